@@ -18,8 +18,14 @@
   value: {{ .Values.worker.maxMemoryPct | quote }}
 - name: WORKER_MAX_MISSING_HEARTBEATS
   value: {{ .Values.worker.maxMissingHeartbeats | quote }}
+- name: WORKER_PREFETCH_LEASE_SECONDS
+  value: {{ .Values.worker.prefetchLeaseSeconds | quote }}
 - name: WORKER_SLEEP_SECONDS
   value: {{ .Values.worker.sleepSeconds | quote }}
+- name: WORKER_WAKE_UP_FALLBACK_SLEEP_SECONDS
+  value: {{ .Values.worker.wakeUpFallbackSleepSeconds | quote }}
+- name: WORKER_WAKE_UP_ON_NEW_JOBS
+  value: {{ .Values.worker.wakeUpOnNewJobs | quote }}
 - name: TMPDIR
   value: "/tmp"
   # ^ensure the temporary files are created in /tmp, which is writable
@@ -34,6 +34,32 @@
     value: {{ .Values.rows.uvicornPort | quote }}
   - name: ROWS_INDEX_MAX_ARROW_DATA_IN_MEMORY
     value: {{ .Values.rowsIndex.maxArrowDataInMemory | quote }}
+  - name: ROWS_INDEX_ROW_GROUP_CACHE_MAX_BYTES
+    value: {{ .Values.rowsIndex.rowGroupCacheMaxBytes | quote }}
+  - name: ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_BYTES
+    value: {{ .Values.rowsIndex.parquetMetadataCacheMaxBytes | quote }}
+  - name: ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_ENTRIES
+    value: {{ .Values.rowsIndex.parquetMetadataCacheMaxEntries | quote }}
+  - name: ROWS_INDEX_SPLITS_CACHE_MAX_BYTES
+    value: {{ .Values.rowsIndex.splitsCacheMaxBytes | quote }}
+  - name: ROWS_INDEX_SPLITS_CACHE_MAX_ENTRIES
+    value: {{ .Values.rowsIndex.splitsCacheMaxEntries | quote }}
+  - name: ROWS_INDEX_SPLITS_CACHE_TTL_SECONDS
+    value: {{ .Values.rowsIndex.splitsCacheTtlSeconds | quote }}
+  - name: ROWS_INDEX_RANGE_READS_MAX_HOLE_SIZE
+    value: {{ .Values.rowsIndex.rangeReadsMaxHoleSize | quote }}
+  - name: ROWS_INDEX_RANGE_READS_MAX_RANGE_SIZE
+    value: {{ .Values.rowsIndex.rangeReadsMaxRangeSize | quote }}
+  - name: ROWS_INDEX_RANGE_READS_MAX_CONCURRENT_REQUESTS
+    value: {{ .Values.rowsIndex.rangeReadsMaxConcurrentRequests | quote }}
+  - name: ROWS_INDEX_DISK_CACHE_BLOCK_SIZE
+    value: {{ .Values.rowsIndex.diskCacheBlockSize | quote }}
+  - name: ROWS_INDEX_DISK_CACHE_DIRECTORY
+    value: {{ .Values.rowsIndex.diskCacheDirectory | quote }}
+  - name: ROWS_INDEX_DISK_CACHE_MAX_BYTES
+    value: {{ .Values.rowsIndex.diskCacheMaxBytes | quote }}
+  - name: ROWS_INDEX_QUERY_THREADS
+    value: {{ .Values.rowsIndex.queryThreads | quote }}
   volumeMounts:
   {{ include "volumeMountParquetMetadataRO" . | nindent 2 }}
   securityContext:
@@ -39,12 +39,46 @@
     value: {{ .Values.duckDBIndex.targetRevision | quote }}
   - name: DUCKDB_INDEX_CACHE_DIRECTORY
     value: {{ .Values.duckDBIndex.cacheDirectory | quote }}
-  - name: DUCKDB_INDEX_CACHE_CLEAN_CACHE_PROBA
-    value: {{ .Values.search.cleanCacheProba | quote }}
   - name: DUCKDB_INDEX_CACHE_EXPIRED_TIME_INTERVAL_SECONDS
     value: {{ .Values.search.expiredTimeIntervalSeconds | quote }}
   - name: DUCKDB_INDEX_EXTENSIONS_DIRECTORY
     value: "/tmp/duckdb-extensions"
+  - name: DUCKDB_INDEX_CONNECTIONS_MAX_PER_FILE
+    value: {{ .Values.search.connectionsMaxPerFile | quote }}
+  - name: DUCKDB_INDEX_CONNECTIONS_MAX_IDLE_SECONDS
+    value: {{ .Values.search.connectionsMaxIdleSeconds | quote }}
+  - name: DUCKDB_INDEX_FILTER_COUNT_CACHE_MAX_ENTRIES
+    value: {{ .Values.search.filterCountCacheMaxEntries | quote }}
+  - name: DUCKDB_INDEX_RESULTS_CACHE_MAX_BYTES
+    value: {{ .Values.search.resultsCacheMaxBytes | quote }}
+  - name: DUCKDB_INDEX_RESULTS_CACHE_MAX_ROWS_PER_ENTRY
+    value: {{ .Values.search.resultsCacheMaxRowsPerEntry | quote }}
+  - name: DUCKDB_INDEX_STREAM_PARQUET_FILES
+    value: {{ .Values.search.streamParquetFiles | quote }}
+  - name: DUCKDB_INDEX_BUILD_MEMORY_LIMIT
+    value: {{ .Values.search.buildMemoryLimit | quote }}
+  - name: DUCKDB_INDEX_SORT_INDEXES_MAX_COLUMNS
+    value: {{ .Values.search.sortIndexesMaxColumns | quote }}
+  - name: DUCKDB_INDEX_PREBUILD_MAX_SPLITS
+    value: {{ .Values.search.prebuildMaxSplits | quote }}
+  - name: DUCKDB_INDEX_PREBUILD_MAX_CONCURRENT_BUILDS
+    value: {{ .Values.search.prebuildMaxConcurrentBuilds | quote }}
+  - name: DUCKDB_INDEX_PREBUILD_INTERVAL_SECONDS
+    value: {{ .Values.search.prebuildIntervalSeconds | quote }}
+  - name: DUCKDB_INDEX_PREBUILD_HALF_LIFE_SECONDS
+    value: {{ .Values.search.prebuildHalfLifeSeconds | quote }}
+  - name: DUCKDB_INDEX_PREBUILD_MIN_FREE_DISK_BYTES
+    value: {{ .Values.search.prebuildMinFreeDiskBytes | quote }}
+  - name: DUCKDB_INDEX_SHARED_STORAGE_PROTOCOL
+    value: {{ .Values.search.sharedStorageProtocol | quote }}
+  - name: DUCKDB_INDEX_SHARED_STORAGE_ROOT
+    value: {{ .Values.search.sharedStorageRoot | quote }}
+  - name: DUCKDB_INDEX_JANITOR_INTERVAL_SECONDS
+    value: {{ .Values.search.janitorIntervalSeconds | quote }}
+  - name: DUCKDB_INDEX_JANITOR_HIGH_WATER_MARK_PERCENT
+    value: {{ .Values.search.janitorHighWaterMarkPercent | quote }}
+  - name: DUCKDB_INDEX_JANITOR_LOW_WATER_MARK_PERCENT
+    value: {{ .Values.search.janitorLowWaterMarkPercent | quote }}
   - name: HF_HUB_ENABLE_HF_TRANSFER
     value: "1"
   volumeMounts:
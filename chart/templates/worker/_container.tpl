@@ -22,6 +22,10 @@
     value: {{ .workerValues.workerDifficultyMax | quote }}
   - name: WORKER_DIFFICULTY_MIN
     value: {{ .workerValues.workerDifficultyMin | quote }}
+  - name: WORKER_NUM_SLOTS
+    value: {{ .workerValues.workerNumSlots | default 1 | quote }}
+  - name: WORKER_PREFETCH_JOBS
+    value: {{ .workerValues.workerPrefetchJobs | default 1 | quote }}
   - name: ROWS_INDEX_MAX_ARROW_DATA_IN_MEMORY
     value: {{ .Values.rowsIndex.maxArrowDataInMemory | quote }}
   # prometheus
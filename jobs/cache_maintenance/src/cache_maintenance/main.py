@@ -13,7 +13,11 @@ from cache_maintenance.backfill import backfill_all_datasets, backfill_retryable
 from cache_maintenance.cache_metrics import collect_cache_metrics
 from cache_maintenance.config import JobConfig
 from cache_maintenance.discussions import post_messages
-from cache_maintenance.queue_metrics import collect_queue_metrics, collect_worker_size_jobs_count
+from cache_maintenance.queue_metrics import (
+    collect_queue_metrics,
+    collect_started_jobs_count_by_namespace,
+    collect_worker_size_jobs_count,
+)
 
 
 def run_job() -> None:
@@ -81,6 +85,7 @@ def run_job() -> None:
                 return
             collect_queue_metrics()
             collect_worker_size_jobs_count()
+            collect_started_jobs_count_by_namespace()
         elif action == "collect-cache-metrics":
             if not cache_resource.is_available():
                 logging.warning(
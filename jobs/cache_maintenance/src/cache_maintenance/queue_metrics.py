@@ -5,6 +5,8 @@ import logging
 
 from libcommon.queue.jobs import Queue
 from libcommon.queue.metrics import JobTotalMetricDocument, WorkerSizeJobsCountDocument
+from libcommon.queue.started_jobs_counts import replace_started_jobs_counts, run_in_queue_transaction
+from pymongo.client_session import ClientSession
 
 
 def collect_queue_metrics() -> None:
@@ -63,3 +65,25 @@ def collect_worker_size_jobs_count() -> None:
         logging.info(f"{worker_size=}: {jobs_count=} has been inserted")
 
     logging.info("worker_size_jobs_count metrics have been updated")
+
+
+def collect_started_jobs_count_by_namespace() -> None:
+    """
+    Collects the number of started jobs by namespace and updates the counters in the database.
+
+    The counters are maintained when the jobs are started and finished, and are used to select the next job to start.
+    Recomputing them fixes a possible drift (e.g. with the jobs started by a previous version of the workers).
+
+    The started jobs are counted and the counters are replaced in the same transaction: if a worker changes a counter
+    in the meantime, the transaction is retried, and the concurrent update is not lost.
+    """
+    logging.info("updating started jobs counts")
+
+    def update_started_jobs_counts(session: ClientSession) -> None:
+        replace_started_jobs_counts(
+            count_by_namespace=Queue().get_started_jobs_count_by_namespace(session=session), session=session
+        )
+
+    run_in_queue_transaction(update_started_jobs_counts)
+
+    logging.info("started jobs counts have been updated")
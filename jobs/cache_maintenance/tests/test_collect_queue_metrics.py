@@ -1,14 +1,21 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright 2023 The HuggingFace Authors.
 
+from typing import Optional
 from unittest.mock import patch
 
 import pytest
 from libcommon.queue.dataset_blockages import DATASET_STATUS_NORMAL
 from libcommon.queue.jobs import JobsCountByWorkerSize, JobsTotalByTypeStatusAndDatasetStatus, Queue
 from libcommon.queue.metrics import JobTotalMetricDocument, WorkerSizeJobsCountDocument
+from libcommon.queue.started_jobs_counts import StartedJobsCountByNamespace, StartedJobsCountDocument
+from pymongo.client_session import ClientSession
 
-from cache_maintenance.queue_metrics import collect_queue_metrics, collect_worker_size_jobs_count
+from cache_maintenance.queue_metrics import (
+    collect_queue_metrics,
+    collect_started_jobs_count_by_namespace,
+    collect_worker_size_jobs_count,
+)
 
 JOB_TYPE_A = "JobTypeA"
 STATUS_WAITING = "waiting"
@@ -25,6 +32,11 @@ NEW_WORKER_SIZE_METRIC = {WORKER_SIZE: COUNT}
 OTHER_WORKER_SIZE = {"heavy": COUNT}
 OTHER_WORKER_SIZE_COUNT = {WORKER_SIZE: COUNT + 1}
 
+NAMESPACE = "org"
+NEW_STARTED_JOBS_COUNTS = {NAMESPACE: COUNT}
+OTHER_NAMESPACE = {"other_org": COUNT}
+OTHER_NAMESPACE_COUNT = {NAMESPACE: COUNT + 1}
+
 
 class MockQueue(Queue):
     def get_jobs_total_by_type_status_and_dataset_status(self) -> JobsTotalByTypeStatusAndDatasetStatus:
@@ -33,6 +45,11 @@ class MockQueue(Queue):
     def get_jobs_count_by_worker_size(self) -> JobsCountByWorkerSize:
         return NEW_WORKER_SIZE_METRIC
 
+    def get_started_jobs_count_by_namespace(
+        self, session: Optional[ClientSession] = None
+    ) -> StartedJobsCountByNamespace:
+        return NEW_STARTED_JOBS_COUNTS
+
 
 @pytest.mark.parametrize(
     "old_metrics",
@@ -71,3 +88,22 @@ def test_collect_worker_size_jobs_count(old_metrics: JobsCountByWorkerSize) -> N
     assert {
         metric.worker_size: metric.jobs_count for metric in WorkerSizeJobsCountDocument.objects()
     } == NEW_WORKER_SIZE_METRIC
+
+
+@pytest.mark.parametrize(
+    "old_counts",
+    [{}, NEW_STARTED_JOBS_COUNTS, OTHER_NAMESPACE, OTHER_NAMESPACE_COUNT],
+)
+def test_collect_started_jobs_count_by_namespace(old_counts: StartedJobsCountByNamespace) -> None:
+    for namespace, count in old_counts.items():
+        StartedJobsCountDocument(namespace=namespace, count=count).save()
+
+    with patch(
+        "cache_maintenance.queue_metrics.Queue",
+        wraps=MockQueue,
+    ):
+        collect_started_jobs_count_by_namespace()
+
+    assert {
+        counter.namespace: counter.count for counter in StartedJobsCountDocument.objects()
+    } == NEW_STARTED_JOBS_COUNTS
@@ -96,6 +96,12 @@ from mongodb_migration.migrations._20240703160300_cache_add_duration import (
 from mongodb_migration.migrations._20240731143600_queue_add_dataset_status_to_queue_metrics import (
     MigrationAddDatasetStatusToQueueMetrics,
 )
+from mongodb_migration.migrations._20261018120000_queue_add_unique_started_unicity_id_index import (
+    MigrationQueueAddUniqueStartedUnicityIdIndex,
+)
+from mongodb_migration.migrations._20261018120100_queue_init_started_jobs_counts import (
+    MigrationQueueInitStartedJobsCounts,
+)
 from mongodb_migration.renaming_migrations import (
     CacheRenamingMigration,
     QueueRenamingMigration,
@@ -418,4 +424,11 @@ class MigrationsCollector:
             MigrationAddDatasetStatusToQueueMetrics(
                 version="20240731143600", description="add 'dataset_status' field to the jobs metrics"
             ),
+            MigrationQueueAddUniqueStartedUnicityIdIndex(
+                version="20261018120000",
+                description="delete the duplicate started jobs and add a unique index on their unicity_id",
+            ),
+            MigrationQueueInitStartedJobsCounts(
+                version="20261018120100", description="initialize the started jobs counts by namespace"
+            ),
         ]
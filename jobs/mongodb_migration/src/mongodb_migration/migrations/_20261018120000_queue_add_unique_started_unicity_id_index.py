@@ -0,0 +1,51 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import logging
+
+from libcommon.constants import QUEUE_COLLECTION_JOBS, QUEUE_MONGOENGINE_ALIAS
+from libcommon.dtos import Status
+from mongoengine.connection import get_db
+
+from mongodb_migration.migration import Migration
+
+INDEX_NAME = "UNIQUE_STARTED_UNICITY_ID"
+
+
+# connection already occurred in the main.py (caveat: we use globals)
+class MigrationQueueAddUniqueStartedUnicityIdIndex(Migration):
+    def up(self) -> None:
+        logging.info("Delete the duplicate started jobs, keeping the most recently started one for each unicity_id")
+        db = get_db(QUEUE_MONGOENGINE_ALIAS)
+        duplicates = db[QUEUE_COLLECTION_JOBS].aggregate(
+            [
+                {"$match": {"status": Status.STARTED.value}},
+                {"$sort": {"started_at": -1}},
+                {"$group": {"_id": "$unicity_id", "job_ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+                {"$match": {"count": {"$gt": 1}}},
+            ]
+        )
+        for duplicate in duplicates:
+            logging.warning(
+                f"job {duplicate['_id']} has been started {duplicate['count']} times. Delete the oldest ones."
+            )
+            db[QUEUE_COLLECTION_JOBS].delete_many({"_id": {"$in": duplicate["job_ids"][1:]}})
+
+        logging.info(f"Create the unique partial index {INDEX_NAME} on the unicity_id of the started jobs")
+        db[QUEUE_COLLECTION_JOBS].create_index(
+            "unicity_id",
+            name=INDEX_NAME,
+            unique=True,
+            partialFilterExpression={"status": Status.STARTED.value},
+        )
+
+    def down(self) -> None:
+        logging.info(f"Delete the index {INDEX_NAME}")
+        db = get_db(QUEUE_MONGOENGINE_ALIAS)
+        db[QUEUE_COLLECTION_JOBS].drop_index(INDEX_NAME)
+
+    def validate(self) -> None:
+        logging.info(f"Check that the index {INDEX_NAME} exists")
+        db = get_db(QUEUE_MONGOENGINE_ALIAS)
+        if INDEX_NAME not in db[QUEUE_COLLECTION_JOBS].index_information():
+            raise ValueError(f"Index does not exist: {INDEX_NAME}")
@@ -0,0 +1,38 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import logging
+
+from libcommon.constants import QUEUE_COLLECTION_JOBS, QUEUE_COLLECTION_STARTED_JOBS_COUNTS, QUEUE_MONGOENGINE_ALIAS
+from libcommon.dtos import Status
+from libcommon.queue.started_jobs_counts import StartedJobsCountDocument
+from mongoengine.connection import get_db
+
+from mongodb_migration.check import check_documents
+from mongodb_migration.migration import Migration
+
+
+# connection already occurred in the main.py (caveat: we use globals)
+class MigrationQueueInitStartedJobsCounts(Migration):
+    def up(self) -> None:
+        logging.info("Initialize the started jobs counts by namespace from the started jobs")
+        db = get_db(QUEUE_MONGOENGINE_ALIAS)
+        for counter in db[QUEUE_COLLECTION_JOBS].aggregate(
+            [
+                {"$match": {"status": Status.STARTED.value}},
+                {"$group": {"_id": "$namespace", "count": {"$sum": 1}}},
+            ]
+        ):
+            db[QUEUE_COLLECTION_STARTED_JOBS_COUNTS].update_one(
+                {"_id": counter["_id"]}, {"$set": {"count": counter["count"]}}, upsert=True
+            )
+
+    def down(self) -> None:
+        logging.info("Drop the started jobs counts collection")
+        db = get_db(QUEUE_MONGOENGINE_ALIAS)
+        db[QUEUE_COLLECTION_STARTED_JOBS_COUNTS].drop()
+
+    def validate(self) -> None:
+        logging.info("Ensure that a random selection of started jobs counts have the expected format")
+
+        check_documents(DocCls=StartedJobsCountDocument, sample_size=10)
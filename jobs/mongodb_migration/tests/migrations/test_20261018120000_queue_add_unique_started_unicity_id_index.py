@@ -0,0 +1,48 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+from datetime import datetime
+
+import pytest
+from libcommon.constants import QUEUE_COLLECTION_JOBS, QUEUE_MONGOENGINE_ALIAS
+from libcommon.resources import MongoResource
+from mongoengine.connection import get_db
+from pymongo.errors import DuplicateKeyError
+
+from mongodb_migration.migrations._20261018120000_queue_add_unique_started_unicity_id_index import (
+    INDEX_NAME,
+    MigrationQueueAddUniqueStartedUnicityIdIndex,
+)
+
+
+def test_queue_add_unique_started_unicity_id_index(mongo_host: str) -> None:
+    with MongoResource(
+        database="test_queue_add_unique_started_unicity_id_index",
+        host=mongo_host,
+        mongoengine_alias=QUEUE_MONGOENGINE_ALIAS,
+    ):
+        db = get_db(QUEUE_MONGOENGINE_ALIAS)
+        db[QUEUE_COLLECTION_JOBS].insert_many(
+            [
+                {"unicity_id": "a", "status": "started", "started_at": datetime(2024, 1, 1), "dataset": "old"},
+                {"unicity_id": "a", "status": "started", "started_at": datetime(2024, 1, 2), "dataset": "new"},
+                {"unicity_id": "a", "status": "waiting", "dataset": "waiting"},
+                {"unicity_id": "b", "status": "started", "started_at": datetime(2024, 1, 1), "dataset": "other"},
+            ]
+        )
+
+        migration = MigrationQueueAddUniqueStartedUnicityIdIndex(
+            version="20261018120000",
+            description="delete the duplicate started jobs and add a unique index on their unicity_id",
+        )
+        migration.up()
+        migration.validate()
+
+        assert sorted(job["dataset"] for job in db[QUEUE_COLLECTION_JOBS].find()) == ["new", "other", "waiting"]
+        with pytest.raises(DuplicateKeyError):
+            db[QUEUE_COLLECTION_JOBS].insert_one({"unicity_id": "b", "status": "started"})
+
+        migration.down()
+        assert INDEX_NAME not in db[QUEUE_COLLECTION_JOBS].index_information()
+
+        db[QUEUE_COLLECTION_JOBS].drop()
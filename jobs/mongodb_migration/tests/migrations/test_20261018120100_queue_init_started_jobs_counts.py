@@ -0,0 +1,42 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+from libcommon.constants import QUEUE_COLLECTION_JOBS, QUEUE_COLLECTION_STARTED_JOBS_COUNTS, QUEUE_MONGOENGINE_ALIAS
+from libcommon.resources import MongoResource
+from mongoengine.connection import get_db
+
+from mongodb_migration.migrations._20261018120100_queue_init_started_jobs_counts import (
+    MigrationQueueInitStartedJobsCounts,
+)
+
+
+def test_queue_init_started_jobs_counts(mongo_host: str) -> None:
+    with MongoResource(
+        database="test_queue_init_started_jobs_counts",
+        host=mongo_host,
+        mongoengine_alias=QUEUE_MONGOENGINE_ALIAS,
+    ):
+        db = get_db(QUEUE_MONGOENGINE_ALIAS)
+        db[QUEUE_COLLECTION_JOBS].insert_many(
+            [
+                {"unicity_id": "a", "namespace": "org1", "status": "started"},
+                {"unicity_id": "b", "namespace": "org1", "status": "started"},
+                {"unicity_id": "c", "namespace": "org1", "status": "waiting"},
+                {"unicity_id": "d", "namespace": "org2", "status": "started"},
+                {"unicity_id": "e", "namespace": "org3", "status": "waiting"},
+            ]
+        )
+
+        migration = MigrationQueueInitStartedJobsCounts(
+            version="20261018120100", description="initialize the started jobs counts by namespace"
+        )
+        migration.up()
+
+        assert {
+            counter["_id"]: counter["count"] for counter in db[QUEUE_COLLECTION_STARTED_JOBS_COUNTS].find()
+        } == {"org1": 2, "org2": 1}
+
+        migration.down()
+        assert db[QUEUE_COLLECTION_STARTED_JOBS_COUNTS].count_documents({}) == 0
+
+        db[QUEUE_COLLECTION_JOBS].drop()
@@ -2,21 +2,28 @@
 # Copyright 2023 The HuggingFace Authors.
 
 import asyncio
+import functools
 import json
 import logging
 import os
 import re
+import tempfile
 import traceback
-from collections.abc import Coroutine
+from collections.abc import Callable, Coroutine
 from hashlib import sha1
 from pathlib import Path
 from typing import Any, Optional, TypeVar
+from uuid import uuid4
 
 import anyio
 import duckdb
 import filelock
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datasets import Features
 from filelock import AsyncFileLock
+from fsspec import AbstractFileSystem
+from fsspec.implementations.http import HTTPFileSystem
 from huggingface_hub import HfApi
 from libcommon.constants import CONFIG_PARQUET_METADATA_KIND, PARQUET_REVISION, ROW_IDX_COLUMN
 from libcommon.duckdb_utils import (
@@ -26,7 +33,9 @@ from libcommon.duckdb_utils import (
     DUCKDB_DEFAULT_INDEX_FILENAME,
     DUCKDB_DEFAULT_PARTIAL_INDEX_FILENAME,
     compute_transformed_data,
+    compute_transformed_data_from_table,
     create_index,
+    create_sort_indexes,
     get_indexable_columns,
     get_monolingual_stemmer,
 )
@@ -37,6 +46,7 @@ from libcommon.parquet_utils import (
     parquet_export_is_partial,
 )
 from libcommon.prometheus import StepProfiler
+from libcommon.queue.lock import lock
 from libcommon.simple_cache import CacheEntry
 from libcommon.storage import StrPath, init_dir
 from libcommon.storage_client import StorageClient
@@ -48,6 +58,22 @@ from libapi.utils import get_cache_entry_from_step
 REPO_TYPE = "dataset"
 DUCKDB_INDEX_DOWNLOADS_SUBDIRECTORY = "downloads"
 HUB_DOWNLOAD_CACHE_FOLDER = "cache"
+# the replicas wait for about 6 minutes for the index built by another replica, before building it themselves
+SHARED_INDEX_LOCK_SLEEPS = (0.05, 0.05, 0.05, 1, 1, 1, 5, 5, 5, 10, 10, 10, 30, 30, 30, 60, 60, 60)
+# when streaming the parquet files, the rows are inserted in batches of about this uncompressed size
+STREAMING_BATCH_MAX_BYTES = 64_000_000
+DEFAULT_BUILD_MEMORY_LIMIT = "1GB"
+CREATE_TABLE_FROM_BATCH_COMMAND = "CREATE TABLE data AS SELECT {columns} FROM batch LIMIT 0;"
+CREATE_TABLE_JOIN_WITH_TRANSFORMED_BATCH_COMMAND = (
+    "CREATE TABLE data AS SELECT {columns}, transformed_batch.* FROM batch POSITIONAL JOIN transformed_batch LIMIT 0;"
+)
+INSERT_BATCH_COMMAND = "INSERT INTO data BY NAME SELECT {columns} FROM batch;"
+INSERT_BATCH_JOIN_WITH_TRANSFORMED_BATCH_COMMAND = (
+    "INSERT INTO data BY NAME SELECT {columns}, transformed_batch.* FROM batch POSITIONAL JOIN transformed_batch;"
+)
+DROP_COLUMN_COMMAND = 'ALTER TABLE data DROP COLUMN "{column}";'
+SET_MEMORY_LIMIT_COMMAND = "SET memory_limit='{memory_limit}';"
+SET_TEMP_DIRECTORY_COMMAND = "SET temp_directory='{temp_directory}';"
 
 T = TypeVar("T")
 
@@ -79,6 +105,75 @@ def create_task(awaitable: Coroutine[None, None, T]) -> asyncio.Task[T]:
     return task
 
 
+def get_streaming_batch_size(metadata: pq.FileMetaData) -> int:
+    """Get the number of rows per batch, so that a batch has about STREAMING_BATCH_MAX_BYTES uncompressed bytes."""
+    num_bytes: int = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+    num_rows: int = metadata.num_rows
+    return max(1, STREAMING_BATCH_MAX_BYTES * num_rows // max(1, num_bytes))
+
+
+def insert_parquet_files_in_batches(
+    con: duckdb.DuckDBPyConnection, fs: AbstractFileSystem, parquet_file_urls: list[str], features: dict[str, Any]
+) -> None:
+    """Create the data table from remote parquet files, without downloading them.
+
+    The row groups are read with range requests and inserted in batches, along with the transformed data (string
+    lengths, audio durations, etc.) of the batch. If the transformed data can't be computed for a batch, the
+    transformed columns are dropped, as in the non-streaming build.
+    """
+    column_names_sql = ",".join(f'"{column}"' for column in features)
+    with_transformed_data = True
+    transformed_columns: list[str] = []
+    is_table_created = False
+    arrow_schema: Optional[pa.Schema] = None
+    for url in parquet_file_urls:
+        with fs.open(url, "rb") as f:
+            parquet_file = pq.ParquetFile(f)
+            arrow_schema = parquet_file.schema_arrow
+            for record_batch in parquet_file.iter_batches(
+                batch_size=get_streaming_batch_size(parquet_file.metadata), columns=list(features)
+            ):
+                batch = pa.Table.from_batches([record_batch])
+                transformed_batch = None
+                if with_transformed_data:
+                    try:
+                        transformed_df = compute_transformed_data_from_table(batch, features)
+                        transformed_batch = None if transformed_df is None else transformed_df.to_arrow()
+                    except Exception as err:
+                        logging.info(f"Unable to compute transformed data {err}, skipping statistics.")
+                        with_transformed_data = False
+                        for column in transformed_columns:
+                            con.sql(DROP_COLUMN_COMMAND.format(column=column))
+                con.register("batch", batch)
+                if transformed_batch is not None:
+                    con.register("transformed_batch", transformed_batch)
+                if not is_table_created:
+                    con.sql(
+                        (
+                            CREATE_TABLE_FROM_BATCH_COMMAND
+                            if transformed_batch is None
+                            else CREATE_TABLE_JOIN_WITH_TRANSFORMED_BATCH_COMMAND
+                        ).format(columns=column_names_sql)
+                    )
+                    is_table_created = True
+                    transformed_columns = [] if transformed_batch is None else transformed_batch.column_names
+                con.sql(
+                    (
+                        INSERT_BATCH_COMMAND
+                        if transformed_batch is None
+                        else INSERT_BATCH_JOIN_WITH_TRANSFORMED_BATCH_COMMAND
+                    ).format(columns=column_names_sql)
+                )
+                con.unregister("batch")
+                if transformed_batch is not None:
+                    con.unregister("transformed_batch")
+    if not is_table_created and arrow_schema is not None:
+        # all the parquet files are empty
+        con.register("batch", arrow_schema.empty_table())
+        con.sql(CREATE_TABLE_FROM_BATCH_COMMAND.format(columns=column_names_sql))
+        con.unregister("batch")
+
+
 def build_index_file(
     cache_folder: StrPath,
     index_folder: StrPath,
@@ -92,7 +187,19 @@ def build_index_file(
     parquet_metadata_directory: StrPath,
     split_parquet_files: list[ParquetFileMetadataItem],
     features: dict[str, Any],
+    stream_parquet_files: bool = False,
+    memory_limit: str = DEFAULT_BUILD_MEMORY_LIMIT,
+    sort_indexes_max_columns: int = 0,
 ) -> None:
+    """Build the duckdb index file of a split.
+
+    By default, the parquet files are downloaded before being loaded. If `stream_parquet_files` is True, their row
+    groups are read remotely and inserted in batches, with a memory limit of `memory_limit` for duckdb, so that the
+    build starts without waiting for the downloads, and doesn't need disk space for them.
+
+    The sort permutations of at most `sort_indexes_max_columns` numerical and short string columns are stored in the
+    index (see `create_sort_indexes`), to serve the /filter requests ordered by these columns.
+    """
     logging.info(f"compute and cache duckdb index on-the-fly for {dataset=} {config=} {split=}")
     if not split_parquet_files:
         raise DownloadIndexError("No parquet files found.")
@@ -116,7 +223,7 @@ def build_index_file(
     indexable_columns = get_indexable_columns(Features.from_dict(features))
 
     all_split_parquets: list[Path] = []
-    for parquet_file in parquet_file_names:
+    for parquet_file in [] if stream_parquet_files else parquet_file_names:
         all_split_parquets.append(
             Path(
                 download_file_from_hub(
@@ -132,33 +239,52 @@ def build_index_file(
         )
 
     transformed_df = None
-    try:
-        transformed_df = compute_transformed_data(all_split_parquets, features)
-    except Exception as err:
-        logging.info(f"Unable to compute transformed data {err}, skipping statistics.")
+    if not stream_parquet_files:
+        try:
+            transformed_df = compute_transformed_data(all_split_parquets, features)
+        except Exception as err:
+            logging.info(f"Unable to compute transformed data {err}, skipping statistics.")
 
     # create index
     index_file_location = f"{index_folder}/{repo_file_location}"
     Path(index_file_location).parent.mkdir(exist_ok=True, parents=True)
 
     try:
-        with duckdb.connect(index_file_location) as con:
-            if transformed_df is not None:
-                logging.debug(transformed_df.head())
-                # update original data with results of transformations (string lengths, audio durations, etc.):
-                logging.info(f"Updating data with {transformed_df.columns}")
-                create_command_sql = CREATE_TABLE_JOIN_WITH_TRANSFORMED_DATA_COMMAND_FROM_LIST_OF_PARQUET_FILES.format(
-                    columns=column_names_sql, source=[str(p) for p in all_split_parquets]
+        temp_directory = tempfile.TemporaryDirectory(dir=Path(index_file_location).parent)
+        with temp_directory, duckdb.connect(index_file_location) as con:
+            # the files spilled to disk by duckdb are deleted as soon as the table is created
+            con.sql(SET_TEMP_DIRECTORY_COMMAND.format(temp_directory=temp_directory.name))
+            if stream_parquet_files:
+                con.sql(SET_MEMORY_LIMIT_COMMAND.format(memory_limit=memory_limit))
+                headers = {"authorization": f"Bearer {hf_token}"} if hf_token else None
+                insert_parquet_files_in_batches(
+                    con,
+                    fs=HTTPFileSystem(headers=headers),
+                    parquet_file_urls=[parquet_file["url"] for parquet_file in split_parquet_files],
+                    features=features,
                 )
-
             else:
-                create_command_sql = CREATE_TABLE_COMMAND_FROM_LIST_OF_PARQUET_FILES.format(
-                    columns=column_names_sql, source=[str(p) for p in all_split_parquets]
-                )
+                if transformed_df is not None:
+                    logging.debug(transformed_df.head())
+                    # update original data with results of transformations (string lengths, audio durations, etc.):
+                    logging.info(f"Updating data with {transformed_df.columns}")
+                    create_command_sql = (
+                        CREATE_TABLE_JOIN_WITH_TRANSFORMED_DATA_COMMAND_FROM_LIST_OF_PARQUET_FILES.format(
+                            columns=column_names_sql, source=[str(p) for p in all_split_parquets]
+                        )
+                    )
+
+                else:
+                    create_command_sql = CREATE_TABLE_COMMAND_FROM_LIST_OF_PARQUET_FILES.format(
+                        columns=column_names_sql, source=[str(p) for p in all_split_parquets]
+                    )
 
-            logging.info(create_command_sql)
-            con.sql(create_command_sql)
+                logging.info(create_command_sql)
+                con.sql(create_command_sql)
             con.sql(CREATE_INDEX_ID_COLUMN_COMMANDS)
+            if sort_indexes_max_columns > 0:
+                sorted_columns = create_sort_indexes(con, features, max_columns=sort_indexes_max_columns)
+                logging.info(f"Created the sort indexes of {sorted_columns}")
             logging.debug(con.sql("SELECT * FROM data LIMIT 5;"))
             logging.debug(con.sql("SELECT count(*) FROM data;"))
             # make sure there is no WAL at the end
@@ -182,6 +308,126 @@ def build_index_file(
         raise
 
 
+def download_shared_index_file(
+    shared_storage_client: StorageClient, shared_path: str, index_file_location: str
+) -> bool:
+    """Download an index file from the shared storage, if it's there. Returns True if it has been downloaded."""
+    if not shared_storage_client.exists(shared_path):
+        return False
+    tmp_path = f"{index_file_location}.{uuid4().hex}.tmp"
+    try:
+        shared_storage_client.download(shared_path, tmp_path)
+        os.replace(tmp_path, index_file_location)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logging.info(f"downloaded the shared index file {shared_path}")
+    return True
+
+
+async def get_shared_index_file_or_build(
+    shared_storage_client: StorageClient,
+    dataset: str,
+    revision: str,
+    config: str,
+    split: str,
+    index_folder: str,
+    repo_file_location: str,
+    build: Callable[[], None],
+) -> None:
+    """Download the index file of a split from the shared storage, or build it and upload it.
+
+    The replicas coordinate through a lock in the queue database, so that only one of them builds a given index while
+    the others wait for it, and then download it. If the lock can't be acquired in time, the index is built locally.
+
+    The lock is polled from the event loop: waiting for the index built by another replica does not hold one of the
+    threads of the anyio limiter, which are shared with the requests. Only the calls to the queue database and to the
+    storage, and the build, run in threads.
+
+    The shared index files are never deleted by the replicas: the files of the old revisions must be expired by the
+    storage itself (see the README of the search service).
+
+    Args:
+        shared_storage_client (`StorageClient`): The storage shared by the replicas.
+        dataset (`str`): The dataset.
+        revision (`str`): The revision of the dataset.
+        config (`str`): The config.
+        split (`str`): The split.
+        index_folder (`str`): The local folder of the index, that identifies it (see `get_download_folder`).
+        repo_file_location (`str`): The location of the index file, relative to the index folder.
+        build (`Callable[[], None]`): The function that builds the index file locally.
+    """
+    index_file_location = f"{index_folder}/{repo_file_location}"
+    shared_path = f"{Path(index_folder).name}/{repo_file_location}"
+    download = functools.partial(download_shared_index_file, shared_storage_client, shared_path, index_file_location)
+    if await anyio.to_thread.run_sync(download):
+        return
+    index_lock = lock.duckdb_index(dataset=dataset, revision=revision, config=config, split=split, owner=uuid4().hex)
+    for sleep in SHARED_INDEX_LOCK_SLEEPS:
+        if await anyio.to_thread.run_sync(index_lock.try_acquire):
+            break
+        await asyncio.sleep(sleep)
+    else:
+        logging.warning(f"the index {shared_path} is still being built by another replica, building it locally")
+        await anyio.to_thread.run_sync(build)
+        return
+    try:
+        # the index may have been uploaded by another replica while waiting for the lock
+        if await anyio.to_thread.run_sync(download):
+            return
+        await anyio.to_thread.run_sync(build)
+        try:
+            await anyio.to_thread.run_sync(shared_storage_client.upload, index_file_location, shared_path)
+        except Exception:
+            logging.exception(f"failed to upload the index file {shared_path} to the shared storage")
+    finally:
+        await anyio.to_thread.run_sync(index_lock.release)
+
+
+def get_index_file_location(
+    duckdb_index_file_directory: StrPath,
+    dataset: str,
+    revision: str,
+    config: str,
+    split: str,
+    max_split_size_bytes: int,
+    parquet_metadata_directory: StrPath,
+    split_parquet_files: list[ParquetFileMetadataItem],
+) -> tuple[str, str, bool]:
+    """Get the location of the index file of a split, and check that there is enough disk space to build it.
+
+    Returns:
+        `tuple[str, str, bool]`: The index folder, the location of the index file relative to the index folder, and
+          whether the index only contains a part of the split.
+    """
+    # For directories like "partial-train" for the file at "en/partial-train/0000.parquet" in the C4 dataset.
+    # Note that "-" is forbidden for split names so it doesn't create directory names collisions.
+    split_directory = extract_split_directory_from_parquet_url(split_parquet_files[0]["url"])
+    partial_parquet_export = parquet_export_is_partial(split_parquet_files[0]["url"])
+
+    num_parquet_files_to_index, num_bytes, num_rows = get_num_parquet_files_to_process(
+        parquet_files=split_parquet_files,
+        parquet_metadata_directory=parquet_metadata_directory,
+        max_size_bytes=max_split_size_bytes,
+    )
+
+    index_filename = (
+        DUCKDB_DEFAULT_PARTIAL_INDEX_FILENAME
+        if (num_parquet_files_to_index < len(split_parquet_files))
+        else DUCKDB_DEFAULT_INDEX_FILENAME
+    )
+    partial = partial_parquet_export or (num_parquet_files_to_index < len(split_parquet_files))
+    repo_file_location = f"{config}/{split_directory}/{index_filename}"
+
+    # We can expect the duckdb index to be around the same size as the num_bytes.
+    # But we apply a factor since we also add the full-text-search index and additional columns
+    size_factor = 5
+    index_folder = get_download_folder(
+        duckdb_index_file_directory, size_factor * num_bytes, dataset, config, split, revision
+    )
+    return index_folder, repo_file_location, partial
+
+
 async def get_index_file_location_and_build_if_missing(
     duckdb_index_file_directory: StrPath,
     dataset: str,
@@ -194,32 +440,30 @@ async def get_index_file_location_and_build_if_missing(
     parquet_metadata_directory: StrPath,
     split_parquet_files: list[ParquetFileMetadataItem],
     features: dict[str, Any],
+    stream_parquet_files: bool = False,
+    build_memory_limit: str = DEFAULT_BUILD_MEMORY_LIMIT,
+    sort_indexes_max_columns: int = 0,
+    timeout: Optional[float] = 20,
+    shared_storage_client: Optional[StorageClient] = None,
 ) -> tuple[str, bool]:
-    with StepProfiler(method="get_index_file_location_and_build_if_missing", step="all"):
-        # For directories like "partial-train" for the file at "en/partial-train/0000.parquet" in the C4 dataset.
-        # Note that "-" is forbidden for split names so it doesn't create directory names collisions.
-        split_directory = extract_split_directory_from_parquet_url(split_parquet_files[0]["url"])
-        partial_parquet_export = parquet_export_is_partial(split_parquet_files[0]["url"])
+    """Get the location of the index file of a split, and build it if missing.
 
-        num_parquet_files_to_index, num_bytes, num_rows = get_num_parquet_files_to_process(
-            parquet_files=split_parquet_files,
-            parquet_metadata_directory=parquet_metadata_directory,
-            max_size_bytes=max_split_size_bytes,
-        )
+    If the index is not ready after `timeout` seconds (None to wait until it's built), `ResponseNotReadyError` is
+    raised, while the build goes on in the background.
 
-        index_filename = (
-            DUCKDB_DEFAULT_PARTIAL_INDEX_FILENAME
-            if (num_parquet_files_to_index < len(split_parquet_files))
-            else DUCKDB_DEFAULT_INDEX_FILENAME
-        )
-        partial = partial_parquet_export or (num_parquet_files_to_index < len(split_parquet_files))
-        repo_file_location = f"{config}/{split_directory}/{index_filename}"
-
-        # We can expect the duckdb index to be around the same size as the num_bytes.
-        # But we apply a factor since we also add the full-text-search index and additional columns
-        size_factor = 5
-        index_folder = get_download_folder(
-            duckdb_index_file_directory, size_factor * num_bytes, dataset, config, split, revision
+    If `shared_storage_client` is set, the index built by another replica is downloaded from it instead of being
+    built again (see `get_shared_index_file_or_build`).
+    """
+    with StepProfiler(method="get_index_file_location_and_build_if_missing", step="all"):
+        index_folder, repo_file_location, partial = get_index_file_location(
+            duckdb_index_file_directory=duckdb_index_file_directory,
+            dataset=dataset,
+            revision=revision,
+            config=config,
+            split=split,
+            max_split_size_bytes=max_split_size_bytes,
+            parquet_metadata_directory=parquet_metadata_directory,
+            split_parquet_files=split_parquet_files,
         )
         index_file_location = f"{index_folder}/{repo_file_location}"
         index_path = anyio.Path(index_file_location)
@@ -227,34 +471,51 @@ async def get_index_file_location_and_build_if_missing(
         # use a lock in case another worker is currently writing
         Path(index_file_location).parent.mkdir(exist_ok=True, parents=True)
         try:
-            async with AsyncFileLock(index_file_location + ".lock", timeout=20):
+            async with AsyncFileLock(index_file_location + ".lock", timeout=-1 if timeout is None else timeout):
                 if not await index_path.is_file():
                     cache_folder = Path(duckdb_index_file_directory) / HUB_DOWNLOAD_CACHE_FOLDER
                     cache_folder.mkdir(exist_ok=True, parents=True)
+                    build = functools.partial(
+                        build_index_file,
+                        cache_folder,
+                        index_folder,
+                        dataset,
+                        config,
+                        split,
+                        repo_file_location,
+                        hf_token,
+                        max_split_size_bytes,
+                        extensions_directory,
+                        parquet_metadata_directory,
+                        split_parquet_files,
+                        features,
+                        stream_parquet_files,
+                        build_memory_limit,
+                        sort_indexes_max_columns,
+                    )
+                    get_shared = (
+                        None
+                        if shared_storage_client is None
+                        else functools.partial(
+                            get_shared_index_file_or_build,
+                            shared_storage_client,
+                            dataset,
+                            revision,
+                            config,
+                            split,
+                            index_folder,
+                            repo_file_location,
+                            build,
+                        )
+                    )
                     with StepProfiler(
                         method="get_index_file_location_and_build_if_missing", step="build duckdb index"
                     ):
                         await asyncio.wait_for(
                             asyncio.shield(
-                                create_task(
-                                    anyio.to_thread.run_sync(
-                                        build_index_file,
-                                        cache_folder,
-                                        index_folder,
-                                        dataset,
-                                        config,
-                                        split,
-                                        repo_file_location,
-                                        hf_token,
-                                        max_split_size_bytes,
-                                        extensions_directory,
-                                        parquet_metadata_directory,
-                                        split_parquet_files,
-                                        features,
-                                    )
-                                )
+                                create_task(anyio.to_thread.run_sync(build) if get_shared is None else get_shared())
                             ),
-                            timeout=20,
+                            timeout=timeout,
                         )
         except (filelock.Timeout, asyncio.TimeoutError):
             _msg = "this can take a minute" if len(_all_tasks) < 20 else "this may take longer than usual"
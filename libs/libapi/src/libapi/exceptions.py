@@ -57,6 +57,10 @@ class AuthCheckHubRequestError(ApiError):
         )
 
 
+class ClientDisconnectedError(Exception):
+    """The client disconnected before the response was ready. No response can be sent."""
+
+
 class DownloadIndexError(ApiError):
     """The index download failed."""
 
@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright 2023 The HuggingFace Authors.
+from typing import Optional
+
 from libcommon.constants import MAX_NUM_ROWS_PER_PAGE
 from starlette.requests import Request
 
@@ -29,6 +31,16 @@ def get_request_parameter_offset(request: Request) -> int:
     return offset
 
 
+def get_request_parameter_columns(request: Request) -> Optional[list[str]]:
+    """Get the list of columns from the repeated 'columns' parameter. None if the parameter is not passed."""
+    columns = request.query_params.getlist("columns")
+    if not columns:
+        return None
+    if not all(is_non_empty_string(column) for column in columns):
+        raise InvalidParameterError("Parameter 'columns' must be a non-empty string")
+    return list(dict.fromkeys(columns))
+
+
 def get_request_parameter(request: Request, parameter_name: str, required: bool = False, default: str = "") -> str:
     parameter = request.query_params.get(parameter_name, default)
     if required:
@@ -6,10 +6,11 @@ from functools import partial
 from typing import Any, Optional
 
 import anyio
+import pyarrow as pa
 from datasets import Features
 from libcommon.dtos import Row
 from libcommon.storage_client import StorageClient
-from libcommon.viewer_utils.features import get_cell_value
+from libcommon.viewer_utils.features import get_cell_value, has_asset_feature
 from tqdm.contrib.concurrent import thread_map
 
 
@@ -79,3 +80,63 @@ async def transform_rows(
             return list(map(func, *iterables))
 
         return await anyio.to_thread.run_sync(_map, fn, enumerate(rows))
+
+
+def _table_to_rows(pa_table: pa.Table, columns: list[str], skipped_columns: list[str]) -> list[Row]:
+    # convert column by column, which is faster than pa_table.to_pylist(). The skipped and missing columns are None.
+    num_rows = pa_table.num_rows
+    if not columns:
+        return [{} for _ in range(num_rows)]
+    columns_values = [
+        (
+            pa_table.column(column).to_pylist()
+            if column in pa_table.column_names and column not in skipped_columns
+            else [None] * num_rows
+        )
+        for column in columns
+    ]
+    return [dict(zip(columns, values)) for values in zip(*columns_values)]
+
+
+async def transform_table(
+    dataset: str,
+    revision: str,
+    config: str,
+    split: str,
+    pa_table: pa.Table,
+    features: Features,
+    storage_client: StorageClient,
+    offset: int,
+    row_idx_column: Optional[str],
+) -> list[Row]:
+    """Same as transform_rows() on pa_table.to_pylist(), with a fast path for the columns without assets.
+
+    get_cell_value() returns the cells as is, unless their feature contains an Image, Audio, Video or Pdf. The other
+    columns are converted from Arrow column by column, and only the cells of the asset columns are transformed one
+    by one.
+    """
+    asset_features = Features({column: feature for column, feature in features.items() if has_asset_feature(feature)})
+    columns = list(features)
+    if row_idx_column and row_idx_column not in features:
+        columns.append(row_idx_column)
+    rows = await anyio.to_thread.run_sync(_table_to_rows, pa_table, columns, list(asset_features))
+    if not asset_features:
+        return rows
+    asset_columns = [column for column in asset_features if column in pa_table.column_names]
+    if row_idx_column and row_idx_column not in asset_columns:
+        asset_columns.append(row_idx_column)
+    transformed_rows = await transform_rows(
+        dataset=dataset,
+        revision=revision,
+        config=config,
+        split=split,
+        rows=pa_table.select(asset_columns).to_pylist(),
+        features=asset_features,
+        storage_client=storage_client,
+        offset=offset,
+        row_idx_column=row_idx_column,
+    )
+    for row, transformed_row in zip(rows, transformed_rows):
+        for column in asset_features:
+            row[column] = transformed_row[column]
+    return rows
@@ -2,10 +2,11 @@
 # Copyright 2022 The HuggingFace Authors.
 
 import logging
-from collections.abc import Callable, Coroutine
+from collections.abc import Awaitable, Callable, Coroutine
 from http import HTTPStatus
-from typing import Any, Optional
+from typing import Any, Optional, TypeVar
 
+import anyio
 import pyarrow as pa
 from datasets import Features
 from libcommon.dtos import Priority, RowItem
@@ -26,11 +27,12 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
 
 from libapi.exceptions import (
+    ClientDisconnectedError,
     ResponseNotFoundError,
     ResponseNotReadyError,
     TransformRowsProcessingError,
 )
-from libapi.rows_utils import transform_rows
+from libapi.rows_utils import transform_table
 
 
 class OrjsonResponse(JSONResponse):
@@ -196,6 +198,48 @@ def get_cache_entry_from_step(
 
 Endpoint = Callable[[Request], Coroutine[Any, Any, Response]]
 
+T = TypeVar("T")
+
+
+async def cancel_on_disconnect(request: Request, func: Callable[[], Awaitable[T]]) -> T:
+    """Await func(), and cancel it if the client disconnects before the result is ready.
+
+    The request body must not be read concurrently, since the disconnection is detected by receiving the messages of
+    the request.
+
+    Args:
+        request (`Request`): The request.
+        func (`Callable[[], Awaitable[T]]`): The function that returns the awaitable to run.
+
+    Raises:
+        [`ClientDisconnectedError`]: if the client disconnected before the result was ready.
+
+    Returns:
+        `T`: The result of func().
+    """
+    results: list[T] = []
+    error: Optional[Exception] = None
+
+    async with anyio.create_task_group() as task_group:
+
+        async def cancel_when_disconnected() -> None:
+            while (await request.receive())["type"] != "http.disconnect":
+                pass
+            task_group.cancel_scope.cancel()
+
+        task_group.start_soon(cancel_when_disconnected)
+        try:
+            results.append(await func())
+        except Exception as err:
+            # raised outside of the task group, so that it's not wrapped in an exception group
+            error = err
+        task_group.cancel_scope.cancel()
+    if error is not None:
+        raise error
+    if not results:
+        raise ClientDisconnectedError("The client disconnected before the response was ready.")
+    return results[0]
+
 
 async def to_rows_list(
     pa_table: pa.Table,
@@ -216,12 +260,12 @@ async def to_rows_list(
             pa_table = pa_table.add_column(idx, column, pa.array([None] * num_rows))
     # transform the rows, if needed (e.g. save the images or audio to the assets, and return their URL)
     try:
-        transformed_rows = await transform_rows(
+        transformed_rows = await transform_table(
             dataset=dataset,
             revision=revision,
             config=config,
             split=split,
-            rows=pa_table.to_pylist(),
+            pa_table=pa_table,
             features=features,
             storage_client=storage_client,
             offset=offset,
@@ -1,9 +1,27 @@
+import asyncio
+from pathlib import Path
 from typing import Optional
+from unittest.mock import patch
 
+import anyio
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+from fsspec.implementations.local import LocalFileSystem
+from libcommon.duckdb_utils import (
+    CREATE_TABLE_JOIN_WITH_TRANSFORMED_DATA_COMMAND_FROM_LIST_OF_PARQUET_FILES,
+    compute_transformed_data,
+)
+from libcommon.queue.lock import lock
+from libcommon.storage_client import StorageClient
 from pytest import TempPathFactory
 
-from libapi.duckdb import check_available_disk_space
+from libapi.duckdb import (
+    check_available_disk_space,
+    get_shared_index_file_or_build,
+    insert_parquet_files_in_batches,
+)
 
 # TODO(QL): test duckdb indexing
 
@@ -14,3 +32,124 @@ def test_check_available_disk_space(tmp_path_factory: TempPathFactory, subpath:
     if subpath:
         path = path / subpath
     check_available_disk_space(path=path, required_space=1)
+
+
+@pytest.mark.parametrize("batch_max_bytes", [1, 100, 1_000_000])
+def test_insert_parquet_files_in_batches(tmp_path: Path, batch_max_bytes: int) -> None:
+    features = {
+        "text": {"dtype": "string", "_type": "Value"},
+        "tokens": {"feature": {"dtype": "string", "_type": "Value"}, "_type": "Sequence"},
+        "label": {"dtype": "int64", "_type": "Value"},
+    }
+    parquet_paths = []
+    for i in range(2):
+        table = pa.table(
+            {
+                "text": [f"text {i} {j}" * j if j % 3 else None for j in range(10)],
+                "tokens": [[str(k) for k in range(j)] for j in range(10)],
+                "label": list(range(10)),
+                "ignored": list(range(10)),
+            }
+        )
+        parquet_paths.append(tmp_path / f"{i}.parquet")
+        pq.write_table(table, parquet_paths[-1], row_group_size=4)
+    # the same table as the one built from the downloaded files
+    transformed_df = compute_transformed_data(parquet_paths, features)
+    with duckdb.connect(":memory:") as con:
+        con.sql(
+            CREATE_TABLE_JOIN_WITH_TRANSFORMED_DATA_COMMAND_FROM_LIST_OF_PARQUET_FILES.format(
+                columns='"text","tokens","label"', source=[str(path) for path in parquet_paths]
+            )
+        )
+        expected = con.sql("SELECT * FROM data").arrow()
+    with duckdb.connect(":memory:") as con, patch("libapi.duckdb.STREAMING_BATCH_MAX_BYTES", batch_max_bytes):
+        insert_parquet_files_in_batches(
+            con, fs=LocalFileSystem(), parquet_file_urls=[str(path) for path in parquet_paths], features=features
+        )
+        assert con.sql("SELECT * FROM data").arrow() == expected
+    assert transformed_df is not None
+    assert expected.column_names == ["text", "tokens", "label", "text.length", "tokens.length"]
+
+
+def test_insert_parquet_files_in_batches_empty_files(tmp_path: Path) -> None:
+    path = tmp_path / "0.parquet"
+    pq.write_table(pa.table({"text": pa.array([], type=pa.string())}), path)
+    with duckdb.connect(":memory:") as con:
+        insert_parquet_files_in_batches(
+            con,
+            fs=LocalFileSystem(),
+            parquet_file_urls=[str(path)],
+            features={"text": {"dtype": "string", "_type": "Value"}},
+        )
+        assert con.sql("SELECT count(*) FROM data").fetchall() == [(0,)]
+
+
+@pytest.mark.anyio
+async def test_get_shared_index_file_or_build(tmp_path: Path) -> None:
+    shared_storage_client = StorageClient(protocol="file", storage_root=str(tmp_path / "shared"), base_url="")
+    repo_file_location = "config/split/index.duckdb"
+    builds: list[str] = []
+
+    async def get_index_file_on_replica(replica: str) -> Path:
+        index_folder = tmp_path / replica / "downloads" / "dataset-hash"
+        index_file_location = index_folder / repo_file_location
+        index_file_location.parent.mkdir(parents=True)
+
+        def build() -> None:
+            builds.append(replica)
+            index_file_location.write_text(f"built by {replica}")
+
+        await get_shared_index_file_or_build(
+            shared_storage_client,
+            "dataset",
+            "revision",
+            "config",
+            "split",
+            str(index_folder),
+            repo_file_location,
+            build,
+        )
+        return index_file_location
+
+    assert (await get_index_file_on_replica("first")).read_text() == "built by first"
+    # the other replicas download the index built by the first one
+    assert (await get_index_file_on_replica("second")).read_text() == "built by first"
+    assert builds == ["first"]
+    assert shared_storage_client.exists(f"dataset-hash/{repo_file_location}")
+
+
+@pytest.mark.anyio
+async def test_get_shared_index_file_or_build_locked(tmp_path: Path) -> None:
+    shared_storage_client = StorageClient(protocol="file", storage_root=str(tmp_path / "shared"), base_url="")
+    index_folder = tmp_path / "downloads" / "dataset-hash"
+    index_file_location = index_folder / "index.duckdb"
+    index_folder.mkdir(parents=True)
+    calls: list[str] = []
+
+    def build() -> None:
+        calls.append("build")
+        index_file_location.write_text("built locally")
+
+    # another replica is building the index, and does not upload it in time
+    with lock.duckdb_index(dataset="dataset", revision="revision", config="config", split="split", owner="other"):
+        # a single thread, shared with the requests
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 1
+        with patch("libapi.duckdb.SHARED_INDEX_LOCK_SLEEPS", (0.1, 0.1)):
+            await asyncio.gather(
+                get_shared_index_file_or_build(
+                    shared_storage_client,
+                    "dataset",
+                    "revision",
+                    "config",
+                    "split",
+                    str(index_folder),
+                    "index.duckdb",
+                    build,
+                ),
+                anyio.to_thread.run_sync(lambda: calls.append("request")),
+            )
+    assert index_file_location.read_text() == "built locally"
+    # the thread is not held while waiting for the lock
+    assert calls == ["request", "build"]
+    # the index built locally is not shared, since it's the job of the replica that holds the lock
+    assert not shared_storage_client.exists("dataset-hash/index.duckdb")
@@ -11,6 +11,7 @@ from starlette.requests import Request
 from libapi.exceptions import InvalidParameterError, MissingRequiredParameterError
 from libapi.request import (
     get_request_parameter,
+    get_request_parameter_columns,
     get_request_parameter_length,
     get_request_parameter_offset,
 )
@@ -83,3 +84,26 @@ def test_get_request_parameter_offset_raises(
     request = build_request(query_string=f"offset={offset}")
     with pytest.raises(InvalidParameterError, match=expected_error_message):
         _ = get_request_parameter_offset(request)
+
+
+@pytest.mark.parametrize(
+    "query_string,expected_value",
+    [
+        ("", None),
+        ("columns=a", ["a"]),
+        ("columns=a&columns=b", ["a", "b"]),
+        ("columns=b&columns=a&columns=b", ["b", "a"]),
+    ],
+)
+def test_get_request_parameter_columns(
+    query_string: str, expected_value: Optional[list[str]], build_request: Callable[..., Request]
+) -> None:
+    request = build_request(query_string=query_string)
+    assert get_request_parameter_columns(request) == expected_value
+
+
+@pytest.mark.parametrize("query_string", ["columns=", "columns=a&columns=%20"])
+def test_get_request_parameter_columns_raises(query_string: str, build_request: Callable[..., Request]) -> None:
+    request = build_request(query_string=query_string)
+    with pytest.raises(InvalidParameterError, match="Parameter 'columns' must be a non-empty string"):
+        _ = get_request_parameter_columns(request)
@@ -120,6 +120,51 @@ async def test_create_response_with_image(image_path: str, storage_client: Stora
     assert image is not None
 
 
+async def test_create_response_with_image_and_other_columns(image_path: str, storage_client: StorageClient) -> None:
+    ds = Dataset.from_dict(
+        {
+            "text": ["Hello there", None],
+            "image": [image_path, None],
+            "nested": [{"a": [1, 2], "b": "c"}, {"a": [], "b": None}],
+            ROW_IDX_COLUMN: [3, 4],
+        }
+    ).cast_column("image", Image())
+    ds_image = Dataset(embed_table_storage(ds.data))
+    image_key = "ds_image/--/revision/--/default/train/3/image/image.jpg"
+    response = await create_response(
+        dataset="ds_image",
+        revision="revision",
+        config="default",
+        split="train",
+        storage_client=storage_client,
+        pa_table=ds_image.data,
+        offset=0,
+        features=ds_image.features,
+        unsupported_columns=[],
+        num_rows_total=10,
+        partial=False,
+        use_row_idx_column=True,
+    )
+    # the order of the columns is preserved, and only the image cells are transformed
+    assert [list(row_item["row"]) for row_item in response["rows"]] == [["text", "image", "nested"]] * 2
+    assert response["rows"] == [
+        {
+            "row_idx": 3,
+            "row": {
+                "text": "Hello there",
+                "image": {"src": f"http://localhost/cached-assets/{image_key}", "height": 480, "width": 640},
+                "nested": {"a": [1, 2], "b": "c"},
+            },
+            "truncated_cells": [],
+        },
+        {
+            "row_idx": 4,
+            "row": {"text": None, "image": None, "nested": {"a": [], "b": None}},
+            "truncated_cells": [],
+        },
+    ]
+
+
 async def test_create_response_with_document(document_path: str, storage_client: StorageClient) -> None:
     document_list = [document_path] * 5  # testing with multiple documents to ensure multithreading works
     ds = Dataset.from_dict({"document": document_list}).cast_column("document", Pdf())
@@ -2,8 +2,11 @@
 # Copyright 2022 The HuggingFace Authors.
 
 from http import HTTPStatus
+from typing import Optional
 from unittest.mock import patch
 
+import anyio
+import pytest
 from huggingface_hub.hf_api import DatasetInfo
 from libcommon.exceptions import (
     DatasetInBlockListError,
@@ -14,9 +17,11 @@ from libcommon.exceptions import (
 from libcommon.operations import EntityInfo
 from libcommon.simple_cache import upsert_response
 from pytest import raises
+from starlette.requests import Request
+from starlette.types import Message
 
-from libapi.exceptions import ResponseNotReadyError
-from libapi.utils import get_cache_entry_from_step
+from libapi.exceptions import ClientDisconnectedError, ResponseNotReadyError
+from libapi.utils import cancel_on_disconnect, get_cache_entry_from_step
 
 
 def test_get_cache_entry_from_step(hf_endpoint: str) -> None:
@@ -266,3 +271,48 @@ def test_get_cache_entry_from_step_no_cache_blocked(hf_endpoint: str) -> None:
                 hf_endpoint=hf_endpoint,
                 blocked_datasets=[dataset],
             )
+
+
+def get_request(disconnect_after: Optional[float] = None) -> Request:
+    messages: list[Message] = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive() -> Message:
+        if messages:
+            return messages.pop(0)
+        if disconnect_after is None:
+            await anyio.sleep_forever()
+        await anyio.sleep(disconnect_after or 0)
+        return {"type": "http.disconnect"}
+
+    return Request(scope={"type": "http", "method": "GET", "headers": []}, receive=receive)
+
+
+@pytest.mark.anyio
+async def test_cancel_on_disconnect() -> None:
+    async def func() -> int:
+        await anyio.sleep(0.01)
+        return 1
+
+    assert await cancel_on_disconnect(get_request(), func) == 1
+
+
+@pytest.mark.anyio
+async def test_cancel_on_disconnect_when_disconnected() -> None:
+    finished = []
+
+    async def func() -> None:
+        await anyio.sleep(1)
+        finished.append(True)
+
+    with raises(ClientDisconnectedError):
+        await cancel_on_disconnect(get_request(disconnect_after=0.01), func)
+    assert not finished
+
+
+@pytest.mark.anyio
+async def test_cancel_on_disconnect_raises_error() -> None:
+    async def func() -> None:
+        raise ResponseNotReadyError("not ready")
+
+    with raises(ResponseNotReadyError):
+        await cancel_on_disconnect(get_request(), func)
@@ -127,11 +127,37 @@ class ParquetMetadataConfig:
 
 
 ROWS_INDEX_MAX_ARROW_DATA_IN_MEMORY = 300_000_000
+ROWS_INDEX_ROW_GROUP_CACHE_MAX_BYTES = 500_000_000
+ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_BYTES = 100_000_000
+ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_ENTRIES = 1_000
+ROWS_INDEX_SPLITS_CACHE_MAX_BYTES = 100_000_000
+ROWS_INDEX_SPLITS_CACHE_MAX_ENTRIES = 100
+ROWS_INDEX_SPLITS_CACHE_TTL_SECONDS = 60.0
+ROWS_INDEX_RANGE_READS_MAX_HOLE_SIZE = 1_000_000
+ROWS_INDEX_RANGE_READS_MAX_RANGE_SIZE = 32_000_000
+ROWS_INDEX_RANGE_READS_MAX_CONCURRENT_REQUESTS = 16
+ROWS_INDEX_DISK_CACHE_BLOCK_SIZE = 1_000_000
+ROWS_INDEX_DISK_CACHE_DIRECTORY = None
+ROWS_INDEX_DISK_CACHE_MAX_BYTES = 0
+ROWS_INDEX_QUERY_THREADS = 8
 
 
 @dataclass(frozen=True)
 class RowsIndexConfig:
     max_arrow_data_in_memory: int = ROWS_INDEX_MAX_ARROW_DATA_IN_MEMORY
+    row_group_cache_max_bytes: int = ROWS_INDEX_ROW_GROUP_CACHE_MAX_BYTES
+    parquet_metadata_cache_max_bytes: int = ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_BYTES
+    parquet_metadata_cache_max_entries: int = ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_ENTRIES
+    splits_cache_max_bytes: int = ROWS_INDEX_SPLITS_CACHE_MAX_BYTES
+    splits_cache_max_entries: int = ROWS_INDEX_SPLITS_CACHE_MAX_ENTRIES
+    splits_cache_ttl_seconds: float = ROWS_INDEX_SPLITS_CACHE_TTL_SECONDS
+    range_reads_max_hole_size: int = ROWS_INDEX_RANGE_READS_MAX_HOLE_SIZE
+    range_reads_max_range_size: int = ROWS_INDEX_RANGE_READS_MAX_RANGE_SIZE
+    range_reads_max_concurrent_requests: int = ROWS_INDEX_RANGE_READS_MAX_CONCURRENT_REQUESTS
+    disk_cache_block_size: int = ROWS_INDEX_DISK_CACHE_BLOCK_SIZE
+    disk_cache_directory: Optional[str] = ROWS_INDEX_DISK_CACHE_DIRECTORY
+    disk_cache_max_bytes: int = ROWS_INDEX_DISK_CACHE_MAX_BYTES
+    query_threads: int = ROWS_INDEX_QUERY_THREADS
 
     @classmethod
     def from_env(cls) -> "RowsIndexConfig":
@@ -141,6 +167,37 @@ class RowsIndexConfig:
                 max_arrow_data_in_memory=env.int(
                     name="MAX_ARROW_DATA_IN_MEMORY", default=ROWS_INDEX_MAX_ARROW_DATA_IN_MEMORY
                 ),
+                row_group_cache_max_bytes=env.int(
+                    name="ROW_GROUP_CACHE_MAX_BYTES", default=ROWS_INDEX_ROW_GROUP_CACHE_MAX_BYTES
+                ),
+                parquet_metadata_cache_max_bytes=env.int(
+                    name="PARQUET_METADATA_CACHE_MAX_BYTES", default=ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_BYTES
+                ),
+                parquet_metadata_cache_max_entries=env.int(
+                    name="PARQUET_METADATA_CACHE_MAX_ENTRIES", default=ROWS_INDEX_PARQUET_METADATA_CACHE_MAX_ENTRIES
+                ),
+                splits_cache_max_bytes=env.int(
+                    name="SPLITS_CACHE_MAX_BYTES", default=ROWS_INDEX_SPLITS_CACHE_MAX_BYTES
+                ),
+                splits_cache_max_entries=env.int(
+                    name="SPLITS_CACHE_MAX_ENTRIES", default=ROWS_INDEX_SPLITS_CACHE_MAX_ENTRIES
+                ),
+                splits_cache_ttl_seconds=env.float(
+                    name="SPLITS_CACHE_TTL_SECONDS", default=ROWS_INDEX_SPLITS_CACHE_TTL_SECONDS
+                ),
+                range_reads_max_hole_size=env.int(
+                    name="RANGE_READS_MAX_HOLE_SIZE", default=ROWS_INDEX_RANGE_READS_MAX_HOLE_SIZE
+                ),
+                range_reads_max_range_size=env.int(
+                    name="RANGE_READS_MAX_RANGE_SIZE", default=ROWS_INDEX_RANGE_READS_MAX_RANGE_SIZE
+                ),
+                range_reads_max_concurrent_requests=env.int(
+                    name="RANGE_READS_MAX_CONCURRENT_REQUESTS", default=ROWS_INDEX_RANGE_READS_MAX_CONCURRENT_REQUESTS
+                ),
+                disk_cache_block_size=env.int(name="DISK_CACHE_BLOCK_SIZE", default=ROWS_INDEX_DISK_CACHE_BLOCK_SIZE),
+                disk_cache_directory=env.str(name="DISK_CACHE_DIRECTORY", default=ROWS_INDEX_DISK_CACHE_DIRECTORY),
+                disk_cache_max_bytes=env.int(name="DISK_CACHE_MAX_BYTES", default=ROWS_INDEX_DISK_CACHE_MAX_BYTES),
+                query_threads=env.int(name="QUERY_THREADS", default=ROWS_INDEX_QUERY_THREADS),
             )
 
 
@@ -7,6 +7,7 @@ HF_DATASETS_CACHE_APPNAME = "hf_datasets_cache"
 PARQUET_METADATA_CACHE_APPNAME = "datasets_server_parquet_metadata"
 DESCRIPTIVE_STATISTICS_CACHE_APPNAME = "dataset_viewer_descriptive_statistics"
 DUCKDB_INDEX_CACHE_APPNAME = "dataset_viewer_duckdb_index"
+ROWS_INDEX_DISK_CACHE_APPNAME = "dataset_viewer_rows_index_disk_cache"
 DUCKDB_INDEX_JOB_RUNNER_SUBDIRECTORY = "job_runner"
 CACHE_METRICS_COLLECTION = "cacheTotalMetric"
 TYPE_STATUS_AND_DATASET_STATUS_JOB_COUNTS_COLLECTION = "jobTotalMetric"
@@ -15,11 +16,14 @@ QUEUE_COLLECTION_JOBS = "jobsBlue"
 QUEUE_COLLECTION_PAST_JOBS = "pastJobs"
 QUEUE_COLLECTION_LOCKS = "locks"
 QUEUE_COLLECTION_DATASET_BLOCKAGES = "datasetBlockages"
+QUEUE_COLLECTION_STARTED_JOBS_COUNTS = "startedJobsCountByNamespace"
 QUEUE_MONGOENGINE_ALIAS = "queue"
 QUEUE_TTL_SECONDS = 600  # 10 minutes
+STARTED_JOBS_COUNTS_CACHE_TTL_SECONDS = 2
 LOCK_TTL_SECONDS_NO_OWNER = 600  # 10 minutes
 LOCK_TTL_SECONDS_TO_START_JOB = 600  # 10 minutes
 LOCK_TTL_SECONDS_TO_WRITE_ON_GIT_BRANCH = 3600  # 1 hour
+LOCK_TTL_SECONDS_TO_BUILD_DUCKDB_INDEX = 1800  # 30 minutes
 
 DATASET_SEPARATOR = "--"
 DEFAULT_DIFFICULTY = 50
@@ -0,0 +1,188 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import logging
+import os
+import threading
+from collections.abc import Callable
+from hashlib import sha256
+from typing import Optional
+
+from libcommon.prometheus import DISK_CACHE_BYTES, DISK_CACHE_EVICTIONS_TOTAL, DISK_CACHE_REQUESTS_TOTAL
+from libcommon.storage import StrPath
+
+# the janitor is triggered when this fraction of max_bytes has been written since the last run
+CLEAN_TRIGGER_RATIO = 0.1
+# the janitor evicts the least recently used blocks until the total size is below this fraction of max_bytes
+CLEAN_TARGET_RATIO = 0.9
+
+
+def get_file_cache_key(url: str, size: int, version: int) -> str:
+    """Get the key of the blocks of a remote file in the disk block cache.
+
+    The URLs of the parquet files are not immutable (they point to a branch), so the key also depends on the size of
+    the file, and on a version number (e.g. the modification time of its metadata file) that changes when the file is
+    written again.
+    """
+    return sha256(f"{url}\n{size}\n{version}".encode()).hexdigest()
+
+
+class DiskBlockCache:
+    """
+    A cache of fixed-size blocks of remote files, stored on the local disk.
+
+    A block is stored in `{directory}/{key[:2]}/{key}/{block_index}`, where `key` identifies the content of a remote
+    file (see `get_file_cache_key`). Every block has `block_size` bytes, except the last block of a file.
+
+    The least recently used blocks (by modification time, which is updated on every hit) are deleted by a janitor
+    thread, started when `CLEAN_TRIGGER_RATIO * max_bytes` bytes have been written since its last run, until the total
+    size is below `CLEAN_TARGET_RATIO * max_bytes`. The directory can be shared by several processes: the blocks are
+    written atomically, and a block that is deleted while being read is a miss.
+
+    Args:
+        directory (`StrPath`): The directory where the blocks are stored.
+        max_bytes (`int`): The maximum total size of the blocks, in bytes.
+        block_size (`int`): The size of the blocks, in bytes.
+    """
+
+    def __init__(self, directory: StrPath, max_bytes: int, block_size: int):
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self._bytes_written_since_clean = 0
+        self._lock = threading.Lock()
+        self._clean_lock = threading.Lock()
+
+    def _get_block_path(self, key: str, block_index: int) -> str:
+        return os.path.join(self.directory, key[:2], key, str(block_index))
+
+    def _get_block(self, key: str, block_index: int) -> Optional[bytes]:
+        path = self._get_block_path(key, block_index)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # the modification time is used to evict the least recently used blocks
+            os.utime(path)
+        except FileNotFoundError:
+            DISK_CACHE_REQUESTS_TOTAL.labels(cache="blocks", result="miss").inc()
+            return None
+        DISK_CACHE_REQUESTS_TOTAL.labels(cache="blocks", result="hit").inc()
+        return data
+
+    def _put_block(self, key: str, block_index: int, data: bytes) -> None:
+        path = self._get_block_path(key, block_index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_aligned_range(self, start: int, end: int, size: int) -> tuple[int, int]:
+        """Get the smallest range of whole blocks that contains the byte range."""
+        return (
+            start - start % self.block_size,
+            min(size, -(-end // self.block_size) * self.block_size),
+        )
+
+    def get_range(self, key: str, start: int, end: int) -> Optional[bytes]:
+        """Get the bytes of a range if all its blocks are cached, else None."""
+        if start >= end:
+            return b""
+        blocks: list[bytes] = []
+        for block_index in range(start // self.block_size, (end - 1) // self.block_size + 1):
+            block = self._get_block(key, block_index)
+            if block is None:
+                return None
+            blocks.append(block)
+        offset = start % self.block_size
+        data = b"".join(blocks)[offset : offset + end - start]  # noqa: E203
+        # a truncated block (e.g. a file that has been written again) is a miss
+        return data if len(data) == end - start else None
+
+    def put_range(self, key: str, start: int, data: bytes, size: int) -> None:
+        """Store the complete blocks of a range that starts at a block boundary.
+
+        The last block of the range is only stored if it is complete, or if it's the last block of the file.
+        """
+        if start % self.block_size:
+            raise ValueError("start must be a multiple of block_size")
+        num_bytes_written = 0
+        for offset in range(0, len(data), self.block_size):
+            block = data[offset : offset + self.block_size]  # noqa: E203
+            if len(block) < self.block_size and start + offset + len(block) != size:
+                break
+            self._put_block(key, (start + offset) // self.block_size, block)
+            num_bytes_written += len(block)
+        with self._lock:
+            self._bytes_written_since_clean += num_bytes_written
+            must_clean = self._bytes_written_since_clean >= CLEAN_TRIGGER_RATIO * self.max_bytes
+            if must_clean:
+                self._bytes_written_since_clean = 0
+        if must_clean:
+            threading.Thread(target=self.clean, daemon=True).start()
+
+    def read_range(self, key: str, start: int, end: int, size: int, fetch: Callable[[int, int], bytes]) -> bytes:
+        """Read a range from the cache, or fetch its blocks and store them in the cache.
+
+        Args:
+            key (`str`): The key of the file.
+            start (`int`): The start of the range (inclusive).
+            end (`int`): The end of the range (exclusive).
+            size (`int`): The size of the file.
+            fetch (`Callable[[int, int], bytes]`): A function that reads a range of the remote file.
+
+        Returns:
+            `bytes`: The bytes of the range.
+        """
+        end = min(end, size)
+        data = self.get_range(key, start, end)
+        if data is None:
+            aligned_start, aligned_end = self.get_aligned_range(start, end, size=size)
+            aligned_data = fetch(aligned_start, aligned_end)
+            self.put_range(key, aligned_start, aligned_data, size=size)
+            data = aligned_data[start - aligned_start : end - aligned_start]  # noqa: E203
+        return data
+
+    def clean(self) -> None:
+        """Delete the least recently used blocks until the total size is below `CLEAN_TARGET_RATIO * max_bytes`,
+        and delete the empty directories. Only one janitor runs at a time in a process."""
+        if not self._clean_lock.acquire(blocking=False):
+            return
+        try:
+            blocks: list[tuple[float, int, str]] = []
+            # bottom-up, so that a directory comes after its subdirectories
+            directories: list[str] = []
+            for root, _, files in os.walk(self.directory, topdown=False):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # deleted by another process
+                    blocks.append((stat.st_mtime, stat.st_size, path))
+                if root != str(self.directory):
+                    directories.append(root)
+            num_bytes = sum(size for _, size, _ in blocks)
+            num_evicted = 0
+            if num_bytes > self.max_bytes:
+                for _, size, path in sorted(blocks):
+                    if num_bytes <= CLEAN_TARGET_RATIO * self.max_bytes:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    num_bytes -= size
+                    num_evicted += 1
+            for directory in directories:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass  # Ignore non-empty directories
+            DISK_CACHE_BYTES.labels(cache="blocks").set(num_bytes)
+            DISK_CACHE_EVICTIONS_TOTAL.labels(cache="blocks").inc(num_evicted)
+            logging.info(f"disk block cache cleaned: {num_evicted} blocks evicted, {num_bytes} bytes remaining")
+        finally:
+            self._clean_lock.release()
@@ -5,6 +5,7 @@ from typing import Any, Literal, Optional
 
 import duckdb
 import polars as pl
+import pyarrow as pa
 from datasets.features.features import Features, FeatureType, Translation, TranslationVariableLanguages, Value, _visit
 from huggingface_hub.repocard_data import DatasetCardData
 from tqdm.contrib.concurrent import thread_map
@@ -16,6 +17,7 @@ from libcommon.parquet_utils import (
     parquet_export_is_partial,
 )
 from libcommon.statistics_utils import (
+    NUMERICAL_DTYPES,
     STRING_DTYPES,
     AudioColumn,
     ImageColumn,
@@ -49,6 +51,22 @@ CREATE_INDEX_ID_COLUMN_COMMANDS = CREATE_SEQUENCE_COMMAND + ALTER_TABLE_BY_ADDIN
 INSTALL_AND_LOAD_EXTENSION_COMMAND = "INSTALL 'fts'; LOAD 'fts';"
 SET_EXTENSIONS_DIRECTORY_COMMAND = "SET extension_directory='{directory}';"
 REPO_TYPE = "dataset"
+# the sort permutations of the columns of the data table (see create_sort_indexes)
+SORT_INDEX_SCHEMA = "sort_index"
+SORT_INDEX_COLUMNS_TABLE = f"{SORT_INDEX_SCHEMA}.columns"
+SORT_INDEX_RANK_COLUMN = "__hf_rank"
+SORT_INDEX_MAX_STRING_LENGTH = 128
+CREATE_SORT_INDEX_COLUMNS_TABLE_COMMAND = (
+    f"CREATE SCHEMA {SORT_INDEX_SCHEMA}; CREATE TABLE {SORT_INDEX_COLUMNS_TABLE} (column_name VARCHAR, table_name"
+    " VARCHAR, num_non_null BIGINT, num_rows BIGINT);"
+)
+CREATE_SORT_INDEX_TABLE_COMMAND = f"""
+    CREATE TABLE {{table_name}} AS
+    SELECT row_number() OVER (ORDER BY {{column}} ASC NULLS LAST, {ROW_IDX_COLUMN}) - 1 AS {SORT_INDEX_RANK_COLUMN},
+        {ROW_IDX_COLUMN}
+    FROM data
+    ORDER BY {SORT_INDEX_RANK_COLUMN};
+"""
 # Only some languages are supported, see: https://duckdb.org/docs/extensions/full_text_search.html#pragma-create_fts_index
 STEMMER_MAPPING = {
     # Stemmer : ["value ISO 639-1", "value ISO 639-2/3"]
@@ -187,6 +205,106 @@ def compute_transformed_data(parquet_paths: list[Path], features: dict[str, Any]
     return transformed_df
 
 
+def compute_transformed_data_from_table(table: pa.Table, features: dict[str, Any]) -> Optional[pl.DataFrame]:
+    """Same as `compute_transformed_data`, for the rows of a table (e.g. a batch of rows of a parquet file).
+
+    The transformed columns have the same types for all the tables, so that they can be inserted in the same table.
+    """
+    transformed_columns: list[pl.Series] = []
+    for feature_name, feature in features.items():
+        if isinstance(feature, list) or (
+            isinstance(feature, dict) and feature.get("_type") in ("LargeList", "List", "Sequence")
+        ):
+            feature_arrow_type = table.schema.field(feature_name).type
+            if pa.types.is_list(feature_arrow_type) or pa.types.is_large_list(feature_arrow_type):
+                lengths_column_name = f"{feature_name}.length"
+                lengths_df = ListColumn.compute_transformed_data(
+                    pl.from_arrow(table.select([feature_name])),  # type: ignore[arg-type]
+                    feature_name,
+                    transformed_column_name=lengths_column_name,
+                )
+                transformed_columns.append(lengths_df[lengths_column_name])
+
+        elif isinstance(feature, dict):
+            if feature.get("_type") == "Value" and feature.get("dtype") in STRING_DTYPES:
+                lengths_column_name = f"{feature_name}.length"
+                lengths_df = StringColumn.compute_transformed_data(
+                    pl.from_arrow(table.select([feature_name])),  # type: ignore[arg-type]
+                    feature_name,
+                    transformed_column_name=lengths_column_name,
+                )
+                transformed_columns.append(lengths_df[lengths_column_name])
+
+            elif feature.get("_type") == "Audio":
+                durations = thread_map(AudioColumn.get_duration, table.column(feature_name).to_pylist(), disable=True)
+                transformed_columns.append(pl.Series(f"{feature_name}.duration", durations, dtype=pl.Float64))
+
+            elif feature.get("_type") == "Image":
+                shapes = thread_map(ImageColumn.get_shape, table.column(feature_name).to_pylist(), disable=True)
+                widths, heights = list(zip(*shapes)) if shapes else ([], [])
+                transformed_columns.append(pl.Series(f"{feature_name}.width", widths, dtype=pl.Int64))
+                transformed_columns.append(pl.Series(f"{feature_name}.height", heights, dtype=pl.Int64))
+
+    return pl.DataFrame(transformed_columns) if transformed_columns else None
+
+
+def get_sortable_columns(features: dict[str, Any]) -> list[str]:
+    """Get the columns that can have a sort index: the numerical and string columns."""
+    return [
+        feature_name
+        for feature_name, feature in features.items()
+        if isinstance(feature, dict)
+        and feature.get("_type") == "Value"
+        and feature.get("dtype") in NUMERICAL_DTYPES + STRING_DTYPES
+    ]
+
+
+def create_sort_indexes(
+    con: duckdb.DuckDBPyConnection,
+    features: dict[str, Any],
+    max_columns: int,
+    max_string_length: int = SORT_INDEX_MAX_STRING_LENGTH,
+) -> list[str]:
+    """Store the sort permutation of the first sortable columns of the data table.
+
+    The permutation of a column is a table of the row indexes, ordered by the values of the column (ascending, nulls
+    last, the ties ordered by row index), with their rank. The rows are stored by rank, so that the zone maps of the
+    rank column (the min/max statistics of each row group) let a page of sorted rows be read without scanning the
+    whole table. The string columns with values longer than `max_string_length` are ignored.
+
+    Args:
+        con (`duckdb.DuckDBPyConnection`): The connection to the index file, with the data table.
+        features (`dict[str, Any]`): The features of the data table.
+        max_columns (`int`): The maximum number of columns with a sort index.
+        max_string_length (`int`): The maximum length of the values of the string columns with a sort index.
+
+    Returns:
+        `list[str]`: The columns with a sort index.
+    """
+    sorted_columns: list[str] = []
+    (num_rows,) = con.sql("SELECT COUNT(*) FROM data;").fetchall()[0]
+    for column in get_sortable_columns(features):
+        if len(sorted_columns) >= max_columns:
+            break
+        column_sql = '"' + column.replace('"', '""') + '"'
+        is_string = features[column]["dtype"] in STRING_DTYPES
+        num_non_null, max_length = con.sql(
+            f"SELECT COUNT({column_sql}), {f'max(length({column_sql}))' if is_string else 0} FROM data;"  # nosec
+        ).fetchall()[0]
+        if (max_length or 0) > max_string_length:
+            continue
+        if not sorted_columns:
+            con.sql(CREATE_SORT_INDEX_COLUMNS_TABLE_COMMAND)
+        table_name = f"{SORT_INDEX_SCHEMA}.column_{len(sorted_columns)}"
+        con.sql(CREATE_SORT_INDEX_TABLE_COMMAND.format(table_name=table_name, column=column_sql))
+        con.execute(
+            f"INSERT INTO {SORT_INDEX_COLUMNS_TABLE} VALUES (?, ?, ?, ?);",
+            [column, table_name, num_non_null, num_rows],
+        )
+        sorted_columns.append(column)
+    return sorted_columns
+
+
 def duckdb_index_is_partial(duckdb_index_url: str) -> bool:
     """
     Check if the DuckDB index is on the full dataset or if it's partial.
@@ -286,6 +404,8 @@ def create_index(
                 con,
                 f"INSERT INTO %fts_schema%.fields VALUES {field_values};",  # nosec - field_values is safe
             )
+            # store the stemmer, so that the query terms can be stemmed the same way when searching
+            _sql(con, "CREATE TABLE %fts_schema%.stemmer AS SELECT '%stemmer%' AS stemmer;")
             _sql(con, "CHECKPOINT;")
 
         # tokenize in parallel (see https://github.com/duckdb/duckdb-fts/issues/7)
@@ -366,98 +486,104 @@ def create_index(
             )
             _sql(con, f"CREATE TABLE tmp.tokenized AS {union_fields_query}")
 
-            # step and stop
+            # stem and stop, once per distinct word
+            # (with aggregations and hash joins: the correlated subqueries were slow on large splits)
             _sql(
                 con,
                 """
-                CREATE TABLE tmp.stemmed_stopped AS (
-                    SELECT stem(t.w, '%stemmer%') AS term,
-                        t.docid AS docid,
-                        t.fieldid AS fieldid
-                    FROM tmp.tokenized AS t
-                    WHERE t.w NOT NULL
-                    AND len(t.w) > 0
-                    AND t.w NOT IN (SELECT sw FROM %fts_schema%.stopwords)
+                CREATE TABLE tmp.stems AS (
+                    SELECT dw.w,
+                        stem(dw.w, '%stemmer%') AS term
+                    FROM (
+                        SELECT DISTINCT t.w
+                        FROM tmp.tokenized AS t
+                        WHERE t.w NOT NULL
+                        AND len(t.w) > 0
+                        AND t.w NOT IN (SELECT sw FROM %fts_schema%.stopwords)
+                    ) AS dw
                 )
             """,
             )
 
-            # create terms table
+            # number the terms
             _sql(
                 con,
                 """
-                CREATE TABLE %fts_schema%.terms AS (
-                    SELECT ss.term,
-                        ss.docid,
-                        ss.fieldid
-                    FROM tmp.stemmed_stopped AS ss
+                CREATE TABLE tmp.termids AS (
+                    SELECT row_number() OVER (ORDER BY dt.term) - 1 AS termid,
+                        dt.term
+                    FROM (
+                        SELECT DISTINCT term
+                        FROM tmp.stems
+                    ) AS dt
                 )
             """,
             )
 
-            # add doc lengths
-            _sql(con, "ALTER TABLE %fts_schema%.docs ADD len BIGINT;")
-            _sql(
-                con,
-                """
-                UPDATE %fts_schema%.docs d
-                SET len = (
-                    SELECT count(term)
-                    FROM %fts_schema%.terms AS t
-                    WHERE t.docid = d.docid
-                );
-            """,
-            )
-
-            # create dictionary
+            # create terms table
             _sql(
                 con,
                 """
-                CREATE TABLE tmp.distinct_terms AS (
-                    SELECT DISTINCT term
-                    FROM %fts_schema%.terms
-                    ORDER BY docid, term
+                CREATE TABLE %fts_schema%.terms AS (
+                    SELECT t.docid,
+                        t.fieldid,
+                        wt.termid
+                    FROM tmp.tokenized AS t
+                    JOIN (
+                        SELECT s.w,
+                            ti.termid
+                        FROM tmp.stems AS s
+                        JOIN tmp.termids AS ti
+                        ON s.term = ti.term
+                    ) AS wt
+                    ON t.w = wt.w
                 )
             """,
             )
+
+            # create dictionary, with the document frequencies
             _sql(
                 con,
                 """
                 CREATE TABLE %fts_schema%.dict AS (
-                    SELECT row_number() OVER () - 1 AS termid,
-                    dt.term
-                    FROM tmp.distinct_terms AS dt
+                    SELECT ti.termid,
+                        ti.term,
+                        tdf.df
+                    FROM tmp.termids AS ti
+                    JOIN (
+                        SELECT termid,
+                            count(DISTINCT docid) AS df
+                        FROM %fts_schema%.terms
+                        GROUP BY termid
+                    ) AS tdf
+                    ON ti.termid = tdf.termid
+                    ORDER BY ti.termid
                 )
             """,
             )
-            _sql(con, "ALTER TABLE %fts_schema%.terms ADD termid BIGINT;")
-            _sql(
-                con,
-                """
-                UPDATE %fts_schema%.terms t
-                SET termid = (
-                    SELECT termid
-                    FROM %fts_schema%.dict d
-                    WHERE t.term = d.term
-                );
-            """,
-            )
-            _sql(con, "ALTER TABLE %fts_schema%.terms DROP term;")
 
-            # compute df
-            _sql(con, "ALTER TABLE %fts_schema%.dict ADD df BIGINT;")
+            # add doc lengths
             _sql(
                 con,
                 """
-                UPDATE %fts_schema%.dict d
-                SET df = (
-                    SELECT count(distinct docid)
-                    FROM %fts_schema%.terms t
-                    WHERE d.termid = t.termid
-                    GROUP BY termid
-                );
+                CREATE TABLE tmp.docs AS (
+                    SELECT docs.docid,
+                        docs.name,
+                        coalesce(lengths.len, 0) AS len
+                    FROM %fts_schema%.docs AS docs
+                    LEFT JOIN (
+                        SELECT docid,
+                            count(*) AS len
+                        FROM %fts_schema%.terms
+                        GROUP BY docid
+                    ) AS lengths
+                    ON docs.docid = lengths.docid
+                    ORDER BY docs.docid
+                )
             """,
             )
+            _sql(con, "DROP TABLE %fts_schema%.docs;")
+            _sql(con, "CREATE TABLE %fts_schema%.docs AS SELECT * FROM tmp.docs;")
 
             # compute stats
             _sql(
@@ -0,0 +1,176 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, Optional, TypeVar
+
+from libcommon.prometheus import (
+    MEMORY_CACHE_BYTES,
+    MEMORY_CACHE_ENTRIES,
+    MEMORY_CACHE_EVICTIONS_TOTAL,
+    MEMORY_CACHE_REQUESTS_TOTAL,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class MemoryLRUCache(Generic[K, V]):
+    """
+    An in-memory LRU cache, bounded by the total size in bytes of its values, and/or by its number of entries.
+
+    The cache is thread-safe and meant to be shared by all the requests handled by a process. The least recently used
+    entries are evicted first when the total size exceeds `max_bytes`, or when the number of entries exceeds
+    `max_entries`. A value bigger than `max_bytes` is never stored.
+
+    If `ttl_seconds` is set, the entries that were stored (or revalidated) more than `ttl_seconds` ago are expired. An
+    expired entry is a miss, unless a `revalidate` function is passed to `get()` and returns True for its value, in
+    which case the entry is kept for another `ttl_seconds`.
+
+    The number of hits, misses and evictions, and the current size of the cache, are reported to Prometheus with the
+    label `cache=name`.
+
+    Args:
+        name (`str`): The name of the cache, used as a label in the Prometheus metrics.
+        max_bytes (`int`, *optional*): The maximum total size of the cached values, in bytes. If 0, nothing is
+          cached. If None, only `max_entries` applies.
+        get_size (`Callable[[V], int]`, *optional*): A function that returns the size of a value, in bytes. Required
+          if `max_bytes` is set.
+        max_entries (`int`, *optional*): The maximum number of entries. If 0, nothing is cached. If None, only
+          `max_bytes` applies.
+        ttl_seconds (`float`, *optional*): The duration after which an entry expires. If None, entries never expire.
+
+    Raises:
+        [`ValueError`]: If `max_bytes` is set without `get_size`, or if neither `max_bytes` nor `max_entries` is set.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: Optional[int] = None,
+        get_size: Optional[Callable[[V], int]] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
+        if max_bytes is not None and get_size is None:
+            raise ValueError("get_size is required to bound the cache by max_bytes")
+        if max_bytes is None and max_entries is None:
+            raise ValueError("the cache must be bounded by max_bytes or max_entries")
+        self.name = name
+        self.max_bytes = max_bytes
+        self.get_size = get_size
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.num_bytes = 0
+        # value, size, and time when the entry was stored or revalidated
+        self._entries: OrderedDict[K, tuple[V, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def get(self, key: K, revalidate: Optional[Callable[[V], bool]] = None) -> Optional[V]:
+        """Get the value from the cache.
+
+        Args:
+            key (`K`): The key of the entry.
+            revalidate (`Callable[[V], bool]`, *optional*): A function called with the value of an expired entry. If it
+              returns True, the entry is kept for another `ttl_seconds`, else it's removed. It's called without
+              holding the lock, and the entry is removed if it raises (unless another value has been stored in the
+              meantime).
+
+        Returns:
+            `V`, *optional*: The value, or None if the entry is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                MEMORY_CACHE_REQUESTS_TOTAL.labels(cache=self.name, result="miss").inc()
+                return None
+            value, _, stored_at = entry
+            is_expired = self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds
+            if not is_expired:
+                self._entries.move_to_end(key)
+                MEMORY_CACHE_REQUESTS_TOTAL.labels(cache=self.name, result="hit").inc()
+                return value
+        try:
+            is_valid = revalidate is not None and revalidate(value)
+        except BaseException:
+            with self._lock:
+                self._remove_if_value(key, value)
+            raise
+        with self._lock:
+            entry = self._entries.get(key)
+            if is_valid and entry is not None and entry[0] is value:
+                self._entries[key] = (value, entry[1], time.monotonic())
+                self._entries.move_to_end(key)
+                MEMORY_CACHE_REQUESTS_TOTAL.labels(cache=self.name, result="hit").inc()
+                return value
+            MEMORY_CACHE_REQUESTS_TOTAL.labels(cache=self.name, result="expired").inc()
+            if not is_valid:
+                self._remove_if_value(key, value)
+        return None
+
+    def _remove_if_value(self, key: K, value: V) -> None:
+        # must be called with the lock held: another thread may have stored a new value while the lock was released
+        entry = self._entries.get(key)
+        if entry is None or entry[0] is not value:
+            return
+        del self._entries[key]
+        self.num_bytes -= entry[1]
+        self._update_gauges()
+
+    def put(self, key: K, value: V) -> None:
+        size = 0 if self.get_size is None else self.get_size(value)
+        if (self.max_bytes is not None and size > self.max_bytes) or self.max_entries == 0:
+            return
+        with self._lock:
+            previous_entry = self._entries.pop(key, None)
+            if previous_entry is not None:
+                self.num_bytes -= previous_entry[1]
+            self._entries[key] = (value, size, time.monotonic())
+            self.num_bytes += size
+            while (self.max_bytes is not None and self.num_bytes > self.max_bytes) or (
+                self.max_entries is not None and len(self._entries) > self.max_entries
+            ):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.num_bytes -= evicted_size
+                MEMORY_CACHE_EVICTIONS_TOTAL.labels(cache=self.name).inc()
+            self._update_gauges()
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self.num_bytes -= entry[1]
+            self._update_gauges()
+            return entry[0]
+
+    def get_or_compute(self, key: K, compute: Callable[[], V], revalidate: Optional[Callable[[V], bool]] = None) -> V:
+        """Get the value from the cache, or compute it and store it in the cache if it's missing or expired.
+
+        Note that the lock is not held while computing the value: two threads that miss the same key at the same time
+        will both compute it.
+        """
+        value = self.get(key, revalidate=revalidate)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.num_bytes = 0
+            self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        MEMORY_CACHE_BYTES.labels(cache=self.name).set(self.num_bytes)
+        MEMORY_CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
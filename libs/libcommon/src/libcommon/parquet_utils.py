@@ -1,13 +1,17 @@
 import asyncio
 import logging
 import os
+import sys
 from collections.abc import Iterable
+from concurrent.futures import Executor
 from dataclasses import dataclass, field
-from functools import lru_cache
+from functools import partial
+from http import HTTPStatus
 from pathlib import Path
 from typing import Literal, Optional, TypedDict, Union
 
 import numpy as np
+import numpy.typing as npt
 import pyarrow as pa
 import pyarrow.compute as pc
 import pyarrow.parquet as pq
@@ -15,15 +19,33 @@ from datasets import Features, Value
 from datasets.features.features import FeatureType
 from datasets.table import cast_table_to_schema
 from datasets.utils.py_utils import size_str
+from fsspec.asyn import sync
 from fsspec.implementations.http import HTTPFile, HTTPFileSystem
 from huggingface_hub import HfFileSystem
 from pyarrow.lib import ArrowInvalid
 
 from libcommon.constants import CONFIG_PARQUET_METADATA_KIND
+from libcommon.disk_block_cache import DiskBlockCache, get_file_cache_key
+from libcommon.memory_cache import MemoryLRUCache
 from libcommon.prometheus import StepProfiler
-from libcommon.simple_cache import get_previous_step_or_raise
+from libcommon.range_reads import (
+    ByteRange,
+    PrefetchedRangesFile,
+    RangeReadsPlanner,
+    RangeRequest,
+    get_column_chunks_byte_ranges,
+)
+from libcommon.simple_cache import get_previous_step_or_raise, get_response_without_content
 from libcommon.storage import StrPath
 from libcommon.viewer_utils.features import get_supported_unsupported_columns
+from libcommon.viewer_utils.parquet_metadata import (
+    ROW_GROUPS_INDEX_FILE,
+    ROW_GROUPS_INDEX_NUM_FIELDS,
+    ROW_GROUPS_INDEX_ROW_END,
+    ROW_GROUPS_INDEX_ROW_GROUP,
+    ROW_GROUPS_INDEX_UNCOMPRESSED_SIZE,
+    load_row_groups_index,
+)
 
 # For partial Parquet export we have paths like "en/partial-train/0000.parquet".
 # "-" is not allowed is split names so we use it in the prefix to avoid collisions.
@@ -34,6 +56,11 @@ PARTIAL_PREFIX = "partial-"
 # Note that "-" is forbidden for split names so it doesn't create directory names collisions.
 PART_SUFFIX = "-part{}"
 
+# The parsed metadata (thrift structures of the row groups and column chunks, with their statistics, and the schema
+# descriptor) takes several times the serialized size of the footer in memory: the size of the entries of the
+# ParquetMetadataCache is overestimated rather than underestimated.
+PARSED_PARQUET_METADATA_SIZE_FACTOR = 10
+
 
 class EmptyParquetMetadataError(Exception):
     pass
@@ -140,43 +167,242 @@ def is_list_pa_type(parquet_file_path: Path, feature_name: str) -> bool:
     return is_list
 
 
+# (parquet file cache key, row group id, columns). The parquet file cache key depends on the URL, the size and the
+# version of the file (see get_file_cache_key), since the URLs point to a branch and the files can be written again.
+RowGroupCacheKey = tuple[str, int, tuple[str, ...]]
+
+
+class RowGroupCache(MemoryLRUCache[RowGroupCacheKey, pa.Table]):
+    """
+    Cache of the row groups read from the remote parquet files, shared by all the RowsIndex of the process.
+
+    The row groups are stored as they are read from the parquet files (before the binary columns are truncated), so
+    that the same entry can be used by `query()` and `query_truncated_binary()`.
+
+    Args:
+        max_bytes (`int`): The maximum total size of the cached row groups, in bytes. If 0, nothing is cached.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(name="row_groups", max_bytes=max_bytes, get_size=lambda pa_table: pa_table.nbytes)
+
+
+@dataclass
+class ParsedParquetMetadata:
+    metadata: pq.FileMetaData
+    # cumulative number of rows at the end of each row group of the file
+    row_group_offsets: npt.NDArray[np.int64]
+
+    @staticmethod
+    def from_metadata_path(metadata_path: str) -> "ParsedParquetMetadata":
+        metadata = pq.read_metadata(metadata_path)
+        row_group_offsets = np.cumsum(
+            np.array(
+                [metadata.row_group(group_id).num_rows for group_id in range(metadata.num_row_groups)], dtype=np.int64
+            )
+        )
+        return ParsedParquetMetadata(metadata=metadata, row_group_offsets=row_group_offsets)
+
+    def estimate_size(self) -> int:
+        return PARSED_PARQUET_METADATA_SIZE_FACTOR * int(self.metadata.serialized_size) + int(
+            self.row_group_offsets.nbytes
+        )
+
+
+# (parquet metadata file path, modification time in nanoseconds)
+ParquetMetadataCacheKey = tuple[str, int]
+
+
+class ParquetMetadataCache(MemoryLRUCache[ParquetMetadataCacheKey, ParsedParquetMetadata]):
+    """
+    Cache of the parsed parquet metadata files (footers) and of the row group offsets of each parquet file, shared by
+    all the RowsIndex of the process.
+
+    The entries are keyed by the modification time of the file, so that a metadata file that is written again is
+    parsed again. The size of an entry is estimated from the serialized size of the metadata, multiplied by
+    `PARSED_PARQUET_METADATA_SIZE_FACTOR`. Since it's only an estimate, the number of entries can be bounded too.
+
+    Args:
+        max_bytes (`int`): The maximum estimated size of the cached metadata, in bytes. If 0, nothing is cached.
+        max_entries (`int`, *optional*): The maximum number of cached metadata files. If None, only `max_bytes`
+          applies.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: Optional[int] = None):
+        super().__init__(
+            name="parquet_metadata",
+            max_bytes=max_bytes,
+            get_size=lambda parsed: parsed.estimate_size(),
+            max_entries=max_entries,
+        )
+
+    def get_parsed_metadata(self, metadata_path: str) -> ParsedParquetMetadata:
+        return self.get_or_compute(
+            key=(metadata_path, os.stat(metadata_path).st_mtime_ns),
+            compute=lambda: ParsedParquetMetadata.from_metadata_path(metadata_path),
+        )
+
+
+def get_binary_cells_max_length(lengths: npt.NDArray[np.int64], max_total_length: int) -> Optional[int]:
+    """Get the largest cell length L such that the sum of min(length, L) over the cells fits in max_total_length.
+
+    The short cells are kept whole, and the budget they leave is shared by the long ones, instead of giving the same
+    budget to every cell.
+
+    Args:
+        lengths (`npt.NDArray[np.int64]`): The lengths of the cells, in bytes (0 for null cells).
+        max_total_length (`int`): The maximum total length of the cells, in bytes.
+
+    Returns:
+        `Optional[int]`: The maximum length of a cell, or None if the cells don't need to be truncated.
+    """
+    num_cells = len(lengths)
+    if num_cells == 0 or int(lengths.sum()) <= max_total_length:
+        return None
+    sorted_lengths = np.sort(lengths)
+    # total length if the cells from index i are truncated to sorted_lengths[i]
+    lengths_before = np.cumsum(sorted_lengths) - sorted_lengths
+    num_cells_from = num_cells - np.arange(num_cells)
+    total_lengths = lengths_before + num_cells_from * sorted_lengths
+    # the first index where it doesn't fit: the cells from this index share the remaining budget
+    index = int(np.argmax(total_lengths > max_total_length))
+    return max(int((max_total_length - lengths_before[index]) // num_cells_from[index]), 0)
+
+
+def truncate_binary_array(array: pa.ChunkedArray, max_total_length: int) -> Optional[pa.ChunkedArray]:
+    """Truncate the longest binary cells, so that the total length of the cells fits in max_total_length.
+
+    The lengths are computed from the offsets of the arrays, and only the chunks that contain a cell longer than the
+    maximum length (see `get_binary_cells_max_length`) are sliced.
+
+    Returns:
+        `Optional[pa.ChunkedArray]`: The truncated array, or None if no cell has been truncated.
+    """
+    chunks_lengths = [pc.binary_length(chunk).fill_null(0).to_numpy().astype(np.int64) for chunk in array.chunks]
+    max_length = get_binary_cells_max_length(
+        np.concatenate(chunks_lengths) if chunks_lengths else np.array([], dtype=np.int64), max_total_length
+    )
+    if max_length is None:
+        return None
+    return pa.chunked_array(
+        [
+            pc.binary_slice(chunk, 0, max_length)
+            if len(chunk_lengths) and int(chunk_lengths.max()) > max_length
+            else chunk
+            for chunk, chunk_lengths in zip(array.chunks, chunks_lengths)
+        ],
+        type=array.type,
+    )
+
+
 @dataclass
 class RowGroupReader:
     parquet_file: pq.ParquetFile
     group_id: int
     features: Features
+    url: str = ""
+    # identifies the content of the parquet file (see get_file_cache_key), required to use the row group cache
+    file_cache_key: str = ""
+    row_group_cache: Optional[RowGroupCache] = None
+    # from the row groups index of the split, if any, to avoid reading the row group metadata
+    uncompressed_size: Optional[int] = None
+    # the file object of parquet_file, which receives the prefetched byte ranges
+    prefetched_ranges_file: Optional[PrefetchedRangesFile] = None
+
+    def _read_row_group(self, columns: list[str]) -> pa.Table:
+        if self.row_group_cache is None or not self.file_cache_key:
+            return self.parquet_file.read_row_group(i=self.group_id, columns=columns)
+        return self.row_group_cache.get_or_compute(
+            (self.file_cache_key, self.group_id, tuple(columns)),
+            lambda: self.parquet_file.read_row_group(i=self.group_id, columns=columns),
+        )
+
+    def is_cached(self, columns: list[str]) -> bool:
+        return (
+            self.row_group_cache is not None
+            and bool(self.file_cache_key)
+            and (self.file_cache_key, self.group_id, tuple(columns)) in self.row_group_cache
+        )
+
+    def get_byte_ranges(self, columns: list[str]) -> list[ByteRange]:
+        return get_column_chunks_byte_ranges(self.parquet_file.metadata.row_group(self.group_id), columns=columns)
 
-    def read(self, columns: list[str]) -> pa.Table:
-        if not set(self.parquet_file.schema_arrow.names) <= set(columns):
+    def read(self, columns: list[str], supported_columns: Optional[list[str]] = None) -> pa.Table:
+        # supported_columns (default: columns) are all the columns that the parquet file is allowed to contain, while
+        # columns are the ones to read
+        supported_columns = columns if supported_columns is None else supported_columns
+        if not set(self.parquet_file.schema_arrow.names) <= set(supported_columns):
             raise SchemaMismatchError(
-                f"Parquet files have different columns: {sorted(columns)} and {sorted(self.parquet_file.schema_arrow.names)}"
+                f"Parquet files have different columns: {sorted(supported_columns)} and {sorted(self.parquet_file.schema_arrow.names)}"
             )
-        pa_table = self.parquet_file.read_row_group(i=self.group_id, columns=columns)
+        pa_table = self._read_row_group(columns)
         # cast_table_to_schema adds null values to missing columns
         return cast_table_to_schema(pa_table, self.features.arrow_schema)
 
     def read_truncated_binary(self, columns: list[str], max_binary_length: int) -> tuple[pa.Table, list[str]]:
-        pa_table = self.parquet_file.read_row_group(i=self.group_id, columns=columns)
+        # max_binary_length is the budget of each binary column, in bytes, for the whole row group
+        pa_table = self._read_row_group(columns)
         truncated_columns: list[str] = []
         if max_binary_length:
             for field_idx, field in enumerate(pa_table.schema):
-                if self.features[field.name] == Value("binary") and pa_table[field_idx].nbytes > max_binary_length:
-                    truncated_array = pc.binary_slice(pa_table[field_idx], 0, max_binary_length // len(pa_table))
+                if self.features[field.name] != Value("binary"):
+                    continue
+                truncated_array = truncate_binary_array(pa_table[field_idx], max_binary_length)
+                if truncated_array is not None:
                     pa_table = pa_table.set_column(field_idx, field, truncated_array)
                     truncated_columns.append(field.name)
         return cast_table_to_schema(pa_table, self.features.arrow_schema), truncated_columns
 
     def read_size(self, columns: Optional[Iterable[str]] = None) -> int:
         if columns is None:
+            if self.uncompressed_size is not None:
+                return self.uncompressed_size
             return self.parquet_file.metadata.row_group(self.group_id).total_byte_size  # type: ignore
         else:
             columns = set(columns)
-            columns_metadata = self.parquet_file.metadata.row_group(self.group_id).to_dict()["columns"]
-            return sum(
-                column_metadata["total_uncompressed_size"]
-                for column_metadata in columns_metadata
-                if column_metadata["path_in_schema"] in columns
-            )
+            row_group_metadata = self.parquet_file.metadata.row_group(self.group_id)
+            size = 0
+            for column_index in range(row_group_metadata.num_columns):
+                column_chunk_metadata = row_group_metadata.column(column_index)
+                path_in_schema = column_chunk_metadata.path_in_schema
+                # the path of a nested column starts with the name of the top-level column
+                if path_in_schema in columns or path_in_schema.split(".")[0] in columns:
+                    size += column_chunk_metadata.total_uncompressed_size
+            return size
+
+
+def get_row_groups_index_or_none(row_groups_index_path: str, num_rows: list[int]) -> Optional[npt.NDArray[np.int64]]:
+    """Load the row groups index of a split, or return None if it's missing or doesn't match the parquet files."""
+    try:
+        row_groups_index = load_row_groups_index(row_groups_index_path)
+    except (OSError, ValueError) as err:
+        logging.warning(f"Could not load the row groups index {row_groups_index_path}: {err}")
+        return None
+    if row_groups_index.ndim != 2 or row_groups_index.shape[0] != ROW_GROUPS_INDEX_NUM_FIELDS:
+        logging.warning(f"The row groups index {row_groups_index_path} has an unexpected shape, ignoring it.")
+        return None
+    file_ids = row_groups_index[ROW_GROUPS_INDEX_FILE]
+    row_ends = row_groups_index[ROW_GROUPS_INDEX_ROW_END]
+    if (len(file_ids) and file_ids[-1] >= len(num_rows)) or (row_ends[-1] if len(row_ends) else 0) != sum(num_rows):
+        logging.warning(f"The row groups index {row_groups_index_path} doesn't match the parquet files, ignoring it.")
+        return None
+    return row_groups_index
+
+
+@dataclass
+class RowGroupsQuery:
+    """The row groups to read to answer a query, and how to read them."""
+
+    row_group_readers: list[RowGroupReader]
+    # the offset of the first requested row in the first row group
+    row_groups_offset: int
+    length: int
+    # the supported columns to read
+    columns: list[str]
+    # if set, the binary values are truncated (see RowGroupReader.read_truncated_binary)
+    max_binary_length: Optional[int] = None
+    # the range requests to send to prefetch the row groups, if planned (see RangeReadsPlanner.plan)
+    range_requests: list[RangeRequest] = field(default_factory=list)
 
 
 @dataclass
@@ -192,42 +418,95 @@ class ParquetIndexWithMetadata:
     hf_token: Optional[str]
     max_arrow_data_in_memory: int
     partial: bool
+    row_group_cache: Optional[RowGroupCache] = None
+    parquet_metadata_cache: Optional[ParquetMetadataCache] = None
+    row_groups_index: Optional[npt.NDArray[np.int64]] = None
+    range_reads_planner: Optional[RangeReadsPlanner] = None
+    disk_block_cache: Optional[DiskBlockCache] = None
 
     num_rows_total: int = field(init=False)
 
     def __post_init__(self) -> None:
         if self.httpfs._session is None:
-            self.httpfs_session = asyncio.run(self.httpfs.set_session())
+            # the session is created on the event loop of the filesystem, where the requests are sent
+            self.httpfs_session = sync(self.httpfs.loop, self.httpfs.set_session)
         else:
             self.httpfs_session = self.httpfs._session
         self.num_rows_total = sum(self.num_rows)
 
-    def query_truncated_binary(self, offset: int, length: int) -> tuple[pa.Table, list[str]]:
-        """Query the parquet files
-
-        Note that this implementation will always read at least one row group, to get the list of columns and always
-        have the same schema, even if the requested rows are invalid (out of range).
-
-        This is the same as query() except that:
-
-        - it computes a maximum size to allocate to binary data in step "parquet_index_with_metadata.row_groups_size_check_truncated_binary"
-        - it uses `read_truncated_binary()` in step "parquet_index_with_metadata.query_truncated_binary".
-
-        Args:
-            offset (`int`): The first row to read.
-            length (`int`): The number of rows to read.
-
-        Raises:
-            [`TooBigRows`]: if the arrow data from the parquet row groups is bigger than max_arrow_data_in_memory
+    def _get_parsed_metadata(self, metadata_path: str) -> ParsedParquetMetadata:
+        if self.parquet_metadata_cache is None:
+            return ParsedParquetMetadata.from_metadata_path(metadata_path)
+        return self.parquet_metadata_cache.get_parsed_metadata(metadata_path)
+
+    def _open_parquet_file(
+        self, file_id: int, parsed_metadata: Optional[ParsedParquetMetadata] = None
+    ) -> tuple[pq.ParquetFile, PrefetchedRangesFile]:
+        if parsed_metadata is None:
+            parsed_metadata = self._get_parsed_metadata(self.metadata_paths[file_id])
+        file = PrefetchedRangesFile(
+            HTTPFile(
+                self.httpfs,
+                self.parquet_files_urls[file_id],
+                session=self.httpfs_session,
+                size=self.num_bytes[file_id],
+                loop=self.httpfs.loop,
+                cache_type=None,
+                **self.httpfs.kwargs,
+            ),
+            size=self.num_bytes[file_id],
+            disk_block_cache=self.disk_block_cache,
+            # the key of the file content, used by the disk block cache and by the row group cache
+            cache_key=(
+                ""
+                if self.disk_block_cache is None and self.row_group_cache is None
+                else get_file_cache_key(
+                    url=self.parquet_files_urls[file_id],
+                    size=self.num_bytes[file_id],
+                    version=os.stat(self.metadata_paths[file_id]).st_mtime_ns,
+                )
+            ),
+        )
+        return pq.ParquetFile(file, metadata=parsed_metadata.metadata, pre_buffer=True), file
+
+    def _get_parquet_file(self, file_id: int) -> pq.ParquetFile:
+        return self._open_parquet_file(file_id)[0]
+
+    def _get_row_group_readers_from_row_groups_index(
+        self, row_groups_index: npt.NDArray[np.int64], offset: int, length: int, features: Features
+    ) -> Optional[tuple[list[RowGroupReader], int]]:
+        row_ends = row_groups_index[ROW_GROUPS_INDEX_ROW_END]
+        if len(row_ends) == 0 or row_ends[-1] == 0:  # if the dataset is empty
+            return None
+        last_row_in_parquet = row_ends[-1] - 1
+        first_row = min(offset, last_row_in_parquet)
+        last_row = min(offset + length - 1, last_row_in_parquet)
+        first_row_group_id, last_row_group_id = np.searchsorted(row_ends, [first_row, last_row], side="right")
+        parquet_files: dict[int, tuple[pq.ParquetFile, PrefetchedRangesFile]] = {}
+        row_group_readers: list[RowGroupReader] = []
+        for i in range(first_row_group_id, last_row_group_id + 1):
+            file_id = int(row_groups_index[ROW_GROUPS_INDEX_FILE, i])
+            if file_id not in parquet_files:
+                parquet_files[file_id] = self._open_parquet_file(file_id)
+            parquet_file, prefetched_ranges_file = parquet_files[file_id]
+            row_group_readers.append(
+                RowGroupReader(
+                    parquet_file=parquet_file,
+                    group_id=int(row_groups_index[ROW_GROUPS_INDEX_ROW_GROUP, i]),
+                    features=features,
+                    url=self.parquet_files_urls[file_id],
+                    file_cache_key=prefetched_ranges_file.cache_key,
+                    row_group_cache=self.row_group_cache,
+                    uncompressed_size=int(row_groups_index[ROW_GROUPS_INDEX_UNCOMPRESSED_SIZE, i]),
+                    prefetched_ranges_file=prefetched_ranges_file,
+                )
+            )
+        first_row_in_row_groups = int(row_ends[first_row_group_id - 1]) if first_row_group_id > 0 else 0
+        return row_group_readers, offset - first_row_in_row_groups
 
-        Returns:
-            `pa.Table`: The requested rows.
-            `list[strl]: List of truncated columns.
-        """
-        all_columns = set(self.features)
-        binary_columns = set(column for column, feature in self.features.items() if feature == Value("binary"))
-        if not binary_columns:
-            return self.query(offset=offset, length=length), []
+    def _get_row_group_readers_from_metadata(
+        self, offset: int, length: int, features: Features
+    ) -> Optional[tuple[list[RowGroupReader], int]]:
         with StepProfiler(
             method="parquet_index_with_metadata.query", step="get the parquet files than contain the requested rows"
         ):
@@ -242,50 +521,45 @@ class ParquetIndexWithMetadata:
             parquet_offset = (
                 offset - parquet_file_offsets[first_parquet_file_id - 1] if first_parquet_file_id > 0 else offset
             )
-            urls = self.parquet_files_urls[first_parquet_file_id : last_parquet_file_id + 1]  # noqa: E203
-            metadata_paths = self.metadata_paths[first_parquet_file_id : last_parquet_file_id + 1]  # noqa: E203
-            num_bytes = self.num_bytes[first_parquet_file_id : last_parquet_file_id + 1]  # noqa: E203
+            file_ids = list(range(first_parquet_file_id, last_parquet_file_id + 1))
 
         with StepProfiler(
             method="parquet_index_with_metadata.query", step="load the remote parquet files using metadata from disk"
         ):
+            parsed_metadatas = [self._get_parsed_metadata(self.metadata_paths[file_id]) for file_id in file_ids]
             parquet_files = [
-                pq.ParquetFile(
-                    HTTPFile(
-                        self.httpfs,
-                        url,
-                        session=self.httpfs_session,
-                        size=size,
-                        loop=self.httpfs.loop,
-                        cache_type=None,
-                        **self.httpfs.kwargs,
-                    ),
-                    metadata=pq.read_metadata(metadata_path),
-                    pre_buffer=True,
-                )
-                for url, metadata_path, size in zip(urls, metadata_paths, num_bytes)
+                self._open_parquet_file(file_id, parsed_metadata=parsed_metadata)
+                for file_id, parsed_metadata in zip(file_ids, parsed_metadatas)
             ]
 
         with StepProfiler(
             method="parquet_index_with_metadata.query", step="get the row groups than contain the requested rows"
         ):
-            row_group_offsets = np.cumsum(
+            parquet_file_first_rows = np.cumsum(
+                [0] + [parsed_metadata.metadata.num_rows for parsed_metadata in parsed_metadatas[:-1]]
+            )
+            row_group_offsets = np.concatenate(
                 [
-                    parquet_file.metadata.row_group(group_id).num_rows
-                    for parquet_file in parquet_files
-                    for group_id in range(parquet_file.metadata.num_row_groups)
+                    parsed_metadata.row_group_offsets + parquet_file_first_row
+                    for parsed_metadata, parquet_file_first_row in zip(parsed_metadatas, parquet_file_first_rows)
                 ]
             )
             row_group_readers = [
-                RowGroupReader(parquet_file=parquet_file, group_id=group_id, features=self.features)
-                for parquet_file in parquet_files
+                RowGroupReader(
+                    parquet_file=parquet_file,
+                    group_id=group_id,
+                    features=features,
+                    url=self.parquet_files_urls[file_id],
+                    file_cache_key=prefetched_ranges_file.cache_key,
+                    row_group_cache=self.row_group_cache,
+                    prefetched_ranges_file=prefetched_ranges_file,
+                )
+                for file_id, (parquet_file, prefetched_ranges_file) in zip(file_ids, parquet_files)
                 for group_id in range(parquet_file.metadata.num_row_groups)
             ]
 
             if len(row_group_offsets) == 0 or row_group_offsets[-1] == 0:  # if the dataset is empty
-                if offset < 0:
-                    raise IndexError("Offset must be non-negative")
-                return cast_table_to_schema(parquet_files[0].read(), self.features.arrow_schema), []
+                return None
 
             last_row_in_parquet = row_group_offsets[-1] - 1
             first_row = min(parquet_offset, last_row_in_parquet)
@@ -294,6 +568,136 @@ class ParquetIndexWithMetadata:
             first_row_group_id, last_row_group_id = np.searchsorted(
                 row_group_offsets, [first_row, last_row], side="right"
             )
+            first_row_in_row_groups = row_group_offsets[first_row_group_id - 1] if first_row_group_id > 0 else 0
+            return (
+                row_group_readers[first_row_group_id : last_row_group_id + 1],  # noqa: E203
+                parquet_offset - first_row_in_row_groups,
+            )
+
+    def _get_row_group_readers(
+        self, offset: int, length: int, features: Features
+    ) -> Optional[tuple[list[RowGroupReader], int]]:
+        """Get the readers of the row groups that contain the requested rows.
+
+        The row groups are found with the row groups index of the split if it exists, or else by loading the metadata
+        of the parquet files that contain the requested rows.
+
+        Args:
+            offset (`int`): The first row to read.
+            length (`int`): The number of rows to read.
+            features (`Features`): The features of the columns to read.
+
+        Returns:
+            `tuple[list[RowGroupReader], int]`, *optional*: The readers of the row groups, and the offset of the first
+              requested row in the first row group. None if the dataset is empty.
+        """
+        if self.row_groups_index is not None:
+            with StepProfiler(
+                method="parquet_index_with_metadata.query",
+                step="get the row groups than contain the requested rows from the row groups index",
+            ):
+                return self._get_row_group_readers_from_row_groups_index(
+                    self.row_groups_index, offset=offset, length=length, features=features
+                )
+        return self._get_row_group_readers_from_metadata(offset=offset, length=length, features=features)
+
+    def _get_files_byte_ranges(
+        self, rows_query: RowGroupsQuery
+    ) -> list[tuple[PrefetchedRangesFile, str, list[ByteRange]]]:
+        """Get the byte ranges of the column chunks to read, for the row groups that are not cached yet."""
+        files_byte_ranges: dict[int, tuple[PrefetchedRangesFile, str, list[ByteRange]]] = {}
+        for row_group_reader in rows_query.row_group_readers:
+            if row_group_reader.prefetched_ranges_file is None or row_group_reader.is_cached(rows_query.columns):
+                continue
+            file = row_group_reader.prefetched_ranges_file
+            _, _, byte_ranges = files_byte_ranges.setdefault(id(file), (file, row_group_reader.url, []))
+            byte_ranges.extend(row_group_reader.get_byte_ranges(rows_query.columns))
+        return list(files_byte_ranges.values())
+
+    def _plan_range_reads(self, rows_query: RowGroupsQuery) -> None:
+        """Plan the coalesced range requests for the column chunks of the row groups that are not cached yet."""
+        if self.range_reads_planner is None:
+            return
+        rows_query.range_requests = self.range_reads_planner.plan(self._get_files_byte_ranges(rows_query))
+
+    def _prefetch_row_groups(self, rows_query: RowGroupsQuery) -> None:
+        """Fetch the column chunks of the row groups that are not cached yet, with coalesced range requests."""
+        if self.range_reads_planner is None:
+            return
+        with StepProfiler(method="parquet_index_with_metadata.query", step="prefetch the row groups"):
+            self.range_reads_planner.prefetch(self.httpfs, self._get_files_byte_ranges(rows_query))
+
+    def _read_empty_table(self, offset: int, columns: Optional[list[str]] = None) -> pa.Table:
+        if offset < 0:
+            raise IndexError("Offset must be non-negative")
+        pa_table = self._get_parquet_file(0).read(
+            columns=None if columns is None else self._get_supported_columns(columns)
+        )
+        return cast_table_to_schema(pa_table, self.get_features(columns).arrow_schema)
+
+    def get_features(self, columns: Optional[list[str]] = None) -> Features:
+        """Get the features of the requested columns, in the order of the dataset. All the features if columns is None."""
+        if columns is None:
+            return self.features
+        return Features({column: feature for column, feature in self.features.items() if column in columns})
+
+    def _get_supported_columns(self, columns: Optional[list[str]] = None) -> list[str]:
+        if columns is None:
+            return self.supported_columns
+        return [column for column in self.supported_columns if column in columns]
+
+    def _plan_query(
+        self,
+        offset: int,
+        length: int,
+        columns: Optional[list[str]],
+        truncate_binary: bool,
+        plan_range_reads: bool = False,
+    ) -> Union[tuple[pa.Table, list[str]], RowGroupsQuery]:
+        """Select the row groups to read, and check that they fit in memory.
+
+        If `plan_range_reads` is True, the range requests to prefetch the row groups are also planned, so that they
+        can be sent from an event loop.
+
+        Returns:
+            `tuple[pa.Table, list[str]]` or `RowGroupsQuery`: The (empty) result if there are no row groups to read,
+              else the query to execute.
+        """
+        features = self.get_features(columns)
+        binary_columns = (
+            set(column for column, feature in features.items() if feature == Value("binary"))
+            if truncate_binary
+            else set()
+        )
+        selection = self._get_row_group_readers(offset=offset, length=length, features=features)
+        if selection is None:
+            return self._read_empty_table(offset=offset, columns=columns), []
+        row_group_readers, row_groups_offset = selection
+        rows_query = RowGroupsQuery(
+            row_group_readers=row_group_readers,
+            row_groups_offset=row_groups_offset,
+            length=length,
+            columns=self._get_supported_columns(columns),
+        )
+
+        if not binary_columns:
+            with StepProfiler(
+                method="parquet_index_with_metadata.row_groups_size_check", step="check if the rows can fit in memory"
+            ):
+                row_groups_size = sum(
+                    [
+                        row_group_reader.read_size(columns=None if columns is None else set(features))
+                        for row_group_reader in row_group_readers
+                    ]
+                )
+                if row_groups_size > self.max_arrow_data_in_memory:
+                    raise TooBigRows(
+                        "Rows from parquet row groups are too big to be read:"
+                        f" {size_str(row_groups_size)} (max={size_str(self.max_arrow_data_in_memory)})"
+                    )
+            if plan_range_reads:
+                self._plan_range_reads(rows_query)
+            return rows_query
 
         with StepProfiler(
             method="parquet_index_with_metadata.row_groups_size_check_truncated_binary",
@@ -301,15 +705,12 @@ class ParquetIndexWithMetadata:
         ):
             in_memory_max_non_binary_size = sum(
                 [
-                    row_group_readers[i].read_size(columns=all_columns - binary_columns)
-                    for i in range(first_row_group_id, last_row_group_id + 1)
+                    row_group_reader.read_size(columns=set(features) - binary_columns)
+                    for row_group_reader in row_group_readers
                 ]
             )
             in_memory_max_binary_size = max(
-                [
-                    row_group_readers[i].read_size(columns=binary_columns)
-                    for i in range(first_row_group_id, last_row_group_id + 1)
-                ]
+                [row_group_reader.read_size(columns=binary_columns) for row_group_reader in row_group_readers]
             )
             in_memory_max_size = in_memory_max_non_binary_size + in_memory_max_binary_size
             if in_memory_max_size > self.max_arrow_data_in_memory:
@@ -317,140 +718,183 @@ class ParquetIndexWithMetadata:
                     "Rows from parquet row groups are too big to be read:"
                     f" {size_str(in_memory_max_size)} (max={size_str(self.max_arrow_data_in_memory)})"
                 )
+        # This is a simple heuristic of how much we need to truncate binary data
+        rows_query.max_binary_length = max(
+            int(
+                (self.max_arrow_data_in_memory - in_memory_max_non_binary_size)
+                / len(row_group_readers)
+                / len(binary_columns)
+                / 2  # we divide more in case the row groups are not evenly distributed
+            ),
+            20,
+        )  # we use a minimum length to not end up with too empty cells
+        if plan_range_reads:
+            self._plan_range_reads(rows_query)
+        return rows_query
+
+    def _execute_query(
+        self, rows_query: RowGroupsQuery, range_results: Optional[list[bytes]] = None
+    ) -> tuple[pa.Table, list[str]]:
+        if range_results is not None and self.range_reads_planner is not None:
+            self.range_reads_planner.store(rows_query.range_requests, range_results)
+        if rows_query.max_binary_length is None:
+            with StepProfiler(method="parquet_index_with_metadata.query", step="read the row groups"):
+                try:
+                    pa_table = pa.concat_tables(
+                        [
+                            row_group_reader.read(rows_query.columns, supported_columns=self.supported_columns)
+                            for row_group_reader in rows_query.row_group_readers
+                        ]
+                    )
+                except ArrowInvalid as err:
+                    raise SchemaMismatchError("Parquet files have different schema.", err)
+                return pa_table.slice(rows_query.row_groups_offset, rows_query.length), []
 
         with StepProfiler(method="parquet_index_with_metadata.query_truncated_binary", step="read the row groups"):
-            # This is a simple heuristic of how much we need to truncate binary data
-            max_binary_length = max(
-                int(
-                    (self.max_arrow_data_in_memory - in_memory_max_non_binary_size)
-                    / (last_row_group_id + 1 - first_row_group_id)
-                    / len(binary_columns)
-                    / 2  # we divide more in case the row groups are not evenly distributed
-                ),
-                20,
-            )  # we use a minimum length to not end up with too empty cells
             try:
                 pa_tables: list[pa.Table] = []
                 truncated_columns: set[str] = set()
-                for i in range(first_row_group_id, last_row_group_id + 1):
-                    rg_pa_table, rg_truncated_columns = row_group_readers[i].read_truncated_binary(
-                        self.supported_columns, max_binary_length=max_binary_length
+                for row_group_reader in rows_query.row_group_readers:
+                    rg_pa_table, rg_truncated_columns = row_group_reader.read_truncated_binary(
+                        rows_query.columns, max_binary_length=rows_query.max_binary_length
                     )
                     pa_tables.append(rg_pa_table)
                     truncated_columns |= set(rg_truncated_columns)
                 pa_table = pa.concat_tables(pa_tables)
             except ArrowInvalid as err:
                 raise SchemaMismatchError("Parquet files have different schema.", err)
-            first_row_in_pa_table = row_group_offsets[first_row_group_id - 1] if first_row_group_id > 0 else 0
-            return pa_table.slice(parquet_offset - first_row_in_pa_table, length), list(truncated_columns)
+            return pa_table.slice(rows_query.row_groups_offset, rows_query.length), list(truncated_columns)
+
+    def _query(
+        self, offset: int, length: int, columns: Optional[list[str]], truncate_binary: bool
+    ) -> tuple[pa.Table, list[str]]:
+        rows_query = self._plan_query(offset=offset, length=length, columns=columns, truncate_binary=truncate_binary)
+        if not isinstance(rows_query, RowGroupsQuery):
+            return rows_query
+        self._prefetch_row_groups(rows_query)
+        return self._execute_query(rows_query)
+
+    async def _query_async(
+        self,
+        offset: int,
+        length: int,
+        columns: Optional[list[str]],
+        truncate_binary: bool,
+        executor: Optional[Executor],
+    ) -> tuple[pa.Table, list[str]]:
+        loop = asyncio.get_running_loop()
+        rows_query = await loop.run_in_executor(
+            executor,
+            partial(
+                self._plan_query,
+                offset=offset,
+                length=length,
+                columns=columns,
+                truncate_binary=truncate_binary,
+                plan_range_reads=True,
+            ),
+        )
+        if not isinstance(rows_query, RowGroupsQuery):
+            return rows_query
+        if rows_query.range_requests and self.range_reads_planner is not None:
+            with StepProfiler(method="parquet_index_with_metadata.query", step="prefetch the row groups"):
+                results = await self.range_reads_planner.fetch(self.httpfs, rows_query.range_requests)
+            return await loop.run_in_executor(
+                executor, partial(self._execute_query, rows_query, range_results=results)
+            )
+        return await loop.run_in_executor(executor, partial(self._execute_query, rows_query))
 
-    def query(self, offset: int, length: int) -> pa.Table:
+    def query_truncated_binary(
+        self, offset: int, length: int, columns: Optional[list[str]] = None
+    ) -> tuple[pa.Table, list[str]]:
         """Query the parquet files
 
         Note that this implementation will always read at least one row group, to get the list of columns and always
         have the same schema, even if the requested rows are invalid (out of range).
 
+        This is the same as query() except that:
+
+        - it computes a maximum size to allocate to binary data in step "parquet_index_with_metadata.row_groups_size_check_truncated_binary"
+        - it uses `read_truncated_binary()` in step "parquet_index_with_metadata.query_truncated_binary".
+
         Args:
             offset (`int`): The first row to read.
             length (`int`): The number of rows to read.
+            columns (`list[str]`, *optional*): The columns to read. If None, all the columns are read.
 
         Raises:
             [`TooBigRows`]: if the arrow data from the parquet row groups is bigger than max_arrow_data_in_memory
 
         Returns:
             `pa.Table`: The requested rows.
+            `list[strl]: List of truncated columns.
         """
-        with StepProfiler(
-            method="parquet_index_with_metadata.query", step="get the parquet files than contain the requested rows"
-        ):
-            parquet_file_offsets = np.cumsum(self.num_rows)
+        return self._query(offset=offset, length=length, columns=columns, truncate_binary=True)
 
-            last_row_in_parquet = parquet_file_offsets[-1] - 1
-            first_row = min(offset, last_row_in_parquet)
-            last_row = min(offset + length - 1, last_row_in_parquet)
-            first_parquet_file_id, last_parquet_file_id = np.searchsorted(
-                parquet_file_offsets, [first_row, last_row], side="right"
-            )
-            parquet_offset = (
-                offset - parquet_file_offsets[first_parquet_file_id - 1] if first_parquet_file_id > 0 else offset
-            )
-            urls = self.parquet_files_urls[first_parquet_file_id : last_parquet_file_id + 1]  # noqa: E203
-            metadata_paths = self.metadata_paths[first_parquet_file_id : last_parquet_file_id + 1]  # noqa: E203
-            num_bytes = self.num_bytes[first_parquet_file_id : last_parquet_file_id + 1]  # noqa: E203
+    def query(self, offset: int, length: int, columns: Optional[list[str]] = None) -> pa.Table:
+        """Query the parquet files
 
-        with StepProfiler(
-            method="parquet_index_with_metadata.query", step="load the remote parquet files using metadata from disk"
-        ):
-            parquet_files = [
-                pq.ParquetFile(
-                    HTTPFile(
-                        self.httpfs,
-                        url,
-                        session=self.httpfs_session,
-                        size=size,
-                        loop=self.httpfs.loop,
-                        cache_type=None,
-                        **self.httpfs.kwargs,
-                    ),
-                    metadata=pq.read_metadata(metadata_path),
-                    pre_buffer=True,
-                )
-                for url, metadata_path, size in zip(urls, metadata_paths, num_bytes)
-            ]
+        Note that this implementation will always read at least one row group, to get the list of columns and always
+        have the same schema, even if the requested rows are invalid (out of range).
 
-        with StepProfiler(
-            method="parquet_index_with_metadata.query", step="get the row groups than contain the requested rows"
-        ):
-            row_group_offsets = np.cumsum(
-                [
-                    parquet_file.metadata.row_group(group_id).num_rows
-                    for parquet_file in parquet_files
-                    for group_id in range(parquet_file.metadata.num_row_groups)
-                ]
-            )
-            row_group_readers = [
-                RowGroupReader(parquet_file=parquet_file, group_id=group_id, features=self.features)
-                for parquet_file in parquet_files
-                for group_id in range(parquet_file.metadata.num_row_groups)
-            ]
+        Args:
+            offset (`int`): The first row to read.
+            length (`int`): The number of rows to read.
+            columns (`list[str]`, *optional*): The columns to read. If None, all the columns are read.
 
-            if len(row_group_offsets) == 0 or row_group_offsets[-1] == 0:  # if the dataset is empty
-                if offset < 0:
-                    raise IndexError("Offset must be non-negative")
-                return cast_table_to_schema(parquet_files[0].read(), self.features.arrow_schema)
+        Raises:
+            [`TooBigRows`]: if the arrow data from the parquet row groups is bigger than max_arrow_data_in_memory
 
-            last_row_in_parquet = row_group_offsets[-1] - 1
-            first_row = min(parquet_offset, last_row_in_parquet)
-            last_row = min(parquet_offset + length - 1, last_row_in_parquet)
+        Returns:
+            `pa.Table`: The requested rows.
+        """
+        return self._query(offset=offset, length=length, columns=columns, truncate_binary=False)[0]
 
-            first_row_group_id, last_row_group_id = np.searchsorted(
-                row_group_offsets, [first_row, last_row], side="right"
-            )
+    async def query_truncated_binary_async(
+        self,
+        offset: int,
+        length: int,
+        columns: Optional[list[str]] = None,
+        executor: Optional[Executor] = None,
+    ) -> tuple[pa.Table, list[str]]:
+        """Same as query_truncated_binary(), without blocking the event loop.
+
+        The row groups are selected and decoded in the threads of `executor`, and the coalesced range requests are
+        awaited on the event loop of the filesystem, without holding a thread. If the task is cancelled (e.g. because
+        the client disconnected), the steps that have not started are skipped, and a running step finishes in the
+        background.
 
-        with StepProfiler(
-            method="parquet_index_with_metadata.row_groups_size_check", step="check if the rows can fit in memory"
-        ):
-            row_groups_size = sum(
-                [row_group_readers[i].read_size() for i in range(first_row_group_id, last_row_group_id + 1)]
-            )
-            if row_groups_size > self.max_arrow_data_in_memory:
-                raise TooBigRows(
-                    "Rows from parquet row groups are too big to be read:"
-                    f" {size_str(row_groups_size)} (max={size_str(self.max_arrow_data_in_memory)})"
-                )
+        Args:
+            offset (`int`): The first row to read.
+            length (`int`): The number of rows to read.
+            columns (`list[str]`, *optional*): The columns to read. If None, all the columns are read.
+            executor (`Executor`, *optional*): The executor that runs the blocking steps, to bound the number of
+              threads. If None, the default executor of the event loop is used.
 
-        with StepProfiler(method="parquet_index_with_metadata.query", step="read the row groups"):
-            try:
-                pa_table = pa.concat_tables(
-                    [
-                        row_group_readers[i].read(self.supported_columns)
-                        for i in range(first_row_group_id, last_row_group_id + 1)
-                    ]
-                )
-            except ArrowInvalid as err:
-                raise SchemaMismatchError("Parquet files have different schema.", err)
-            first_row_in_pa_table = row_group_offsets[first_row_group_id - 1] if first_row_group_id > 0 else 0
-            return pa_table.slice(parquet_offset - first_row_in_pa_table, length)
+        Raises:
+            [`TooBigRows`]: if the arrow data from the parquet row groups is bigger than max_arrow_data_in_memory
+
+        Returns:
+            `pa.Table`: The requested rows.
+            `list[strl]: List of truncated columns.
+        """
+        return await self._query_async(
+            offset=offset, length=length, columns=columns, truncate_binary=True, executor=executor
+        )
+
+    async def query_async(
+        self,
+        offset: int,
+        length: int,
+        columns: Optional[list[str]] = None,
+        executor: Optional[Executor] = None,
+    ) -> pa.Table:
+        """Same as query(), without blocking the event loop. See query_truncated_binary_async()."""
+        return (
+            await self._query_async(
+                offset=offset, length=length, columns=columns, truncate_binary=False, executor=executor
+            )
+        )[0]
 
     @staticmethod
     def from_parquet_metadata_items(
@@ -461,6 +905,11 @@ class ParquetIndexWithMetadata:
         hf_token: Optional[str],
         max_arrow_data_in_memory: int,
         unsupported_features: list[FeatureType] = [],
+        row_group_cache: Optional[RowGroupCache] = None,
+        parquet_metadata_cache: Optional[ParquetMetadataCache] = None,
+        row_groups_index_subpath: Optional[str] = None,
+        range_reads_planner: Optional[RangeReadsPlanner] = None,
+        disk_block_cache: Optional[DiskBlockCache] = None,
     ) -> "ParquetIndexWithMetadata":
         if not parquet_file_metadata_items:
             raise EmptyParquetMetadataError("No parquet files found.")
@@ -494,6 +943,16 @@ class ParquetIndexWithMetadata:
                 features,
                 unsupported_features=unsupported_features,
             )
+
+        row_groups_index = None
+        if row_groups_index_subpath is not None:
+            with StepProfiler(
+                method="parquet_index_with_metadata.from_parquet_metadata_items", step="load the row groups index"
+            ):
+                row_groups_index = get_row_groups_index_or_none(
+                    row_groups_index_path=os.path.join(parquet_metadata_directory, row_groups_index_subpath),
+                    num_rows=num_rows,
+                )
         return ParquetIndexWithMetadata(
             features=features,
             supported_columns=supported_columns,
@@ -506,6 +965,11 @@ class ParquetIndexWithMetadata:
             hf_token=hf_token,
             max_arrow_data_in_memory=max_arrow_data_in_memory,
             partial=partial,
+            row_group_cache=row_group_cache,
+            parquet_metadata_cache=parquet_metadata_cache,
+            row_groups_index=row_groups_index,
+            range_reads_planner=range_reads_planner,
+            disk_block_cache=disk_block_cache,
         )
 
 
@@ -520,6 +984,10 @@ class RowsIndex:
         parquet_metadata_directory: StrPath,
         max_arrow_data_in_memory: int,
         unsupported_features: list[FeatureType] = [],
+        row_group_cache: Optional[RowGroupCache] = None,
+        parquet_metadata_cache: Optional[ParquetMetadataCache] = None,
+        range_reads_planner: Optional[RangeReadsPlanner] = None,
+        disk_block_cache: Optional[DiskBlockCache] = None,
     ):
         self.dataset = dataset
         self.config = config
@@ -530,6 +998,10 @@ class RowsIndex:
             parquet_metadata_directory=parquet_metadata_directory,
             max_arrow_data_in_memory=max_arrow_data_in_memory,
             unsupported_features=unsupported_features,
+            row_group_cache=row_group_cache,
+            parquet_metadata_cache=parquet_metadata_cache,
+            range_reads_planner=range_reads_planner,
+            disk_block_cache=disk_block_cache,
         )
 
     def _init_parquet_index(
@@ -538,6 +1010,10 @@ class RowsIndex:
         parquet_metadata_directory: StrPath,
         max_arrow_data_in_memory: int,
         unsupported_features: list[FeatureType] = [],
+        row_group_cache: Optional[RowGroupCache] = None,
+        parquet_metadata_cache: Optional[ParquetMetadataCache] = None,
+        range_reads_planner: Optional[RangeReadsPlanner] = None,
+        disk_block_cache: Optional[DiskBlockCache] = None,
     ) -> ParquetIndexWithMetadata:
         with StepProfiler(method="rows_index._init_parquet_index", step="all"):
             # get the list of parquet files
@@ -569,11 +1045,21 @@ class RowsIndex:
                 hf_token=hf_token,
                 max_arrow_data_in_memory=max_arrow_data_in_memory,
                 unsupported_features=unsupported_features,
+                row_group_cache=row_group_cache,
+                parquet_metadata_cache=parquet_metadata_cache,
+                range_reads_planner=range_reads_planner,
+                disk_block_cache=disk_block_cache,
+                row_groups_index_subpath=next(
+                    (
+                        row_groups_index_item["row_groups_index_subpath"]
+                        for row_groups_index_item in content.get("row_groups_indexes", [])
+                        if row_groups_index_item["split"] == self.split
+                    ),
+                    None,
+                ),
             )
 
-    # note that this cache size is global for the class, not per instance
-    @lru_cache(maxsize=1)
-    def query(self, offset: int, length: int) -> pa.Table:
+    def query(self, offset: int, length: int, columns: Optional[list[str]] = None) -> pa.Table:
         """Query the parquet files
 
         Note that this implementation will always read at least one row group, to get the list of columns and always
@@ -582,19 +1068,20 @@ class RowsIndex:
         Args:
             offset (`int`): The first row to read.
             length (`int`): The number of rows to read.
+            columns (`list[str]`, *optional*): The columns to read. If None, all the columns are read.
 
         Returns:
             `pa.Table`: The requested rows.
         """
         logging.info(
             f"Query {type(self.parquet_index).__name__} for dataset={self.dataset}, config={self.config},"
-            f" split={self.split}, offset={offset}, length={length}"
+            f" split={self.split}, offset={offset}, length={length}, columns={columns}"
         )
-        return self.parquet_index.query(offset=offset, length=length)
+        return self.parquet_index.query(offset=offset, length=length, columns=columns)
 
-    # note that this cache size is global for the class, not per instance
-    @lru_cache(maxsize=1)
-    def query_truncated_binary(self, offset: int, length: int) -> tuple[pa.Table, list[str]]:
+    def query_truncated_binary(
+        self, offset: int, length: int, columns: Optional[list[str]] = None
+    ) -> tuple[pa.Table, list[str]]:
         """Query the parquet files
 
         Note that this implementation will always read at least one row group, to get the list of columns and always
@@ -603,6 +1090,7 @@ class RowsIndex:
         Args:
             offset (`int`): The first row to read.
             length (`int`): The number of rows to read.
+            columns (`list[str]`, *optional*): The columns to read. If None, all the columns are read.
 
         Returns:
             `pa.Table`: The requested rows.
@@ -610,9 +1098,80 @@ class RowsIndex:
         """
         logging.info(
             f"Query {type(self.parquet_index).__name__} for dataset={self.dataset}, config={self.config},"
-            f" split={self.split}, offset={offset}, length={length}, with truncated binary"
+            f" split={self.split}, offset={offset}, length={length}, columns={columns}, with truncated binary"
+        )
+        return self.parquet_index.query_truncated_binary(offset=offset, length=length, columns=columns)
+
+    async def query_async(
+        self, offset: int, length: int, columns: Optional[list[str]] = None, executor: Optional[Executor] = None
+    ) -> pa.Table:
+        """Same as query(), without blocking the event loop. See ParquetIndexWithMetadata.query_async()."""
+        logging.info(
+            f"Query {type(self.parquet_index).__name__} for dataset={self.dataset}, config={self.config},"
+            f" split={self.split}, offset={offset}, length={length}, columns={columns}, async"
         )
-        return self.parquet_index.query_truncated_binary(offset=offset, length=length)
+        return await self.parquet_index.query_async(offset=offset, length=length, columns=columns, executor=executor)
+
+    async def query_truncated_binary_async(
+        self, offset: int, length: int, columns: Optional[list[str]] = None, executor: Optional[Executor] = None
+    ) -> tuple[pa.Table, list[str]]:
+        """Same as query_truncated_binary(), without blocking the event loop.
+
+        See ParquetIndexWithMetadata.query_truncated_binary_async().
+        """
+        logging.info(
+            f"Query {type(self.parquet_index).__name__} for dataset={self.dataset}, config={self.config},"
+            f" split={self.split}, offset={offset}, length={length}, columns={columns}, with truncated binary, async"
+        )
+        return await self.parquet_index.query_truncated_binary_async(
+            offset=offset, length=length, columns=columns, executor=executor
+        )
+
+
+# (dataset, config, split)
+RowsIndexCacheKey = tuple[str, str, str]
+
+
+def estimate_rows_index_size(rows_index: RowsIndex) -> int:
+    """Rough estimate of the memory used by a RowsIndex: the lists of files and the features."""
+    parquet_index = rows_index.parquet_index
+    return (
+        sum(sys.getsizeof(url) for url in parquet_index.parquet_files_urls)
+        + sum(sys.getsizeof(path) for path in parquet_index.metadata_paths)
+        + 2 * 8 * len(parquet_index.num_rows)
+        + sys.getsizeof(str(parquet_index.features))
+    )
+
+
+class RowsIndexCache(MemoryLRUCache[RowsIndexCacheKey, RowsIndex]):
+    """
+    Cache of the RowsIndex of the most recently queried splits, to avoid fetching the parquet metadata from the cache
+    database and parsing the features on every request.
+
+    After `ttl_seconds`, an entry is revalidated against the `dataset_git_revision` of the config-parquet-metadata
+    cache entry, which is fetched without its content. The RowsIndex is created again if the revision has changed.
+
+    Args:
+        max_bytes (`int`): The maximum estimated size of the cached RowsIndex, in bytes. If 0, nothing is cached.
+        max_entries (`int`): The maximum number of cached splits.
+        ttl_seconds (`float`): The duration after which an entry is revalidated.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int, ttl_seconds: float):
+        super().__init__(
+            name="rows_indexes",
+            max_bytes=max_bytes,
+            get_size=estimate_rows_index_size,
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+        )
+
+
+def is_rows_index_up_to_date(rows_index: RowsIndex) -> bool:
+    response = get_response_without_content(
+        kind=CONFIG_PARQUET_METADATA_KIND, dataset=rows_index.dataset, config=rows_index.config
+    )
+    return response["http_status"] == HTTPStatus.OK and response["dataset_git_revision"] == rows_index.revision
 
 
 class Indexer:
@@ -624,6 +1183,11 @@ class Indexer:
         unsupported_features: list[FeatureType] = [],
         all_columns_supported_datasets_allow_list: Union[Literal["all"], list[str]] = "all",
         hf_token: Optional[str] = None,
+        row_group_cache: Optional[RowGroupCache] = None,
+        rows_index_cache: Optional[RowsIndexCache] = None,
+        parquet_metadata_cache: Optional[ParquetMetadataCache] = None,
+        range_reads_planner: Optional[RangeReadsPlanner] = None,
+        disk_block_cache: Optional[DiskBlockCache] = None,
     ):
         self.parquet_metadata_directory = parquet_metadata_directory
         self.httpfs = httpfs
@@ -631,13 +1195,31 @@ class Indexer:
         self.max_arrow_data_in_memory = max_arrow_data_in_memory
         self.unsupported_features = unsupported_features
         self.all_columns_supported_datasets_allow_list = all_columns_supported_datasets_allow_list
+        self.row_group_cache = row_group_cache
+        self.rows_index_cache = rows_index_cache
+        self.parquet_metadata_cache = parquet_metadata_cache
+        self.range_reads_planner = range_reads_planner
+        self.disk_block_cache = disk_block_cache
 
-    @lru_cache(maxsize=1)
     def get_rows_index(
         self,
         dataset: str,
         config: str,
         split: str,
+    ) -> RowsIndex:
+        if self.rows_index_cache is None:
+            return self._create_rows_index(dataset=dataset, config=config, split=split)
+        return self.rows_index_cache.get_or_compute(
+            key=(dataset, config, split),
+            compute=lambda: self._create_rows_index(dataset=dataset, config=config, split=split),
+            revalidate=is_rows_index_up_to_date,
+        )
+
+    def _create_rows_index(
+        self,
+        dataset: str,
+        config: str,
+        split: str,
     ) -> RowsIndex:
         filter_features = (
             self.all_columns_supported_datasets_allow_list != "all"
@@ -653,4 +1235,8 @@ class Indexer:
             parquet_metadata_directory=self.parquet_metadata_directory,
             max_arrow_data_in_memory=self.max_arrow_data_in_memory,
             unsupported_features=unsupported_features,
+            row_group_cache=self.row_group_cache,
+            parquet_metadata_cache=self.parquet_metadata_cache,
+            range_reads_planner=self.range_reads_planner,
+            disk_block_cache=self.disk_block_cache,
         )
@@ -517,7 +517,7 @@ specification: ProcessingGraphSpecification = {
     "config-parquet-metadata": {
         "input_type": "config",
         "triggered_by": "config-parquet",
-        "job_runner_version": 2,
+        "job_runner_version": 4,
         "difficulty": 50,
     },
     "dataset-parquet": {
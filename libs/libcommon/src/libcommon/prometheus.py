@@ -9,6 +9,7 @@ from typing import Any, Optional, TypeVar
 from prometheus_client import (
     REGISTRY,
     CollectorRegistry,
+    Counter,
     Gauge,
     Histogram,
     generate_latest,
@@ -76,6 +77,79 @@ METHOD_LONG_STEPS_PROCESSING_TIME = Histogram(
     ["method", "step"],
     buckets=LONG_DURATION_PROMETHEUS_HISTOGRAM_BUCKETS,
 )
+MEMORY_CACHE_REQUESTS_TOTAL = Counter(
+    name="memory_cache_requests_total",
+    documentation="Number of lookups in the in-memory caches of the process, by result (hit or miss)",
+    labelnames=["cache", "result"],
+)
+MEMORY_CACHE_EVICTIONS_TOTAL = Counter(
+    name="memory_cache_evictions_total",
+    documentation="Number of entries evicted from the in-memory caches of the process",
+    labelnames=["cache"],
+)
+DISK_CACHE_REQUESTS_TOTAL = Counter(
+    name="disk_cache_requests_total",
+    documentation="Number of lookups in the on-disk caches of the process, by result (hit or miss)",
+    labelnames=["cache", "result"],
+)
+DISK_CACHE_EVICTIONS_TOTAL = Counter(
+    name="disk_cache_evictions_total",
+    documentation="Number of entries evicted from the on-disk caches by the process",
+    labelnames=["cache"],
+)
+DISK_CACHE_BYTES = Gauge(
+    name="disk_cache_bytes",
+    documentation="Size in bytes of the on-disk caches, as measured by the last cleaning",
+    labelnames=["cache"],
+    multiprocess_mode="liveall",
+)
+RANGE_READS_REQUESTS_TOTAL = Counter(
+    name="range_reads_requests_total",
+    documentation="Number of range reads of remote parquet files, by kind (coalesced prefetch, or direct read)",
+    labelnames=["kind"],
+)
+RANGE_READS_BYTES_TOTAL = Counter(
+    name="range_reads_bytes_total",
+    documentation="Number of bytes read with range reads of remote parquet files, by kind (prefetch or direct)",
+    labelnames=["kind"],
+)
+MEMORY_CACHE_BYTES = Gauge(
+    name="memory_cache_bytes",
+    documentation="Size in bytes of the values stored in the in-memory caches",
+    labelnames=["cache"],
+    multiprocess_mode="livesum",
+)
+MEMORY_CACHE_ENTRIES = Gauge(
+    name="memory_cache_entries",
+    documentation="Number of entries stored in the in-memory caches",
+    labelnames=["cache"],
+    multiprocess_mode="livesum",
+)
+DUCKDB_INDEX_PREBUILD_QUEUE_DEPTH = Gauge(
+    name="duckdb_index_prebuild_queue_depth",
+    documentation="Number of trending splits whose DuckDB index is waiting to be checked or prebuilt",
+    multiprocess_mode="livesum",
+)
+DUCKDB_INDEX_PREBUILDS_TOTAL = Counter(
+    name="duckdb_index_prebuilds_total",
+    documentation="Number of DuckDB index prebuilds of trending splits, by result (built, ready, skipped or error)",
+    labelnames=["result"],
+)
+DUCKDB_INDEX_PREBUILD_DURATION = Histogram(
+    "duckdb_index_prebuild_duration_seconds",
+    "Histogram of the duration of the DuckDB index prebuilds of trending splits (in seconds)",
+    buckets=LONG_DURATION_PROMETHEUS_HISTOGRAM_BUCKETS,
+)
+DUCKDB_INDEX_EVICTIONS_TOTAL = Counter(
+    name="duckdb_index_evictions_total",
+    documentation="Number of DuckDB index files deleted by the index janitor, by reason (expired or disk_usage)",
+    labelnames=["reason"],
+)
+DUCKDB_INDEX_EVICTED_BYTES_TOTAL = Counter(
+    name="duckdb_index_evicted_bytes_total",
+    documentation="Number of bytes freed by the deletion of DuckDB index files, by reason (expired or disk_usage)",
+    labelnames=["reason"],
+)
 
 
 def update_queue_jobs_total() -> None:
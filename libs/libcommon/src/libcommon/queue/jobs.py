@@ -10,7 +10,6 @@ from datetime import datetime, timedelta
 from itertools import groupby
 from operator import itemgetter
 from typing import Any, Generic, Optional, TypedDict, TypeVar
-from uuid import uuid4
 
 import bson
 import pandas as pd
@@ -20,6 +19,9 @@ from mongoengine import Document
 from mongoengine.errors import DoesNotExist
 from mongoengine.fields import DateTimeField, EnumField, IntField, StringField
 from mongoengine.queryset.queryset import QuerySet
+from pymongo import DESCENDING, ReturnDocument
+from pymongo.client_session import ClientSession
+from pymongo.errors import DuplicateKeyError
 from pymongoarrow.api import Schema, find_pandas_all
 
 from libcommon.constants import (
@@ -30,7 +32,7 @@ from libcommon.constants import (
 )
 from libcommon.dtos import FlatJobInfo, JobInfo, Priority, Status, WorkerSize
 from libcommon.queue.dataset_blockages import DATASET_STATUS_BLOCKED, DATASET_STATUS_NORMAL, get_blocked_datasets
-from libcommon.queue.lock import lock, release_lock
+from libcommon.queue.lock import release_lock
 from libcommon.queue.metrics import (
     decrease_metric,
     decrease_worker_size_metrics,
@@ -38,6 +40,13 @@ from libcommon.queue.metrics import (
     update_metrics_for_type,
 )
 from libcommon.queue.past_jobs import create_past_job
+from libcommon.queue.started_jobs_counts import (
+    StartedJobsCountByNamespace,
+    decrease_started_jobs_count,
+    get_started_jobs_counts,
+    increase_started_jobs_count,
+    run_in_queue_transaction,
+)
 from libcommon.utils import get_datetime, inputs_to_string
 
 # START monkey patching ### hack ###
@@ -172,7 +181,15 @@ class JobDocument(Document):
             ("priority", "status", "created_at", "dataset", "difficulty", "namespace"),
             ("priority", "status", "type", "namespace", "unicity_id", "created_at", "-difficulty"),
             ("status", "type"),
+            ("status", "namespace", "unicity_id"),
             ("unicity_id", "status", "-created_at"),
+            {
+                # only one job can be started for a given unicity_id: it makes the claim of a job atomic
+                "name": "UNIQUE_STARTED_UNICITY_ID",
+                "fields": ["unicity_id"],
+                "unique": True,
+                "partialFilterExpression": {"status": Status.STARTED.value},
+            },
         ],
     }
     type = StringField(required=True)
@@ -385,8 +402,8 @@ class Queue:
     def _get_next_waiting_job_for_priority(
         self,
         priority: Priority,
-        difficulty_min: Optional[int] = None,
-        difficulty_max: Optional[int] = None,
+        filters: JobQueryFilters,
+        started_jobs_counts: StartedJobsCountByNamespace,
     ) -> JobDocument:
         """Get the next job in the queue for a given priority.
 
@@ -398,8 +415,8 @@ class Queue:
 
         Args:
             priority (`Priority`): The priority of the job.
-            difficulty_min (`int`, *optional*): if not None, only jobs with a difficulty greater or equal to this value are considered.
-            difficulty_max (`int`, *optional*): if not None, only jobs with a difficulty lower or equal to this value are considered.
+            filters (`JobQueryFilters`): the filters on difficulty and blocked datasets.
+            started_jobs_counts (`StartedJobsCountByNamespace`): the number of started jobs per namespace.
 
         Raises:
             [`EmptyQueueError`]: if there is no waiting job in the queue that satisfies the restrictions above.
@@ -408,30 +425,15 @@ class Queue:
             `JobDocument`: the next waiting job for priority
         """
         logging.debug(f"Getting next waiting job for priority {priority}")
-        blocked_datasets = get_blocked_datasets()
-        logging.debug(f"Blocked datasets: {blocked_datasets}")
-
-        filters: JobQueryFilters = {}
-        if difficulty_min is not None and difficulty_min > DEFAULT_DIFFICULTY_MIN:
-            filters["difficulty__gt"] = difficulty_min
-        if difficulty_max is not None and difficulty_max < DEFAULT_DIFFICULTY_MAX:
-            filters["difficulty__lte"] = difficulty_max
-        if blocked_datasets:
-            filters["dataset__nin"] = blocked_datasets
-        started_jobs = JobDocument.objects(status=Status.STARTED, **filters)
-        logging.debug(f"Number of started jobs: {started_jobs.count()}")
-        started_job_namespaces = [job.namespace for job in started_jobs.only("namespace")]
-        logging.debug(f"Started job namespaces: {started_job_namespaces}")
-
         next_waiting_job = (
             JobDocument.objects(
                 status=Status.WAITING,
-                namespace__nin=set(started_job_namespaces),
+                namespace__nin=list(started_jobs_counts),
                 priority=priority,
                 **filters,
             )
             .order_by("+created_at")
-            .only("type", "dataset", "revision", "config", "split", "priority", "unicity_id")
+            .only("unicity_id")
             .no_cache()
             .first()
         )
@@ -448,9 +450,8 @@ class Queue:
         # - exclude the waiting jobs which unicity_id is already in a started job
         # and, among the remaining waiting jobs, let's:
         # - select the oldest waiting job for the namespace with the least number of started jobs
-        started_unicity_ids = {job.unicity_id for job in started_jobs.only("unicity_id")}
         descending_frequency_namespace_counts = [
-            [namespace, count] for namespace, count in Counter(started_job_namespaces).most_common()
+            [namespace, count] for namespace, count in Counter(started_jobs_counts).most_common()
         ]
         logging.debug(f"Descending frequency namespace counts: {descending_frequency_namespace_counts}")
         descending_frequency_namespace_groups = [
@@ -460,6 +461,9 @@ class Queue:
         while descending_frequency_namespace_groups:
             least_common_namespaces_group = descending_frequency_namespace_groups.pop()
             logging.debug(f"Least common namespaces group: {least_common_namespaces_group}")
+            started_unicity_ids = JobDocument.objects(
+                status=Status.STARTED, namespace__in=least_common_namespaces_group
+            ).distinct("unicity_id")
             next_waiting_job = (
                 JobDocument.objects(
                     status=Status.WAITING,
@@ -469,7 +473,7 @@ class Queue:
                     **filters,
                 )
                 .order_by("+created_at")
-                .only("type", "dataset", "revision", "config", "split", "priority", "unicity_id")
+                .only("unicity_id")
                 .no_cache()
                 .first()
             )
@@ -491,6 +495,9 @@ class Queue:
         - if none, among the datasets that have the least started jobs:
           - ensuring that the unicity_id field is unique among the started jobs.
 
+        The blocked datasets and the number of started jobs per namespace are fetched once, and shared by the priority
+        passes.
+
         Args:
             difficulty_min (`int`, *optional*): if not None, only jobs with a difficulty greater or equal to this value are considered.
             difficulty_max (`int`, *optional*): if not None, only jobs with a difficulty lower or equal to this value are considered.
@@ -499,80 +506,82 @@ class Queue:
             [`EmptyQueueError`]: if there is no waiting job in the queue that satisfies the restrictions above.
 
         Returns:
-            `JobDocument`: the next waiting job
+            `JobDocument`: the next waiting job. Only its unicity_id field is loaded.
         """
+        blocked_datasets = get_blocked_datasets()
+        logging.debug(f"Blocked datasets: {blocked_datasets}")
+
+        filters: JobQueryFilters = {}
+        if difficulty_min is not None and difficulty_min > DEFAULT_DIFFICULTY_MIN:
+            filters["difficulty__gt"] = difficulty_min
+        if difficulty_max is not None and difficulty_max < DEFAULT_DIFFICULTY_MAX:
+            filters["difficulty__lte"] = difficulty_max
+        if blocked_datasets:
+            filters["dataset__nin"] = blocked_datasets
+        started_jobs_counts = get_started_jobs_counts()
+        logging.debug(f"Started jobs counts: {started_jobs_counts}")
+
         for priority in [Priority.HIGH, Priority.NORMAL, Priority.LOW]:
             with contextlib.suppress(EmptyQueueError):
                 return self._get_next_waiting_job_for_priority(
                     priority=priority,
-                    difficulty_min=difficulty_min,
-                    difficulty_max=difficulty_max,
+                    filters=filters,
+                    started_jobs_counts=started_jobs_counts,
                 )
         raise EmptyQueueError("no job available")
 
     def _start_newest_job_and_delete_others(self, job: JobDocument) -> JobDocument:
         """Start a job (the newest one for unicity_id) and delete the other ones.
 
-        A lock is used to ensure that the job is not started by another worker.
+        The job is claimed with an atomic find_one_and_update. The unique partial index on the unicity_id of the
+        started jobs ensures that another worker cannot start a job with the same unicity_id, without a lock. The
+        started jobs count of the namespace is increased in the same transaction.
 
         Args:
             job (`JobDocument`): the job to start
 
         Raises:
             [`AlreadyStartedJobError`]: if a started job already exist for the same unicity_id.
-            [`LockTimeoutError`]: if the lock could not be acquired after 20 retries.
+            [`NoWaitingJobError`]: if no waiting job could be found for the unicity_id (e.g. they have been deleted
+              or started by another worker in the meantime).
 
         Returns:
             `JobDocument`: the started job
         """
-        # could be a method of Job
-        RETRIES = 20
-        # uuid is used to differentiate between workers
-        # otherwise another worker might acquire the lock
-        lock_owner = str(uuid4())
-        try:
-            # retry for 2 seconds
-            with lock(
-                key=job.unicity_id,
-                owner=lock_owner,
-                sleeps=[0.1] * RETRIES,
-                ttl=lock.TTL.LOCK_TTL_SECONDS_TO_START_JOB,
-            ):
-                # get all the pending jobs for the same unicity_id
-                waiting_jobs = JobDocument.objects(unicity_id=job.unicity_id).order_by("-created_at")
-                datetime = get_datetime()
-                # raise if any job has already been started for unicity_id
-                num_started_jobs = waiting_jobs(status=Status.STARTED).count()
-                if num_started_jobs > 0:
-                    if num_started_jobs > 1:
-                        logging.critical(f"job {job.unicity_id} has been started {num_started_jobs} times. Max is 1.")
-                    raise AlreadyStartedJobError(f"job {job.unicity_id} has been started by another worker")
-                # get the most recent one
-                first_job = waiting_jobs.first()
-                if not first_job:
-                    raise NoWaitingJobError(f"no waiting job could be found for {job.unicity_id}")
-                # start it
-                if not JobDocument.objects(pk=str(first_job.pk), status=Status.WAITING).update(
-                    started_at=datetime,
-                    status=Status.STARTED,
-                    write_concern={"w": "majority", "fsync": True},
-                    read_concern={"level": "majority"},
-                ):
-                    raise AlreadyStartedJobError(f"job {job.unicity_id} has been started by another worker")
-                update_metrics_for_type(
-                    dataset=first_job.dataset,
-                    job_type=first_job.type,
-                    previous_status=Status.WAITING,
-                    new_status=Status.STARTED,
-                    difficulty=first_job.difficulty,
+
+        def claim(session: ClientSession) -> dict[str, Any]:
+            try:
+                started_job_son = JobDocument._get_collection().find_one_and_update(
+                    {"unicity_id": job.unicity_id, "status": Status.WAITING.value},
+                    {"$set": {"started_at": get_datetime(), "status": Status.STARTED.value}},
+                    sort=[("created_at", DESCENDING)],
+                    return_document=ReturnDocument.AFTER,
+                    session=session,
                 )
-                # and delete the other waiting jobs, if any
-                self.delete_waiting_jobs_by_job_id(job_ids=[job.pk for job in waiting_jobs if job.pk != first_job.pk])
-                return first_job.reload()
-        except TimeoutError as err:
-            raise LockTimeoutError(
-                f"could not acquire the lock for job {job.unicity_id} after {RETRIES} retries."
-            ) from err
+            except DuplicateKeyError as err:
+                raise AlreadyStartedJobError(f"job {job.unicity_id} has been started by another worker") from err
+            if started_job_son is None:
+                raise NoWaitingJobError(f"no waiting job could be found for {job.unicity_id}")
+            increase_started_jobs_count(namespace=started_job_son["namespace"], session=session)
+            return started_job_son
+
+        # the transaction is committed with the same write concern (w: majority, journaled) as the previous update of
+        # the job, which was protected by a lock
+        started_job = JobDocument._from_son(run_in_queue_transaction(claim))
+        update_metrics_for_type(
+            dataset=started_job.dataset,
+            job_type=started_job.type,
+            previous_status=Status.WAITING,
+            new_status=Status.STARTED,
+            difficulty=started_job.difficulty,
+        )
+        # and delete the other waiting jobs, if any
+        if other_job_ids := [
+            other_job.pk
+            for other_job in JobDocument.objects(unicity_id=job.unicity_id, status=Status.WAITING).only("id")
+        ]:
+            self.delete_waiting_jobs_by_job_id(job_ids=other_job_ids)
+        return started_job
 
     def start_job(
         self,
@@ -581,8 +590,8 @@ class Queue:
     ) -> JobInfo:
         """Start the next job in the queue.
 
-        The job is moved from the waiting state to the started state. A lock is used to ensure that only one worker
-        can start a job at a time.
+        The job is moved from the waiting state to the started state, with an atomic update that fails if another
+        worker has already started a job with the same unicity_id.
 
         Args:
             difficulty_min: if not None, only jobs with a difficulty greater or equal to this value are considered.
@@ -592,7 +601,7 @@ class Queue:
             [`EmptyQueueError`]: if there is no job in the queue, within the limit of the maximum number of started jobs
                 for a dataset
             [`AlreadyStartedJobError`]: if a started job already exist for the same unicity_id
-            [`LockTimeoutError`]: if the lock cannot be acquired
+            [`NoWaitingJobError`]: if the waiting jobs for the unicity_id have disappeared in the meantime
 
         Returns:
             `JobInfo`: the job id, the type, the input arguments: dataset, revision, config and split
@@ -608,6 +617,88 @@ class Queue:
         started_job = self._start_newest_job_and_delete_others(job=next_waiting_job)
         return started_job.info()
 
+    def start_jobs(
+        self,
+        num_jobs: int,
+        difficulty_min: Optional[int] = None,
+        difficulty_max: Optional[int] = None,
+    ) -> list[JobInfo]:
+        """Start up to num_jobs jobs of the queue, in the order they would have been started by start_job.
+
+        It's meant for the workers that process quick jobs, to claim several jobs at once and process them in a row.
+        The jobs are claimed one by one, as in start_job. If an unexpected error occurs, the jobs already started are
+        released before the error is raised. The jobs are started immediately: the caller has to send heartbeats for
+        all of them, and to release the jobs it will not process (see release_job).
+
+        Args:
+            num_jobs (`int`): the maximum number of jobs to start.
+            difficulty_min: if not None, only jobs with a difficulty greater or equal to this value are considered.
+            difficulty_max: if not None, only jobs with a difficulty lower or equal to this value are considered.
+
+        Raises:
+            [`EmptyQueueError`]: if no job could be started because the queue is empty (see start_job)
+            [`AlreadyStartedJobError`]: if no job could be started because a started job already exist for the same
+              unicity_id
+            [`NoWaitingJobError`]: if no job could be started because the waiting jobs for the unicity_id have
+              disappeared in the meantime
+
+        Returns:
+            `list[JobInfo]`: the started jobs, at least one.
+        """
+        job_infos: list[JobInfo] = []
+        try:
+            for _ in range(num_jobs):
+                try:
+                    job_infos.append(self.start_job(difficulty_min=difficulty_min, difficulty_max=difficulty_max))
+                except (EmptyQueueError, AlreadyStartedJobError, NoWaitingJobError):
+                    if not job_infos:
+                        raise
+                    # the other jobs are being claimed by other workers, don't insist
+                    break
+        except Exception:
+            # don't leave the jobs already started without a worker
+            for job_info in job_infos:
+                try:
+                    self.release_job(job_id=job_info["job_id"])
+                except Exception:
+                    logging.exception(f"failed to release the job {job_info['job_id']}")
+            raise
+        return job_infos
+
+    def release_job(self, job_id: str) -> None:
+        """Put a started job back in the waiting state, so that another worker can start it.
+
+        It's used for the jobs started by start_jobs that the worker could not process in time. Nothing is done if the
+        job does not exist or is not started.
+
+        Args:
+            job_id (`str`): id of the job
+        """
+
+        def release(session: ClientSession) -> Optional[dict[str, Any]]:
+            released_job_son = JobDocument._get_collection().find_one_and_update(
+                {"_id": bson.ObjectId(job_id), "status": Status.STARTED.value},
+                {"$set": {"status": Status.WAITING.value}, "$unset": {"started_at": "", "last_heartbeat": ""}},
+                return_document=ReturnDocument.AFTER,
+                session=session,
+            )
+            if released_job_son is not None:
+                decrease_started_jobs_count(namespace=released_job_son["namespace"], session=session)
+            return released_job_son
+
+        released_job_son = run_in_queue_transaction(release)
+        if released_job_son is None:
+            logging.warning(f"job {job_id} could not be released: it does not exist or it's not started.")
+            return
+        job = JobDocument._from_son(released_job_son)
+        update_metrics_for_type(
+            dataset=job.dataset,
+            job_type=job.type,
+            previous_status=Status.STARTED,
+            new_status=Status.WAITING,
+            difficulty=job.difficulty,
+        )
+
     def get_job_with_id(self, job_id: str) -> JobDocument:
         """Get the job for a given job id.
 
@@ -702,7 +793,17 @@ class Queue:
                 finished_at=get_datetime(),
             )
         job_priority = job.priority
-        job.delete()
+
+        def delete(session: ClientSession) -> None:
+            # the started jobs count is decreased in the same transaction, and only if the job was still started
+            if (
+                JobDocument._get_collection()
+                .delete_one({"_id": job.pk, "status": Status.STARTED.value}, session=session)
+                .deleted_count
+            ):
+                decrease_started_jobs_count(namespace=job.namespace, session=session)
+
+        run_in_queue_transaction(delete)
         release_lock(key=job.unicity_id)
         if was_blocked:
             pending_jobs = self.get_pending_jobs_df(dataset=job.dataset)
@@ -853,6 +954,24 @@ class Queue:
             )
         }
 
+    def get_started_jobs_count_by_namespace(
+        self, session: Optional[ClientSession] = None
+    ) -> StartedJobsCountByNamespace:
+        """Count the number of started jobs by namespace.
+
+        Args:
+            session (`ClientSession`, *optional*): the session of the transaction, if any.
+
+        Returns:
+            an object with the number of started jobs by namespace. Only the namespaces with started jobs are included.
+        """
+        return {
+            count["_id"]: count["count"]
+            for count in JobDocument.objects(status=Status.STARTED).aggregate(
+                [{"$group": {"_id": "$namespace", "count": {"$sum": 1}}}], session=session
+            )
+        }
+
     def get_jobs_count_by_worker_size(self) -> JobsCountByWorkerSize:
         """Count the number of jobs by worker size.
 
@@ -18,6 +18,7 @@ from mongoengine.queryset.queryset import QuerySet
 
 from libcommon.constants import (
     LOCK_TTL_SECONDS_NO_OWNER,
+    LOCK_TTL_SECONDS_TO_BUILD_DUCKDB_INDEX,
     LOCK_TTL_SECONDS_TO_START_JOB,
     LOCK_TTL_SECONDS_TO_WRITE_ON_GIT_BRANCH,
     QUEUE_COLLECTION_LOCKS,
@@ -48,6 +49,7 @@ class QuerySetManager(Generic[U]):
 class _TTL(IntEnum):
     LOCK_TTL_SECONDS_TO_START_JOB = LOCK_TTL_SECONDS_TO_START_JOB
     LOCK_TTL_SECONDS_TO_WRITE_ON_GIT_BRANCH = LOCK_TTL_SECONDS_TO_WRITE_ON_GIT_BRANCH
+    LOCK_TTL_SECONDS_TO_BUILD_DUCKDB_INDEX = LOCK_TTL_SECONDS_TO_BUILD_DUCKDB_INDEX
 
 
 class Lock(Document):
@@ -128,21 +130,27 @@ class lock(contextlib.AbstractContextManager["lock"]):
         if ttl is not None and ttl not in list(self.TTL):
             raise ValueError(f"The TTL value is not supported by the TTL index. It should be one of {list(self.TTL)}")
 
+    def try_acquire(self) -> bool:
+        """Try to acquire the lock once, without sleeping. Returns True if the lock has been acquired."""
+        try:
+            Lock.objects(key=self.key, owner__in=[None, self.owner]).update(
+                upsert=True,
+                write_concern={"w": "majority", "fsync": True},
+                read_concern={"level": "majority"},
+                owner=self.owner,
+                updated_at=get_datetime(),
+                ttl=self.ttl,
+            )
+            return True
+        except NotUniqueError:
+            return False
+
     def acquire(self) -> None:
         for sleep in self.sleeps:
-            try:
-                Lock.objects(key=self.key, owner__in=[None, self.owner]).update(
-                    upsert=True,
-                    write_concern={"w": "majority", "fsync": True},
-                    read_concern={"level": "majority"},
-                    owner=self.owner,
-                    updated_at=get_datetime(),
-                    ttl=self.ttl,
-                )
+            if self.try_acquire():
                 return
-            except NotUniqueError:
-                logging.debug(f"Sleep {sleep}s to acquire lock '{self.key}' for owner='{self.owner}'")
-                time.sleep(sleep)
+            logging.debug(f"Sleep {sleep}s to acquire lock '{self.key}' for owner='{self.owner}'")
+            time.sleep(sleep)
         raise TimeoutError("lock couldn't be acquired")
 
     def release(self) -> None:
@@ -183,6 +191,32 @@ class lock(contextlib.AbstractContextManager["lock"]):
         key = json.dumps({"dataset": dataset, "branch": branch})
         return cls(key=key, owner=owner, sleeps=sleeps, ttl=_TTL.LOCK_TTL_SECONDS_TO_WRITE_ON_GIT_BRANCH)
 
+    @classmethod
+    def duckdb_index(
+        cls,
+        dataset: str,
+        revision: str,
+        config: str,
+        split: str,
+        owner: str,
+        sleeps: Sequence[float] = _default_sleeps,
+    ) -> "lock":
+        """
+        Lock the build of the duckdb index of a split, so that only one replica builds it
+
+        Args:
+            dataset (`str`): the dataset repository
+            revision (`str`): the revision of the dataset
+            config (`str`): the config name
+            split (`str`): the split name
+            owner (`str`): the id of the replica that builds the index
+            sleeps (`Sequence[float]`, *optional*): the time in seconds to sleep between each attempt to acquire the lock
+        """
+        key = json.dumps(
+            {"type": "duckdb-index", "dataset": dataset, "revision": revision, "config": config, "split": split}
+        )
+        return cls(key=key, owner=owner, sleeps=sleeps, ttl=_TTL.LOCK_TTL_SECONDS_TO_BUILD_DUCKDB_INDEX)
+
 
 def release_lock(key: str) -> None:
     """
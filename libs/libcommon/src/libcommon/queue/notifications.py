@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import contextlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from pymongo.change_stream import CollectionChangeStream
+from pymongo.errors import PyMongoError
+
+from libcommon.constants import DEFAULT_DIFFICULTY_MAX, DEFAULT_DIFFICULTY_MIN
+from libcommon.dtos import Status
+from libcommon.queue.jobs import JobDocument
+
+# maximum duration of a single request to the change stream, so that the timeout of wait() is respected
+MAX_AWAIT_TIME_MS = 1_000
+
+
+def _is_in_difficulty_range(difficulty: int, difficulty_min: Optional[int], difficulty_max: Optional[int]) -> bool:
+    return (difficulty_min is None or difficulty > difficulty_min) and (
+        difficulty_max is None or difficulty <= difficulty_max
+    )
+
+
+class WaitingJobsNotifier(ABC):
+    """
+    Wakes up the idle workers when a waiting job is added to the queue, instead of polling the queue.
+
+    Only the jobs within the difficulty range of the worker are notified (same convention as Queue.start_job: the
+    minimum is excluded, the maximum is included).
+
+    Args:
+        difficulty_min (`int`, *optional*): if not None, only jobs with a difficulty greater than this value are
+          notified.
+        difficulty_max (`int`, *optional*): if not None, only jobs with a difficulty lower or equal to this value are
+          notified.
+    """
+
+    def __init__(self, difficulty_min: Optional[int] = None, difficulty_max: Optional[int] = None) -> None:
+        self.difficulty_min = difficulty_min
+        self.difficulty_max = difficulty_max
+
+    @abstractmethod
+    def wait(self, timeout_seconds: float) -> bool:
+        """Wait until a waiting job is added to the queue, or until the timeout.
+
+        Args:
+            timeout_seconds (`float`): the maximum duration to wait, in seconds.
+
+        Returns:
+            `bool`: True if a waiting job has been added, False if the timeout has been reached.
+        """
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MongoWaitingJobsNotifier(WaitingJobsNotifier):
+    """
+    Notifier based on a change stream on the jobs collection (requires a replica set).
+
+    The change stream is opened on the first call to wait(), and kept open between the calls, so that the jobs added
+    while the worker is busy are notified on the next call. If the change stream cannot be used, wait() falls back to
+    sleeping until the timeout.
+
+    Only the inserted waiting jobs, and the updates that set the status to waiting (jobs released by a worker), are
+    notified. The documents are not looked up: the difficulty range is checked for the inserted jobs only, since the
+    update of a released job does not contain its difficulty. A released job thus wakes up all the idle workers,
+    which is acceptable since the jobs are rarely released.
+    """
+
+    def __init__(self, difficulty_min: Optional[int] = None, difficulty_max: Optional[int] = None) -> None:
+        super().__init__(difficulty_min=difficulty_min, difficulty_max=difficulty_max)
+        self._change_stream: Optional[CollectionChangeStream[Any]] = None
+
+    def _get_pipeline(self) -> list[dict[str, Any]]:
+        insert_match: dict[str, Any] = {
+            "operationType": "insert",
+            "fullDocument.status": Status.WAITING.value,
+        }
+        difficulty_filter: dict[str, int] = {}
+        if self.difficulty_min is not None and self.difficulty_min > DEFAULT_DIFFICULTY_MIN:
+            difficulty_filter["$gt"] = self.difficulty_min
+        if self.difficulty_max is not None and self.difficulty_max < DEFAULT_DIFFICULTY_MAX:
+            difficulty_filter["$lte"] = self.difficulty_max
+        if difficulty_filter:
+            insert_match["fullDocument.difficulty"] = difficulty_filter
+        update_match: dict[str, Any] = {
+            "operationType": "update",
+            "updateDescription.updatedFields.status": Status.WAITING.value,
+        }
+        return [{"$match": {"$or": [insert_match, update_match]}}, {"$project": {"_id": 1}}]
+
+    def _get_change_stream(self) -> CollectionChangeStream[Any]:
+        if self._change_stream is None:
+            self._change_stream = JobDocument._get_collection().watch(
+                pipeline=self._get_pipeline(), max_await_time_ms=MAX_AWAIT_TIME_MS
+            )
+        return self._change_stream
+
+    def wait(self, timeout_seconds: float) -> bool:
+        deadline = time.monotonic() + timeout_seconds
+        try:
+            change_stream = self._get_change_stream()
+            while True:
+                if change_stream.try_next() is not None:
+                    return True
+                if time.monotonic() >= deadline:
+                    return False
+        except PyMongoError as err:
+            logging.warning(f"the change stream on the jobs collection failed, fall back to polling: {err}")
+            self.close()
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            return False
+
+    def close(self) -> None:
+        if self._change_stream is not None:
+            with contextlib.suppress(PyMongoError):
+                self._change_stream.close()
+            self._change_stream = None
+
+
+class LocalWaitingJobsNotifier(WaitingJobsNotifier):
+    """
+    In-process notifier, where the waiting jobs are notified explicitly with notify(). Meant for the tests.
+    """
+
+    def __init__(self, difficulty_min: Optional[int] = None, difficulty_max: Optional[int] = None) -> None:
+        super().__init__(difficulty_min=difficulty_min, difficulty_max=difficulty_max)
+        self._num_notifications = 0
+        self._condition = threading.Condition()
+
+    def notify(self, difficulty: int) -> None:
+        if not _is_in_difficulty_range(
+            difficulty=difficulty, difficulty_min=self.difficulty_min, difficulty_max=self.difficulty_max
+        ):
+            return
+        with self._condition:
+            self._num_notifications += 1
+            self._condition.notify_all()
+
+    def wait(self, timeout_seconds: float) -> bool:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._num_notifications > 0, timeout=timeout_seconds):
+                return False
+            self._num_notifications -= 1
+            return True
@@ -0,0 +1,167 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import logging
+import sys
+import types
+from collections.abc import Callable, Mapping
+from typing import Generic, Optional, TypeVar
+
+from mongoengine import Document
+from mongoengine.connection import get_connection
+from mongoengine.fields import IntField, StringField
+from mongoengine.queryset.queryset import QuerySet
+from pymongo.client_session import ClientSession
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+
+from libcommon.constants import (
+    QUEUE_COLLECTION_STARTED_JOBS_COUNTS,
+    QUEUE_MONGOENGINE_ALIAS,
+    STARTED_JOBS_COUNTS_CACHE_TTL_SECONDS,
+)
+from libcommon.memory_cache import MemoryLRUCache
+
+# START monkey patching ### hack ###
+# see https://github.com/sbdchd/mongo-types#install
+U = TypeVar("U", bound=Document)
+
+
+def no_op(self, _):  # type: ignore
+    return self
+
+
+QuerySet.__class_getitem__ = types.MethodType(no_op, QuerySet)
+
+
+class QuerySetManager(Generic[U]):
+    def __get__(self, instance: object, cls: type[U]) -> QuerySet[U]:
+        return QuerySet(cls, cls._get_collection())
+
+
+# END monkey patching ### hack ###
+
+StartedJobsCountByNamespace = Mapping[str, int]
+T = TypeVar("T")
+
+
+class StartedJobsCountDocument(Document):
+    """Number of started jobs for a namespace, used to select the next job to start (fair scheduling).
+
+    The counter is increased when a job is started, and decreased when it's finished or released, in the same
+    transaction as the change of the job (see run_in_queue_transaction). It is recomputed periodically from the jobs
+    (see the cache_maintenance job), to fix a possible drift, e.g. with the jobs started by a previous version.
+
+    Args:
+        namespace (`str`): The dataset namespace (user or organization) if any, else the dataset name.
+        count (`int`): The number of started jobs for the namespace.
+    """
+
+    meta = {
+        "collection": QUEUE_COLLECTION_STARTED_JOBS_COUNTS,
+        "db_alias": QUEUE_MONGOENGINE_ALIAS,
+        "indexes": [("count", "namespace")],
+    }
+    namespace = StringField(primary_key=True)
+    count = IntField(required=True, default=0)
+
+    objects = QuerySetManager["StartedJobsCountDocument"]()
+
+
+# The counts are read on every attempt to start a job. They are cached for a short time in the process, since a
+# slightly outdated view of the started jobs is acceptable for fair scheduling (the unicity of the started jobs is
+# guaranteed by the database). The cache is cleared when the process starts or finishes a job.
+_started_jobs_counts_cache: MemoryLRUCache[str, StartedJobsCountByNamespace] = MemoryLRUCache(
+    name="started_jobs_counts",
+    max_bytes=10_000_000,
+    get_size=sys.getsizeof,
+    max_entries=1,
+    ttl_seconds=STARTED_JOBS_COUNTS_CACHE_TTL_SECONDS,
+)
+_CACHE_KEY = "all"
+
+
+def run_in_queue_transaction(callback: Callable[[ClientSession], T]) -> T:
+    """Run a callback in a transaction on the queue database.
+
+    It's used to update a job and the started jobs count of its namespace atomically. The callback can be called
+    several times, if the transaction is retried (e.g. on a write conflict), and it must pass the session to all
+    its operations.
+
+    Args:
+        callback (`Callable[[ClientSession], T]`): the function to run in the transaction.
+
+    Returns:
+        `T`: the value returned by the callback.
+    """
+    with get_connection(QUEUE_MONGOENGINE_ALIAS).start_session() as session:
+        return session.with_transaction(
+            callback,
+            read_concern=ReadConcern(level="snapshot"),
+            # j=True is the equivalent of fsync=True, which is not accepted for a transaction
+            write_concern=WriteConcern(w="majority", j=True),
+        )
+
+
+def _update_started_jobs_count(namespace: str, increase_by: int, session: Optional[ClientSession]) -> None:
+    if increase_by >= 0:
+        StartedJobsCountDocument._get_collection().update_one(
+            {"_id": namespace}, {"$inc": {"count": increase_by}}, upsert=True, session=session
+        )
+    else:
+        # the counter never goes below zero, e.g. for a job started before the counter had been initialized
+        StartedJobsCountDocument._get_collection().update_one(
+            {"_id": namespace, "count": {"$gte": -increase_by}}, {"$inc": {"count": increase_by}}, session=session
+        )
+    _started_jobs_counts_cache.clear()
+
+
+def increase_started_jobs_count(namespace: str, session: Optional[ClientSession] = None) -> None:
+    _update_started_jobs_count(namespace=namespace, increase_by=1, session=session)
+
+
+def decrease_started_jobs_count(namespace: str, session: Optional[ClientSession] = None) -> None:
+    _update_started_jobs_count(namespace=namespace, increase_by=-1, session=session)
+
+
+def replace_started_jobs_counts(count_by_namespace: StartedJobsCountByNamespace, session: ClientSession) -> None:
+    """Replace the started jobs counts with the given ones.
+
+    Only the counters that have changed are written, to limit the write conflicts with the workers. It must be run in a
+    transaction (see run_in_queue_transaction), with the same session as the one used to count the started jobs, so
+    that the concurrent updates of the counters are not lost.
+
+    Args:
+        count_by_namespace (`StartedJobsCountByNamespace`): the number of started jobs by namespace.
+        session (`ClientSession`): the session of the transaction.
+    """
+    collection = StartedJobsCountDocument._get_collection()
+    old_count_by_namespace = {
+        counter["_id"]: counter["count"] for counter in collection.find({}, {"count": 1}, session=session)
+    }
+    for namespace in old_count_by_namespace.keys() - count_by_namespace.keys():
+        collection.delete_one({"_id": namespace}, session=session)
+        logging.info(f"{namespace=} has been deleted")
+    for namespace, count in count_by_namespace.items():
+        if old_count_by_namespace.get(namespace) != count:
+            collection.update_one({"_id": namespace}, {"$set": {"count": count}}, upsert=True, session=session)
+            logging.info(f"{namespace=}: {count=} has been inserted")
+    _started_jobs_counts_cache.clear()
+
+
+def get_started_jobs_counts() -> StartedJobsCountByNamespace:
+    """Return the number of started jobs for every namespace that has started jobs.
+
+    The result is cached in the process for STARTED_JOBS_COUNTS_CACHE_TTL_SECONDS seconds.
+    """
+    return _started_jobs_counts_cache.get_or_compute(
+        _CACHE_KEY,
+        lambda: {
+            counter["_id"]: counter["count"]
+            for counter in StartedJobsCountDocument.objects(count__gt=0).only("count").as_pymongo()
+        },
+    )
+
+
+def clear_started_jobs_counts_cache() -> None:
+    _started_jobs_counts_cache.clear()
@@ -6,6 +6,7 @@ from .jobs import JobDocument
 from .lock import Lock
 from .metrics import JobTotalMetricDocument, WorkerSizeJobsCountDocument
 from .past_jobs import PastJobDocument
+from .started_jobs_counts import StartedJobsCountDocument, clear_started_jobs_counts_cache
 
 
 # only for the tests
@@ -17,3 +18,5 @@ def _clean_queue_database() -> None:
     Lock.drop_collection()  # type: ignore
     PastJobDocument.drop_collection()  # type: ignore
     DatasetBlockageDocument.drop_collection()  # type: ignore
+    StartedJobsCountDocument.drop_collection()  # type: ignore
+    clear_started_jobs_counts_cache()
@@ -0,0 +1,304 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import asyncio
+import bisect
+import os
+from collections.abc import Iterable
+from typing import Any, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fsspec.asyn import sync
+from fsspec.implementations.http import HTTPFileSystem
+
+from libcommon.disk_block_cache import DiskBlockCache
+from libcommon.prometheus import RANGE_READS_BYTES_TOTAL, RANGE_READS_REQUESTS_TOTAL
+
+# start (inclusive) and end (exclusive) offsets in a file
+ByteRange = tuple[int, int]
+DEFAULT_MAX_CONCURRENT_REQUESTS = 16
+
+
+def get_column_chunks_byte_ranges(
+    row_group_metadata: pq.RowGroupMetaData, columns: Optional[Iterable[str]] = None
+) -> list[ByteRange]:
+    """Get the byte ranges of the column chunks of a row group, from the parquet metadata.
+
+    Args:
+        row_group_metadata (`pq.RowGroupMetaData`): The metadata of the row group.
+        columns (`Iterable[str]`, *optional*): The top-level columns to read. If None, all the column chunks are
+          returned.
+
+    Returns:
+        `list[ByteRange]`: The byte ranges of the column chunks, in the order of the metadata.
+    """
+    columns = None if columns is None else set(columns)
+    byte_ranges: list[ByteRange] = []
+    for column_index in range(row_group_metadata.num_columns):
+        column_chunk_metadata = row_group_metadata.column(column_index)
+        path_in_schema = column_chunk_metadata.path_in_schema
+        # the path of a nested column starts with the name of the top-level column
+        if columns is not None and path_in_schema not in columns and path_in_schema.split(".")[0] not in columns:
+            continue
+        start = column_chunk_metadata.data_page_offset
+        if column_chunk_metadata.has_dictionary_page and 0 < column_chunk_metadata.dictionary_page_offset < start:
+            start = column_chunk_metadata.dictionary_page_offset
+        byte_ranges.append((start, start + column_chunk_metadata.total_compressed_size))
+    return byte_ranges
+
+
+def merge_byte_ranges(byte_ranges: Iterable[ByteRange], max_hole_size: int, max_range_size: int) -> list[ByteRange]:
+    """Merge the byte ranges that are separated by at most `max_hole_size` bytes.
+
+    Overlapping and adjacent ranges are always merged, unless the merged range would be bigger than `max_range_size`
+    (a range that is already bigger is kept as is).
+
+    Args:
+        byte_ranges (`Iterable[ByteRange]`): The byte ranges, in any order.
+        max_hole_size (`int`): The maximum number of unneeded bytes between two ranges that are merged.
+        max_range_size (`int`): The maximum size of a merged range.
+
+    Returns:
+        `list[ByteRange]`: The sorted merged byte ranges.
+    """
+    merged_byte_ranges: list[ByteRange] = []
+    for start, end in sorted(byte_ranges):
+        if merged_byte_ranges:
+            last_start, last_end = merged_byte_ranges[-1]
+            if start - last_end <= max_hole_size and max(end, last_end) - last_start <= max_range_size:
+                merged_byte_ranges[-1] = (last_start, max(end, last_end))
+                continue
+        merged_byte_ranges.append((start, end))
+    return merged_byte_ranges
+
+
+class PrefetchedRangesFile:
+    """
+    A read-only file object that serves the reads from prefetched byte ranges, and falls back to the wrapped file.
+
+    It implements `read_buffer`, so that pyarrow gets the prefetched bytes without copying them.
+
+    If a disk block cache is passed, the reads that are not prefetched are served from the cache when possible, and the
+    fetched blocks are stored in the cache.
+
+    Args:
+        file (`Any`): The wrapped file object (e.g. an `HTTPFile`), used for the reads that are not prefetched.
+        size (`int`): The size of the file, in bytes.
+        disk_block_cache (`DiskBlockCache`, *optional*): The disk block cache.
+        cache_key (`str`, *optional*): The key of the file in the disk block cache.
+    """
+
+    def __init__(self, file: Any, size: int, disk_block_cache: Optional[DiskBlockCache] = None, cache_key: str = ""):
+        self.file = file
+        self.size = size
+        self.disk_block_cache = disk_block_cache
+        self.cache_key = cache_key
+        self.position = 0
+        # sorted by start offset
+        self._starts: list[int] = []
+        self._buffers: list[tuple[int, memoryview]] = []
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.file.closed)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            self.position = offset
+        elif whence == os.SEEK_CUR:
+            self.position += offset
+        elif whence == os.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self.position
+
+    def close(self) -> None:
+        self.file.close()
+
+    def add_byte_ranges(self, byte_ranges: dict[ByteRange, bytes]) -> None:
+        for (start, _), data in byte_ranges.items():
+            index = bisect.bisect_left(self._starts, start)
+            self._starts.insert(index, start)
+            self._buffers.insert(index, (start, memoryview(data)))
+
+    def has_byte_range(self, byte_range: ByteRange) -> bool:
+        return self._get_prefetched(*byte_range) is not None
+
+    def _get_prefetched(self, start: int, end: int) -> Optional[memoryview]:
+        index = bisect.bisect_right(self._starts, start) - 1
+        if index < 0:
+            return None
+        buffer_start, buffer = self._buffers[index]
+        if end > buffer_start + len(buffer):
+            return None
+        return buffer[start - buffer_start : end - buffer_start]  # noqa: E203
+
+    def read_buffer(self, nbytes: int = -1) -> pa.Buffer:
+        end = self.size if nbytes < 0 else min(self.position + nbytes, self.size)
+        prefetched = self._get_prefetched(self.position, end)
+        if prefetched is None:
+            if self.disk_block_cache is None:
+                data = self._read_file(self.position, end)
+            else:
+                data = self.disk_block_cache.read_range(
+                    self.cache_key, self.position, end, size=self.size, fetch=self._read_file
+                )
+            prefetched = memoryview(data)
+        self.position += len(prefetched)
+        return pa.py_buffer(prefetched)
+
+    def _read_file(self, start: int, end: int) -> bytes:
+        RANGE_READS_REQUESTS_TOTAL.labels(kind="direct").inc()
+        self.file.seek(start)
+        data: bytes = self.file.read(end - start)
+        RANGE_READS_BYTES_TOTAL.labels(kind="direct").inc(len(data))
+        return data
+
+    def read(self, nbytes: int = -1) -> bytes:
+        data: bytes = self.read_buffer(nbytes).to_pybytes()
+        return data
+
+
+# the file object that receives the data, its URL, and the byte range to request
+RangeRequest = tuple[PrefetchedRangesFile, str, ByteRange]
+
+
+async def _fetch_byte_ranges(
+    httpfs: HTTPFileSystem, requests: list[tuple[str, ByteRange]], max_concurrent_requests: int
+) -> list[bytes]:
+    # created here, on the event loop of the filesystem
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+    async def fetch_byte_range(url: str, start: int, end: int) -> bytes:
+        async with semaphore:
+            data: bytes = await httpfs._cat_file(url, start=start, end=end)
+            return data
+
+    results: list[bytes] = await asyncio.gather(
+        *(fetch_byte_range(url, start, end) for url, (start, end) in requests)
+    )
+    return results
+
+
+class RangeReadsPlanner:
+    """
+    Plan the HTTP range requests needed to read row groups from remote parquet files, and send them concurrently (at
+    most `max_concurrent_requests` at a time, for each call).
+
+    The byte ranges of the column chunks to read are merged when they are separated by at most `max_hole_size` bytes
+    (even across row groups), so that a page of rows that spans several small row groups needs only a few round trips.
+
+    If the files have a disk block cache, the merged ranges that are already in the cache are not requested, and the
+    others are extended to whole blocks, and stored in the cache once fetched.
+
+    Args:
+        max_hole_size (`int`): The maximum number of unneeded bytes between two ranges that are merged.
+        max_range_size (`int`): The maximum size of a merged range, in bytes.
+        max_concurrent_requests (`int`, *optional*): The maximum number of range requests in flight for a call to
+          `fetch` or `prefetch`. Defaults to 16.
+    """
+
+    def __init__(
+        self, max_hole_size: int, max_range_size: int, max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS
+    ):
+        if max_concurrent_requests < 1:
+            raise ValueError("max_concurrent_requests must be at least 1")
+        self.max_hole_size = max_hole_size
+        self.max_range_size = max_range_size
+        self.max_concurrent_requests = max_concurrent_requests
+
+    def plan(
+        self, files_byte_ranges: Iterable[tuple[PrefetchedRangesFile, str, list[ByteRange]]]
+    ) -> list[RangeRequest]:
+        """Plan the range requests needed to read byte ranges of files.
+
+        The merged ranges that are found in the disk block cache are added to the files directly, without a request.
+
+        Args:
+            files_byte_ranges (`Iterable[tuple[PrefetchedRangesFile, str, list[ByteRange]]]`): For each file, the file
+              object that receives the data, its URL, and the byte ranges to read. The ranges that are already
+              prefetched are ignored.
+
+        Returns:
+            `list[RangeRequest]`: The range requests to send.
+        """
+        requests: list[RangeRequest] = []
+        for file, url, byte_ranges in files_byte_ranges:
+            for byte_range in merge_byte_ranges(
+                [byte_range for byte_range in byte_ranges if not file.has_byte_range(byte_range)],
+                max_hole_size=self.max_hole_size,
+                max_range_size=self.max_range_size,
+            ):
+                if file.disk_block_cache is not None:
+                    cached_data = file.disk_block_cache.get_range(file.cache_key, *byte_range)
+                    if cached_data is not None:
+                        file.add_byte_ranges({byte_range: cached_data})
+                        continue
+                    byte_range = file.disk_block_cache.get_aligned_range(*byte_range, size=file.size)
+                requests.append((file, url, byte_range))
+        return requests
+
+    async def fetch(self, httpfs: HTTPFileSystem, requests: list[RangeRequest]) -> list[bytes]:
+        """Send the range requests concurrently, on the event loop and session of the filesystem.
+
+        It must be awaited from an asyncio event loop, which is not blocked while the requests are in flight. If the
+        task is cancelled, the requests are cancelled too.
+        """
+        if not requests:
+            return []
+        future = asyncio.run_coroutine_threadsafe(
+            _fetch_byte_ranges(
+                httpfs, [(url, byte_range) for _, url, byte_range in requests], self.max_concurrent_requests
+            ),
+            httpfs.loop,
+        )
+        results: list[bytes] = await asyncio.wrap_future(future)
+        return results
+
+    def store(self, requests: list[RangeRequest], results: list[bytes]) -> None:
+        """Add the fetched data to the files, and to their disk block cache."""
+        for (file, _, byte_range), data in zip(requests, results):
+            file.add_byte_ranges({byte_range: data})
+            if file.disk_block_cache is not None:
+                file.disk_block_cache.put_range(file.cache_key, byte_range[0], data, size=file.size)
+        RANGE_READS_REQUESTS_TOTAL.labels(kind="prefetch").inc(len(requests))
+        RANGE_READS_BYTES_TOTAL.labels(kind="prefetch").inc(sum(len(data) for data in results))
+
+    def prefetch(
+        self, httpfs: HTTPFileSystem, files_byte_ranges: Iterable[tuple[PrefetchedRangesFile, str, list[ByteRange]]]
+    ) -> None:
+        """Fetch the byte ranges of the files concurrently, on the event loop and session of the filesystem.
+
+        It blocks until the data is received. See `plan`, `fetch` and `store` to send the requests from an event loop.
+
+        Args:
+            httpfs (`HTTPFileSystem`): The filesystem used to send the requests.
+            files_byte_ranges (`Iterable[tuple[PrefetchedRangesFile, str, list[ByteRange]]]`): For each file, the file
+              object that receives the data, its URL, and the byte ranges to read. The ranges that are already
+              prefetched are ignored.
+        """
+        requests = self.plan(files_byte_ranges)
+        if not requests:
+            return
+        results = sync(
+            httpfs.loop,
+            _fetch_byte_ranges,
+            httpfs,
+            [(url, byte_range) for _, url, byte_range in requests],
+            self.max_concurrent_requests,
+        )
+        self.store(requests, results)
@@ -16,6 +16,7 @@ from libcommon.constants import (
     DUCKDB_INDEX_CACHE_APPNAME,
     HF_DATASETS_CACHE_APPNAME,
     PARQUET_METADATA_CACHE_APPNAME,
+    ROWS_INDEX_DISK_CACHE_APPNAME,
 )
 
 StrPath = Union[str, PathLike[str]]
@@ -70,6 +71,20 @@ def init_duckdb_index_cache_dir(directory: Optional[StrPath] = None) -> StrPath:
     return init_dir(directory, appname=DUCKDB_INDEX_CACHE_APPNAME)
 
 
+def init_rows_index_disk_cache_dir(directory: Optional[StrPath] = None) -> StrPath:
+    """Initialize the directory of the disk block cache of the rows index.
+
+    If directory is None, it will be set to the default cache location on the machine.
+
+    Args:
+        directory (`StrPath`, *optional*): The directory to initialize. Defaults to None.
+
+    Returns:
+        `StrPath`: The directory.
+    """
+    return init_dir(directory, appname=ROWS_INDEX_DISK_CACHE_APPNAME)
+
+
 def init_hf_datasets_cache_dir(directory: Optional[StrPath] = None) -> StrPath:
     """Initialize the cache directory for the datasets library.
 
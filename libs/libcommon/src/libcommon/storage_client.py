@@ -3,6 +3,7 @@
 import logging
 from typing import Optional, Union
 from urllib import parse
+from uuid import uuid4
 
 import fsspec
 from fsspec.implementations.local import LocalFileSystem
@@ -82,6 +83,20 @@ class StorageClient:
     def exists(self, path: str) -> bool:
         return bool(self._fs.exists(self.get_full_path(path)))
 
+    def upload(self, local_path: str, path: str) -> None:
+        """Upload a local file. The file is written atomically: it's never seen partially written."""
+        full_path = self.get_full_path(path)
+        if self.protocol == "file":
+            # the objects written to S3 only appear once complete, but the local files must be renamed
+            tmp_path = f"{full_path}.{uuid4().hex}.tmp"
+            self._fs.put_file(local_path, tmp_path)
+            self._fs.mv(tmp_path, full_path)
+        else:
+            self._fs.put_file(local_path, full_path)
+
+    def download(self, path: str, local_path: str) -> None:
+        self._fs.get_file(self.get_full_path(path), local_path)
+
     def get_url(self, path: str, revision: str) -> str:
         return self.prepare_url(self.get_unprepared_url(path), revision=revision)
 
@@ -507,6 +507,22 @@ def get_cell_value(
         raise TypeError("could not determine the type of the data cell.")
 
 
+def has_asset_feature(feature: FeatureType) -> bool:
+    """Check if the feature contains an Image, Audio, Video or Pdf feature, at any depth.
+
+    The cells of the other features are returned as is by get_cell_value().
+    """
+    found = False
+
+    def check(subfeature: FeatureType) -> None:
+        nonlocal found
+        if isinstance(subfeature, (Image, Audio, Video, Pdf)):
+            found = True
+
+    _visit(feature, check)
+    return found
+
+
 # in JSON, dicts do not carry any order, so we need to return a list
 #
 # > An object is an *unordered* collection of zero or more name/value pairs, where a name is a string and a value
@@ -1,9 +1,13 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright 2022 The HuggingFace Authors.
 
-from os import makedirs
+import contextlib
+import os
+import threading
 from pathlib import Path
 
+import numpy as np
+import numpy.typing as npt
 import pyarrow.parquet as pq
 
 from libcommon.constants import DATASET_SEPARATOR
@@ -11,13 +15,26 @@ from libcommon.storage import StrPath
 
 PARQUET_METADATA_DIR_MODE = 0o755
 
+ROW_GROUPS_INDEX_FILENAME = "row_groups_index.npy"
+# The row groups index of a split is an int64 array with one column per row group (in the order of the split's
+# parquet files, sorted by filename), and one row per field:
+# - the index of the parquet file in the split
+ROW_GROUPS_INDEX_FILE = 0
+# - the index of the row group in the parquet file
+ROW_GROUPS_INDEX_ROW_GROUP = 1
+# - the cumulative number of rows at the end of the row group, in the split
+ROW_GROUPS_INDEX_ROW_END = 2
+# - the uncompressed size of the row group, in bytes
+ROW_GROUPS_INDEX_UNCOMPRESSED_SIZE = 3
+ROW_GROUPS_INDEX_NUM_FIELDS = 4
+
 
 def create_parquet_metadata_dir(
     dataset: str, config: str, split: str, parquet_metadata_directory: StrPath
 ) -> tuple[Path, str]:
     dir_path = Path(parquet_metadata_directory).resolve() / dataset / DATASET_SEPARATOR / config / split
     parquet_metadata_dir_subpath = f"{dataset}/{DATASET_SEPARATOR}/{config}/{split}"
-    makedirs(dir_path, PARQUET_METADATA_DIR_MODE, exist_ok=True)
+    os.makedirs(dir_path, PARQUET_METADATA_DIR_MODE, exist_ok=True)
     return dir_path, parquet_metadata_dir_subpath
 
 
@@ -41,3 +58,55 @@ def create_parquet_metadata_file(
         parquet_file_metadata.write_metadata_file(parquet_metadata_file_path)
     parquet_metadata_subpath = f"{parquet_metadata_dir_subpath}/{filename}"
     return parquet_metadata_subpath
+
+
+def create_row_groups_index(parquet_files_metadata: list[pq.FileMetaData]) -> npt.NDArray[np.int64]:
+    """
+    Create the row groups index of a split, from the metadata of its parquet files.
+
+    Args:
+        parquet_files_metadata (`list[pq.FileMetaData]`): The metadata of the split's parquet files, sorted by filename.
+
+    Returns:
+        `np.ndarray`: An int64 array of shape (ROW_GROUPS_INDEX_NUM_FIELDS, number of row groups in the split).
+    """
+    columns: list[tuple[int, int, int, int]] = []
+    num_rows = 0
+    for file_id, parquet_file_metadata in enumerate(parquet_files_metadata):
+        for row_group_id in range(parquet_file_metadata.num_row_groups):
+            row_group_metadata = parquet_file_metadata.row_group(row_group_id)
+            num_rows += row_group_metadata.num_rows
+            columns.append((file_id, row_group_id, num_rows, row_group_metadata.total_byte_size))
+    return np.array(columns, dtype=np.int64).reshape(-1, ROW_GROUPS_INDEX_NUM_FIELDS).T.copy()
+
+
+def create_row_groups_index_file(
+    dataset: str,
+    config: str,
+    split: str,
+    parquet_files_metadata: list[pq.FileMetaData],
+    parquet_metadata_directory: StrPath,
+) -> str:
+    dir_path, parquet_metadata_dir_subpath = create_parquet_metadata_dir(
+        dataset=dataset,
+        config=config,
+        split=split,
+        parquet_metadata_directory=parquet_metadata_directory,
+    )
+    row_groups_index_path = dir_path / ROW_GROUPS_INDEX_FILENAME
+    # the index is memory-mapped by the API services: write a temporary file and replace the index atomically, so
+    # that a reader never sees a truncated or partially written file
+    tmp_path = f"{row_groups_index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, create_row_groups_index(parquet_files_metadata))
+        os.replace(tmp_path, row_groups_index_path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+    return f"{parquet_metadata_dir_subpath}/{ROW_GROUPS_INDEX_FILENAME}"
+
+
+def load_row_groups_index(row_groups_index_path: StrPath) -> npt.NDArray[np.int64]:
+    """Load the row groups index of a split as a read-only memory-mapped array."""
+    return np.load(row_groups_index_path, mmap_mode="r")  # type: ignore[no-any-return]
@@ -0,0 +1,138 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+"""Benchmark of the claim of the jobs (Queue.start_job) by concurrent workers.
+
+Each worker claims a job, finishes it immediately, and starts again until the queue is empty. The number of claims
+per second, and the latencies of the claims, are reported for each number of workers.
+
+Run it against the local mongo database (see `make benchmark-queue`):
+
+    poetry run python tests/queue/benchmark_start_job.py --mongo-url mongodb://localhost:27020 --num-workers 1 8 32
+
+or against mongomock (if installed), with only one worker since mongomock is not thread-safe. It only checks the
+protocol and measures the overhead on the client side:
+
+    poetry run python tests/queue/benchmark_start_job.py --mongo-url mongomock://localhost --num-workers 1
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from mongoengine.connection import connect, disconnect
+
+from libcommon.constants import QUEUE_MONGOENGINE_ALIAS
+from libcommon.dtos import JobInfo, Priority
+from libcommon.queue.jobs import AlreadyStartedJobError, EmptyQueueError, Queue
+from libcommon.queue.utils import _clean_queue_database
+
+DATABASE = "dataset_viewer_queue_benchmark"
+JOB_TYPE = "benchmark"
+DIFFICULTY = 50
+
+
+@dataclass
+class WorkerStats:
+    claim_durations: list[float] = field(default_factory=list)
+    num_already_started: int = 0
+
+
+def connect_to_queue(mongo_url: str) -> None:
+    if mongo_url.startswith("mongomock://"):
+        import mongomock  # not a dependency of libcommon
+
+        connect(
+            db=DATABASE,
+            alias=QUEUE_MONGOENGINE_ALIAS,
+            host=mongo_url.replace("mongomock://", "mongodb://"),
+            mongo_client_class=mongomock.MongoClient,
+        )
+    else:
+        connect(db=DATABASE, alias=QUEUE_MONGOENGINE_ALIAS, host=mongo_url)
+
+
+def create_jobs(num_jobs: int, num_namespaces: int, num_duplicates: int) -> None:
+    Queue().create_jobs(
+        [
+            JobInfo(
+                job_id="not used",
+                type=JOB_TYPE,
+                params={
+                    "dataset": f"namespace{i % num_namespaces}/dataset{i}",
+                    "revision": "revision",
+                    "config": None,
+                    "split": None,
+                },
+                priority=Priority.LOW,
+                difficulty=DIFFICULTY,
+                started_at=None,
+            )
+            for i in range(num_jobs)
+            for _ in range(num_duplicates)
+        ]
+    )
+
+
+def run_worker() -> WorkerStats:
+    queue = Queue()
+    stats = WorkerStats()
+    while True:
+        start = time.perf_counter()
+        try:
+            job_info = queue.start_job()
+        except EmptyQueueError:
+            return stats
+        except AlreadyStartedJobError:
+            stats.num_already_started += 1
+            continue
+        stats.claim_durations.append(time.perf_counter() - start)
+        queue.finish_job(job_id=job_info["job_id"])
+
+
+def benchmark(num_workers: int, num_jobs: int, num_namespaces: int, num_duplicates: int) -> None:
+    _clean_queue_database()
+    create_jobs(num_jobs=num_jobs, num_namespaces=num_namespaces, num_duplicates=num_duplicates)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        all_stats = list(executor.map(lambda _: run_worker(), range(num_workers)))
+    elapsed = time.perf_counter() - start
+    durations = sorted(duration for stats in all_stats for duration in stats.claim_durations)
+    if len(durations) != num_jobs:
+        raise RuntimeError(f"{len(durations)} jobs have been claimed, expected {num_jobs}")
+    print(
+        f"{num_workers=}: {len(durations) / elapsed:.1f} claims/s,"
+        f" p50={statistics.median(durations) * 1_000:.2f}ms,"
+        f" p99={durations[int(len(durations) * 0.99)] * 1_000:.2f}ms,"
+        f" already_started={sum(stats.num_already_started for stats in all_stats)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the claim of the jobs by concurrent workers.")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27020")
+    parser.add_argument("--num-workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--num-jobs", type=int, default=2_000, help="number of distinct jobs (unicity_id)")
+    parser.add_argument("--num-namespaces", type=int, default=100)
+    parser.add_argument("--num-duplicates", type=int, default=2, help="number of waiting jobs per unicity_id")
+    args = parser.parse_args()
+    if args.mongo_url.startswith("mongomock://") and any(num_workers > 1 for num_workers in args.num_workers):
+        parser.error("mongomock is not thread-safe, use --num-workers 1")
+    connect_to_queue(args.mongo_url)
+    try:
+        for num_workers in args.num_workers:
+            benchmark(
+                num_workers=num_workers,
+                num_jobs=args.num_jobs,
+                num_namespaces=args.num_namespaces,
+                num_duplicates=args.num_duplicates,
+            )
+    finally:
+        _clean_queue_database()
+        disconnect(alias=QUEUE_MONGOENGINE_ALIAS)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,10 @@ import pytz
 from libcommon.constants import QUEUE_TTL_SECONDS
 from libcommon.dtos import Priority, Status, WorkerSize
 from libcommon.queue.dataset_blockages import DATASET_STATUS_NORMAL, block_dataset
-from libcommon.queue.jobs import EmptyQueueError, JobDocument, Queue
+from libcommon.queue.jobs import AlreadyStartedJobError, EmptyQueueError, JobDocument, NoWaitingJobError, Queue
 from libcommon.queue.metrics import JobTotalMetricDocument, WorkerSizeJobsCountDocument
 from libcommon.queue.past_jobs import JOB_DURATION_MIN_SECONDS, PastJobDocument
+from libcommon.queue.started_jobs_counts import StartedJobsCountDocument, get_started_jobs_counts
 from libcommon.resources import QueueMongoResource
 from libcommon.utils import get_datetime
 
@@ -143,6 +144,107 @@ def test_add_job() -> None:
     assert_past_jobs_number(1)
 
 
+def test_start_job_is_atomic() -> None:
+    test_type = "test_type"
+    test_dataset = "test_dataset"
+    test_revision = "test_revision"
+    test_difficulty = 50
+    queue = Queue()
+    job1 = queue.add_job(job_type=test_type, dataset=test_dataset, revision=test_revision, difficulty=test_difficulty)
+    queue.start_job()
+    assert job1.reload().status == Status.STARTED
+
+    # another worker selected a waiting job for the same unicity_id before the first job was started
+    job2 = queue.add_job(job_type=test_type, dataset=test_dataset, revision=test_revision, difficulty=test_difficulty)
+    with pytest.raises(AlreadyStartedJobError):
+        queue._start_newest_job_and_delete_others(job=job2)
+    assert job2.reload().status == Status.WAITING
+    assert JobDocument.objects(unicity_id=job1.unicity_id, status=Status.STARTED).count() == 1
+    assert_metric_jobs_per_type(job_type=test_type, status=Status.WAITING, total=1)
+    assert_metric_jobs_per_type(job_type=test_type, status=Status.STARTED, total=1)
+
+    # or the waiting jobs have been deleted in the meantime
+    queue.finish_job(job_id=str(job1.pk))
+    queue.delete_waiting_jobs_by_job_id(job_ids=[str(job2.pk)])
+    with pytest.raises(NoWaitingJobError):
+        queue._start_newest_job_and_delete_others(job=job2)
+
+
+def test_started_jobs_counts() -> None:
+    test_type = "test_type"
+    test_revision = "test_revision"
+    test_difficulty = 50
+    queue = Queue()
+    for dataset in ["org1/dataset1", "org1/dataset2", "org2/dataset1"]:
+        queue.add_job(job_type=test_type, dataset=dataset, revision=test_revision, difficulty=test_difficulty)
+    assert get_started_jobs_counts() == {}
+
+    job_info_1 = queue.start_job()
+    job_info_2 = queue.start_job()
+    job_info_3 = queue.start_job()
+    assert get_started_jobs_counts() == {"org1": 2, "org2": 1}
+    assert queue.get_started_jobs_count_by_namespace() == {"org1": 2, "org2": 1}
+
+    queue.finish_job(job_id=job_info_1["job_id"])
+    queue.finish_job(job_id=job_info_2["job_id"])
+    assert get_started_jobs_counts() == {"org1": 1}
+    assert queue.get_started_jobs_count_by_namespace() == {"org1": 1}
+    # finishing a job twice does not decrease the counter twice
+    queue.finish_job(job_id=job_info_1["job_id"])
+    assert get_started_jobs_counts() == {"org1": 1}
+
+    # the counter does not go below zero for the jobs started before the counters were initialized
+    StartedJobsCountDocument.drop_collection()
+    queue.finish_job(job_id=job_info_3["job_id"])
+    assert get_started_jobs_counts() == {}
+    assert StartedJobsCountDocument.objects(count__lt=0).count() == 0
+
+
+def test_start_jobs_and_release_job() -> None:
+    test_type = "test_type"
+    test_revision = "test_revision"
+    test_difficulty = 50
+    queue = Queue()
+    with pytest.raises(EmptyQueueError):
+        queue.start_jobs(num_jobs=2)
+    for dataset in ["dataset1", "dataset2", "dataset3"]:
+        queue.add_job(job_type=test_type, dataset=dataset, revision=test_revision, difficulty=test_difficulty)
+
+    job_infos = queue.start_jobs(num_jobs=2)
+    assert [job_info["params"]["dataset"] for job_info in job_infos] == ["dataset1", "dataset2"]
+    assert_metric_jobs_per_type(job_type=test_type, status=Status.WAITING, total=1)
+    assert_metric_jobs_per_type(job_type=test_type, status=Status.STARTED, total=2)
+
+    queue.release_job(job_id=job_infos[1]["job_id"])
+    job = JobDocument.objects(pk=job_infos[1]["job_id"]).get()
+    assert job.status == Status.WAITING
+    assert job.started_at is None
+    assert_metric_jobs_per_type(job_type=test_type, status=Status.WAITING, total=2)
+    assert_metric_jobs_per_type(job_type=test_type, status=Status.STARTED, total=1)
+    assert get_started_jobs_counts() == {"dataset1": 1}
+
+    # only the available jobs are started
+    job_infos = queue.start_jobs(num_jobs=5)
+    assert [job_info["params"]["dataset"] for job_info in job_infos] == ["dataset2", "dataset3"]
+
+
+def test_start_jobs_releases_the_started_jobs_on_error() -> None:
+    test_type = "test_type"
+    test_revision = "test_revision"
+    test_difficulty = 50
+    queue = Queue()
+    for dataset in ["dataset1", "dataset2"]:
+        queue.add_job(job_type=test_type, dataset=dataset, revision=test_revision, difficulty=test_difficulty)
+
+    start_job = queue.start_job
+    with patch.object(queue, "start_job", side_effect=[start_job(), RuntimeError("unexpected")]):
+        with pytest.raises(RuntimeError):
+            queue.start_jobs(num_jobs=2)
+    assert JobDocument.objects(status=Status.STARTED).count() == 0
+    assert JobDocument.objects(status=Status.WAITING).count() == 2
+    assert get_started_jobs_counts() == {}
+
+
 def test_finish_job_blocked() -> None:
     test_type = "test_type"
     test_dataset = "test_dataset"
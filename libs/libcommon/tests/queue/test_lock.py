@@ -79,3 +79,16 @@ def test_lock_git_branch(tmp_path_factory: pytest.TempPathFactory, queue_mongo_r
     assert Lock.objects().get().key == json.dumps({"dataset": "dataset", "branch": "refs/convert/parquet"})
     assert Lock.objects().get().owner is None
     Lock.objects().delete()
+
+
+def test_lock_try_acquire(queue_mongo_resource: QueueMongoResource) -> None:
+    first = lock(key="test_lock", owner="first")
+    second = lock(key="test_lock", owner="second")
+    assert first.try_acquire()
+    # the owner can acquire it again, but not the other ones
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+    Lock.objects(key="test_lock").delete()
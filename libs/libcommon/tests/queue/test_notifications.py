@@ -0,0 +1,76 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+from collections.abc import Iterator
+from typing import Optional
+
+import pytest
+
+from libcommon.dtos import Priority
+from libcommon.queue.jobs import JobDocument, Queue
+from libcommon.queue.notifications import LocalWaitingJobsNotifier, MongoWaitingJobsNotifier
+from libcommon.resources import QueueMongoResource
+
+
+@pytest.fixture(autouse=True)
+def queue_mongo_resource_autouse(queue_mongo_resource: QueueMongoResource) -> QueueMongoResource:
+    return queue_mongo_resource
+
+
+@pytest.fixture
+def mongo_notifier() -> Iterator[MongoWaitingJobsNotifier]:
+    notifier = MongoWaitingJobsNotifier(difficulty_min=40, difficulty_max=70)
+    yield notifier
+    notifier.close()
+
+
+@pytest.mark.parametrize(
+    "difficulty,expected",
+    [(20, False), (40, False), (50, True), (70, True), (90, False)],
+)
+def test_mongo_notifier(mongo_notifier: MongoWaitingJobsNotifier, difficulty: int, expected: bool) -> None:
+    assert not mongo_notifier.wait(timeout_seconds=0.1)
+    # ^ opens the change stream
+    queue = Queue()
+    queue.add_job(job_type="test_type", dataset="dataset", revision="revision", difficulty=difficulty)
+    assert mongo_notifier.wait(timeout_seconds=5) is expected
+
+
+def test_mongo_notifier_released_job(mongo_notifier: MongoWaitingJobsNotifier) -> None:
+    queue = Queue()
+    queue.add_job(job_type="test_type", dataset="dataset", revision="revision", difficulty=50)
+    job_info = queue.start_job()
+    assert not mongo_notifier.wait(timeout_seconds=0.1)
+    queue.heartbeat(job_id=job_info["job_id"])
+    assert not mongo_notifier.wait(timeout_seconds=0.1)
+    queue.release_job(job_id=job_info["job_id"])
+    assert mongo_notifier.wait(timeout_seconds=5)
+
+
+def test_mongo_notifier_other_updates(mongo_notifier: MongoWaitingJobsNotifier) -> None:
+    queue = Queue()
+    queue.add_job(job_type="test_type", dataset="dataset", revision="revision", difficulty=50)
+    assert not mongo_notifier.wait(timeout_seconds=0.1)
+    # an update of a waiting job that does not change its status is not notified
+    JobDocument.objects(dataset="dataset").update(priority=Priority.HIGH)
+    assert not mongo_notifier.wait(timeout_seconds=0.5)
+
+
+@pytest.mark.parametrize(
+    "difficulty_min,difficulty_max,difficulty,expected",
+    [
+        (None, None, 50, True),
+        (40, 70, 50, True),
+        (40, 70, 40, False),
+        (40, 70, 70, True),
+        (None, 40, 50, False),
+    ],
+)
+def test_local_notifier(
+    difficulty_min: Optional[int], difficulty_max: Optional[int], difficulty: int, expected: bool
+) -> None:
+    notifier = LocalWaitingJobsNotifier(difficulty_min=difficulty_min, difficulty_max=difficulty_max)
+    assert not notifier.wait(timeout_seconds=0.01)
+    notifier.notify(difficulty=difficulty)
+    assert notifier.wait(timeout_seconds=0.01) is expected
+    assert not notifier.wait(timeout_seconds=0.01)
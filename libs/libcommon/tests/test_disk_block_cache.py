@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import os
+from pathlib import Path
+
+import pytest
+
+from libcommon.disk_block_cache import DiskBlockCache, get_file_cache_key
+
+DATA = bytes(range(256)) * 4  # 1024 bytes
+
+
+class Fetcher:
+    def __init__(self) -> None:
+        self.requests: list[tuple[int, int]] = []
+
+    def __call__(self, start: int, end: int) -> bytes:
+        self.requests.append((start, end))
+        return DATA[start:end]
+
+
+def test_get_file_cache_key() -> None:
+    key = get_file_cache_key(url="https://a", size=10, version=1)
+    assert key == get_file_cache_key(url="https://a", size=10, version=1)
+    assert key != get_file_cache_key(url="https://a", size=10, version=2)
+    assert key != get_file_cache_key(url="https://a", size=11, version=1)
+    assert key != get_file_cache_key(url="https://b", size=10, version=1)
+
+
+@pytest.mark.parametrize(
+    "start,end,expected",
+    [(0, 1, (0, 100)), (100, 200, (100, 200)), (150, 250, (100, 300)), (950, 1024, (900, 1024)), (0, 0, (0, 0))],
+)
+def test_disk_block_cache_get_aligned_range(tmp_path: Path, start: int, end: int, expected: tuple[int, int]) -> None:
+    cache = DiskBlockCache(directory=tmp_path, max_bytes=10_000, block_size=100)
+    assert cache.get_aligned_range(start, end, size=len(DATA)) == expected
+
+
+def test_disk_block_cache_read_range(tmp_path: Path) -> None:
+    cache = DiskBlockCache(directory=tmp_path, max_bytes=10_000, block_size=100)
+    fetch = Fetcher()
+    assert cache.read_range("key", 150, 250, size=len(DATA), fetch=fetch) == DATA[150:250]
+    assert fetch.requests == [(100, 300)]
+    # the blocks are read from the disk
+    assert cache.read_range("key", 100, 300, size=len(DATA), fetch=fetch) == DATA[100:300]
+    assert cache.read_range("key", 120, 130, size=len(DATA), fetch=fetch) == DATA[120:130]
+    assert len(fetch.requests) == 1
+    # the last block of the file is shorter
+    assert cache.read_range("key", 1000, 2000, size=len(DATA), fetch=fetch) == DATA[1000:]
+    assert fetch.requests[-1] == (1000, 1024)
+    assert cache.get_range("key", 1010, 1024) == DATA[1010:]
+    # the keys are separated
+    assert cache.get_range("other_key", 150, 250) is None
+
+
+def test_disk_block_cache_put_range_ignores_incomplete_blocks(tmp_path: Path) -> None:
+    cache = DiskBlockCache(directory=tmp_path, max_bytes=10_000, block_size=100)
+    cache.put_range("key", 0, DATA[:250], size=len(DATA))
+    assert cache.get_range("key", 0, 200) == DATA[:200]
+    assert cache.get_range("key", 200, 250) is None
+    with pytest.raises(ValueError):
+        cache.put_range("key", 50, DATA[50:150], size=len(DATA))
+
+
+def test_disk_block_cache_clean(tmp_path: Path) -> None:
+    cache = DiskBlockCache(directory=tmp_path, max_bytes=500, block_size=100)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        # don't start the janitor automatically
+        monkeypatch.setattr("libcommon.disk_block_cache.CLEAN_TRIGGER_RATIO", 100)
+        for block_index in range(8):
+            start = block_index * 100
+            cache.put_range("key", start, DATA[start : start + 100], size=len(DATA))  # noqa: E203
+            # the blocks are evicted in the order of their last use
+            os.utime(cache._get_block_path("key", block_index), (block_index, block_index))
+        cache.put_range("other_key", 0, DATA[:100], size=len(DATA))
+        os.utime(cache._get_block_path("other_key", 0), (0, 0))
+        assert cache.get_range("key", 0, 100) == DATA[:100]  # a hit updates the modification time
+    # 900 bytes are stored: the least recently used blocks are evicted until the size is below 90% of max_bytes
+    cache.clean()
+    assert cache.get_range("key", 0, 100) == DATA[:100]
+    assert cache.get_range("key", 500, 800) == DATA[500:800]
+    for start in range(100, 500, 100):
+        assert cache.get_range("key", start, start + 100) is None
+    # the empty directories are deleted
+    assert not os.path.exists(os.path.dirname(cache._get_block_path("other_key", 0)))
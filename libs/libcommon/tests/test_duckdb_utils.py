@@ -1,4 +1,15 @@
-from libcommon.duckdb_utils import duckdb_index_is_partial
+from pathlib import Path
+
+import duckdb
+
+from libcommon.constants import ROW_IDX_COLUMN
+from libcommon.duckdb_utils import (
+    SORT_INDEX_COLUMNS_TABLE,
+    SORT_INDEX_RANK_COLUMN,
+    create_index,
+    create_sort_indexes,
+    duckdb_index_is_partial,
+)
 
 
 def test_duckdb_index_is_partial() -> None:
@@ -11,3 +22,84 @@ def test_duckdb_index_is_partial() -> None:
     assert not duckdb_index_is_partial(
         "https://hf.co/datasets/rajpurkar/squad/resolve/refs%2Fconvert%2Fduckdb/plain_text/train/index.duckdb"
     )
+
+
+def test_create_index(tmp_path: Path) -> None:
+    database = str(tmp_path / "index.duckdb")
+    with duckdb.connect(database) as con:
+        con.execute(f"CREATE TABLE data ({ROW_IDX_COLUMN} BIGINT, text VARCHAR, title VARCHAR)")
+        con.execute(
+            "INSERT INTO data VALUES (0, 'The Lord Vader', 'vader'), (1, 'vader, vader and his ship', NULL), (2, NULL, NULL)"
+        )
+    create_index(
+        database=database,
+        input_table="data",
+        columns=["text", "title"],
+        stemmer="none",
+        input_id=ROW_IDX_COLUMN,
+        fts_schema="fts_main_data",
+    )
+    with duckdb.connect(database, read_only=True) as con:
+        con.execute("LOAD 'fts';")
+        assert con.sql("SELECT term, df FROM fts_main_data.dict ORDER BY term").fetchall() == [
+            ("lord", 1),
+            ("ship", 1),
+            ("vader", 2),
+        ]
+        assert con.sql("SELECT docid, name, len FROM fts_main_data.docs ORDER BY docid").fetchall() == [
+            (0, 0, 3),
+            (1, 1, 3),
+            (2, 2, 0),
+        ]
+        assert con.sql(
+            "SELECT docid, fieldid, term FROM fts_main_data.terms JOIN fts_main_data.dict USING (termid) ORDER BY ALL"
+        ).fetchall() == [
+            (0, 0, "lord"),
+            (0, 0, "vader"),
+            (0, 1, "vader"),
+            (1, 0, "ship"),
+            (1, 0, "vader"),
+            (1, 0, "vader"),
+        ]
+        assert con.sql("SELECT num_docs, avgdl FROM fts_main_data.stats").fetchall() == [(3, 2.0)]
+        assert con.sql("SELECT stemmer FROM fts_main_data.stemmer").fetchall() == [("none",)]
+        scores = con.sql(
+            f"SELECT {ROW_IDX_COLUMN}, fts_main_data.match_bm25({ROW_IDX_COLUMN}, 'vader') AS score FROM data ORDER BY {ROW_IDX_COLUMN}"
+        ).fetchall()
+        assert [row_idx for row_idx, score in scores if score is not None] == [0, 1]
+
+
+def test_create_sort_indexes(tmp_path: Path) -> None:
+    features = {
+        "score": {"dtype": "float64", "_type": "Value"},
+        "text": {"dtype": "string", "_type": "Value"},
+        "label": {"dtype": "string", "_type": "Value"},
+        "tags": {"feature": {"dtype": "string", "_type": "Value"}, "_type": "Sequence"},
+        "count": {"dtype": "int64", "_type": "Value"},
+        "other_count": {"dtype": "int64", "_type": "Value"},
+    }
+    with duckdb.connect(str(tmp_path / "index.duckdb")) as con:
+        con.execute(
+            f"CREATE TABLE data ({ROW_IDX_COLUMN} BIGINT, score DOUBLE, text VARCHAR, label VARCHAR, tags VARCHAR[],"
+            " count BIGINT, other_count BIGINT)"
+        )
+        con.execute(
+            "INSERT INTO data VALUES (0, 0.5, 'a long text', 'b', ['x'], 1, 1), (1, NULL, 'text', 'a', [], 3, 1),"
+            " (2, 0.5, NULL, NULL, NULL, 2, 1), (3, -1, 'text', 'c', ['y'], NULL, 1)"
+        )
+        # the long string column, and the list column, are ignored
+        assert create_sort_indexes(con, features, max_columns=3, max_string_length=5) == ["score", "label", "count"]
+        assert con.sql(f"SELECT * FROM {SORT_INDEX_COLUMNS_TABLE}").fetchall() == [
+            ("score", "sort_index.column_0", 3, 4),
+            ("label", "sort_index.column_1", 3, 4),
+            ("count", "sort_index.column_2", 3, 4),
+        ]
+        # ascending, nulls last, the ties ordered by row index
+        for table_name, expected_row_idx in [
+            ("sort_index.column_0", [3, 0, 2, 1]),
+            ("sort_index.column_1", [1, 0, 3, 2]),
+            ("sort_index.column_2", [0, 2, 1, 3]),
+        ]:
+            assert con.sql(f"SELECT {SORT_INDEX_RANK_COLUMN}, {ROW_IDX_COLUMN} FROM {table_name}").fetchall() == list(
+                enumerate(expected_row_idx)
+            )
@@ -0,0 +1,138 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+from unittest.mock import patch
+
+import pytest
+
+from libcommon.memory_cache import MemoryLRUCache
+
+
+def get_cache(max_bytes: int) -> MemoryLRUCache[str, bytes]:
+    return MemoryLRUCache(name="test", max_bytes=max_bytes, get_size=len)
+
+
+def test_memory_lru_cache_get_put() -> None:
+    cache = get_cache(max_bytes=10)
+    assert cache.get("a") is None
+    cache.put("a", b"aaa")
+    assert cache.get("a") == b"aaa"
+    assert "a" in cache
+    assert len(cache) == 1
+    assert cache.num_bytes == 3
+    cache.put("a", b"aaaa")
+    assert cache.get("a") == b"aaaa"
+    assert len(cache) == 1
+    assert cache.num_bytes == 4
+
+
+def test_memory_lru_cache_evicts_least_recently_used() -> None:
+    cache = get_cache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    # "b" is now the least recently used entry
+    cache.put("c", b"cccc")
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.num_bytes == 8
+
+
+def test_memory_lru_cache_does_not_store_too_big_values() -> None:
+    cache = get_cache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"b" * 11)
+    assert "b" not in cache
+    assert "a" in cache
+    disabled_cache = get_cache(max_bytes=0)
+    disabled_cache.put("a", b"a")
+    assert len(disabled_cache) == 0
+
+
+def test_memory_lru_cache_get_or_compute() -> None:
+    cache = get_cache(max_bytes=10)
+    calls: list[str] = []
+
+    def compute() -> bytes:
+        calls.append("a")
+        return b"aaa"
+
+    assert cache.get_or_compute("a", compute) == b"aaa"
+    assert cache.get_or_compute("a", compute) == b"aaa"
+    assert calls == ["a"]
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.num_bytes == 0
+
+
+def test_memory_lru_cache_max_entries() -> None:
+    cache: MemoryLRUCache[str, bytes] = MemoryLRUCache(name="test", max_bytes=10, get_size=len, max_entries=2)
+    cache.put("a", b"a")
+    cache.put("b", b"b")
+    cache.put("c", b"c")
+    assert "a" not in cache
+    assert len(cache) == 2
+    assert cache.num_bytes == 2
+
+
+def test_memory_lru_cache_entries_only() -> None:
+    cache: MemoryLRUCache[str, int] = MemoryLRUCache(name="test", max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    assert "a" not in cache
+    assert cache.get("c") == 3
+    assert cache.num_bytes == 0
+    disabled_cache: MemoryLRUCache[str, int] = MemoryLRUCache(name="test", max_entries=0)
+    disabled_cache.put("a", 1)
+    assert len(disabled_cache) == 0
+    with pytest.raises(ValueError):
+        MemoryLRUCache(name="test")
+    with pytest.raises(ValueError):
+        MemoryLRUCache(name="test", max_bytes=10)
+
+
+def test_memory_lru_cache_ttl_and_revalidate() -> None:
+    cache: MemoryLRUCache[str, bytes] = MemoryLRUCache(name="test", max_bytes=10, get_size=len, ttl_seconds=10)
+    with patch("libcommon.memory_cache.time.monotonic", return_value=100):
+        cache.put("a", b"aaa")
+        cache.put("b", b"bbb")
+    with patch("libcommon.memory_cache.time.monotonic", return_value=105):
+        assert cache.get("a") == b"aaa"
+    with patch("libcommon.memory_cache.time.monotonic", return_value=120):
+        # expired entries are removed, unless they are revalidated
+        assert cache.get("a") is None
+        assert "a" not in cache
+        assert cache.get("b", revalidate=lambda value: value == b"bbb") == b"bbb"
+    with patch("libcommon.memory_cache.time.monotonic", return_value=125):
+        # the revalidated entry is kept for another ttl_seconds
+        assert cache.get("b") == b"bbb"
+    with patch("libcommon.memory_cache.time.monotonic", return_value=140):
+        assert cache.get("b", revalidate=lambda value: False) is None
+        assert len(cache) == 0
+        assert cache.num_bytes == 0
+
+
+def test_memory_lru_cache_revalidate_keeps_a_value_stored_in_the_meantime() -> None:
+    cache: MemoryLRUCache[str, bytes] = MemoryLRUCache(name="test", max_bytes=10, get_size=len, ttl_seconds=10)
+
+    def store_new_value_and_fail(value: bytes) -> bool:
+        # e.g. another thread that computes the value in get_or_compute
+        cache.put("a", b"new")
+        return False
+
+    def store_new_value_and_raise(value: bytes) -> bool:
+        cache.put("a", b"newer")
+        raise RuntimeError("revalidation failed")
+
+    with patch("libcommon.memory_cache.time.monotonic", return_value=100):
+        cache.put("a", b"old")
+    with patch("libcommon.memory_cache.time.monotonic", return_value=120):
+        assert cache.get("a", revalidate=store_new_value_and_fail) is None
+        assert cache.get("a") == b"new"
+    with patch("libcommon.memory_cache.time.monotonic", return_value=140):
+        with pytest.raises(RuntimeError):
+            cache.get("a", revalidate=store_new_value_and_raise)
+        assert cache.get("a") == b"newer"
+        assert cache.num_bytes == 5
@@ -4,31 +4,44 @@
 import os
 import shutil
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 from unittest.mock import patch
 
+import numpy as np
+import pyarrow as pa
 import pyarrow.parquet as pq
 import pytest
-from datasets import Dataset, Image, concatenate_datasets
+from datasets import Dataset, Features, Image, Value, concatenate_datasets
 from datasets.table import embed_table_storage
 from fsspec import AbstractFileSystem
 from fsspec.implementations.http import HTTPFileSystem
 
+from libcommon.disk_block_cache import DiskBlockCache
 from libcommon.parquet_utils import (
+    PARSED_PARQUET_METADATA_SIZE_FACTOR,
     Indexer,
     ParquetIndexWithMetadata,
+    ParquetMetadataCache,
+    RowGroupCache,
+    RowGroupReader,
     RowsIndex,
+    RowsIndexCache,
     SchemaMismatchError,
     TooBigRows,
     extract_split_directory_from_parquet_url,
+    get_binary_cells_max_length,
     get_num_parquet_files_to_process,
     parquet_export_is_partial,
+    truncate_binary_array,
 )
+from libcommon.range_reads import RangeReadsPlanner
 from libcommon.resources import CacheMongoResource
 from libcommon.simple_cache import upsert_response
 from libcommon.storage import StrPath
+from libcommon.viewer_utils.parquet_metadata import create_row_groups_index_file
 
 REVISION_NAME = "revision"
 CACHED_ASSETS_FOLDER = "cached-assets"
@@ -465,6 +478,19 @@ def test_rows_index_query_with_parquet_metadata(
         rows_index_with_parquet_metadata.query(offset=-1, length=2)
 
 
+def test_rows_index_query_with_columns(rows_index_with_parquet_metadata: RowsIndex, ds_sharded: Dataset) -> None:
+    assert rows_index_with_parquet_metadata.query(offset=1, length=3, columns=["text"]).to_pydict() == ds_sharded[1:4]
+    pa_table = rows_index_with_parquet_metadata.query(offset=1, length=3, columns=[])
+    assert pa_table.column_names == []
+    assert pa_table.num_rows == 3
+    pa_table, truncated_columns = rows_index_with_parquet_metadata.query_truncated_binary(
+        offset=1, length=3, columns=[]
+    )
+    assert pa_table.column_names == []
+    assert truncated_columns == []
+    assert rows_index_with_parquet_metadata.parquet_index.get_features(columns=[]) == {}
+
+
 def test_rows_index_query_with_too_big_rows(rows_index_with_too_big_rows: RowsIndex, ds_sharded: Dataset) -> None:
     with pytest.raises(TooBigRows):
         rows_index_with_too_big_rows.query(offset=0, length=3)
@@ -533,3 +559,360 @@ def test_get_num_parquet_files_to_index(
         max_size_bytes=max_size_bytes,
     )
     assert (num_files, num_bytes, num_rows) == expected
+
+
+def test_rows_index_query_with_row_group_cache(
+    parquet_metadata_directory: StrPath,
+    ds_sharded: Dataset,
+    ds_sharded_fs: AbstractFileSystem,
+    dataset_sharded_with_config_parquet_metadata: dict[str, Any],
+) -> None:
+    row_group_cache = RowGroupCache(max_bytes=9999999999)
+    indexer = Indexer(
+        hf_token="token",
+        parquet_metadata_directory=parquet_metadata_directory,
+        httpfs=HTTPFileSystem(),
+        max_arrow_data_in_memory=9999999999,
+        row_group_cache=row_group_cache,
+    )
+    with ds_sharded_fs.open("default/train/0003.parquet") as f:
+        with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+            index = indexer.get_rows_index("ds_sharded", "default", "train")
+            assert index.query(offset=1, length=3).to_pydict() == ds_sharded[1:4]
+    # the two files that contain the rows have one row group each
+    assert len(row_group_cache) == 2
+    with patch.object(pq.ParquetFile, "read_row_group", side_effect=RuntimeError("should be read from the cache")):
+        with ds_sharded_fs.open("default/train/0003.parquet") as f:
+            with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+                assert index.query(offset=2, length=2).to_pydict() == ds_sharded[2:4]
+                assert index.query_truncated_binary(offset=1, length=3)[0].to_pydict() == ds_sharded[1:4]
+    # the cached row groups are not used anymore when the parquet files are written again
+    for item in dataset_sharded_with_config_parquet_metadata["parquet_files_metadata"]:
+        metadata_path = os.path.join(parquet_metadata_directory, item["parquet_metadata_subpath"])
+        mtime_ns = os.stat(metadata_path).st_mtime_ns + 1_000_000_000
+        os.utime(metadata_path, ns=(mtime_ns, mtime_ns))
+    with patch.object(pq.ParquetFile, "read_row_group", side_effect=RuntimeError("should not be read from the cache")):
+        with ds_sharded_fs.open("default/train/0003.parquet") as f:
+            with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+                with pytest.raises(RuntimeError):
+                    index.query(offset=2, length=2)
+
+
+def test_indexer_get_rows_index_with_rows_index_cache(
+    parquet_metadata_directory: StrPath,
+    ds_sharded: Dataset,
+    dataset_sharded_with_config_parquet_metadata: dict[str, Any],
+) -> None:
+    rows_index_cache = RowsIndexCache(max_bytes=9999999999, max_entries=10, ttl_seconds=10)
+    indexer = Indexer(
+        hf_token="token",
+        parquet_metadata_directory=parquet_metadata_directory,
+        httpfs=HTTPFileSystem(),
+        max_arrow_data_in_memory=9999999999,
+        rows_index_cache=rows_index_cache,
+    )
+    with patch("libcommon.memory_cache.time.monotonic", return_value=100):
+        index = indexer.get_rows_index("ds_sharded", "default", "train")
+    assert len(rows_index_cache) == 1
+    with patch("libcommon.memory_cache.time.monotonic", return_value=105):
+        with patch("libcommon.parquet_utils.get_previous_step_or_raise", side_effect=RuntimeError("should be cached")):
+            assert indexer.get_rows_index("ds_sharded", "default", "train") is index
+    # after the TTL, the entry is kept if the dataset git revision has not changed
+    with patch("libcommon.memory_cache.time.monotonic", return_value=120):
+        with patch("libcommon.parquet_utils.get_previous_step_or_raise", side_effect=RuntimeError("should be cached")):
+            assert indexer.get_rows_index("ds_sharded", "default", "train") is index
+    upsert_response(
+        kind="config-parquet-metadata",
+        dataset="ds_sharded",
+        dataset_git_revision="new_revision",
+        config="default",
+        content=dataset_sharded_with_config_parquet_metadata,
+        http_status=HTTPStatus.OK,
+        progress=1.0,
+    )
+    with patch("libcommon.memory_cache.time.monotonic", return_value=125):
+        assert indexer.get_rows_index("ds_sharded", "default", "train") is index
+    # after the TTL, the entry is recreated since the dataset git revision has changed
+    with patch("libcommon.memory_cache.time.monotonic", return_value=140):
+        new_index = indexer.get_rows_index("ds_sharded", "default", "train")
+    assert new_index is not index
+    assert new_index.revision == "new_revision"
+    assert len(rows_index_cache) == 1
+
+
+def test_rows_index_query_with_parquet_metadata_cache(
+    parquet_metadata_directory: StrPath,
+    ds_sharded: Dataset,
+    ds_sharded_fs: AbstractFileSystem,
+    dataset_sharded_with_config_parquet_metadata: dict[str, Any],
+) -> None:
+    parquet_metadata_cache = ParquetMetadataCache(max_bytes=9999999999)
+    indexer = Indexer(
+        hf_token="token",
+        parquet_metadata_directory=parquet_metadata_directory,
+        httpfs=HTTPFileSystem(),
+        max_arrow_data_in_memory=9999999999,
+        parquet_metadata_cache=parquet_metadata_cache,
+    )
+    with ds_sharded_fs.open("default/train/0003.parquet") as f:
+        with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+            index = indexer.get_rows_index("ds_sharded", "default", "train")
+            assert index.query(offset=1, length=3).to_pydict() == ds_sharded[1:4]
+            # the rows are in the first two files
+            assert len(parquet_metadata_cache) == 2
+            with patch.object(pq, "read_metadata", side_effect=RuntimeError("should be read from the cache")):
+                assert index.query(offset=2, length=2).to_pydict() == ds_sharded[2:4]
+                assert index.query_truncated_binary(offset=1, length=3)[0].to_pydict() == ds_sharded[1:4]
+            # a metadata file that is written again is parsed again
+            metadata_path = index.parquet_index.metadata_paths[0]
+            stat = os.stat(metadata_path)
+            os.utime(metadata_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            assert index.query(offset=1, length=3).to_pydict() == ds_sharded[1:4]
+            assert len(parquet_metadata_cache) == 3
+            # the size of an entry is the estimated size of the parsed metadata, not of the serialized one
+            parsed = parquet_metadata_cache.get_parsed_metadata(metadata_path)
+            assert parsed.estimate_size() > PARSED_PARQUET_METADATA_SIZE_FACTOR * parsed.metadata.serialized_size
+    bounded_parquet_metadata_cache = ParquetMetadataCache(max_bytes=9999999999, max_entries=1)
+    for metadata_path in index.parquet_index.metadata_paths[:2]:
+        bounded_parquet_metadata_cache.get_parsed_metadata(metadata_path)
+    assert len(bounded_parquet_metadata_cache) == 1
+
+
+@pytest.mark.parametrize("num_rows_total", [8, 9])
+def test_rows_index_query_with_row_groups_index(
+    indexer: Indexer,
+    parquet_metadata_directory: StrPath,
+    ds_sharded: Dataset,
+    ds_sharded_fs: AbstractFileSystem,
+    dataset_sharded_with_config_parquet_metadata: dict[str, Any],
+    num_rows_total: int,
+) -> None:
+    parquet_files_metadata = sorted(
+        dataset_sharded_with_config_parquet_metadata["parquet_files_metadata"], key=lambda item: item["filename"]
+    )
+    row_groups_index_subpath = create_row_groups_index_file(
+        dataset="ds_sharded",
+        config="default",
+        split="train",
+        parquet_files_metadata=[
+            pq.read_metadata(os.path.join(parquet_metadata_directory, item["parquet_metadata_subpath"]))
+            for item in parquet_files_metadata
+        ],
+        parquet_metadata_directory=parquet_metadata_directory,
+    )
+    # the index is written to a temporary file, then moved in place
+    assert not any(
+        filename.endswith(".tmp")
+        for filename in os.listdir(os.path.dirname(os.path.join(parquet_metadata_directory, row_groups_index_subpath)))
+    )
+    # the row groups index is ignored if it doesn't match the parquet files
+    parquet_files_metadata[-1]["num_rows"] += num_rows_total - len(ds_sharded)
+    upsert_response(
+        kind="config-parquet-metadata",
+        dataset="ds_sharded",
+        dataset_git_revision=REVISION_NAME,
+        config="default",
+        content={
+            "parquet_files_metadata": parquet_files_metadata,
+            "row_groups_indexes": [
+                {
+                    "dataset": "ds_sharded",
+                    "config": "default",
+                    "split": "train",
+                    "row_groups_index_subpath": row_groups_index_subpath,
+                }
+            ],
+        },
+        http_status=HTTPStatus.OK,
+        progress=1.0,
+    )
+    with ds_sharded_fs.open("default/train/0003.parquet") as f:
+        with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+            index = indexer.get_rows_index("ds_sharded", "default", "train")
+            if num_rows_total != len(ds_sharded):
+                assert index.parquet_index.row_groups_index is None
+                return
+            assert index.parquet_index.row_groups_index is not None
+            with patch.object(
+                ParquetIndexWithMetadata,
+                "_get_row_group_readers_from_metadata",
+                side_effect=RuntimeError("should use the row groups index"),
+            ):
+                for offset, length in [(0, 1), (1, 3), (2, 100), (7, 1), (100, 2)]:
+                    expected = ds_sharded[offset : offset + length]  # noqa: E203
+                    assert index.query(offset=offset, length=length).to_pydict() == expected
+                    assert index.query_truncated_binary(offset=offset, length=length)[0].to_pydict() == expected
+
+
+def test_rows_index_query_with_range_reads_planner(
+    parquet_metadata_directory: StrPath,
+    ds_sharded: Dataset,
+    ds_sharded_fs: AbstractFileSystem,
+    dataset_sharded_with_config_parquet_metadata: dict[str, Any],
+) -> None:
+    indexer = Indexer(
+        hf_token="token",
+        parquet_metadata_directory=parquet_metadata_directory,
+        httpfs=HTTPFileSystem(),
+        max_arrow_data_in_memory=9999999999,
+        range_reads_planner=RangeReadsPlanner(max_hole_size=1_000_000, max_range_size=32_000_000),
+    )
+    # all the shards have the same content
+    with ds_sharded_fs.open("default/train/0000.parquet") as f:
+        data = f.read()
+    requested_urls: list[str] = []
+
+    async def cat_file(url: str, start: int, end: int) -> bytes:
+        requested_urls.append(url)
+        return data[start:end]
+
+    with ds_sharded_fs.open("default/train/0003.parquet") as f:
+        with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+            index = indexer.get_rows_index("ds_sharded", "default", "train")
+            with patch.object(f, "read", side_effect=RuntimeError("should be prefetched")):
+                with patch.object(indexer.httpfs, "_cat_file", side_effect=cat_file):
+                    assert index.query(offset=1, length=3).to_pydict() == ds_sharded[1:4]
+                    assert index.query_truncated_binary(offset=1, length=5)[0].to_pydict() == ds_sharded[1:6]
+    # one coalesced request per file and per query
+    assert sorted(requested_urls) == sorted(
+        index.parquet_index.parquet_files_urls[:2] + index.parquet_index.parquet_files_urls[:3]
+    )
+
+
+@pytest.mark.parametrize("with_range_reads_planner", [False, True])
+async def test_rows_index_query_async(
+    parquet_metadata_directory: StrPath,
+    ds_sharded: Dataset,
+    ds_sharded_fs: AbstractFileSystem,
+    dataset_sharded_with_config_parquet_metadata: dict[str, Any],
+    with_range_reads_planner: bool,
+) -> None:
+    indexer = Indexer(
+        hf_token="token",
+        parquet_metadata_directory=parquet_metadata_directory,
+        httpfs=HTTPFileSystem(),
+        max_arrow_data_in_memory=9999999999,
+        range_reads_planner=(
+            RangeReadsPlanner(max_hole_size=1_000_000, max_range_size=32_000_000) if with_range_reads_planner else None
+        ),
+    )
+    with ds_sharded_fs.open("default/train/0000.parquet") as f:
+        data = f.read()
+    requested_urls: list[str] = []
+
+    async def cat_file(url: str, start: int, end: int) -> bytes:
+        requested_urls.append(url)
+        return data[start:end]
+
+    with ds_sharded_fs.open("default/train/0003.parquet") as f:
+        with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+            index = indexer.get_rows_index("ds_sharded", "default", "train")
+            with patch.object(indexer.httpfs, "_cat_file", side_effect=cat_file):
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    pa_table = await index.query_async(offset=1, length=3, executor=executor)
+                    assert pa_table.to_pydict() == ds_sharded[1:4]
+                    pa_table, truncated_columns = await index.query_truncated_binary_async(
+                        offset=1, length=5, executor=executor
+                    )
+                    assert pa_table.to_pydict() == ds_sharded[1:6]
+                    assert truncated_columns == []
+                    # out of range: the last row group is read to get the schema
+                    pa_table = await index.query_async(offset=1000, length=3, executor=executor)
+                    assert pa_table.num_rows == 0
+    if with_range_reads_planner:
+        urls = index.parquet_index.parquet_files_urls
+        assert sorted(requested_urls) == sorted(urls[:2] + urls[:3] + urls[-1:])
+    else:
+        assert requested_urls == []
+
+
+@pytest.mark.parametrize("with_range_reads_planner", [False, True])
+def test_rows_index_query_with_disk_block_cache(
+    tmp_path: Path,
+    parquet_metadata_directory: StrPath,
+    ds_sharded: Dataset,
+    ds_sharded_fs: AbstractFileSystem,
+    dataset_sharded_with_config_parquet_metadata: dict[str, Any],
+    with_range_reads_planner: bool,
+) -> None:
+    indexer = Indexer(
+        hf_token="token",
+        parquet_metadata_directory=parquet_metadata_directory,
+        httpfs=HTTPFileSystem(),
+        max_arrow_data_in_memory=9999999999,
+        range_reads_planner=(
+            RangeReadsPlanner(max_hole_size=1_000_000, max_range_size=32_000_000) if with_range_reads_planner else None
+        ),
+        disk_block_cache=DiskBlockCache(directory=tmp_path, max_bytes=1_000_000, block_size=100),
+    )
+    # all the shards have the same content
+    with ds_sharded_fs.open("default/train/0000.parquet") as f:
+        data = f.read()
+
+    async def cat_file(url: str, start: int, end: int) -> bytes:
+        return data[start:end]
+
+    with ds_sharded_fs.open("default/train/0003.parquet") as f:
+        with patch("libcommon.parquet_utils.HTTPFile", return_value=f):
+            index = indexer.get_rows_index("ds_sharded", "default", "train")
+            with patch.object(indexer.httpfs, "_cat_file", side_effect=cat_file):
+                assert index.query(offset=1, length=3).to_pydict() == ds_sharded[1:4]
+            # the second time, the data is read from the disk
+            with patch.object(f, "read", side_effect=RuntimeError("should be read from the disk")):
+                with patch.object(
+                    indexer.httpfs, "_cat_file", side_effect=RuntimeError("should be read from the disk")
+                ):
+                    assert index.query(offset=1, length=3).to_pydict() == ds_sharded[1:4]
+
+
+@pytest.mark.parametrize(
+    "lengths,max_total_length,expected",
+    [
+        ([], 10, None),
+        ([1, 2, 3], 6, None),
+        ([10, 10], 10, 5),
+        # the short cells are kept whole, the long ones share the rest of the budget
+        ([1, 2, 100, 1000], 103, 50),
+        ([1, 2, 100, 1000], 200, 98),
+        ([1, 2, 100, 1000], 1, 0),
+    ],
+)
+def test_get_binary_cells_max_length(lengths: list[int], max_total_length: int, expected: Optional[int]) -> None:
+    assert get_binary_cells_max_length(np.array(lengths, dtype=np.int64), max_total_length) == expected
+
+
+def test_truncate_binary_array() -> None:
+    array = pa.chunked_array([[b"a", None, b"bb"], [b"c" * 100], [b"d" * 1000]], type=pa.binary())
+    assert truncate_binary_array(array, max_total_length=10_000) is None
+    truncated_array = truncate_binary_array(array, max_total_length=104)
+    assert truncated_array is not None
+    assert truncated_array.type == array.type
+    assert truncated_array.to_pylist() == [b"a", None, b"bb", b"c" * 50, b"d" * 50]
+    # the chunks without long cells are not sliced
+    assert truncated_array.chunk(0).buffers()[2].address == array.chunk(0).buffers()[2].address
+
+
+def test_row_group_reader_read_size_and_read_truncated_binary(tmp_path: Path) -> None:
+    features = Features({"text": Value("string"), "binary": Value("binary"), "nested": {"a": Value("int64")}})
+    pa_table = pa.table(
+        {
+            "text": ["a", "b", "c"],
+            "binary": [b"x", b"y" * 1000, b"z" * 10_000],
+            "nested": [{"a": 1}, {"a": 2}, {"a": 3}],
+        },
+        schema=features.arrow_schema,
+    )
+    pq.write_table(pa_table, tmp_path / "data.parquet")
+    parquet_file = pq.ParquetFile(tmp_path / "data.parquet")
+    reader = RowGroupReader(parquet_file=parquet_file, group_id=0, features=features)
+    columns_metadata = parquet_file.metadata.row_group(0).to_dict()["columns"]
+    assert reader.read_size(columns=["nested", "text"]) == sum(
+        column_metadata["total_uncompressed_size"]
+        for column_metadata in columns_metadata
+        if column_metadata["path_in_schema"] in ["nested.a", "text"]
+    )
+    pa_table, truncated_columns = reader.read_truncated_binary(list(features), max_binary_length=2_001)
+    assert truncated_columns == ["binary"]
+    assert pa_table.column("binary").to_pylist() == [b"x", b"y" * 1000, b"z" * 1000]
+    pa_table, truncated_columns = reader.read_truncated_binary(list(features), max_binary_length=100_000)
+    assert truncated_columns == []
@@ -0,0 +1,158 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import asyncio
+import io
+from pathlib import Path
+from typing import Optional
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fsspec.implementations.http import HTTPFileSystem
+
+from libcommon.range_reads import (
+    ByteRange,
+    PrefetchedRangesFile,
+    RangeReadsPlanner,
+    get_column_chunks_byte_ranges,
+    merge_byte_ranges,
+)
+
+
+@pytest.fixture
+def parquet_data(tmp_path: Path) -> bytes:
+    table = pa.table({"a": list(range(100)), "b": [str(i) for i in range(100)], "c": [{"d": i} for i in range(100)]})
+    path = tmp_path / "data.parquet"
+    pq.write_table(table, path, row_group_size=10)
+    return path.read_bytes()
+
+
+class FileThatFailsOnRead(io.BytesIO):
+    def read(self, size: Optional[int] = -1) -> bytes:
+        raise RuntimeError("should be read from the prefetched byte ranges")
+
+
+@pytest.mark.parametrize(
+    "byte_ranges,max_hole_size,max_range_size,expected",
+    [
+        ([], 10, 100, []),
+        ([(0, 10)], 10, 100, [(0, 10)]),
+        ([(20, 30), (0, 10)], 10, 100, [(0, 30)]),
+        ([(0, 10), (21, 30)], 10, 100, [(0, 10), (21, 30)]),
+        ([(0, 10), (5, 8), (10, 20)], 0, 100, [(0, 20)]),
+        ([(0, 10), (10, 20), (20, 30)], 0, 20, [(0, 20), (20, 30)]),
+        ([(0, 50), (50, 60)], 0, 20, [(0, 50), (50, 60)]),
+    ],
+)
+def test_merge_byte_ranges(
+    byte_ranges: list[ByteRange], max_hole_size: int, max_range_size: int, expected: list[ByteRange]
+) -> None:
+    assert merge_byte_ranges(byte_ranges, max_hole_size=max_hole_size, max_range_size=max_range_size) == expected
+
+
+def test_get_column_chunks_byte_ranges(parquet_data: bytes) -> None:
+    row_group_metadata = pq.ParquetFile(io.BytesIO(parquet_data)).metadata.row_group(1)
+    byte_ranges = get_column_chunks_byte_ranges(row_group_metadata)
+    assert len(byte_ranges) == 3
+    assert get_column_chunks_byte_ranges(row_group_metadata, columns=["b", "c"]) == byte_ranges[1:]
+    assert get_column_chunks_byte_ranges(row_group_metadata, columns=[]) == []
+
+
+def test_prefetched_ranges_file(parquet_data: bytes) -> None:
+    metadata = pq.ParquetFile(io.BytesIO(parquet_data)).metadata
+    file = PrefetchedRangesFile(FileThatFailsOnRead(parquet_data), size=len(parquet_data))
+    parquet_file = pq.ParquetFile(file, metadata=metadata, pre_buffer=True)
+    byte_ranges = [
+        byte_range
+        for group_id in [2, 3]
+        for byte_range in get_column_chunks_byte_ranges(metadata.row_group(group_id), columns=["a", "c"])
+    ]
+    merged_byte_ranges = merge_byte_ranges(byte_ranges, max_hole_size=1_000, max_range_size=1_000_000)
+    assert len(merged_byte_ranges) == 1
+    file.add_byte_ranges({(start, end): parquet_data[start:end] for start, end in merged_byte_ranges})
+    assert all(file.has_byte_range(byte_range) for byte_range in byte_ranges)
+    table = parquet_file.read_row_groups([2, 3], columns=["a", "c"])
+    assert table.column("a").to_pylist() == list(range(20, 40))
+    with pytest.raises(RuntimeError):
+        parquet_file.read_row_group(4, columns=["a"])
+
+
+def test_range_reads_planner_prefetch(parquet_data: bytes) -> None:
+    requests: list[tuple[str, ByteRange]] = []
+
+    async def cat_file(url: str, start: int, end: int) -> bytes:
+        requests.append((url, (start, end)))
+        return parquet_data[start:end]
+
+    httpfs = HTTPFileSystem()
+    first_file = PrefetchedRangesFile(FileThatFailsOnRead(parquet_data), size=len(parquet_data))
+    second_file = PrefetchedRangesFile(FileThatFailsOnRead(parquet_data), size=len(parquet_data))
+    planner = RangeReadsPlanner(max_hole_size=0, max_range_size=1_000_000)
+    with patch.object(httpfs, "_cat_file", side_effect=cat_file):
+        planner.prefetch(
+            httpfs,
+            [
+                (first_file, "https://first", [(0, 10), (10, 20), (30, 40)]),
+                (second_file, "https://second", [(0, 10)]),
+            ],
+        )
+        assert sorted(requests) == [
+            ("https://first", (0, 20)),
+            ("https://first", (30, 40)),
+            ("https://second", (0, 10)),
+        ]
+        first_file.seek(5)
+        assert first_file.read(10) == parquet_data[5:15]
+        assert first_file.tell() == 15
+        # the byte ranges that are already prefetched are not requested again
+        requests.clear()
+        planner.prefetch(httpfs, [(first_file, "https://first", [(0, 10), (35, 50)])])
+        assert requests == [("https://first", (35, 50))]
+
+
+@pytest.mark.parametrize("max_concurrent_requests", [1, 3, 100])
+def test_range_reads_planner_max_concurrent_requests(parquet_data: bytes, max_concurrent_requests: int) -> None:
+    num_in_flight = 0
+    max_num_in_flight = 0
+
+    async def cat_file(url: str, start: int, end: int) -> bytes:
+        nonlocal num_in_flight, max_num_in_flight
+        num_in_flight += 1
+        max_num_in_flight = max(max_num_in_flight, num_in_flight)
+        await asyncio.sleep(0.01)
+        num_in_flight -= 1
+        return parquet_data[start:end]
+
+    httpfs = HTTPFileSystem()
+    file = PrefetchedRangesFile(FileThatFailsOnRead(parquet_data), size=len(parquet_data))
+    planner = RangeReadsPlanner(
+        max_hole_size=0, max_range_size=1_000_000, max_concurrent_requests=max_concurrent_requests
+    )
+    byte_ranges = [(start, start + 5) for start in range(0, 100, 10)]
+    with patch.object(httpfs, "_cat_file", side_effect=cat_file):
+        planner.prefetch(httpfs, [(file, "https://first", byte_ranges)])
+    assert max_num_in_flight == min(max_concurrent_requests, len(byte_ranges))
+    assert all(file.has_byte_range(byte_range) for byte_range in byte_ranges)
+    with pytest.raises(ValueError):
+        RangeReadsPlanner(max_hole_size=0, max_range_size=1_000_000, max_concurrent_requests=0)
+
+
+@pytest.mark.anyio
+async def test_range_reads_planner_plan_fetch_store(parquet_data: bytes) -> None:
+    async def cat_file(url: str, start: int, end: int) -> bytes:
+        return parquet_data[start:end]
+
+    httpfs = HTTPFileSystem()
+    file = PrefetchedRangesFile(FileThatFailsOnRead(parquet_data), size=len(parquet_data))
+    planner = RangeReadsPlanner(max_hole_size=0, max_range_size=1_000_000)
+    requests = planner.plan([(file, "https://first", [(0, 10), (10, 20), (30, 40)])])
+    assert requests == [(file, "https://first", (0, 20)), (file, "https://first", (30, 40))]
+    with patch.object(httpfs, "_cat_file", side_effect=cat_file):
+        # the requests are sent from the event loop of the filesystem, without blocking the current one
+        results = await planner.fetch(httpfs, requests)
+    assert results == [parquet_data[0:20], parquet_data[30:40]]
+    planner.store(requests, results)
+    assert file.has_byte_range((5, 15))
+    assert planner.plan([(file, "https://first", [(0, 10)])]) == []
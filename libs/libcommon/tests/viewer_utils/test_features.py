@@ -20,6 +20,7 @@ from libcommon.url_preparator import URLPreparator
 from libcommon.viewer_utils.features import (
     get_cell_value,
     get_supported_unsupported_columns,
+    has_asset_feature,
     infer_audio_file_extension,
     to_features_list,
 )
@@ -123,6 +124,23 @@ def test_get_supported_unsupported_columns() -> None:
     assert unsupported_columns == ["audio1", "audio2", "audio3", "binary"]
 
 
+@pytest.mark.parametrize(
+    "feature,expected",
+    [
+        (Value("string"), False),
+        (List(Value("int32")), False),
+        ({"a": Value("string"), "b": List({"c": Value("float32")})}, False),
+        (Image(), True),
+        (Audio(), True),
+        (List(Image()), True),
+        (Features({"a": [Pdf()]}), True),
+        ({"a": Value("string"), "b": List({"c": Audio()})}, True),
+    ],
+)
+def test_has_asset_feature(feature: Any, expected: bool) -> None:
+    assert has_asset_feature(feature) == expected
+
+
 # specific test created for https://github.com/huggingface/dataset-viewer/issues/2045
 # which is reproduced only when using s3 for fsspec
 def test_ogg_audio_with_s3(
@@ -8,9 +8,10 @@ from libapi.routes.healthcheck import healthcheck_endpoint
 from libapi.routes.metrics import create_metrics_endpoint
 from libapi.utils import EXPOSED_HEADERS
 from libcommon.cloudfront import get_cloudfront_signer
+from libcommon.disk_block_cache import DiskBlockCache
 from libcommon.log import init_logging
 from libcommon.resources import CacheMongoResource, QueueMongoResource, Resource
-from libcommon.storage import exists, init_parquet_metadata_dir
+from libcommon.storage import exists, init_parquet_metadata_dir, init_rows_index_disk_cache_dir
 from libcommon.storage_client import StorageClient
 from libcommon.url_preparator import URLPreparator
 from starlette.applications import Starlette
@@ -36,6 +37,16 @@ def create_app_with_config(app_config: AppConfig) -> Starlette:
     if not exists(parquet_metadata_directory):
         raise RuntimeError("The parquet metadata storage directory could not be accessed. Exiting.")
 
+    disk_block_cache = (
+        DiskBlockCache(
+            directory=init_rows_index_disk_cache_dir(directory=app_config.rows_index.disk_cache_directory),
+            max_bytes=app_config.rows_index.disk_cache_max_bytes,
+            block_size=app_config.rows_index.disk_cache_block_size,
+        )
+        if app_config.rows_index.disk_cache_max_bytes > 0
+        else None
+    )
+
     hf_jwt_public_keys = get_jwt_public_keys(
         algorithm_name=app_config.api.hf_jwt_algorithm,
         public_key_url=app_config.api.hf_jwt_public_key_url,
@@ -97,6 +108,17 @@ def create_app_with_config(app_config: AppConfig) -> Starlette:
                 cached_assets_storage_client=cached_assets_storage_client,
                 parquet_metadata_directory=parquet_metadata_directory,
                 max_arrow_data_in_memory=app_config.rows_index.max_arrow_data_in_memory,
+                row_group_cache_max_bytes=app_config.rows_index.row_group_cache_max_bytes,
+                parquet_metadata_cache_max_bytes=app_config.rows_index.parquet_metadata_cache_max_bytes,
+                parquet_metadata_cache_max_entries=app_config.rows_index.parquet_metadata_cache_max_entries,
+                splits_cache_max_bytes=app_config.rows_index.splits_cache_max_bytes,
+                splits_cache_max_entries=app_config.rows_index.splits_cache_max_entries,
+                splits_cache_ttl_seconds=app_config.rows_index.splits_cache_ttl_seconds,
+                range_reads_max_hole_size=app_config.rows_index.range_reads_max_hole_size,
+                range_reads_max_range_size=app_config.rows_index.range_reads_max_range_size,
+                range_reads_max_concurrent_requests=app_config.rows_index.range_reads_max_concurrent_requests,
+                disk_block_cache=disk_block_cache,
+                query_threads=app_config.rows_index.query_threads,
                 hf_endpoint=app_config.common.hf_endpoint,
                 hf_token=app_config.common.hf_token,
                 blocked_datasets=app_config.common.blocked_datasets,
@@ -2,28 +2,47 @@
 # Copyright 2022 The HuggingFace Authors.
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from http import HTTPStatus
 from typing import Literal, Optional, Union
 
+import anyio
 from fsspec.implementations.http import HTTPFileSystem
 from libapi.authentication import auth_check
-from libapi.exceptions import ApiError, TooBigContentError, UnexpectedApiError
+from libapi.exceptions import (
+    ApiError,
+    ClientDisconnectedError,
+    InvalidParameterError,
+    TooBigContentError,
+    UnexpectedApiError,
+)
 from libapi.request import (
     get_request_parameter,
+    get_request_parameter_columns,
     get_request_parameter_length,
     get_request_parameter_offset,
 )
 from libapi.response import create_response
 from libapi.utils import (
     Endpoint,
+    cancel_on_disconnect,
     get_json_api_error_response,
     get_json_error_response,
     get_json_ok_response,
     try_backfill_dataset_then_raise,
 )
 from libcommon.constants import CONFIG_PARQUET_METADATA_KIND
-from libcommon.parquet_utils import Indexer, TooBigRows
+from libcommon.disk_block_cache import DiskBlockCache
+from libcommon.parquet_utils import (
+    Indexer,
+    ParquetMetadataCache,
+    RowGroupCache,
+    RowsIndexCache,
+    TooBigRows,
+)
 from libcommon.prometheus import StepProfiler
+from libcommon.range_reads import DEFAULT_MAX_CONCURRENT_REQUESTS, RangeReadsPlanner
 from libcommon.simple_cache import CachedArtifactError, CachedArtifactNotFoundError
 from libcommon.storage import StrPath
 from libcommon.storage_client import StorageClient
@@ -44,6 +63,17 @@ def create_rows_endpoint(
     max_arrow_data_in_memory: int,
     hf_endpoint: str,
     blocked_datasets: list[str],
+    row_group_cache_max_bytes: int = 0,
+    parquet_metadata_cache_max_bytes: int = 0,
+    parquet_metadata_cache_max_entries: Optional[int] = None,
+    splits_cache_max_bytes: int = 0,
+    splits_cache_max_entries: int = 0,
+    splits_cache_ttl_seconds: float = 0,
+    range_reads_max_hole_size: int = 0,
+    range_reads_max_range_size: int = 0,
+    range_reads_max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+    disk_block_cache: Optional[DiskBlockCache] = None,
+    query_threads: Optional[int] = None,
     hf_token: Optional[str] = None,
     hf_jwt_public_keys: Optional[list[str]] = None,
     hf_jwt_algorithm: Optional[str] = None,
@@ -59,10 +89,30 @@ def create_rows_endpoint(
         httpfs=HTTPFileSystem(headers={"authorization": f"Bearer {hf_token}"}),
         max_arrow_data_in_memory=max_arrow_data_in_memory,
         all_columns_supported_datasets_allow_list=ALL_COLUMNS_SUPPORTED_DATASETS_ALLOW_LIST,
+        row_group_cache=RowGroupCache(max_bytes=row_group_cache_max_bytes),
+        rows_index_cache=RowsIndexCache(
+            max_bytes=splits_cache_max_bytes,
+            max_entries=splits_cache_max_entries,
+            ttl_seconds=splits_cache_ttl_seconds,
+        ),
+        parquet_metadata_cache=ParquetMetadataCache(
+            max_bytes=parquet_metadata_cache_max_bytes, max_entries=parquet_metadata_cache_max_entries
+        ),
+        range_reads_planner=(
+            RangeReadsPlanner(
+                max_hole_size=range_reads_max_hole_size,
+                max_range_size=range_reads_max_range_size,
+                max_concurrent_requests=range_reads_max_concurrent_requests,
+            )
+            if range_reads_max_range_size > 0
+            else None
+        ),
+        disk_block_cache=disk_block_cache,
     )
+    # the row groups are selected and decoded in these threads, the range requests are sent from the event loop
+    query_executor = ThreadPoolExecutor(max_workers=query_threads, thread_name_prefix="rows_query")
 
     async def rows_endpoint(request: Request) -> Response:
-        await indexer.httpfs.set_session()
         revision: Optional[str] = None
         with StepProfiler(method="rows_endpoint", step="all"):
             try:
@@ -72,7 +122,8 @@ def create_rows_endpoint(
                     split = get_request_parameter(request, "split", required=True)
                     offset = get_request_parameter_offset(request)
                     length = get_request_parameter_length(request)
-                    logging.info(f"/rows, {dataset=}, {config=}, {split=}, {offset=}, {length=}")
+                    columns = get_request_parameter_columns(request)
+                    logging.info(f"/rows, {dataset=}, {config=}, {split=}, {offset=}, {length=}, {columns=}")
                 if dataset == "HuggingFaceFW/fineweb-edu-score-2" and offset > 1_000_000:
                     return get_json_error_response(
                         content="too many requests",
@@ -91,17 +142,31 @@ def create_rows_endpoint(
                     )
                 try:
                     with StepProfiler(method="rows_endpoint", step="get row groups index"):
-                        rows_index = indexer.get_rows_index(
-                            dataset=dataset,
-                            config=config,
-                            split=split,
+                        rows_index = await anyio.to_thread.run_sync(
+                            partial(indexer.get_rows_index, dataset=dataset, config=config, split=split)
                         )
                         revision = rows_index.revision
+                    if columns is not None:
+                        unknown_columns = [
+                            column for column in columns if column not in rows_index.parquet_index.features
+                        ]
+                        if unknown_columns:
+                            raise InvalidParameterError(
+                                f"Parameter 'columns' contains unknown columns: {unknown_columns}"
+                            )
                     with StepProfiler(method="rows_endpoint", step="query the rows"):
                         try:
                             # Some datasets have very long binary data that we truncate
-                            pa_table, truncated_columns = rows_index.query_truncated_binary(
-                                offset=offset, length=length
+                            # the query is cancelled if the client disconnects
+                            pa_table, truncated_columns = await cancel_on_disconnect(
+                                request,
+                                partial(
+                                    rows_index.query_truncated_binary_async,
+                                    offset=offset,
+                                    length=length,
+                                    columns=columns,
+                                    executor=query_executor,
+                                ),
                             )
                         except TooBigRows as err:
                             raise TooBigContentError(str(err)) from None
@@ -114,8 +179,12 @@ def create_rows_endpoint(
                             storage_client=cached_assets_storage_client,
                             pa_table=pa_table,
                             offset=offset,
-                            features=rows_index.parquet_index.features,
-                            unsupported_columns=rows_index.parquet_index.unsupported_columns,
+                            features=rows_index.parquet_index.get_features(columns),
+                            unsupported_columns=[
+                                column
+                                for column in rows_index.parquet_index.unsupported_columns
+                                if columns is None or column in columns
+                            ],
                             partial=rows_index.parquet_index.partial,
                             num_rows_total=rows_index.parquet_index.num_rows_total,
                             truncated_columns=truncated_columns,
@@ -133,6 +202,10 @@ def create_rows_endpoint(
                         )
                 with StepProfiler(method="rows_endpoint", step="generate the OK response"):
                     return get_json_ok_response(content=response, max_age=max_age_long, revision=revision)
+            except ClientDisconnectedError:
+                logging.info("/rows: the client disconnected, the query has been cancelled")
+                # non-standard "Client Closed Request" status code (as in nginx), only seen in the logs and metrics
+                return Response(status_code=499)
             except CachedArtifactError as e:
                 content = e.cache_entry_with_details["content"]
                 http_status = e.cache_entry_with_details["http_status"]
@@ -74,6 +74,11 @@ def test_get_split_missing_parameter(
     assert response.status_code == 422
 
 
+def test_get_rows_invalid_columns_parameter(client: TestClient) -> None:
+    response = client.get("/rows", params={"dataset": "a", "config": "b", "split": "c", "columns": ""})
+    assert response.status_code == 422
+
+
 def test_metrics(client: TestClient) -> None:
     response = client.get("/healthcheck")
     response = client.get("/metrics")
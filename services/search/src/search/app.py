@@ -1,6 +1,8 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright 2023 The HuggingFace Authors.
 
+from functools import partial
+
 import uvicorn
 from libapi.config import UvicornConfig
 from libapi.jwt_token import get_jwt_public_keys
@@ -21,6 +23,10 @@ from starlette.routing import Route
 from starlette_prometheus import PrometheusMiddleware
 
 from search.config import AppConfig
+from search.duckdb_connection import DuckDBConnectionPool
+from search.janitor import IndexJanitor
+from search.prebuild import IndexPrebuilder, build_split_index
+from search.results_cache import RankedRowsCache
 from search.routes.filter import create_filter_endpoint
 from search.routes.search import create_search_endpoint
 
@@ -37,6 +43,32 @@ def create_app_with_config(app_config: AppConfig) -> Starlette:
     duckdb_index_cache_directory = init_duckdb_index_cache_dir(directory=app_config.duckdb_index.cache_directory)
     if not exists(duckdb_index_cache_directory):
         raise RuntimeError("The duckdb_index cache directory could not be accessed. Exiting.")
+    # shared by /search and /filter
+    connection_pool = (
+        DuckDBConnectionPool(
+            extensions_directory=app_config.duckdb_index.extensions_directory,
+            max_connections_per_file=app_config.duckdb_index.connections_max_per_file,
+            max_idle_seconds=app_config.duckdb_index.connections_max_idle_seconds,
+        )
+        if app_config.duckdb_index.connections_max_per_file > 0
+        else None
+    )
+    index_janitor = IndexJanitor(
+        duckdb_index_file_directory=duckdb_index_cache_directory,
+        interval_seconds=app_config.duckdb_index.janitor_interval_seconds,
+        expired_time_interval_seconds=app_config.duckdb_index.expired_time_interval_seconds,
+        high_water_mark_percent=app_config.duckdb_index.janitor_high_water_mark_percent,
+        low_water_mark_percent=app_config.duckdb_index.janitor_low_water_mark_percent,
+        connection_pool=connection_pool,
+    )
+    results_cache = (
+        RankedRowsCache(
+            max_bytes=app_config.duckdb_index.results_cache_max_bytes,
+            max_rows_per_entry=app_config.duckdb_index.results_cache_max_rows_per_entry,
+        )
+        if app_config.duckdb_index.results_cache_max_bytes > 0
+        else None
+    )
     parquet_metadata_directory = init_parquet_metadata_dir(directory=app_config.parquet_metadata.storage_directory)
     if not exists(parquet_metadata_directory):
         raise RuntimeError("The parquet metadata storage directory could not be accessed. Exiting.")
@@ -84,12 +116,51 @@ def create_app_with_config(app_config: AppConfig) -> Starlette:
         # no need to specify a url_signer
     )
     storage_clients = [cached_assets_storage_client, assets_storage_client]
+    # the index files built by a replica are shared with the other ones
+    shared_index_storage_client = (
+        StorageClient(
+            protocol=app_config.duckdb_index.shared_storage_protocol,
+            storage_root=app_config.duckdb_index.shared_storage_root,
+            base_url="",
+            s3_config=app_config.s3,
+        )
+        if app_config.duckdb_index.shared_storage_root
+        else None
+    )
     resources: list[Resource] = [cache_resource, queue_resource]
     if not cache_resource.is_available():
         raise RuntimeError("The connection to the cache database could not be established. Exiting.")
     if not queue_resource.is_available():
         raise RuntimeError("The connection to the queue database could not be established. Exiting.")
 
+    index_prebuilder = (
+        IndexPrebuilder(
+            build_index=partial(
+                build_split_index,
+                duckdb_index_file_directory=duckdb_index_cache_directory,
+                parquet_metadata_directory=parquet_metadata_directory,
+                hf_endpoint=app_config.common.hf_endpoint,
+                blocked_datasets=app_config.common.blocked_datasets,
+                hf_token=app_config.common.hf_token,
+                hf_timeout_seconds=app_config.api.hf_timeout_seconds,
+                storage_clients=storage_clients,
+                extensions_directory=app_config.duckdb_index.extensions_directory,
+                stream_parquet_files=app_config.duckdb_index.stream_parquet_files,
+                build_memory_limit=app_config.duckdb_index.build_memory_limit,
+                sort_indexes_max_columns=app_config.duckdb_index.sort_indexes_max_columns,
+                shared_storage_client=shared_index_storage_client,
+            ),
+            duckdb_index_file_directory=duckdb_index_cache_directory,
+            max_splits=app_config.duckdb_index.prebuild_max_splits,
+            max_concurrent_builds=app_config.duckdb_index.prebuild_max_concurrent_builds,
+            interval_seconds=app_config.duckdb_index.prebuild_interval_seconds,
+            half_life_seconds=app_config.duckdb_index.prebuild_half_life_seconds,
+            min_free_disk_bytes=app_config.duckdb_index.prebuild_min_free_disk_bytes,
+        )
+        if app_config.duckdb_index.prebuild_max_splits > 0
+        else None
+    )
+
     routes = [
         Route("/healthcheck", endpoint=healthcheck_endpoint),
         Route("/metrics", endpoint=create_metrics_endpoint()),
@@ -111,8 +182,14 @@ def create_app_with_config(app_config: AppConfig) -> Starlette:
                 max_age_short=app_config.api.max_age_short,
                 storage_clients=storage_clients,
                 extensions_directory=app_config.duckdb_index.extensions_directory,
-                clean_cache_proba=app_config.duckdb_index.clean_cache_proba,
-                expiredTimeIntervalSeconds=app_config.duckdb_index.expired_time_interval_seconds,
+                connection_pool=connection_pool,
+                stream_parquet_files=app_config.duckdb_index.stream_parquet_files,
+                build_memory_limit=app_config.duckdb_index.build_memory_limit,
+                sort_indexes_max_columns=app_config.duckdb_index.sort_indexes_max_columns,
+                index_prebuilder=index_prebuilder,
+                index_janitor=index_janitor,
+                shared_index_storage_client=shared_index_storage_client,
+                results_cache=results_cache,
             ),
         ),
         Route(
@@ -132,13 +209,27 @@ def create_app_with_config(app_config: AppConfig) -> Starlette:
                 max_age_short=app_config.api.max_age_short,
                 storage_clients=storage_clients,
                 extensions_directory=app_config.duckdb_index.extensions_directory,
-                clean_cache_proba=app_config.duckdb_index.clean_cache_proba,
-                expiredTimeIntervalSeconds=app_config.duckdb_index.expired_time_interval_seconds,
+                connection_pool=connection_pool,
+                stream_parquet_files=app_config.duckdb_index.stream_parquet_files,
+                build_memory_limit=app_config.duckdb_index.build_memory_limit,
+                sort_indexes_max_columns=app_config.duckdb_index.sort_indexes_max_columns,
+                index_prebuilder=index_prebuilder,
+                index_janitor=index_janitor,
+                shared_index_storage_client=shared_index_storage_client,
+                filter_count_cache_max_entries=app_config.duckdb_index.filter_count_cache_max_entries,
+                results_cache=results_cache,
             ),
         ),
     ]
 
-    return Starlette(routes=routes, middleware=middleware, on_shutdown=[resource.release for resource in resources])
+    return Starlette(
+        routes=routes,
+        middleware=middleware,
+        on_startup=[index_janitor.start] + ([] if index_prebuilder is None else [index_prebuilder.start]),
+        on_shutdown=[resource.release for resource in resources]
+        + [index_janitor.stop]
+        + ([] if index_prebuilder is None else [index_prebuilder.stop]),
+    )
 
 
 def start() -> None:
@@ -7,6 +7,7 @@ from typing import Optional
 from environs import Env
 from libapi.config import ApiConfig
 from libcommon.config import (
+    STORAGE_PROTOCOL_VALUES,
     AssetsConfig,
     CacheConfig,
     CachedAssetsConfig,
@@ -16,21 +17,57 @@ from libcommon.config import (
     ParquetMetadataConfig,
     QueueConfig,
     S3Config,
+    StorageProtocol,
 )
+from marshmallow.validate import OneOf
 
 DUCKDB_INDEX_CACHE_DIRECTORY = None
-DUCKDB_INDEX_CACHE_CLEAN_CACHE_PROBA = 0.05
 DUCKDB_INDEX_CACHE_EXPIRED_TIME_INTERVAL_SECONDS = 3_600  # 1 hour
 
 DUCKDB_INDEX_EXTENSIONS_DIRECTORY: Optional[str] = None
+DUCKDB_INDEX_CONNECTIONS_MAX_PER_FILE = 4
+DUCKDB_INDEX_CONNECTIONS_MAX_IDLE_SECONDS = 300.0
+DUCKDB_INDEX_FILTER_COUNT_CACHE_MAX_ENTRIES = 10_000
+DUCKDB_INDEX_RESULTS_CACHE_MAX_BYTES = 100_000_000
+DUCKDB_INDEX_RESULTS_CACHE_MAX_ROWS_PER_ENTRY = 100_000
+DUCKDB_INDEX_STREAM_PARQUET_FILES = False
+DUCKDB_INDEX_BUILD_MEMORY_LIMIT = "1GB"
+DUCKDB_INDEX_SORT_INDEXES_MAX_COLUMNS = 0
+DUCKDB_INDEX_PREBUILD_MAX_SPLITS = 20
+DUCKDB_INDEX_PREBUILD_MAX_CONCURRENT_BUILDS = 1
+DUCKDB_INDEX_PREBUILD_INTERVAL_SECONDS = 60.0
+DUCKDB_INDEX_PREBUILD_HALF_LIFE_SECONDS = 3_600.0
+DUCKDB_INDEX_PREBUILD_MIN_FREE_DISK_BYTES = 10_000_000_000
+DUCKDB_INDEX_SHARED_STORAGE_PROTOCOL: StorageProtocol = "file"
+DUCKDB_INDEX_SHARED_STORAGE_ROOT: Optional[str] = None
+DUCKDB_INDEX_JANITOR_INTERVAL_SECONDS = 60.0
+DUCKDB_INDEX_JANITOR_HIGH_WATER_MARK_PERCENT = 80.0
+DUCKDB_INDEX_JANITOR_LOW_WATER_MARK_PERCENT = 70.0
 
 
 @dataclass(frozen=True)
 class DuckDbIndexConfig:
     cache_directory: Optional[str] = DUCKDB_INDEX_CACHE_DIRECTORY
-    clean_cache_proba: float = DUCKDB_INDEX_CACHE_CLEAN_CACHE_PROBA
     expired_time_interval_seconds: int = DUCKDB_INDEX_CACHE_EXPIRED_TIME_INTERVAL_SECONDS
     extensions_directory: Optional[str] = DUCKDB_INDEX_EXTENSIONS_DIRECTORY
+    connections_max_per_file: int = DUCKDB_INDEX_CONNECTIONS_MAX_PER_FILE
+    connections_max_idle_seconds: float = DUCKDB_INDEX_CONNECTIONS_MAX_IDLE_SECONDS
+    filter_count_cache_max_entries: int = DUCKDB_INDEX_FILTER_COUNT_CACHE_MAX_ENTRIES
+    results_cache_max_bytes: int = DUCKDB_INDEX_RESULTS_CACHE_MAX_BYTES
+    results_cache_max_rows_per_entry: int = DUCKDB_INDEX_RESULTS_CACHE_MAX_ROWS_PER_ENTRY
+    stream_parquet_files: bool = DUCKDB_INDEX_STREAM_PARQUET_FILES
+    build_memory_limit: str = DUCKDB_INDEX_BUILD_MEMORY_LIMIT
+    sort_indexes_max_columns: int = DUCKDB_INDEX_SORT_INDEXES_MAX_COLUMNS
+    prebuild_max_splits: int = DUCKDB_INDEX_PREBUILD_MAX_SPLITS
+    prebuild_max_concurrent_builds: int = DUCKDB_INDEX_PREBUILD_MAX_CONCURRENT_BUILDS
+    prebuild_interval_seconds: float = DUCKDB_INDEX_PREBUILD_INTERVAL_SECONDS
+    prebuild_half_life_seconds: float = DUCKDB_INDEX_PREBUILD_HALF_LIFE_SECONDS
+    prebuild_min_free_disk_bytes: int = DUCKDB_INDEX_PREBUILD_MIN_FREE_DISK_BYTES
+    shared_storage_protocol: StorageProtocol = DUCKDB_INDEX_SHARED_STORAGE_PROTOCOL
+    shared_storage_root: Optional[str] = DUCKDB_INDEX_SHARED_STORAGE_ROOT
+    janitor_interval_seconds: float = DUCKDB_INDEX_JANITOR_INTERVAL_SECONDS
+    janitor_high_water_mark_percent: float = DUCKDB_INDEX_JANITOR_HIGH_WATER_MARK_PERCENT
+    janitor_low_water_mark_percent: float = DUCKDB_INDEX_JANITOR_LOW_WATER_MARK_PERCENT
 
     @classmethod
     def from_env(cls) -> "DuckDbIndexConfig":
@@ -38,14 +75,62 @@ class DuckDbIndexConfig:
         with env.prefixed("DUCKDB_INDEX_"):
             return cls(
                 cache_directory=env.str(name="CACHE_DIRECTORY", default=DUCKDB_INDEX_CACHE_DIRECTORY),
-                clean_cache_proba=env.float(
-                    name="CACHE_CLEAN_CACHE_PROBA", default=DUCKDB_INDEX_CACHE_CLEAN_CACHE_PROBA
-                ),
                 expired_time_interval_seconds=env.int(
                     name="CACHE_EXPIRED_TIME_INTERVAL_SECONDS",
                     default=DUCKDB_INDEX_CACHE_EXPIRED_TIME_INTERVAL_SECONDS,
                 ),
                 extensions_directory=env.str(name="EXTENSIONS_DIRECTORY", default=DUCKDB_INDEX_EXTENSIONS_DIRECTORY),
+                connections_max_per_file=env.int(
+                    name="CONNECTIONS_MAX_PER_FILE", default=DUCKDB_INDEX_CONNECTIONS_MAX_PER_FILE
+                ),
+                connections_max_idle_seconds=env.float(
+                    name="CONNECTIONS_MAX_IDLE_SECONDS", default=DUCKDB_INDEX_CONNECTIONS_MAX_IDLE_SECONDS
+                ),
+                filter_count_cache_max_entries=env.int(
+                    name="FILTER_COUNT_CACHE_MAX_ENTRIES", default=DUCKDB_INDEX_FILTER_COUNT_CACHE_MAX_ENTRIES
+                ),
+                results_cache_max_bytes=env.int(
+                    name="RESULTS_CACHE_MAX_BYTES", default=DUCKDB_INDEX_RESULTS_CACHE_MAX_BYTES
+                ),
+                results_cache_max_rows_per_entry=env.int(
+                    name="RESULTS_CACHE_MAX_ROWS_PER_ENTRY", default=DUCKDB_INDEX_RESULTS_CACHE_MAX_ROWS_PER_ENTRY
+                ),
+                stream_parquet_files=env.bool(name="STREAM_PARQUET_FILES", default=DUCKDB_INDEX_STREAM_PARQUET_FILES),
+                build_memory_limit=env.str(name="BUILD_MEMORY_LIMIT", default=DUCKDB_INDEX_BUILD_MEMORY_LIMIT),
+                sort_indexes_max_columns=env.int(
+                    name="SORT_INDEXES_MAX_COLUMNS", default=DUCKDB_INDEX_SORT_INDEXES_MAX_COLUMNS
+                ),
+                prebuild_max_splits=env.int(name="PREBUILD_MAX_SPLITS", default=DUCKDB_INDEX_PREBUILD_MAX_SPLITS),
+                prebuild_max_concurrent_builds=env.int(
+                    name="PREBUILD_MAX_CONCURRENT_BUILDS", default=DUCKDB_INDEX_PREBUILD_MAX_CONCURRENT_BUILDS
+                ),
+                prebuild_interval_seconds=env.float(
+                    name="PREBUILD_INTERVAL_SECONDS", default=DUCKDB_INDEX_PREBUILD_INTERVAL_SECONDS
+                ),
+                prebuild_half_life_seconds=env.float(
+                    name="PREBUILD_HALF_LIFE_SECONDS", default=DUCKDB_INDEX_PREBUILD_HALF_LIFE_SECONDS
+                ),
+                prebuild_min_free_disk_bytes=env.int(
+                    name="PREBUILD_MIN_FREE_DISK_BYTES", default=DUCKDB_INDEX_PREBUILD_MIN_FREE_DISK_BYTES
+                ),
+                shared_storage_protocol=env.str(
+                    name="SHARED_STORAGE_PROTOCOL",
+                    default=DUCKDB_INDEX_SHARED_STORAGE_PROTOCOL,
+                    validate=OneOf(
+                        STORAGE_PROTOCOL_VALUES,
+                        error="DUCKDB_INDEX_SHARED_STORAGE_PROTOCOL must be one of: {choices}",
+                    ),
+                ),
+                shared_storage_root=env.str(name="SHARED_STORAGE_ROOT", default=DUCKDB_INDEX_SHARED_STORAGE_ROOT),
+                janitor_interval_seconds=env.float(
+                    name="JANITOR_INTERVAL_SECONDS", default=DUCKDB_INDEX_JANITOR_INTERVAL_SECONDS
+                ),
+                janitor_high_water_mark_percent=env.float(
+                    name="JANITOR_HIGH_WATER_MARK_PERCENT", default=DUCKDB_INDEX_JANITOR_HIGH_WATER_MARK_PERCENT
+                ),
+                janitor_low_water_mark_percent=env.float(
+                    name="JANITOR_LOW_WATER_MARK_PERCENT", default=DUCKDB_INDEX_JANITOR_LOW_WATER_MARK_PERCENT
+                ),
             )
 
 
@@ -1,6 +1,14 @@
-from typing import Any, Optional
+import fcntl
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager
+from typing import Any, BinaryIO, Optional
 
 import duckdb
+from filelock import FileLock, Timeout
 
 ATTACH_READ_ONLY_DATABASE = "ATTACH '{database}' as db (READ_ONLY); USE db;"
 LOAD_FTS_SAFE_COMMAND = "INSTALL 'fts'; LOAD 'fts'; SET enable_external_access=false; SET lock_configuration=true;"
@@ -18,3 +26,225 @@ def duckdb_connect_readonly(
         con.execute(SET_EXTENSIONS_DIRECTORY_COMMAND.format(directory=extensions_directory))
     con.sql(LOAD_FTS_SAFE_COMMAND)
     return con
+
+
+def get_file_identity(path: str) -> Optional[tuple[int, int]]:
+    # the modification time is updated on every request (see get_index_file_location_and_build_if_missing), so a
+    # file that has been replaced is detected by its inode. Note that the path contains the revision of the dataset,
+    # so a new file at the same path has the same content.
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def open_index_file_shared(path: str) -> BinaryIO:
+    """Open an index file with a shared lock, held while connections to the file are open.
+
+    The index janitor does not delete an index file that is locked (see `remove_index_file_if_unused`).
+    """
+    file = open(path, "rb")
+    try:
+        fcntl.flock(file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        # the file may have been deleted between the opening and the lock
+        stat = os.fstat(file.fileno())
+        if get_file_identity(path) != (stat.st_dev, stat.st_ino):
+            raise FileNotFoundError(f"The index file {path} has been deleted.")
+    except BlockingIOError as err:
+        file.close()
+        raise FileNotFoundError(f"The index file {path} is being deleted.") from err
+    except BaseException:
+        file.close()
+        raise
+    return file
+
+
+def remove_index_file_if_unused(path: str) -> bool:
+    """Delete an index file, unless connections to it are open (see `open_index_file_shared`), or it's being built
+    or requested (see `get_index_file_location_and_build_if_missing`).
+
+    Returns:
+        `bool`: True if the file has been deleted, or was already missing.
+    """
+    try:
+        with FileLock(path + ".lock", timeout=0), open(path, "rb") as file:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    except (Timeout, BlockingIOError):
+        return False
+    return True
+
+
+class _FileConnections:
+    def __init__(self, lock_file: BinaryIO, max_connections: int):
+        stat = os.fstat(lock_file.fileno())
+        self.identity = stat.st_dev, stat.st_ino
+        self.lock_file = lock_file
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+        # (connection, time of release), the most recently released last
+        self.idle: list[tuple[duckdb.DuckDBPyConnection, float]] = []
+        # the number of threads that use or wait for a connection
+        self.num_users = 0
+        self.is_forgotten = False
+
+    def release_lock_file_if_unused(self) -> None:
+        if self.is_forgotten and self.num_users == 0:
+            self.lock_file.close()
+
+
+class DuckDBConnectionPool:
+    """
+    A pool of long-lived read-only DuckDB connections, per index file.
+
+    Opening a connection attaches the index file and loads the fts extension, which takes several milliseconds. The
+    pool keeps the connections open between the requests, and they are closed:
+
+    - when they have been idle for more than `max_idle_seconds`,
+    - when the index file has been deleted or replaced (see `evict_missing_files`),
+    - when a query raised, since the state of the session is unknown.
+
+    While a file has open connections, the pool holds a shared lock on it, so that the index janitor does not delete
+    it (see `open_index_file_shared`). The lock is released when its last idle connection is closed.
+
+    The pool is thread-safe. A connection is used by one thread at a time, and at most `max_connections_per_file`
+    connections are used concurrently for the same file: the other threads wait.
+
+    Args:
+        extensions_directory (`str`, *optional*): The directory where the duckdb extensions are downloaded.
+        max_connections_per_file (`int`): The maximum number of connections to the same index file.
+        max_idle_seconds (`float`): The duration after which an idle connection is closed.
+    """
+
+    def __init__(
+        self, extensions_directory: Optional[str], max_connections_per_file: int, max_idle_seconds: float
+    ) -> None:
+        if max_connections_per_file <= 0:
+            raise ValueError("max_connections_per_file must be positive")
+        self.extensions_directory = extensions_directory
+        self.max_connections_per_file = max_connections_per_file
+        self.max_idle_seconds = max_idle_seconds
+        self._lock = threading.Lock()
+        self._files: dict[str, _FileConnections] = {}
+
+    def _forget(self, database: str) -> list[duckdb.DuckDBPyConnection]:
+        """Forget a file, release its lock if no connection is in use, and return its idle connections to close.
+
+        Must be called with the lock held.
+        """
+        file_connections = self._files.pop(database)
+        file_connections.is_forgotten = True
+        file_connections.release_lock_file_if_unused()
+        return [con for con, _ in file_connections.idle]
+
+    def _get_file_connections(self, database: str) -> _FileConnections:
+        identity = get_file_identity(database)
+        to_close: list[duckdb.DuckDBPyConnection] = []
+        try:
+            with self._lock:
+                file_connections = self._files.get(database)
+                if file_connections is not None and file_connections.identity != identity:
+                    to_close = self._forget(database)
+                    file_connections = None
+                if file_connections is None:
+                    if identity is None:
+                        raise FileNotFoundError(f"The index file {database} does not exist.")
+                    file_connections = _FileConnections(
+                        open_index_file_shared(database), max_connections=self.max_connections_per_file
+                    )
+                    self._files[database] = file_connections
+                file_connections.num_users += 1
+        finally:
+            for con in to_close:
+                con.close()
+        return file_connections
+
+    @contextmanager
+    def connect(self, database: str) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Get a connection to the index file, and return it to the pool after use."""
+        self.evict_idle_connections()
+        file_connections = self._get_file_connections(database)
+        try:
+            with file_connections.semaphore:
+                with self._lock:
+                    con = file_connections.idle.pop()[0] if file_connections.idle else None
+                if con is None:
+                    con = duckdb_connect_readonly(database=database, extensions_directory=self.extensions_directory)
+                try:
+                    yield con
+                except BaseException:
+                    con.close()
+                    raise
+                with self._lock:
+                    is_returned = not file_connections.is_forgotten
+                    if is_returned:
+                        file_connections.idle.append((con, time.monotonic()))
+                if not is_returned:
+                    # the file has been evicted while the connection was in use
+                    con.close()
+        finally:
+            with self._lock:
+                file_connections.num_users -= 1
+                file_connections.release_lock_file_if_unused()
+
+    def evict_idle_connections(self) -> None:
+        """Close the connections that have been idle for more than max_idle_seconds.
+
+        The files that have no connections left are forgotten, and their lock is released.
+        """
+        deadline = time.monotonic() - self.max_idle_seconds
+        to_close: list[duckdb.DuckDBPyConnection] = []
+        with self._lock:
+            for database, file_connections in list(self._files.items()):
+                # the least recently released connections come first
+                while file_connections.idle and file_connections.idle[0][1] < deadline:
+                    to_close.append(file_connections.idle.pop(0)[0])
+                if not file_connections.idle and file_connections.num_users == 0:
+                    self._forget(database)
+        for con in to_close:
+            con.close()
+
+    def evict_missing_files(self) -> None:
+        """Close the idle connections to the index files that have been deleted or replaced, and forget the files.
+
+        The connections that are in use are closed when they are released.
+        """
+        to_close: list[duckdb.DuckDBPyConnection] = []
+        with self._lock:
+            for database, file_connections in list(self._files.items()):
+                if get_file_identity(database) != file_connections.identity:
+                    to_close.extend(self._forget(database))
+        if to_close:
+            logging.info(f"closing {len(to_close)} duckdb connections to deleted index files")
+        for con in to_close:
+            con.close()
+
+    def close(self) -> None:
+        """Close all the idle connections."""
+        with self._lock:
+            to_close = [con for database in list(self._files) for con in self._forget(database)]
+        for con in to_close:
+            con.close()
+
+
+@contextmanager
+def _connect_to_index_file(
+    database: str, extensions_directory: Optional[str] = None
+) -> Iterator[duckdb.DuckDBPyConnection]:
+    with open_index_file_shared(database):
+        with duckdb_connect_readonly(database=database, extensions_directory=extensions_directory) as con:
+            yield con
+
+
+def connect_to_index(
+    database: str, extensions_directory: Optional[str] = None, connection_pool: Optional[DuckDBConnectionPool] = None
+) -> AbstractContextManager[duckdb.DuckDBPyConnection]:
+    """Get a read-only connection to the index file from the pool, or a new one that is closed after use.
+
+    A shared lock is held on the index file while the connection is open (see `open_index_file_shared`).
+    """
+    if connection_pool is None:
+        return _connect_to_index_file(database=database, extensions_directory=extensions_directory)
+    return connection_pool.connect(database)
@@ -0,0 +1,248 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import asyncio
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Optional
+
+import anyio
+import psutil
+from filelock import FileLock, Timeout
+from libapi.duckdb import DUCKDB_INDEX_DOWNLOADS_SUBDIRECTORY, HUB_DOWNLOAD_CACHE_FOLDER
+from libcommon.prometheus import DISK_CACHE_BYTES, DUCKDB_INDEX_EVICTED_BYTES_TOTAL, DUCKDB_INDEX_EVICTIONS_TOTAL
+from libcommon.storage import StrPath, clean_dir
+
+from search.duckdb_connection import DuckDBConnectionPool, remove_index_file_if_unused
+
+METADATA_FILENAME = "index_janitor.sqlite"
+LOCK_FILENAME = "index_janitor.lock"
+INDEX_FILE_SUFFIX = ".duckdb"
+# the index files that are not tracked yet (e.g. built before a restart) are found by scanning the directory
+SCAN_INTERVAL_SECONDS = 3_600
+SQLITE_TIMEOUT_SECONDS = 30
+
+CREATE_TABLE_COMMAND = "CREATE TABLE IF NOT EXISTS index_files (path TEXT PRIMARY KEY, size INTEGER, last_access REAL)"
+UPSERT_COMMAND = (
+    "INSERT INTO index_files (path, size, last_access) VALUES (?, ?, ?) ON CONFLICT (path) DO UPDATE SET"
+    " size = excluded.size, last_access = max(index_files.last_access, excluded.last_access)"
+)
+
+
+class IndexJanitor:
+    """
+    Delete the DuckDB index files of the search service in the background, instead of cleaning the directory in the
+    request handlers.
+
+    The /search and /filter endpoints record the accesses to the index files in memory, and every `interval_seconds`
+    they are flushed to a SQLite database in the index directory, shared by the workers, with the size of the files.
+    Then, in one worker at a time:
+
+    - the files not accessed for `expired_time_interval_seconds` are deleted,
+    - if the disk usage is above `high_water_mark_percent`, the least recently accessed files are deleted until it's
+      below `low_water_mark_percent`.
+
+    A file with open connections, or that is being built or requested, is never deleted (see
+    `remove_index_file_if_unused`). It's deleted by a next round, once unused.
+
+    Every `SCAN_INTERVAL_SECONDS`, the index directory is scanned to track the files that are not tracked yet, and the
+    expired files of the Hub download cache are deleted.
+
+    Args:
+        duckdb_index_file_directory (`StrPath`): The directory of the indexes.
+        interval_seconds (`float`): The delay between two rounds of evictions.
+        expired_time_interval_seconds (`int`): The duration after which an index file that has not been accessed is
+          deleted.
+        high_water_mark_percent (`float`): The disk usage, in percent, above which the least recently accessed files
+          are deleted.
+        low_water_mark_percent (`float`): The disk usage, in percent, at which the deletions stop.
+        connection_pool (`DuckDBConnectionPool`, *optional*): The pool of connections of the worker, whose idle
+          connections are closed, so that the files can be deleted.
+    """
+
+    _janitor_task: Optional[asyncio.Task[None]] = None
+
+    def __init__(
+        self,
+        duckdb_index_file_directory: StrPath,
+        interval_seconds: float,
+        expired_time_interval_seconds: int,
+        high_water_mark_percent: float,
+        low_water_mark_percent: float,
+        connection_pool: Optional[DuckDBConnectionPool] = None,
+    ) -> None:
+        if not 0 <= low_water_mark_percent <= high_water_mark_percent <= 100:
+            raise ValueError(
+                "the water marks must verify 0 <= low_water_mark_percent <= high_water_mark_percent <= 100"
+            )
+        self.duckdb_index_file_directory = duckdb_index_file_directory
+        self.interval_seconds = interval_seconds
+        self.expired_time_interval_seconds = expired_time_interval_seconds
+        self.high_water_mark_percent = high_water_mark_percent
+        self.low_water_mark_percent = low_water_mark_percent
+        self.connection_pool = connection_pool
+        self._accesses_lock = threading.Lock()
+        # time of the last access, per index file, since the last flush
+        self._accesses: dict[str, float] = {}
+        self._last_scan: Optional[float] = None
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        Path(self.duckdb_index_file_directory).mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(
+            sqlite3.connect(f"{self.duckdb_index_file_directory}/{METADATA_FILENAME}", timeout=SQLITE_TIMEOUT_SECONDS)
+        ) as con:
+            with con:
+                con.execute(CREATE_TABLE_COMMAND)
+                yield con
+
+    def record_access(self, index_file_location: str) -> None:
+        with self._accesses_lock:
+            # same path as found by `scan`
+            self._accesses[os.path.normpath(index_file_location)] = time.time()
+
+    def flush(self) -> None:
+        """Store the accesses recorded by the worker since the last flush."""
+        with self._accesses_lock:
+            accesses, self._accesses = self._accesses, {}
+        rows = []
+        for path, last_access in accesses.items():
+            try:
+                rows.append((path, os.path.getsize(path), last_access))
+            except FileNotFoundError:
+                continue
+        if rows:
+            with self._connect() as con:
+                con.executemany(UPSERT_COMMAND, rows)
+
+    def scan(self) -> None:
+        """Track the index files that are not tracked yet, with their modification time as last access, and forget
+        the files that have been deleted."""
+        downloads_directory = Path(self.duckdb_index_file_directory) / DUCKDB_INDEX_DOWNLOADS_SUBDIRECTORY
+        rows = []
+        for path in downloads_directory.glob(f"**/*{INDEX_FILE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            rows.append((os.path.normpath(path), stat.st_size, stat.st_mtime))
+        # the lock files of the deleted index files (their modification time is updated when they are acquired)
+        expired_before = time.time() - self.expired_time_interval_seconds
+        for lock_path in downloads_directory.glob(f"**/*{INDEX_FILE_SUFFIX}.lock"):
+            with contextlib.suppress(FileNotFoundError):
+                if not lock_path.with_suffix("").exists() and lock_path.stat().st_mtime <= expired_before:
+                    lock_path.unlink()
+        for directory, _, _ in sorted(os.walk(downloads_directory), reverse=True):
+            if directory != str(downloads_directory):
+                with contextlib.suppress(OSError):
+                    # only if empty
+                    os.rmdir(directory)
+        with self._connect() as con:
+            con.executemany(UPSERT_COMMAND, rows)
+            tracked_paths = [path for (path,) in con.execute("SELECT path FROM index_files")]
+            con.executemany(
+                "DELETE FROM index_files WHERE path = ?",
+                [(path,) for path in tracked_paths if not os.path.isfile(path)],
+            )
+        clean_dir(
+            Path(self.duckdb_index_file_directory) / HUB_DOWNLOAD_CACHE_FOLDER, self.expired_time_interval_seconds
+        )
+
+    def _evict(
+        self, con: sqlite3.Connection, path: str, size: int, last_access: float, accessed_before: float, reason: str
+    ) -> bool:
+        """Delete an index file if it has not been accessed since `accessed_before` and is not in use."""
+        try:
+            # a request of another worker may have touched the file since its last access was stored (see
+            # get_index_file_location_and_build_if_missing)
+            modified_at = os.path.getmtime(path)
+        except FileNotFoundError:
+            con.execute("DELETE FROM index_files WHERE path = ?", (path,))
+            return False
+        if modified_at > last_access:
+            con.execute(UPSERT_COMMAND, (path, size, modified_at))
+            last_access = modified_at
+        if last_access > accessed_before:
+            return False
+        if not remove_index_file_if_unused(path):
+            logging.debug(f"the index file {path} is in use, it will be deleted later")
+            return False
+        con.execute("DELETE FROM index_files WHERE path = ?", (path,))
+        DUCKDB_INDEX_EVICTIONS_TOTAL.labels(reason=reason).inc()
+        DUCKDB_INDEX_EVICTED_BYTES_TOTAL.labels(reason=reason).inc(size)
+        return True
+
+    def evict(self) -> None:
+        """Delete the expired index files, and the least recently accessed ones if the disk usage is too high."""
+        num_evicted = 0
+        now = time.time()
+        with self._connect() as con:
+            expired_before = now - self.expired_time_interval_seconds
+            for path, size, last_access in con.execute(
+                "SELECT path, size, last_access FROM index_files WHERE last_access <= ?", (expired_before,)
+            ).fetchall():
+                num_evicted += self._evict(con, path, size, last_access, expired_before, reason="expired")
+            disk_usage = psutil.disk_usage(str(self.duckdb_index_file_directory))
+            if disk_usage.percent > self.high_water_mark_percent:
+                bytes_to_free = disk_usage.used - disk_usage.total * self.low_water_mark_percent / 100
+                for path, size, last_access in con.execute(
+                    "SELECT path, size, last_access FROM index_files ORDER BY last_access"
+                ).fetchall():
+                    if bytes_to_free <= 0:
+                        break
+                    # the files accessed during the last round may be about to be connected to
+                    if self._evict(con, path, size, last_access, now - self.interval_seconds, reason="disk_usage"):
+                        num_evicted += 1
+                        bytes_to_free -= size
+                if bytes_to_free > 0:
+                    logging.warning(
+                        f"the disk usage of {self.duckdb_index_file_directory} is still above"
+                        f" {self.low_water_mark_percent}%, all the other index files are in use"
+                    )
+            (total_size,) = con.execute("SELECT coalesce(sum(size), 0) FROM index_files").fetchone()
+        DISK_CACHE_BYTES.labels(cache="duckdb_index").set(total_size)
+        if num_evicted:
+            logging.info(f"the index janitor deleted {num_evicted} index files")
+
+    def run(self) -> None:
+        """Flush the accesses, and, if no other worker is doing it, scan the index directory and evict the files."""
+        if self.connection_pool is not None:
+            # release the locks on the files that are not used anymore, so that they can be deleted
+            self.connection_pool.evict_idle_connections()
+        self.flush()
+        try:
+            with FileLock(f"{self.duckdb_index_file_directory}/{LOCK_FILENAME}", timeout=0):
+                now = time.monotonic()
+                if self._last_scan is None or now - self._last_scan >= SCAN_INTERVAL_SECONDS:
+                    self.scan()
+                    self._last_scan = now
+                self.evict()
+        except Timeout:
+            # another worker is evicting the files
+            pass
+        if self.connection_pool is not None:
+            self.connection_pool.evict_missing_files()
+
+    async def _janitor_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await anyio.to_thread.run_sync(self.run)
+            except Exception:
+                logging.exception("the index janitor failed")
+
+    def start(self) -> None:
+        self._janitor_task = asyncio.create_task(self._janitor_loop())
+
+    async def stop(self) -> None:
+        if self._janitor_task is None:
+            return
+        self._janitor_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._janitor_task
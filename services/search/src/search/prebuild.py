@@ -0,0 +1,258 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import asyncio
+import contextlib
+import heapq
+import logging
+import os
+import time
+from collections.abc import Awaitable, Callable
+from http import HTTPStatus
+from typing import Optional
+
+import anyio
+from libapi.duckdb import (
+    DEFAULT_BUILD_MEMORY_LIMIT,
+    check_available_disk_space,
+    get_cache_entry_from_parquet_metadata_job,
+    get_index_file_location,
+    get_index_file_location_and_build_if_missing,
+)
+from libapi.exceptions import DownloadIndexError
+from libcommon.prometheus import (
+    DUCKDB_INDEX_PREBUILD_DURATION,
+    DUCKDB_INDEX_PREBUILD_QUEUE_DEPTH,
+    DUCKDB_INDEX_PREBUILDS_TOTAL,
+)
+from libcommon.storage import StrPath
+from libcommon.storage_client import StorageClient
+
+# (dataset, config, split)
+SplitKey = tuple[str, str, str]
+# a function that builds the index of a split if missing, and returns True if it has been built
+BuildIndexFunction = Callable[[str, str, str], Awaitable[bool]]
+
+# the splits whose prebuild failed are not prebuilt again before this delay
+PREBUILD_RETRY_DELAY_SECONDS = 3_600
+# the request counts of the least requested splits are forgotten beyond this number of splits
+MAX_TRACKED_SPLITS = 10_000
+
+
+class PrebuildSkippedError(Exception):
+    pass
+
+
+async def build_split_index(
+    dataset: str,
+    config: str,
+    split: str,
+    duckdb_index_file_directory: StrPath,
+    parquet_metadata_directory: StrPath,
+    hf_endpoint: str,
+    blocked_datasets: list[str],
+    hf_token: Optional[str] = None,
+    hf_timeout_seconds: Optional[float] = None,
+    storage_clients: Optional[list[StorageClient]] = None,
+    extensions_directory: Optional[str] = None,
+    max_split_size_bytes: int = 5_000_000_000,
+    stream_parquet_files: bool = False,
+    build_memory_limit: str = DEFAULT_BUILD_MEMORY_LIMIT,
+    sort_indexes_max_columns: int = 0,
+    shared_storage_client: Optional[StorageClient] = None,
+) -> bool:
+    """Build the index of a split if missing, as the /search and /filter endpoints do, but without a timeout.
+
+    Raises:
+        [~`PrebuildSkippedError`]: if the parquet metadata of the split is not available.
+        [~`libapi.exceptions.DownloadIndexError`]: if there is not enough disk space to build the index.
+
+    Returns:
+        `bool`: True if the index has been built (or downloaded from the shared storage), False if it was already
+          there.
+    """
+    parquet_metadata_response = await anyio.to_thread.run_sync(
+        get_cache_entry_from_parquet_metadata_job,
+        dataset,
+        config,
+        hf_endpoint,
+        hf_token,
+        hf_timeout_seconds,
+        blocked_datasets,
+        storage_clients,
+    )
+    if parquet_metadata_response["http_status"] != HTTPStatus.OK:
+        raise PrebuildSkippedError(f"the parquet metadata of {dataset=} {config=} is an error response")
+    content_parquet_metadata = parquet_metadata_response["content"]
+    split_parquet_files = [
+        parquet_file
+        for parquet_file in content_parquet_metadata["parquet_files_metadata"]
+        if parquet_file["config"] == config and parquet_file["split"] == split
+    ]
+    if not split_parquet_files:
+        raise PrebuildSkippedError(f"no parquet files found for {dataset=} {config=} {split=}")
+    revision = parquet_metadata_response["dataset_git_revision"]
+    index_folder, repo_file_location, _ = get_index_file_location(
+        duckdb_index_file_directory=duckdb_index_file_directory,
+        dataset=dataset,
+        revision=revision,
+        config=config,
+        split=split,
+        max_split_size_bytes=max_split_size_bytes,
+        parquet_metadata_directory=parquet_metadata_directory,
+        split_parquet_files=split_parquet_files,
+    )
+    is_missing = not os.path.isfile(f"{index_folder}/{repo_file_location}")
+    # also updates the modification time of an existing index, so that it's not deleted as expired
+    await get_index_file_location_and_build_if_missing(
+        duckdb_index_file_directory=duckdb_index_file_directory,
+        dataset=dataset,
+        config=config,
+        split=split,
+        revision=revision,
+        hf_token=hf_token,
+        max_split_size_bytes=max_split_size_bytes,
+        extensions_directory=extensions_directory,
+        parquet_metadata_directory=parquet_metadata_directory,
+        split_parquet_files=split_parquet_files,
+        features=content_parquet_metadata["features"],
+        stream_parquet_files=stream_parquet_files,
+        build_memory_limit=build_memory_limit,
+        sort_indexes_max_columns=sort_indexes_max_columns,
+        timeout=None,
+        shared_storage_client=shared_storage_client,
+    )
+    return is_missing
+
+
+class IndexPrebuilder:
+    """
+    Build the DuckDB indexes of the trending splits in the background, before they are requested.
+
+    The /search and /filter endpoints record their requests. Every `interval_seconds`, the `max_splits` splits with
+    the highest request counts (decayed exponentially, with a half-life of `half_life_seconds`) are passed to
+    `build_index`, at most `max_concurrent_builds` at a time. An index that is already there is only touched, so that
+    it's not deleted as expired.
+
+    A split is skipped if the free disk space is below `min_free_disk_bytes`, to leave room for the indexes built on
+    request. A split whose prebuild failed is not prebuilt again before `PREBUILD_RETRY_DELAY_SECONDS`.
+
+    Args:
+        build_index (`BuildIndexFunction`): The function that builds the index of a split if missing (see
+          `build_split_index`).
+        duckdb_index_file_directory (`StrPath`): The directory of the indexes, used to check the free disk space.
+        max_splits (`int`): The number of trending splits to prebuild.
+        max_concurrent_builds (`int`): The maximum number of indexes built at the same time.
+        interval_seconds (`float`): The delay between two rounds of prebuilds.
+        half_life_seconds (`float`): The half-life of the request counts.
+        min_free_disk_bytes (`int`): The free disk space under which the indexes are not prebuilt.
+    """
+
+    _prebuild_task: Optional[asyncio.Task[None]] = None
+
+    def __init__(
+        self,
+        build_index: BuildIndexFunction,
+        duckdb_index_file_directory: StrPath,
+        max_splits: int,
+        max_concurrent_builds: int,
+        interval_seconds: float,
+        half_life_seconds: float,
+        min_free_disk_bytes: int,
+    ) -> None:
+        if max_concurrent_builds <= 0:
+            raise ValueError("max_concurrent_builds must be positive")
+        self.build_index = build_index
+        self.duckdb_index_file_directory = duckdb_index_file_directory
+        self.max_splits = max_splits
+        self.max_concurrent_builds = max_concurrent_builds
+        self.interval_seconds = interval_seconds
+        self.half_life_seconds = half_life_seconds
+        self.min_free_disk_bytes = min_free_disk_bytes
+        # decayed request count and time of the last update, per split
+        self._request_counts: dict[SplitKey, tuple[float, float]] = {}
+        # time of the last failed prebuild, per split
+        self._failures: dict[SplitKey, float] = {}
+
+    def _get_decayed_count(self, split_key: SplitKey, now: float) -> float:
+        count, updated_at = self._request_counts.get(split_key, (0.0, now))
+        decay: float = 0.5 ** ((now - updated_at) / self.half_life_seconds)
+        return count * decay
+
+    def record_request(self, dataset: str, config: str, split: str) -> None:
+        now = time.monotonic()
+        split_key = (dataset, config, split)
+        self._request_counts[split_key] = (self._get_decayed_count(split_key, now) + 1, now)
+
+    def get_trending_splits(self) -> list[SplitKey]:
+        """Get the most requested splits, the most requested first, ignoring the ones that failed recently."""
+        now = time.monotonic()
+        counts = {split_key: self._get_decayed_count(split_key, now) for split_key in self._request_counts}
+        if len(counts) > MAX_TRACKED_SPLITS:
+            self._request_counts = {
+                split_key: (counts[split_key], now)
+                for split_key in heapq.nlargest(MAX_TRACKED_SPLITS, counts, key=counts.__getitem__)
+            }
+        self._failures = {
+            split_key: failed_at
+            for split_key, failed_at in self._failures.items()
+            if now - failed_at < PREBUILD_RETRY_DELAY_SECONDS
+        }
+        return heapq.nlargest(
+            self.max_splits,
+            (split_key for split_key in counts if split_key not in self._failures),
+            key=counts.__getitem__,
+        )
+
+    async def _prebuild(self, split_key: SplitKey) -> None:
+        start = time.perf_counter()
+        try:
+            check_available_disk_space(self.duckdb_index_file_directory, self.min_free_disk_bytes)
+            built = await self.build_index(*split_key)
+        except (DownloadIndexError, PrebuildSkippedError) as err:
+            logging.info(f"skipped the prebuild of the index of {split_key}: {err}")
+            DUCKDB_INDEX_PREBUILDS_TOTAL.labels(result="skipped").inc()
+            self._failures[split_key] = time.monotonic()
+            return
+        except Exception:
+            logging.exception(f"failed to prebuild the index of {split_key}")
+            DUCKDB_INDEX_PREBUILDS_TOTAL.labels(result="error").inc()
+            self._failures[split_key] = time.monotonic()
+            return
+        if built:
+            logging.info(f"prebuilt the index of {split_key}")
+            DUCKDB_INDEX_PREBUILD_DURATION.observe(time.perf_counter() - start)
+        DUCKDB_INDEX_PREBUILDS_TOTAL.labels(result="built" if built else "ready").inc()
+
+    async def prebuild_trending_splits(self) -> None:
+        """Build the missing indexes of the trending splits, at most `max_concurrent_builds` at a time."""
+        split_keys = self.get_trending_splits()
+        semaphore = asyncio.Semaphore(self.max_concurrent_builds)
+        DUCKDB_INDEX_PREBUILD_QUEUE_DEPTH.set(len(split_keys))
+
+        async def prebuild(split_key: SplitKey) -> None:
+            async with semaphore:
+                try:
+                    await self._prebuild(split_key)
+                finally:
+                    DUCKDB_INDEX_PREBUILD_QUEUE_DEPTH.dec()
+
+        try:
+            await asyncio.gather(*(prebuild(split_key) for split_key in split_keys))
+        finally:
+            DUCKDB_INDEX_PREBUILD_QUEUE_DEPTH.set(0)
+
+    async def _prebuild_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.prebuild_trending_splits()
+
+    def start(self) -> None:
+        self._prebuild_task = asyncio.create_task(self._prebuild_loop())
+
+    async def stop(self) -> None:
+        if self._prebuild_task is None:
+            return
+        self._prebuild_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._prebuild_task
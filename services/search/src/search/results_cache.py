@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+from libcommon.memory_cache import MemoryLRUCache
+
+from search.duckdb_connection import get_file_identity
+
+# (index file location, identity of the index file, endpoint, query or where, orderby)
+RankedRowsKey = tuple[str, tuple[int, int], str, str, str]
+
+
+@dataclass(frozen=True)
+class RankedRows:
+    """
+    The first ranked rows of a /search or /filter query.
+
+    Args:
+        table (`pa.Table`): The row indexes (and possibly the scores) of the first ranked rows, in order.
+        num_rows_total (`int`, *optional*): The total number of matching rows, if known.
+    """
+
+    table: pa.Table
+    num_rows_total: Optional[int]
+
+    @property
+    def is_complete(self) -> bool:
+        return self.num_rows_total is not None and self.table.num_rows == self.num_rows_total
+
+    def has_page(self, offset: int, length: int) -> bool:
+        return self.is_complete or offset + length <= self.table.num_rows
+
+
+class RankedRowsCache(MemoryLRUCache[RankedRowsKey, RankedRows]):
+    """
+    Cache of the ranked row indexes of the /search and /filter queries, so that the next pages of the same query only
+    fetch their rows from the index file.
+
+    The identity of the index file (see `get_file_identity`) is part of the key: the entries of an index file that has
+    been deleted or replaced are never hit again, and are evicted as the least recently used.
+
+    Args:
+        max_bytes (`int`): The maximum total size of the cached row indexes, in bytes. If 0, nothing is cached.
+        max_rows_per_entry (`int`): The maximum number of ranked rows stored per query. The pages beyond are not
+          served from the cache.
+    """
+
+    def __init__(self, max_bytes: int, max_rows_per_entry: int):
+        super().__init__(
+            name="ranked_rows",
+            max_bytes=max_bytes,
+            get_size=lambda ranked_rows: ranked_rows.table.get_total_buffer_size(),
+        )
+        self.max_rows_per_entry = max_rows_per_entry
+
+    def get_key(
+        self, index_file_location: str, endpoint: str, query: str, orderby: str = ""
+    ) -> Optional[RankedRowsKey]:
+        """Get the key of a query, or None if the index file does not exist."""
+        identity = get_file_identity(index_file_location)
+        if identity is None:
+            return None
+        return index_file_location, identity, endpoint, query, orderby
+
+    def put_first_rows(self, key: RankedRowsKey, table: pa.Table, num_rows_total: Optional[int]) -> RankedRows:
+        """Store the first `max_rows_per_entry` rows of the ranked rows of a query.
+
+        The rows are copied if the table is truncated, so that the buffers of the whole table are not kept alive.
+        """
+        if table.num_rows > self.max_rows_per_entry:
+            table = table.take(pa.array(np.arange(self.max_rows_per_entry)))
+        ranked_rows = RankedRows(table=table, num_rows_total=num_rows_total)
+        self.put(key, ranked_rows)
+        return ranked_rows
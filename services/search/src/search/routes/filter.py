@@ -2,17 +2,18 @@
 # Copyright 2023 The HuggingFace Authors.
 
 import logging
-import random
 import re
 from http import HTTPStatus
 from typing import Optional
 
 import anyio
 import duckdb
+import numpy as np
 import pyarrow as pa
 from datasets import Features, Value
 from libapi.authentication import auth_check
 from libapi.duckdb import (
+    DEFAULT_BUILD_MEMORY_LIMIT,
     get_cache_entry_from_parquet_metadata_job,
     get_index_file_location_and_build_if_missing,
 )
@@ -30,14 +31,19 @@ from libapi.utils import (
     get_json_ok_response,
 )
 from libcommon.constants import ROW_IDX_COLUMN
+from libcommon.memory_cache import MemoryLRUCache
 from libcommon.prometheus import StepProfiler
-from libcommon.storage import StrPath, clean_dir
+from libcommon.storage import StrPath
 from libcommon.storage_client import StorageClient
 from libcommon.viewer_utils.features import get_supported_unsupported_columns
 from starlette.requests import Request
 from starlette.responses import Response
 
-from search.duckdb_connection import duckdb_connect_readonly
+from search.duckdb_connection import DuckDBConnectionPool, connect_to_index, get_file_identity
+from search.janitor import IndexJanitor
+from search.prebuild import IndexPrebuilder
+from search.results_cache import RankedRowsCache
+from search.sort_index import get_sort_index, get_sorted_row_idx_page
 
 FILTER_QUERY = """\
     SELECT {columns}
@@ -52,11 +58,48 @@ FILTER_COUNT_QUERY = """\
     FROM data
     {where}"""
 
+FILTER_ROW_IDX_QUERY = """\
+    SELECT {row_idx_column}
+    FROM data
+    {where}
+    {orderby}
+    LIMIT {limit}"""
+
+FILTER_RANK_COLUMN = "__hf_filter_rank"
+JOIN_PAGE_AND_DATA_COMMAND = "SELECT {columns} FROM memory.filter_page_table JOIN db.data USING({row_idx_column}) ORDER BY memory.filter_page_table.{rank_column};"  # nosec
+# ^ the string substitutions here are constants, not user inputs
+
 SQL_INVALID_SYMBOLS = "|".join([";", "--", r"/\*", r"\*/"])
 SQL_INVALID_SYMBOLS_PATTERN = re.compile(rf"(?:{SQL_INVALID_SYMBOLS})", flags=re.IGNORECASE)
 
 logger = logging.getLogger(__name__)
 
+# (index file location, identity of the index file, where)
+FilterCountCacheKey = tuple[str, tuple[int, int], str]
+
+
+class FilterCountCache(MemoryLRUCache[FilterCountCacheKey, int]):
+    """
+    Cache of the number of rows that match a filter, so that the pages of the same filter don't scan the whole index.
+
+    The path of an index file contains the dataset revision, so the counts never expire. As in `RankedRowsCache`, the
+    identity of the index file (see `get_file_identity`) is part of the key, so that the counts of an index file that
+    has been replaced are never hit again.
+
+    Args:
+        max_entries (`int`): The maximum number of cached counts. If 0, nothing is cached.
+    """
+
+    def __init__(self, max_entries: int):
+        super().__init__(name="filter_counts", max_entries=max_entries)
+
+    def get_key(self, index_file_location: str, where: str) -> Optional[FilterCountCacheKey]:
+        """Get the key of a filter, or None if the index file does not exist."""
+        identity = get_file_identity(index_file_location)
+        if identity is None:
+            return None
+        return index_file_location, identity, where
+
 
 def create_filter_endpoint(
     duckdb_index_file_directory: StrPath,
@@ -73,10 +116,19 @@ def create_filter_endpoint(
     max_age_short: int = 0,
     storage_clients: Optional[list[StorageClient]] = None,
     extensions_directory: Optional[str] = None,
-    clean_cache_proba: float = 0.0,
-    expiredTimeIntervalSeconds: int = 60,
     max_split_size_bytes: int = 5_000_000_000,
+    connection_pool: Optional[DuckDBConnectionPool] = None,
+    stream_parquet_files: bool = False,
+    build_memory_limit: str = DEFAULT_BUILD_MEMORY_LIMIT,
+    sort_indexes_max_columns: int = 0,
+    index_prebuilder: Optional[IndexPrebuilder] = None,
+    index_janitor: Optional[IndexJanitor] = None,
+    shared_index_storage_client: Optional[StorageClient] = None,
+    filter_count_cache_max_entries: int = 0,
+    results_cache: Optional[RankedRowsCache] = None,
 ) -> Endpoint:
+    filter_count_cache = FilterCountCache(max_entries=filter_count_cache_max_entries)
+
     async def filter_endpoint(request: Request) -> Response:
         revision: Optional[str] = None
         with StepProfiler(method="filter_endpoint", step="all"):
@@ -105,6 +157,9 @@ def create_filter_endpoint(
                         hf_timeout_seconds=hf_timeout_seconds,
                     )
 
+                if index_prebuilder is not None:
+                    index_prebuilder.record_request(dataset=dataset, config=config, split=split)
+
                 with StepProfiler(method="filter_endpoint", step="build index if missing"):
                     # get parquet urls and dataset_info
                     parquet_metadata_response = get_cache_entry_from_parquet_metadata_job(
@@ -143,7 +198,13 @@ def create_filter_endpoint(
                         parquet_metadata_directory=parquet_metadata_directory,
                         split_parquet_files=split_parquet_files,
                         features=content_parquet_metadata["features"],
+                        stream_parquet_files=stream_parquet_files,
+                        build_memory_limit=build_memory_limit,
+                        sort_indexes_max_columns=sort_indexes_max_columns,
+                        shared_storage_client=shared_index_storage_client,
                     )
+                    if index_janitor is not None:
+                        index_janitor.record_access(index_file_location)
                     # features must contain the row idx column for full_text_search
                     features = Features.from_dict(content_parquet_metadata["features"])
                     features[ROW_IDX_COLUMN] = Value("int64")
@@ -161,15 +222,10 @@ def create_filter_endpoint(
                         length,
                         offset,
                         extensions_directory,
+                        connection_pool,
+                        filter_count_cache,
+                        results_cache,
                     )
-                    # no need to do it every time
-                    # TODO: Will be moved to another process in parallel
-                    if random.random() < clean_cache_proba:  # nosec
-                        with StepProfiler(method="filter_endpoint", step="clean old indexes"):
-                            clean_dir(
-                                duckdb_index_file_directory,
-                                expiredTimeIntervalSeconds,
-                            )
                 with StepProfiler(method="filter_endpoint", step="create response"):
                     response = await create_response(
                         dataset=dataset,
@@ -203,8 +259,13 @@ def execute_filter_query(
     limit: int,
     offset: int,
     extensions_directory: Optional[str] = None,
+    connection_pool: Optional[DuckDBConnectionPool] = None,
+    filter_count_cache: Optional[FilterCountCache] = None,
+    results_cache: Optional[RankedRowsCache] = None,
 ) -> tuple[int, pa.Table]:
-    with duckdb_connect_readonly(extensions_directory=extensions_directory, database=index_file_location) as con:
+    with connect_to_index(
+        database=index_file_location, extensions_directory=extensions_directory, connection_pool=connection_pool
+    ) as con:
         filter_query = FILTER_QUERY.format(
             columns=",".join([f'"{column}"' for column in columns]),
             where=f"WHERE {where}" if where else "",
@@ -213,14 +274,91 @@ def execute_filter_query(
             offset=offset,
         )
         filter_count_query = FILTER_COUNT_QUERY.format(where=f"WHERE {where}" if where else "")
+        cache_key = (
+            None
+            if results_cache is None
+            else results_cache.get_key(index_file_location, endpoint="filter", query=where, orderby=orderby)
+        )
+        count_cache_key = (
+            None if filter_count_cache is None else filter_count_cache.get_key(index_file_location, where=where)
+        )
         try:
-            pa_table = con.sql(filter_query).arrow()
-            num_rows_total = con.sql(filter_count_query).fetchall()[0][0]
+            # the pages ordered by a column with a sort index are read from its permutation, without sorting
+            sort_index = get_sort_index(con, orderby) if orderby else None
+            ranked_rows = None if results_cache is None or cache_key is None else results_cache.get(cache_key)
+            if (
+                ranked_rows is None
+                and results_cache is not None
+                and cache_key is not None
+                and offset + limit <= results_cache.max_rows_per_entry
+            ):
+                # rank the first rows once, and serve the next pages from the cache
+                if sort_index is None:
+                    row_idx_query = FILTER_ROW_IDX_QUERY.format(
+                        row_idx_column=ROW_IDX_COLUMN,
+                        where=f"WHERE {where}" if where else "",
+                        orderby=f"ORDER BY {orderby}" if orderby else "",
+                        limit=results_cache.max_rows_per_entry,
+                    )
+                    row_idx_table = con.sql(row_idx_query).arrow()
+                    num_ranked_rows_total = (
+                        row_idx_table.num_rows if row_idx_table.num_rows < results_cache.max_rows_per_entry else None
+                    )
+                else:
+                    row_idx_table, num_ranked_rows_total = get_sorted_row_idx_page(
+                        con, sort_index=sort_index, where=where, offset=0, limit=results_cache.max_rows_per_entry
+                    )
+                ranked_rows = results_cache.put_first_rows(
+                    cache_key, row_idx_table, num_rows_total=num_ranked_rows_total
+                )
+            num_rows_total: Optional[int] = None
+            if ranked_rows is not None and ranked_rows.has_page(offset, limit):
+                pa_table = join_page_and_data(
+                    con, columns=columns, row_idx_table=ranked_rows.table.slice(offset, limit)
+                )
+                num_rows_total = ranked_rows.num_rows_total
+            elif sort_index is not None:
+                row_idx_table, num_rows_total = get_sorted_row_idx_page(
+                    con, sort_index=sort_index, where=where, offset=offset, limit=limit
+                )
+                pa_table = join_page_and_data(con, columns=columns, row_idx_table=row_idx_table)
+            else:
+                pa_table = con.sql(filter_query).arrow()
+            if num_rows_total is None:
+                if pa_table.num_rows < limit and (pa_table.num_rows > 0 or offset == 0):
+                    # the page contains the last matching rows: no need to count them
+                    num_rows_total = offset + pa_table.num_rows
+                    if filter_count_cache is not None and count_cache_key is not None:
+                        filter_count_cache.put(count_cache_key, num_rows_total)
+                elif filter_count_cache is None or count_cache_key is None:
+                    num_rows_total = con.sql(filter_count_query).fetchall()[0][0]
+                else:
+                    num_rows_total = filter_count_cache.get_or_compute(
+                        count_cache_key, lambda: con.sql(filter_count_query).fetchall()[0][0]
+                    )
         except duckdb.Error as err:
             raise InvalidParameterError(message="A query parameter is invalid") from err
     return num_rows_total, pa_table
 
 
+def join_page_and_data(con: duckdb.DuckDBPyConnection, columns: list[str], row_idx_table: pa.Table) -> pa.Table:
+    """Get the rows of a page from their row indexes, in the same order."""
+    join_page_and_data_query = JOIN_PAGE_AND_DATA_COMMAND.format(
+        columns=",".join([f'"{column}"' for column in columns]),
+        row_idx_column=ROW_IDX_COLUMN,
+        rank_column=FILTER_RANK_COLUMN,
+    )
+    con.execute("USE memory;")
+    con.from_arrow(
+        row_idx_table.append_column(FILTER_RANK_COLUMN, pa.array(np.arange(row_idx_table.num_rows)))
+    ).create_view("filter_page_table")
+    con.execute("USE db;")
+    pa_table = con.execute(query=join_page_and_data_query).arrow()
+    # don't keep the page table alive in a pooled connection
+    con.execute("DROP VIEW memory.filter_page_table;")
+    return pa_table
+
+
 def validate_query_parameter(parameter_value: str, parameter_name: str) -> None:
     if SQL_INVALID_SYMBOLS_PATTERN.search(parameter_value):
         raise InvalidParameterError(message=f"Parameter '{parameter_name}' contains invalid symbols")
@@ -2,15 +2,16 @@
 # Copyright 2023 The HuggingFace Authors.
 
 import logging
-import random
 from http import HTTPStatus
 from typing import Optional
 
 import anyio
+import duckdb
 import pyarrow as pa
 from datasets import Features, Value
 from libapi.authentication import auth_check
 from libapi.duckdb import (
+    DEFAULT_BUILD_MEMORY_LIMIT,
     get_cache_entry_from_parquet_metadata_job,
     get_index_file_location_and_build_if_missing,
 )
@@ -33,7 +34,7 @@ from libapi.utils import (
 from libcommon.constants import HF_FTS_SCORE, MAX_NUM_ROWS_PER_PAGE, ROW_IDX_COLUMN
 from libcommon.dtos import PaginatedResponse
 from libcommon.prometheus import StepProfiler
-from libcommon.storage import StrPath, clean_dir
+from libcommon.storage import StrPath
 from libcommon.storage_client import StorageClient
 from libcommon.viewer_utils.features import (
     get_supported_unsupported_columns,
@@ -42,7 +43,10 @@ from libcommon.viewer_utils.features import (
 from starlette.requests import Request
 from starlette.responses import Response
 
-from search.duckdb_connection import duckdb_connect_readonly
+from search.duckdb_connection import DuckDBConnectionPool, connect_to_index
+from search.janitor import IndexJanitor
+from search.prebuild import IndexPrebuilder
+from search.results_cache import RankedRowsCache
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +55,74 @@ JOIN_STAGE_AND_DATA_COMMAND = "SELECT {columns} FROM memory.fts_stage_table JOIN
 # ^ "no sec" to remove https://bandit.readthedocs.io/en/1.7.5/plugins/b608_hardcoded_sql_expressions.html
 # the string substitutions here are constants, not user inputs
 
+# the stemmer is stored in the index by create_index
+GET_FTS_STEMMER_COMMAND = "SELECT stemmer FROM fts_main_data.stemmer;"
+FTS_QUERY_TERMS_COMMAND = "SELECT termid, df FROM fts_main_data.dict WHERE term IN (SELECT DISTINCT stem(unnest(fts_main_data.tokenize(?)), ?));"
+FTS_NUM_MATCHES_COMMAND = "SELECT count(DISTINCT docid) FROM fts_main_data.terms WHERE termid IN ({termids});"  # nosec
+# same score as match_bm25, with the default parameters k=1.2 and b=0.75, but only computed for the documents in the
+# posting lists of the query terms, and only the best ones are returned
+FTS_TOP_K_COMMAND = f"""\
+    WITH term_tf AS (
+        SELECT termid, docid, count(*) AS tf
+        FROM fts_main_data.terms
+        WHERE termid IN ({{termids}})
+        GROUP BY docid, termid
+    ),
+    scores AS (
+        SELECT docs.docid,
+            docs.name,
+            sum(
+                log(((SELECT num_docs FROM fts_main_data.stats) - dict.df + 0.5) / (dict.df + 0.5) + 1)
+                * ((term_tf.tf * (1.2 + 1)) / (term_tf.tf + 1.2 * (1 - 0.75 + 0.75 * (docs.len / (SELECT avgdl FROM fts_main_data.stats)))))
+            ) AS score
+        FROM term_tf
+        JOIN fts_main_data.dict AS dict USING (termid)
+        JOIN fts_main_data.docs AS docs USING (docid)
+        GROUP BY docs.docid, docs.name
+    )
+    SELECT name AS {ROW_IDX_COLUMN}, score AS {HF_FTS_SCORE}
+    FROM scores
+    ORDER BY score DESC, docid
+    LIMIT {{num_rows}}"""  # nosec
+# ^ termids and num_rows are integers
+
+
+def get_fts_stemmer(con: duckdb.DuckDBPyConnection) -> Optional[str]:
+    """Get the stemmer of the full-text search index, or None if it's not stored in the index file (e.g. a file built
+    before the stemmer was stored)."""
+    try:
+        result = con.execute(GET_FTS_STEMMER_COMMAND).fetchone()
+    except duckdb.CatalogException:
+        return None
+    return None if result is None else str(result[0])
+
+
+def rank_matches(con: duckdb.DuckDBPyConnection, query: str, num_rows: int) -> tuple[int, pa.Table]:
+    """Get the number of rows that match the query, and the row indexes and scores of the first `num_rows` ones.
+
+    The scores are only computed for the rows that contain a term of the query, and DuckDB keeps the best ones with a
+    top-k, so that the scores of all the matching rows are never loaded.
+    If the stemmer can't be read from the index, all the matching rows are scored with match_bm25 and sorted.
+    """
+    stemmer = get_fts_stemmer(con)
+    if stemmer is None:
+        fts_stage_table = con.execute(query=FTS_STAGE_TABLE_COMMAND, parameters=[query]).arrow()
+        return fts_stage_table.num_rows, fts_stage_table.sort_by([(HF_FTS_SCORE, "descending")]).slice(0, num_rows)
+    query_terms = con.execute(query=FTS_QUERY_TERMS_COMMAND, parameters=[query, stemmer]).fetchall()
+    if not query_terms:
+        return 0, pa.table(
+            {ROW_IDX_COLUMN: pa.array([], type=pa.int64()), HF_FTS_SCORE: pa.array([], type=pa.float64())}
+        )
+    termids = ",".join(str(int(termid)) for termid, _ in query_terms)
+    # the rows that contain a single term are given by its document frequency
+    num_rows_total = (
+        query_terms[0][1]
+        if len(query_terms) == 1
+        else con.execute(FTS_NUM_MATCHES_COMMAND.format(termids=termids)).fetchall()[0][0]
+    )
+    fts_stage_table = con.execute(FTS_TOP_K_COMMAND.format(termids=termids, num_rows=num_rows)).arrow()
+    return num_rows_total, fts_stage_table
+
 
 def full_text_search(
     index_file_location: str,
@@ -59,12 +131,31 @@ def full_text_search(
     offset: int,
     length: int,
     extensions_directory: Optional[str] = None,
+    connection_pool: Optional[DuckDBConnectionPool] = None,
+    results_cache: Optional[RankedRowsCache] = None,
 ) -> tuple[int, pa.Table]:
-    with duckdb_connect_readonly(extensions_directory=extensions_directory, database=index_file_location) as con:
-        fts_stage_table = con.execute(query=FTS_STAGE_TABLE_COMMAND, parameters=[query]).arrow()
-        num_rows_total = fts_stage_table.num_rows
-        logging.info(f"got {num_rows_total=} results for {query=} using {offset=} {length=}")
-        fts_stage_table = fts_stage_table.sort_by([(HF_FTS_SCORE, "descending")]).slice(offset, length)
+    with connect_to_index(
+        database=index_file_location, extensions_directory=extensions_directory, connection_pool=connection_pool
+    ) as con:
+        cache_key = (
+            None
+            if results_cache is None
+            else results_cache.get_key(index_file_location, endpoint="search", query=query)
+        )
+        ranked_rows = None if results_cache is None or cache_key is None else results_cache.get(cache_key)
+        if ranked_rows is not None and ranked_rows.num_rows_total is not None and ranked_rows.has_page(offset, length):
+            fts_stage_table = ranked_rows.table
+            num_rows_total = ranked_rows.num_rows_total
+            logging.info(f"got {num_rows_total=} cached results for {query=} using {offset=} {length=}")
+        else:
+            num_rows = offset + length
+            if results_cache is not None and cache_key is not None:
+                num_rows = max(num_rows, results_cache.max_rows_per_entry)
+            num_rows_total, fts_stage_table = rank_matches(con, query=query, num_rows=num_rows)
+            logging.info(f"got {num_rows_total=} results for {query=} using {offset=} {length=}")
+            if results_cache is not None and cache_key is not None:
+                results_cache.put_first_rows(cache_key, fts_stage_table, num_rows_total=num_rows_total)
+        fts_stage_table = fts_stage_table.slice(offset, length)
         join_stage_and_data_query = JOIN_STAGE_AND_DATA_COMMAND.format(
             columns=",".join([f'"{column}"' for column in columns]),
             row_idx_column=ROW_IDX_COLUMN,
@@ -74,6 +165,8 @@ def full_text_search(
         con.from_arrow(fts_stage_table).create_view("fts_stage_table")
         con.execute("USE db;")
         pa_table = con.execute(query=join_stage_and_data_query).arrow()
+        # don't keep the stage table alive in a pooled connection
+        con.execute("DROP VIEW memory.fts_stage_table;")
     return num_rows_total, pa_table
 
 
@@ -131,9 +224,15 @@ def create_search_endpoint(
     max_age_short: int = 0,
     storage_clients: Optional[list[StorageClient]] = None,
     extensions_directory: Optional[str] = None,
-    clean_cache_proba: float = 0.0,
-    expiredTimeIntervalSeconds: int = 60,
     max_split_size_bytes: int = 5_000_000_000,
+    connection_pool: Optional[DuckDBConnectionPool] = None,
+    stream_parquet_files: bool = False,
+    build_memory_limit: str = DEFAULT_BUILD_MEMORY_LIMIT,
+    sort_indexes_max_columns: int = 0,
+    index_prebuilder: Optional[IndexPrebuilder] = None,
+    index_janitor: Optional[IndexJanitor] = None,
+    shared_index_storage_client: Optional[StorageClient] = None,
+    results_cache: Optional[RankedRowsCache] = None,
 ) -> Endpoint:
     async def search_endpoint(request: Request) -> Response:
         revision: Optional[str] = None
@@ -160,6 +259,9 @@ def create_search_endpoint(
 
                 logging.info(f"/search {dataset=} {config=} {split=} {query=} {offset=} {length=}")
 
+                if index_prebuilder is not None:
+                    index_prebuilder.record_request(dataset=dataset, config=config, split=split)
+
                 with StepProfiler(method="filter_endpoint", step="build index if missing"):
                     # get parquet urls and dataset_info
                     parquet_metadata_response = get_cache_entry_from_parquet_metadata_job(
@@ -198,7 +300,13 @@ def create_search_endpoint(
                         parquet_metadata_directory=parquet_metadata_directory,
                         split_parquet_files=split_parquet_files,
                         features=content_parquet_metadata["features"],
+                        stream_parquet_files=stream_parquet_files,
+                        build_memory_limit=build_memory_limit,
+                        sort_indexes_max_columns=sort_indexes_max_columns,
+                        shared_storage_client=shared_index_storage_client,
                     )
+                    if index_janitor is not None:
+                        index_janitor.record_access(index_file_location)
                     # features must contain the row idx column for full_text_search
                     features = Features.from_dict(content_parquet_metadata["features"])
                     features[ROW_IDX_COLUMN] = Value("int64")
@@ -216,15 +324,9 @@ def create_search_endpoint(
                         offset,
                         length,
                         extensions_directory,
+                        connection_pool,
+                        results_cache,
                     )
-                    # no need to do it every time
-                    # TODO: Will be moved to another process in parallel
-                    if random.random() < clean_cache_proba:  # nosec
-                        with StepProfiler(method="search_endpoint", step="clean old indexes"):
-                            clean_dir(
-                                duckdb_index_file_directory,
-                                expiredTimeIntervalSeconds,
-                            )
                 with StepProfiler(method="search_endpoint", step="create response"):
                     response = await create_response(
                         pa_table=pa_table,
@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import duckdb
+import numpy as np
+import numpy.typing as npt
+import pyarrow as pa
+from libcommon.constants import ROW_IDX_COLUMN
+from libcommon.duckdb_utils import SORT_INDEX_COLUMNS_TABLE, SORT_INDEX_RANK_COLUMN
+
+# a single column, quoted or not, with an optional direction
+ORDERBY_SINGLE_COLUMN_PATTERN = re.compile(
+    r'^\s*(?:"(?P<quoted>(?:[^"]|"")+)"|(?P<unquoted>[A-Za-z_]\w*))(?:\s+(?P<direction>ASC|DESC))?\s*$',
+    flags=re.IGNORECASE,
+)
+GET_SORT_INDEXES_QUERY = f"SELECT column_name, table_name, num_non_null, num_rows FROM {SORT_INDEX_COLUMNS_TABLE};"
+GET_SORTED_ROW_IDX_QUERY = f"""\
+    SELECT {ROW_IDX_COLUMN}
+    FROM {{table_name}}
+    WHERE {SORT_INDEX_RANK_COLUMN} >= {{start}} AND {SORT_INDEX_RANK_COLUMN} < {{end}}
+    ORDER BY {SORT_INDEX_RANK_COLUMN} {{direction}}"""
+MATCHING_ROW_IDX_QUERY = """\
+    SELECT {row_idx_column}
+    FROM data
+    WHERE {where}"""
+# the sort permutation is walked by chunks of at least this number of rows
+MIN_WALK_CHUNK_SIZE = 4_096
+
+
+@dataclass(frozen=True)
+class SortIndex:
+    """
+    The sort permutation of a column of an index file (see `libcommon.duckdb_utils.create_sort_indexes`).
+
+    Args:
+        column (`str`): The sorted column.
+        table_name (`str`): The table of the sort permutation.
+        num_non_null (`int`): The number of non-null values of the column.
+        num_rows (`int`): The number of rows of the data table.
+        descending (`bool`): Whether the column is sorted in descending order. The null values come last in both
+          orders, and in descending order, the rows with equal (or null) values come in descending row index order.
+    """
+
+    column: str
+    table_name: str
+    num_non_null: int
+    num_rows: int
+    descending: bool
+
+    def _get_ranked_row_idx(
+        self, con: duckdb.DuckDBPyConnection, start: int, end: int, direction: str
+    ) -> npt.NDArray[np.int64]:
+        if start >= end:
+            return np.array([], dtype=np.int64)
+        query = GET_SORTED_ROW_IDX_QUERY.format(table_name=self.table_name, start=start, end=end, direction=direction)
+        row_idx: npt.NDArray[np.int64] = con.sql(query).arrow().column(0).to_numpy()
+        return row_idx
+
+    def get_row_idx(self, con: duckdb.DuckDBPyConnection, start: int, end: int) -> npt.NDArray[np.int64]:
+        """Get the row indexes at the positions between `start` (inclusive) and `end` (exclusive) in the sort order.
+
+        Only the row groups of the permutation that contain these ranks are read, thanks to its zone maps.
+        """
+        end = min(end, self.num_rows)
+        if not self.descending:
+            return self._get_ranked_row_idx(con, start, end, "ASC")
+        # the non-null values in reverse order, then the null values in reverse order
+        num_non_null, num_rows = self.num_non_null, self.num_rows
+        return np.concatenate(
+            [
+                self._get_ranked_row_idx(con, num_non_null - min(end, num_non_null), num_non_null - start, "DESC"),
+                self._get_ranked_row_idx(
+                    con, num_rows + num_non_null - end, num_rows + num_non_null - max(start, num_non_null), "DESC"
+                ),
+            ]
+        )
+
+
+def get_sort_index(con: duckdb.DuckDBPyConnection, orderby: str) -> Optional[SortIndex]:
+    """Get the sort index that gives the order of an `orderby` parameter, if the index file has one.
+
+    Only an `orderby` on a single column, with an optional direction, can use a sort index.
+    """
+    match = ORDERBY_SINGLE_COLUMN_PATTERN.match(orderby)
+    if match is None:
+        return None
+    try:
+        sort_indexes = con.sql(GET_SORT_INDEXES_QUERY).fetchall()
+    except duckdb.CatalogException:
+        # the index file has no sort indexes
+        return None
+    column = match["unquoted"] if match["quoted"] is None else match["quoted"].replace('""', '"')
+    # the identifiers are case insensitive in duckdb, even if quoted
+    candidates = [sort_index for sort_index in sort_indexes if sort_index[0].lower() == column.lower()]
+    if len(candidates) != 1:
+        return None
+    column_name, table_name, num_non_null, num_rows = candidates[0]
+    return SortIndex(
+        column=column_name,
+        table_name=table_name,
+        num_non_null=num_non_null,
+        num_rows=num_rows,
+        descending=(match["direction"] or "").upper() == "DESC",
+    )
+
+
+def get_sorted_row_idx_page(
+    con: duckdb.DuckDBPyConnection, sort_index: SortIndex, where: str, offset: int, limit: int
+) -> tuple[pa.Table, int]:
+    """Get the row indexes of a page of the rows that match `where`, in the order of a sort index.
+
+    The matching rows are never sorted. Without `where`, the row indexes of the page are read directly from the
+    permutation. Otherwise, the predicate is evaluated in one pass over the data table, and the permutation is walked
+    by chunks until the page is filled: the number of walked rows depends on the depth of the page and on the
+    proportion of matching rows, not on the size of the split.
+
+    Returns:
+        `tuple[pa.Table, int]`: The row indexes of the page, in order, and the number of matching rows.
+    """
+    if not where:
+        row_idx = sort_index.get_row_idx(con, offset, offset + limit)
+        return pa.table({ROW_IDX_COLUMN: row_idx}), sort_index.num_rows
+    is_match = np.zeros(sort_index.num_rows, dtype=bool)
+    reader = con.execute(
+        MATCHING_ROW_IDX_QUERY.format(row_idx_column=ROW_IDX_COLUMN, where=where)
+    ).fetch_record_batch()
+    for batch in reader:
+        is_match[batch.column(0).to_numpy()] = True
+    num_matches = int(np.count_nonzero(is_match))
+    num_needed = min(offset + limit, num_matches)
+    pages: list[npt.NDArray[np.int64]] = []
+    num_found = 0
+    position = 0
+    # the expected number of rows to walk to find the needed matching rows
+    chunk_size = MIN_WALK_CHUNK_SIZE if num_needed == 0 else num_needed * sort_index.num_rows // num_matches
+    chunk_size = max(MIN_WALK_CHUNK_SIZE, chunk_size + chunk_size // 10)
+    while num_found < num_needed and position < sort_index.num_rows:
+        row_idx = sort_index.get_row_idx(con, position, position + chunk_size)
+        pages.append(row_idx[is_match[row_idx]])
+        num_found += len(pages[-1])
+        position += chunk_size
+        chunk_size *= 2
+    row_idx = np.concatenate(pages) if pages else np.array([], dtype=np.int64)
+    return pa.table({ROW_IDX_COLUMN: row_idx[offset : offset + limit]}), num_matches  # noqa: E203
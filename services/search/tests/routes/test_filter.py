@@ -2,6 +2,7 @@
 # Copyright 2023 The HuggingFace Authors.
 
 import os
+import shutil
 from collections.abc import Generator
 from pathlib import Path
 from typing import Union
@@ -14,10 +15,12 @@ from datasets import Dataset
 from libapi.exceptions import InvalidParameterError
 from libapi.response import create_response
 from libcommon.constants import ROW_IDX_COLUMN
+from libcommon.duckdb_utils import create_sort_indexes
 from libcommon.storage_client import StorageClient
 
 from search.config import AppConfig
-from search.routes.filter import execute_filter_query, validate_query_parameter
+from search.results_cache import RankedRowsCache
+from search.routes.filter import FilterCountCache, execute_filter_query, validate_query_parameter
 
 CACHED_ASSETS_FOLDER = "cached-assets"
 
@@ -120,6 +123,155 @@ def test_execute_filter_query(columns: list[str], where: str, orderby: str, inde
     assert pa_table == expected_pa_table
 
 
+@pytest.mark.parametrize(
+    "where,limit,offset,expected_num_rows_total,expected_cached_count",
+    [
+        # a page that is not the last one: the matching rows are counted, and the count is cached
+        ("", 2, 0, 4, 4),
+        ("\"gender\"='female'", 1, 0, 2, 2),
+        # the last page: the count is derived from the page, and cached
+        ("", 2, 3, 4, 4),
+        ("\"gender\"='female'", 10, 0, 2, 2),
+        # no matching rows
+        ('"age">100', 10, 0, 0, 0),
+        # a page beyond the last matching row: the matching rows are counted
+        ("", 2, 10, 4, 4),
+    ],
+)
+def test_execute_filter_query_count_cache(
+    where: str,
+    limit: int,
+    offset: int,
+    expected_num_rows_total: int,
+    expected_cached_count: int,
+    index_file_location: str,
+) -> None:
+    filter_count_cache = FilterCountCache(max_entries=10)
+    num_rows_total, _ = execute_filter_query(
+        index_file_location=index_file_location,
+        columns=["name", ROW_IDX_COLUMN],
+        where=where,
+        orderby="",
+        limit=limit,
+        offset=offset,
+        filter_count_cache=filter_count_cache,
+    )
+    assert num_rows_total == expected_num_rows_total
+    key = filter_count_cache.get_key(index_file_location, where=where)
+    assert key is not None
+    assert filter_count_cache.get(key) == expected_cached_count
+
+
+def test_execute_filter_query_uses_cached_count(index_file_location: str) -> None:
+    filter_count_cache = FilterCountCache(max_entries=10)
+    # a stale count, to check that the cache is used
+    key = filter_count_cache.get_key(index_file_location, where="")
+    assert key is not None
+    filter_count_cache.put(key, 100)
+    num_rows_total, pa_table = execute_filter_query(
+        index_file_location=index_file_location,
+        columns=["name", ROW_IDX_COLUMN],
+        where="",
+        orderby="",
+        limit=2,
+        offset=0,
+        filter_count_cache=filter_count_cache,
+    )
+    assert num_rows_total == 100
+    assert pa_table.num_rows == 2
+
+
+def test_filter_count_cache_key_changes_when_the_index_file_is_replaced(index_file_location: str) -> None:
+    filter_count_cache = FilterCountCache(max_entries=10)
+    key = filter_count_cache.get_key(index_file_location, where="")
+    assert key is not None
+    filter_count_cache.put(key, 100)
+    shutil.copyfile(index_file_location, f"{index_file_location}.tmp")
+    os.replace(f"{index_file_location}.tmp", index_file_location)
+    new_key = filter_count_cache.get_key(index_file_location, where="")
+    assert new_key is not None
+    assert new_key != key
+    assert filter_count_cache.get(new_key) is None
+    assert filter_count_cache.get_key("missing.duckdb", where="") is None
+
+
+@pytest.mark.parametrize("max_rows_per_entry", [1, 2, 3, 100])
+@pytest.mark.parametrize("where,orderby", [("", ""), ("\"gender\"='female'", ""), ("", '"age" DESC, "name"')])
+def test_execute_filter_query_results_cache(
+    where: str, orderby: str, max_rows_per_entry: int, index_file_location: str
+) -> None:
+    columns = ["name", "age", ROW_IDX_COLUMN]
+    results_cache = RankedRowsCache(max_bytes=1_000_000, max_rows_per_entry=max_rows_per_entry)
+    for limit, offset in [(2, 0), (2, 1), (2, 2), (1, 3), (2, 10)]:
+        expected = execute_filter_query(
+            index_file_location=index_file_location,
+            columns=columns,
+            where=where,
+            orderby=orderby,
+            limit=limit,
+            offset=offset,
+        )
+        for _ in range(2):
+            assert (
+                execute_filter_query(
+                    index_file_location=index_file_location,
+                    columns=columns,
+                    where=where,
+                    orderby=orderby,
+                    limit=limit,
+                    offset=offset,
+                    results_cache=results_cache,
+                )
+                == expected
+            )
+    # the ranked rows are only cached if the first page fits in an entry
+    assert len(results_cache) == (1 if max_rows_per_entry >= 2 else 0)
+
+
+@pytest.fixture
+def sorted_index_file_location(tmp_path: Path) -> str:
+    index_file_location = str(tmp_path / "index.duckdb")
+    with duckdb.connect(index_file_location) as con:
+        con.sql(
+            f"CREATE TABLE data AS SELECT range AS {ROW_IDX_COLUMN}, CASE WHEN range % 11 = 0 THEN NULL ELSE"
+            " hash(range) % 1000 END AS num, chr(65 + (hash(range) % 26)::INT) AS label FROM range(10_000)"
+        )
+        features = {"num": {"dtype": "int64", "_type": "Value"}, "label": {"dtype": "string", "_type": "Value"}}
+        assert create_sort_indexes(con, features, max_columns=2) == ["num", "label"]
+    return index_file_location
+
+
+@pytest.mark.parametrize("orderby", ['"num"', "num DESC", '"LABEL" asc'])
+@pytest.mark.parametrize("where", ["", '"num" % 7 = 0', "\"label\" = 'A'", '"num" > 1000'])
+@pytest.mark.parametrize("max_rows_per_entry", [0, 1_000])
+def test_execute_filter_query_sort_index(
+    orderby: str, where: str, max_rows_per_entry: int, sorted_index_file_location: str
+) -> None:
+    column, _, direction = orderby.partition(" ")
+    results_cache = RankedRowsCache(max_bytes=1_000_000, max_rows_per_entry=max_rows_per_entry)
+    with duckdb.connect(sorted_index_file_location, read_only=True) as con:
+        # the ties are ordered by row index, in the direction of the column
+        expected_row_idx = [
+            row_idx
+            for (row_idx,) in con.sql(
+                f"SELECT {ROW_IDX_COLUMN} FROM data {f'WHERE {where}' if where else ''}"
+                f" ORDER BY {column} {direction} NULLS LAST, {ROW_IDX_COLUMN} {direction}"
+            ).fetchall()
+        ]
+    for limit, offset in [(100, 0), (100, 50), (100, 5_000), (10, 9_995), (100, 20_000)]:
+        num_rows_total, pa_table = execute_filter_query(
+            index_file_location=sorted_index_file_location,
+            columns=["num", "label", ROW_IDX_COLUMN],
+            where=where,
+            orderby=orderby,
+            limit=limit,
+            offset=offset,
+            results_cache=results_cache,
+        )
+        assert num_rows_total == len(expected_row_idx)
+        assert pa_table.column(ROW_IDX_COLUMN).to_pylist() == expected_row_idx[offset : offset + limit]
+
+
 @pytest.mark.parametrize("where", ['"non-existing-column"=30', '"name"=30', '"name">30'])
 def test_execute_filter_query_raises(where: str, index_file_location: str) -> None:
     columns, limit, offset = ["name", "gender", "age"], 100, 0
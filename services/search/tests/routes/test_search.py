@@ -2,6 +2,7 @@
 # Copyright 2023 The HuggingFace Authors.
 
 import os
+from pathlib import Path
 from typing import Any
 
 import duckdb
@@ -9,10 +10,13 @@ import pandas as pd
 import pyarrow as pa
 import pytest
 from libapi.duckdb import get_download_folder
-from libcommon.constants import ROW_IDX_COLUMN
+from libcommon.constants import HF_FTS_SCORE, ROW_IDX_COLUMN
+from libcommon.duckdb_utils import create_index
 from libcommon.storage import StrPath
 
-from search.routes.search import full_text_search
+from search.duckdb_connection import DuckDBConnectionPool, duckdb_connect_readonly
+from search.results_cache import RankedRowsCache
+from search.routes.search import FTS_STAGE_TABLE_COMMAND, full_text_search, get_fts_stemmer, rank_matches
 
 
 def test_get_download_folder(duckdb_index_cache_directory: StrPath) -> None:
@@ -101,9 +105,78 @@ def test_full_text_search(
     assert num_rows_total == expected_num_rows_total
     assert pa_table == expected_table
 
+    # the state of a pooled connection is reset after the search
+    connection_pool = DuckDBConnectionPool(extensions_directory=None, max_connections_per_file=1, max_idle_seconds=60)
+    for _ in range(2):
+        assert full_text_search(
+            index_file_location, features, query, offset, length, connection_pool=connection_pool
+        ) == (expected_num_rows_total, expected_table)
+    connection_pool.close()
+
+    # the next requests for the same query are served from the cached ranked rows
+    results_cache = RankedRowsCache(max_bytes=1_000_000, max_rows_per_entry=100)
+    for _ in range(2):
+        assert full_text_search(index_file_location, features, query, offset, length, results_cache=results_cache) == (
+            expected_num_rows_total,
+            expected_table,
+        )
+    assert len(results_cache) == 1
+
     # ensure that database has not been modified
     con = duckdb.connect(index_file_location)
     assert sample_df.size == con.execute(query="SELECT COUNT(*) FROM data;").fetchall()[0][0]
     con.close()
 
     os.remove(index_file_location)
+
+
+@pytest.mark.parametrize("query", ["Lord", "lord vader ships", "Round, round!", "non existing text", "the"])
+def test_rank_matches(tmp_path: Path, query: str) -> None:
+    index_file_location = str(tmp_path / "index.duckdb")
+    words = ["lord", "vader", "ship", "space", "rebel", "dark", "round", "circles", "the"]
+    with duckdb.connect(index_file_location) as con:
+        con.execute(f"CREATE TABLE data ({ROW_IDX_COLUMN} BIGINT, text VARCHAR)")
+        con.executemany(
+            "INSERT INTO data VALUES (?, ?)",
+            [
+                (row_idx, " ".join(words[(row_idx * 7 + i) % len(words)] for i in range(row_idx % 5 + 1)))
+                for row_idx in range(200)
+            ],
+        )
+    create_index(
+        database=index_file_location,
+        input_table="data",
+        columns=["text"],
+        stemmer="english",
+        input_id=ROW_IDX_COLUMN,
+        fts_schema="fts_main_data",
+    )
+
+    with duckdb_connect_readonly(index_file_location) as con:
+        assert get_fts_stemmer(con) == "english"
+        # the same scores as match_bm25 on all the rows
+        expected_table = con.execute(query=FTS_STAGE_TABLE_COMMAND, parameters=[query]).arrow()
+        expected_table = expected_table.sort_by([(HF_FTS_SCORE, "descending"), (ROW_IDX_COLUMN, "ascending")])
+        num_rows_total, table = rank_matches(con, query=query, num_rows=10)
+    assert num_rows_total == expected_table.num_rows
+    assert table.column(ROW_IDX_COLUMN).to_pylist() == expected_table.column(ROW_IDX_COLUMN).to_pylist()[:10]
+    assert table.column(HF_FTS_SCORE).to_pylist() == pytest.approx(
+        expected_table.column(HF_FTS_SCORE).to_pylist()[:10]
+    )
+
+
+def test_rank_matches_without_stored_stemmer(tmp_path: Path) -> None:
+    index_file_location = str(tmp_path / "index.duckdb")
+    with duckdb.connect(index_file_location) as con:
+        con.execute("INSTALL 'fts';")
+        con.execute("LOAD 'fts';")
+        con.execute(f"CREATE TABLE data ({ROW_IDX_COLUMN} BIGINT, text VARCHAR)")
+        con.execute("INSERT INTO data VALUES (0, 'lord vader'), (1, 'space ships'), (2, 'the lords')")
+        con.sql(f"PRAGMA create_fts_index('data', '{ROW_IDX_COLUMN}', 'text', stemmer='english', overwrite=1);")
+
+    with duckdb_connect_readonly(index_file_location) as con:
+        # all the matching rows are scored with match_bm25
+        assert get_fts_stemmer(con) is None
+        num_rows_total, table = rank_matches(con, query="lord", num_rows=10)
+    assert num_rows_total == 2
+    assert sorted(table.column(ROW_IDX_COLUMN).to_pylist()) == [0, 2]
@@ -0,0 +1,84 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import os
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from search.duckdb_connection import DuckDBConnectionPool, connect_to_index, remove_index_file_if_unused
+
+
+@pytest.fixture
+def index_file_location(tmp_path: Path) -> str:
+    index_file_location = str(tmp_path / "index.duckdb")
+    con = duckdb.connect(index_file_location)
+    con.sql("CREATE TABLE data AS SELECT * FROM range(10) t(id);")
+    con.close()
+    return index_file_location
+
+
+def test_connection_pool_reuses_connections(index_file_location: str) -> None:
+    pool = DuckDBConnectionPool(extensions_directory=None, max_connections_per_file=2, max_idle_seconds=60)
+    with pool.connect(index_file_location) as con:
+        assert con.sql("SELECT COUNT(*) FROM data").fetchall() == [(10,)]
+        with pool.connect(index_file_location) as other_con:
+            # a connection is used by one thread at a time
+            assert other_con is not con
+    # the most recently released connection is reused, so that the others become idle and are closed
+    with pool.connect(index_file_location) as reused_con:
+        assert reused_con is con
+    pool.close()
+
+
+def test_connection_pool_closes_connection_on_error(index_file_location: str) -> None:
+    pool = DuckDBConnectionPool(extensions_directory=None, max_connections_per_file=1, max_idle_seconds=60)
+    with pytest.raises(duckdb.Error):
+        with pool.connect(index_file_location) as con:
+            con.sql("SELECT * FROM missing_table")
+    with pool.connect(index_file_location) as new_con:
+        assert new_con is not con
+
+
+def test_connection_pool_evicts_idle_connections(index_file_location: str) -> None:
+    pool = DuckDBConnectionPool(extensions_directory=None, max_connections_per_file=1, max_idle_seconds=0)
+    with pool.connect(index_file_location) as con:
+        pass
+    pool.evict_idle_connections()
+    with pytest.raises(duckdb.ConnectionException):
+        con.sql("SELECT 1")
+
+
+def test_connection_pool_evicts_missing_files(index_file_location: str) -> None:
+    pool = DuckDBConnectionPool(extensions_directory=None, max_connections_per_file=1, max_idle_seconds=60)
+    with pool.connect(index_file_location) as con:
+        pass
+    os.remove(index_file_location)
+    pool.evict_missing_files()
+    with pytest.raises(duckdb.ConnectionException):
+        con.sql("SELECT 1")
+    with pytest.raises(FileNotFoundError):
+        with pool.connect(index_file_location):
+            pass
+
+
+def test_connection_pool_locks_files_in_use(index_file_location: str) -> None:
+    pool = DuckDBConnectionPool(extensions_directory=None, max_connections_per_file=1, max_idle_seconds=60)
+    with pool.connect(index_file_location):
+        assert not remove_index_file_if_unused(index_file_location)
+    # idle connections keep the file locked, until they are closed
+    assert not remove_index_file_if_unused(index_file_location)
+    pool.max_idle_seconds = 0
+    pool.evict_idle_connections()
+    assert remove_index_file_if_unused(index_file_location)
+    assert not os.path.exists(index_file_location)
+
+
+def test_connect_to_index_locks_file(index_file_location: str) -> None:
+    with connect_to_index(index_file_location) as con:
+        assert con.sql("SELECT COUNT(*) FROM data").fetchall() == [(10,)]
+        assert not remove_index_file_if_unused(index_file_location)
+    assert remove_index_file_if_unused(index_file_location)
+    # a missing file is considered removed
+    assert remove_index_file_if_unused(index_file_location)
@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import os
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+from unittest.mock import patch
+
+import duckdb
+import pytest
+
+from search.duckdb_connection import DuckDBConnectionPool
+from search.janitor import IndexJanitor
+
+
+def create_index_file(tmp_path: Path, name: str, last_access: float) -> str:
+    index_file_location = str(tmp_path / "downloads" / name / "index.duckdb")
+    Path(index_file_location).parent.mkdir(parents=True)
+    con = duckdb.connect(index_file_location)
+    con.sql("CREATE TABLE data AS SELECT * FROM range(10) t(id);")
+    con.close()
+    os.utime(index_file_location, (last_access, last_access))
+    return index_file_location
+
+
+def get_index_janitor(tmp_path: Path, connection_pool: Optional[DuckDBConnectionPool] = None) -> IndexJanitor:
+    return IndexJanitor(
+        duckdb_index_file_directory=tmp_path,
+        interval_seconds=60,
+        expired_time_interval_seconds=3_600,
+        high_water_mark_percent=80,
+        low_water_mark_percent=70,
+        connection_pool=connection_pool,
+    )
+
+
+def get_disk_usage(percent: float, used: int) -> SimpleNamespace:
+    return SimpleNamespace(total=int(used * 100 / percent), used=used, percent=percent)
+
+
+def test_index_janitor_evicts_expired_files(tmp_path: Path) -> None:
+    now = time.time()
+    expired = create_index_file(tmp_path, "expired", last_access=now - 7_200)
+    recent = create_index_file(tmp_path, "recent", last_access=now - 7_200)
+    index_janitor = get_index_janitor(tmp_path)
+    index_janitor.scan()
+    index_janitor.record_access(recent)
+    index_janitor.flush()
+    index_janitor.evict()
+    assert not os.path.exists(expired)
+    assert os.path.exists(recent)
+
+
+def test_index_janitor_evicts_least_recently_accessed_files(tmp_path: Path) -> None:
+    now = time.time()
+    index_file_locations = [
+        create_index_file(tmp_path, f"ds_{i}", last_access=now - 1_000 + 100 * i) for i in range(3)
+    ]
+    index_janitor = get_index_janitor(tmp_path)
+    index_janitor.scan()
+    size = os.path.getsize(index_file_locations[0])
+    # freeing two files is needed to reach the low water mark
+    disk_usage = get_disk_usage(percent=90, used=9 * size)
+    with patch("search.janitor.psutil.disk_usage", return_value=disk_usage):
+        index_janitor.evict()
+    assert [os.path.exists(location) for location in index_file_locations] == [False, False, True]
+
+
+def test_index_janitor_does_not_evict_files_in_use(tmp_path: Path) -> None:
+    index_file_location = create_index_file(tmp_path, "ds", last_access=time.time() - 7_200)
+    connection_pool = DuckDBConnectionPool(extensions_directory=None, max_connections_per_file=1, max_idle_seconds=0)
+    index_janitor = get_index_janitor(tmp_path, connection_pool=connection_pool)
+    with connection_pool.connect(index_file_location):
+        index_janitor.run()
+        assert os.path.exists(index_file_location)
+    # the idle connection is closed, and the file is deleted by the next round
+    os.utime(index_file_location, (time.time() - 7_200, time.time() - 7_200))
+    index_janitor.run()
+    assert not os.path.exists(index_file_location)
+
+
+def test_index_janitor_scan(tmp_path: Path) -> None:
+    now = time.time()
+    index_file_location = create_index_file(tmp_path, "ds", last_access=now)
+    index_janitor = get_index_janitor(tmp_path)
+    index_janitor.scan()
+    with index_janitor._connect() as con:
+        assert con.execute("SELECT path, last_access FROM index_files").fetchall() == [
+            (index_file_location, pytest.approx(now))
+        ]
+    os.remove(index_file_location)
+    index_janitor.scan()
+    with index_janitor._connect() as con:
+        assert con.execute("SELECT path FROM index_files").fetchall() == []
+    # the empty directories and the orphan lock files are deleted
+    assert not os.path.exists(os.path.dirname(index_file_location))
@@ -0,0 +1,97 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from libapi.exceptions import DownloadIndexError
+
+from search.prebuild import IndexPrebuilder, PrebuildSkippedError, SplitKey
+
+pytestmark = pytest.mark.anyio
+
+
+def get_index_prebuilder(
+    tmp_path: Path, built: list[SplitKey], max_splits: int = 2, max_concurrent_builds: int = 1
+) -> IndexPrebuilder:
+    running: list[SplitKey] = []
+
+    async def build_index(dataset: str, config: str, split: str) -> bool:
+        if dataset == "skipped":
+            raise PrebuildSkippedError("no parquet files")
+        if dataset == "error":
+            raise RuntimeError("failed")
+        running.append((dataset, config, split))
+        assert len(running) <= max_concurrent_builds
+        await asyncio.sleep(0.01)
+        running.remove((dataset, config, split))
+        built.append((dataset, config, split))
+        return True
+
+    return IndexPrebuilder(
+        build_index=build_index,
+        duckdb_index_file_directory=tmp_path,
+        max_splits=max_splits,
+        max_concurrent_builds=max_concurrent_builds,
+        interval_seconds=60,
+        half_life_seconds=3_600,
+        min_free_disk_bytes=0,
+    )
+
+
+def test_index_prebuilder_get_trending_splits(tmp_path: Path) -> None:
+    index_prebuilder = get_index_prebuilder(tmp_path, built=[])
+    assert index_prebuilder.get_trending_splits() == []
+    for _ in range(3):
+        index_prebuilder.record_request("ds", "config", "train")
+    index_prebuilder.record_request("ds", "config", "test")
+    for _ in range(2):
+        index_prebuilder.record_request("other", "config", "train")
+    assert index_prebuilder.get_trending_splits() == [("ds", "config", "train"), ("other", "config", "train")]
+
+
+def test_index_prebuilder_request_counts_decay(tmp_path: Path) -> None:
+    index_prebuilder = get_index_prebuilder(tmp_path, built=[])
+    with patch("search.prebuild.time.monotonic", return_value=0):
+        for _ in range(3):
+            index_prebuilder.record_request("old", "config", "train")
+    with patch("search.prebuild.time.monotonic", return_value=2 * 3_600):
+        # 3 requests two half-lives ago weigh less than one request now
+        index_prebuilder.record_request("new", "config", "train")
+        assert index_prebuilder.get_trending_splits() == [("new", "config", "train"), ("old", "config", "train")]
+
+
+@pytest.mark.parametrize("max_concurrent_builds", [1, 2])
+async def test_index_prebuilder_prebuild_trending_splits(tmp_path: Path, max_concurrent_builds: int) -> None:
+    built: list[SplitKey] = []
+    index_prebuilder = get_index_prebuilder(
+        tmp_path, built=built, max_splits=10, max_concurrent_builds=max_concurrent_builds
+    )
+    for dataset in ["ds", "other", "skipped", "error"]:
+        index_prebuilder.record_request(dataset, "config", "train")
+    await index_prebuilder.prebuild_trending_splits()
+    assert sorted(built) == [("ds", "config", "train"), ("other", "config", "train")]
+    # the splits that failed are not prebuilt again before the retry delay
+    assert sorted(index_prebuilder.get_trending_splits()) == sorted(built)
+
+
+async def test_index_prebuilder_not_enough_disk_space(tmp_path: Path) -> None:
+    built: list[SplitKey] = []
+    index_prebuilder = get_index_prebuilder(tmp_path, built=built)
+    index_prebuilder.record_request("ds", "config", "train")
+    with patch("search.prebuild.check_available_disk_space", side_effect=DownloadIndexError("no space")):
+        await index_prebuilder.prebuild_trending_splits()
+    assert built == []
+
+
+async def test_index_prebuilder_start_stop(tmp_path: Path) -> None:
+    built: list[SplitKey] = []
+    index_prebuilder = get_index_prebuilder(tmp_path, built=built)
+    index_prebuilder.interval_seconds = 0.01
+    index_prebuilder.record_request("ds", "config", "train")
+    index_prebuilder.start()
+    await asyncio.sleep(0.1)
+    await index_prebuilder.stop()
+    assert ("ds", "config", "train") in built
@@ -0,0 +1,49 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The HuggingFace Authors.
+
+from pathlib import Path
+from typing import Optional
+
+import pyarrow as pa
+import pytest
+
+from search.results_cache import RankedRows, RankedRowsCache
+
+
+@pytest.mark.parametrize(
+    "num_rows,num_rows_total,offset,length,expected",
+    [
+        (10, 10, 5, 10, True),
+        (10, 10, 20, 10, True),
+        (10, 20, 0, 10, True),
+        (10, 20, 5, 10, False),
+        (10, None, 0, 10, True),
+        (10, None, 5, 10, False),
+    ],
+)
+def test_ranked_rows_has_page(
+    num_rows: int, num_rows_total: Optional[int], offset: int, length: int, expected: bool
+) -> None:
+    ranked_rows = RankedRows(table=pa.table({"a": list(range(num_rows))}), num_rows_total=num_rows_total)
+    assert ranked_rows.has_page(offset, length) == expected
+
+
+def test_ranked_rows_cache_put_first_rows(tmp_path: Path) -> None:
+    index_file_location = str(tmp_path / "index.duckdb")
+    cache = RankedRowsCache(max_bytes=1_000_000, max_rows_per_entry=10)
+    assert cache.get_key(index_file_location, endpoint="search", query="query") is None
+    Path(index_file_location).touch()
+    key = cache.get_key(index_file_location, endpoint="search", query="query")
+    assert key is not None
+    table = pa.table({"a": list(range(1_000))})
+    ranked_rows = cache.put_first_rows(key, table, num_rows_total=table.num_rows)
+    assert cache.get(key) is ranked_rows
+    assert ranked_rows.table == table.slice(0, 10)
+    # the buffers of the whole table are not kept alive
+    assert ranked_rows.table.get_total_buffer_size() < table.get_total_buffer_size()
+    # a replaced index file gets a new key
+    Path(index_file_location).with_suffix(".tmp").touch()
+    Path(index_file_location).with_suffix(".tmp").rename(index_file_location)
+    new_key = cache.get_key(index_file_location, endpoint="search", query="query")
+    assert new_key is not None
+    assert new_key != key
@@ -49,8 +49,13 @@ WORKER_MAX_JOB_DURATION_SECONDS = 20 * 60
 WORKER_MAX_LOAD_PCT = 70
 WORKER_MAX_MEMORY_PCT = 80
 WORKER_MAX_MISSING_HEARTBEATS = 5
+WORKER_NUM_SLOTS = 1
+WORKER_PREFETCH_JOBS = 1
+WORKER_PREFETCH_LEASE_SECONDS = 60
 WORKER_SLEEP_SECONDS = 15
 WORKER_STATE_FILE_PATH = None
+WORKER_WAKE_UP_FALLBACK_SLEEP_SECONDS = 5 * 60
+WORKER_WAKE_UP_ON_NEW_JOBS = False
 
 
 @dataclass(frozen=True)
@@ -65,8 +70,13 @@ class WorkerConfig:
     max_load_pct: int = WORKER_MAX_LOAD_PCT
     max_memory_pct: int = WORKER_MAX_MEMORY_PCT
     max_missing_heartbeats: int = WORKER_MAX_MISSING_HEARTBEATS
+    num_slots: int = WORKER_NUM_SLOTS
+    prefetch_jobs: int = WORKER_PREFETCH_JOBS
+    prefetch_lease_seconds: float = WORKER_PREFETCH_LEASE_SECONDS
     sleep_seconds: float = WORKER_SLEEP_SECONDS
     state_file_path: Optional[str] = WORKER_STATE_FILE_PATH
+    wake_up_fallback_sleep_seconds: float = WORKER_WAKE_UP_FALLBACK_SLEEP_SECONDS
+    wake_up_on_new_jobs: bool = WORKER_WAKE_UP_ON_NEW_JOBS
 
     @classmethod
     def from_env(cls) -> "WorkerConfig":
@@ -95,10 +105,17 @@ class WorkerConfig:
                 max_load_pct=env.int(name="MAX_LOAD_PCT", default=WORKER_MAX_LOAD_PCT),
                 max_memory_pct=env.int(name="MAX_MEMORY_PCT", default=WORKER_MAX_MEMORY_PCT),
                 max_missing_heartbeats=env.int(name="MAX_MISSING_HEARTBEATS", default=WORKER_MAX_MISSING_HEARTBEATS),
+                num_slots=env.int(name="NUM_SLOTS", default=WORKER_NUM_SLOTS),
+                prefetch_jobs=env.int(name="PREFETCH_JOBS", default=WORKER_PREFETCH_JOBS),
+                prefetch_lease_seconds=env.float(name="PREFETCH_LEASE_SECONDS", default=WORKER_PREFETCH_LEASE_SECONDS),
                 sleep_seconds=env.float(name="SLEEP_SECONDS", default=WORKER_SLEEP_SECONDS),
                 state_file_path=env.str(
                     name="STATE_FILE_PATH", default=WORKER_STATE_FILE_PATH
                 ),  # this environment variable is not expected to be set explicitly, it's set by the worker executor
+                wake_up_fallback_sleep_seconds=env.float(
+                    name="WAKE_UP_FALLBACK_SLEEP_SECONDS", default=WORKER_WAKE_UP_FALLBACK_SLEEP_SECONDS
+                ),
+                wake_up_on_new_jobs=env.bool(name="WAKE_UP_ON_NEW_JOBS", default=WORKER_WAKE_UP_ON_NEW_JOBS),
             )
 
 
@@ -184,8 +184,13 @@ class ParquetFileMetadataItem(SplitItem):
     parquet_metadata_subpath: str
 
 
+class RowGroupsIndexItem(SplitItem):
+    row_groups_index_subpath: str
+
+
 class ConfigParquetMetadataResponse(TypedDict):
     parquet_files_metadata: list[ParquetFileMetadataItem]
+    row_groups_indexes: list[RowGroupsIndexItem]
     features: Optional[dict[str, Any]]
     partial: bool
 
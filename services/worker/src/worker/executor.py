@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright 2022 The HuggingFace Authors.
 import asyncio
+import contextlib
 import logging
 import os
 import signal
@@ -50,10 +51,25 @@ class BadWorkerState(RuntimeError):
 
 
 class WorkerExecutor:
+    """
+    Supervises the worker loop subprocesses: starts them, sends the heartbeats of their jobs, kills the long jobs and
+    the zombie jobs.
+
+    The executor runs `worker.num_slots` worker loops concurrently (one by default). Each slot has its own state file.
+    The worker loops check the available resources (memory and CPU) before starting a job.
+
+    With one slot, the executor stops when the worker loop stops (e.g. after a long job has been killed), and the pod
+    is restarted. With several slots, a stopped worker loop is restarted in place, and the other slots keep running.
+    """
+
     def __init__(self, app_config: AppConfig, job_runner_factory: JobRunnerFactory, state_file_path: str) -> None:
         self.app_config = app_config
         self.job_runner_factory = job_runner_factory
         self.state_file_path = state_file_path
+        num_slots = max(1, self.app_config.worker.num_slots)
+        self.state_file_paths = (
+            [state_file_path] if num_slots == 1 else [f"{state_file_path}.{slot}" for slot in range(num_slots)]
+        )
 
         max_missing_heartbeats = self.app_config.worker.max_missing_heartbeats
         heartbeat_interval_seconds = self.app_config.worker.heartbeat_interval_seconds
@@ -65,15 +81,19 @@ class WorkerExecutor:
         self.kill_long_job_interval_seconds = self.app_config.worker.kill_long_job_interval_seconds
 
         self.executors: list[Union[OutputExecutor, TCPExecutor]] = []
+        self.stopping = False
 
-    def _create_worker_loop_executor(self) -> OutputExecutor:
-        banner = self.state_file_path
+    def _create_worker_loop_executor(self, state_file_path: Optional[str] = None) -> OutputExecutor:
+        state_file_path = state_file_path or self.state_file_path
+        banner = state_file_path
         start_worker_loop_command = [
             sys.executable,
             START_WORKER_LOOP_PATH,
             "--print-worker-state-path",
         ]
-        return OutputExecutor(start_worker_loop_command, banner, timeout=60)
+        return OutputExecutor(
+            start_worker_loop_command, banner, timeout=60, envvars={"WORKER_STATE_FILE_PATH": state_file_path}
+        )
 
     def _create_web_app_executor(self) -> TCPExecutor:
         logging.info("Starting webapp for /healthcheck and /metrics.")
@@ -82,9 +102,12 @@ class WorkerExecutor:
         return TCPExecutor(start_web_app_command, host=uvicorn_config.hostname, port=uvicorn_config.port, timeout=10)
 
     def start(self) -> None:
-        worker_loop_executor = self._create_worker_loop_executor()
-        worker_loop_executor.start()  # blocking until the banner is printed
-        self.executors.append(worker_loop_executor)
+        worker_loop_executors: list[tuple[OutputExecutor, str]] = []
+        for state_file_path in self.state_file_paths:
+            worker_loop_executor = self._create_worker_loop_executor(state_file_path=state_file_path)
+            worker_loop_executor.start()  # blocking until the banner is printed
+            self.executors.append(worker_loop_executor)
+            worker_loop_executors.append((worker_loop_executor, state_file_path))
 
         web_app_executor = self._create_web_app_executor()
         web_app_executor.start()  # blocking until socket connection is established
@@ -104,19 +127,31 @@ class WorkerExecutor:
                 ),
             )
         )
-        loop.create_task(
-            every(
-                self.kill_long_job,
-                worker_loop_executor=worker_loop_executor,
-                seconds=(
-                    self.kill_long_job_interval_seconds * 0.5,
-                    self.kill_long_job_interval_seconds * 1.5,
-                ),
+        for worker_loop_executor, state_file_path in worker_loop_executors:
+            loop.create_task(
+                every(
+                    self.kill_long_job,
+                    worker_loop_executor=worker_loop_executor,
+                    state_file_path=state_file_path,
+                    seconds=(
+                        self.kill_long_job_interval_seconds * 0.5,
+                        self.kill_long_job_interval_seconds * 1.5,
+                    ),
+                )
+            )
+        if len(worker_loop_executors) == 1:
+            loop.run_until_complete(
+                every(self.are_workers_alive, worker_loop_executors=worker_loop_executors, seconds=1.0, stop_on=False)
+            )
+        else:
+            loop.run_until_complete(
+                every(
+                    self.restart_stopped_workers,
+                    worker_loop_executors=worker_loop_executors,
+                    seconds=1.0,
+                    stop_on=False,
+                )
             )
-        )
-        loop.run_until_complete(
-            every(self.is_worker_alive, worker_loop_executor=worker_loop_executor, seconds=1.0, stop_on=False)
-        )
         logging.info("Executor loop finished.")
 
     def sigterm_stop(self) -> None:
@@ -124,28 +159,41 @@ class WorkerExecutor:
         self.stop()
 
     def stop(self) -> None:
+        self.stopping = True
         for executor in self.executors:
             executor.stop()
+        for state_file_path in self.state_file_paths:
+            self.release_prefetched_jobs(state_file_path=state_file_path)
 
-    def get_state(self) -> Optional[WorkerState]:
-        worker_state_file_path = self.state_file_path
+    def get_state(self, state_file_path: Optional[str] = None) -> Optional[WorkerState]:
+        worker_state_file_path = state_file_path or self.state_file_path
         if not os.path.exists(worker_state_file_path):
             return None
         with FileLock(f"{worker_state_file_path}.lock"):
             try:
                 with open(worker_state_file_path, "rb") as worker_state_f:
                     worker_state = orjson.loads(worker_state_f.read())
-                    return WorkerState(
+                    state = WorkerState(
                         current_job_info=worker_state.get("current_job_info"),
                         last_updated=datetime.fromisoformat(worker_state["last_updated"]),
                     )
+                    if "prefetched_job_infos" in worker_state:
+                        state["prefetched_job_infos"] = worker_state["prefetched_job_infos"]
+                    return state
             except (orjson.JSONDecodeError, KeyError) as err:
                 raise BadWorkerState(f"Failed to read worker state at {worker_state_file_path}") from err
 
     def heartbeat(self) -> None:
-        worker_state = self.get_state()
-        if worker_state and worker_state["current_job_info"]:
-            job_id = worker_state["current_job_info"]["job_id"]
+        job_infos = []
+        for state_file_path in self.state_file_paths:
+            worker_state = self.get_state(state_file_path=state_file_path)
+            if not worker_state:
+                continue
+            if worker_state["current_job_info"]:
+                job_infos.append(worker_state["current_job_info"])
+            job_infos.extend(worker_state.get("prefetched_job_infos", []))
+        for job_info in job_infos:
+            job_id = job_info["job_id"]
             try:
                 Queue().heartbeat(job_id=job_id)
             except Exception as error:
@@ -153,6 +201,29 @@ class WorkerExecutor:
                 # Don't stop since the AfterJobPlan may be running
                 # self.stop()
 
+    def release_prefetched_jobs(self, state_file_path: Optional[str] = None) -> None:
+        """Put the prefetched jobs of a stopped worker loop back in the waiting state in the queue.
+
+        The worker loop releases them itself when it's stopped with SIGTERM, but not when it's killed (e.g. OOM). They
+        are removed from the worker state before being released, so that they are never released twice: another worker
+        may have started them in the meantime.
+        """
+        worker_state_file_path = state_file_path or self.state_file_path
+        worker_state = self.get_state(state_file_path=worker_state_file_path)
+        if not worker_state or not worker_state.get("prefetched_job_infos"):
+            return
+        prefetched_job_infos = worker_state.pop("prefetched_job_infos")
+        with FileLock(f"{worker_state_file_path}.lock"):
+            with open(worker_state_file_path, "wb") as worker_state_f:
+                worker_state_f.write(orjson.dumps(worker_state))
+        queue = Queue()
+        for job_info in prefetched_job_infos:
+            logging.info(f"Releasing a prefetched job of a stopped worker loop. Job info = {job_info}")
+            try:
+                queue.release_job(job_id=job_info["job_id"])
+            except Exception:
+                logging.exception(f"failed to release the prefetched job {job_info['job_id']}")
+
     def kill_zombies(self) -> None:
         queue = Queue()
         zombies = queue.get_zombies(max_seconds_without_heartbeat=self.max_seconds_without_heartbeat_for_zombies)
@@ -163,8 +234,8 @@ class WorkerExecutor:
             job_manager.set_crashed(message=message)
             logging.info(f"Killing zombie. Job info = {zombie}")
 
-    def kill_long_job(self, worker_loop_executor: OutputExecutor) -> None:
-        worker_state = self.get_state()
+    def kill_long_job(self, worker_loop_executor: OutputExecutor, state_file_path: Optional[str] = None) -> None:
+        worker_state = self.get_state(state_file_path=state_file_path)
         if worker_state and worker_state["current_job_info"]:
             long_job = worker_state["current_job_info"]
             last_updated = worker_state["last_updated"]
@@ -178,15 +249,50 @@ class WorkerExecutor:
                 try:
                     worker_loop_executor.stop()  # raises an error if the worker returned exit code 1
                 finally:
+                    self.release_prefetched_jobs(state_file_path=state_file_path)
                     logging.info(f"Killing a long job. Job info = {long_job}")
                     job_runner = self.job_runner_factory.create_job_runner(long_job)
                     job_manager = JobManager(job_info=long_job, app_config=self.app_config, job_runner=job_runner)
                     message = "Job manager was killed while running this job (job exceeded maximum duration)."
                     job_manager.set_exceeded_maximum_duration(message=message)
 
-    def is_worker_alive(self, worker_loop_executor: OutputExecutor) -> bool:
+    def are_workers_alive(self, worker_loop_executors: list[tuple[OutputExecutor, str]]) -> bool:
+        return all(
+            self.is_worker_alive(worker_loop_executor=worker_loop_executor, state_file_path=state_file_path)
+            for worker_loop_executor, state_file_path in worker_loop_executors
+        )
+
+    def restart_stopped_workers(self, worker_loop_executors: list[tuple[OutputExecutor, str]]) -> bool:
+        """Restart the worker loops that have stopped (long job killed, crash, OOM), and keep the other ones running.
+
+        Returns:
+            `bool`: False if the executor is being stopped, True otherwise.
+        """
+        for worker_loop_executor, state_file_path in worker_loop_executors:
+            if self.stopping:
+                return False
+            try:
+                if self.is_worker_alive(worker_loop_executor=worker_loop_executor, state_file_path=state_file_path):
+                    continue
+            except Exception:
+                pass  # the crash has been logged by is_worker_alive
+            if self.stopping:
+                return False
+            self.restart_worker(worker_loop_executor=worker_loop_executor, state_file_path=state_file_path)
+        return True
+
+    def restart_worker(self, worker_loop_executor: OutputExecutor, state_file_path: str) -> None:
+        logging.warning(f"Restarting the worker loop with state file {state_file_path}.")
+        # forget the job of the stopped worker loop, so that no heartbeat is sent for it anymore: if it has not been
+        # finished (e.g. OOM), it will be detected as a zombie
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(state_file_path)
+        worker_loop_executor.start()  # blocking until the banner is printed
+
+    def is_worker_alive(self, worker_loop_executor: OutputExecutor, state_file_path: Optional[str] = None) -> bool:
         if worker_loop_executor.running():
             return True
+        self.release_prefetched_jobs(state_file_path=state_file_path)
         try:
             worker_loop_executor.stop()  # raises an error if the worker returned unexpected exit code
         except ProcessExitedWithError as err:
@@ -194,7 +300,7 @@ class WorkerExecutor:
             if err.exit_code == -9:
                 explanation += " SIGKILL - surely an OOM"
             error_msg = f"Worker crashed ({explanation})"
-            state = self.get_state()
+            state = self.get_state(state_file_path=state_file_path)
             if state and state["current_job_info"]:
                 error_msg += f" when running job_id={state['current_job_info']['job_id']}"
             logging.error(error_msg)
@@ -202,7 +308,7 @@ class WorkerExecutor:
         except BaseException as err:
             explanation = f"{type(err).__name__}: {err}"
             error_msg = f"Worker crashed ({explanation})"
-            state = self.get_state()
+            state = self.get_state(state_file_path=state_file_path)
             if state and state["current_job_info"]:
                 error_msg += f" when running job_id={state['current_job_info']['job_id']}"
             logging.error(error_msg)
@@ -214,7 +320,7 @@ class WorkerExecutor:
                 if return_code == -9:
                     explanation += " SIGKILL - surely an OOM"
                 error_msg = f"Worker crashed ({explanation})"
-                state = self.get_state()
+                state = self.get_state(state_file_path=state_file_path)
                 if state and state["current_job_info"]:
                     error_msg += f" when running job_id={state['current_job_info']['job_id']}"
                 logging.error(error_msg)
@@ -3,6 +3,7 @@
 
 import functools
 import logging
+import os
 from typing import Optional
 
 from libcommon.constants import PARQUET_REVISION
@@ -15,8 +16,8 @@ from libcommon.exceptions import (
 from libcommon.parquet_utils import extract_split_directory_from_parquet_url
 from libcommon.simple_cache import get_previous_step_or_raise
 from libcommon.storage import StrPath
-from libcommon.viewer_utils.parquet_metadata import create_parquet_metadata_file
-from pyarrow.parquet import ParquetFile
+from libcommon.viewer_utils.parquet_metadata import create_parquet_metadata_file, create_row_groups_index_file
+from pyarrow.parquet import ParquetFile, read_metadata
 from tqdm.contrib.concurrent import thread_map
 
 from worker.config import AppConfig
@@ -24,6 +25,7 @@ from worker.dtos import (
     CompleteJobResult,
     ConfigParquetMetadataResponse,
     ParquetFileMetadataItem,
+    RowGroupsIndexItem,
 )
 from worker.job_runners.config.config_job_runner import ConfigJobRunner
 from worker.utils import hffs_parquet_url, retry_on_arrow_invalid_open_file
@@ -71,12 +73,58 @@ def create_parquet_metadata_file_from_remote_parquet(
     )
 
 
+def create_row_groups_index_files(
+    dataset: str,
+    config: str,
+    parquet_files_metadata: list[ParquetFileMetadataItem],
+    parquet_metadata_directory: StrPath,
+) -> list[RowGroupsIndexItem]:
+    row_groups_indexes: list[RowGroupsIndexItem] = []
+    splits = list(
+        dict.fromkeys(
+            parquet_file_metadata["split"]
+            for parquet_file_metadata in parquet_files_metadata
+            if parquet_file_metadata["split"] is not None
+        )
+    )
+    for split in splits:
+        # same order as in ParquetIndexWithMetadata
+        split_parquet_files_metadata = sorted(
+            [
+                parquet_file_metadata
+                for parquet_file_metadata in parquet_files_metadata
+                if parquet_file_metadata["split"] == split
+            ],
+            key=lambda parquet_file_metadata: parquet_file_metadata["filename"],
+        )
+        row_groups_index_subpath = create_row_groups_index_file(
+            dataset=dataset,
+            config=config,
+            split=split,
+            parquet_files_metadata=[
+                read_metadata(
+                    os.path.join(parquet_metadata_directory, parquet_file_metadata["parquet_metadata_subpath"])
+                )
+                for parquet_file_metadata in split_parquet_files_metadata
+            ],
+            parquet_metadata_directory=parquet_metadata_directory,
+        )
+        row_groups_indexes.append(
+            RowGroupsIndexItem(
+                dataset=dataset, config=config, split=split, row_groups_index_subpath=row_groups_index_subpath
+            )
+        )
+    return row_groups_indexes
+
+
 def compute_parquet_metadata_response(
     dataset: str, config: str, hf_endpoint: str, hf_token: Optional[str], parquet_metadata_directory: StrPath
 ) -> ConfigParquetMetadataResponse:
     """
     Get the response of 'config-parquet-metadata' for one specific dataset and config on huggingface.co.
     Store the config's parquet metadata on the disk and return the list of local metadata files.
+    Also store, for each split, an index of the row groups of its parquet files (see
+    `libcommon.viewer_utils.parquet_metadata.create_row_groups_index`).
 
     Args:
         dataset (`str`):
@@ -102,7 +150,7 @@ def compute_parquet_metadata_response(
             If the HfFileSystem couldn't access the parquet files.
 
     Returns:
-        `ConfigParquetMetadataResponse`: An object with the list of parquet metadata files.
+        `ConfigParquetMetadataResponse`: An object with the list of parquet metadata files and row groups indexes.
     """
     logging.info(f"compute 'config-parquet-metadata' for {dataset=} {config=}")
 
@@ -137,8 +185,17 @@ def compute_parquet_metadata_response(
         unit="pq",
         disable=True,
     )
+    row_groups_indexes = create_row_groups_index_files(
+        dataset=dataset,
+        config=config,
+        parquet_files_metadata=parquet_files_metadata,
+        parquet_metadata_directory=parquet_metadata_directory,
+    )
     return ConfigParquetMetadataResponse(
-        parquet_files_metadata=parquet_files_metadata, features=features, partial=partial
+        parquet_files_metadata=parquet_files_metadata,
+        row_groups_indexes=row_groups_indexes,
+        features=features,
+        partial=partial,
     )
 
 
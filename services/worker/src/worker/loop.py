@@ -4,6 +4,7 @@
 import logging
 import random
 import time
+from collections import deque
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional, TypedDict
@@ -19,6 +20,7 @@ from libcommon.queue.jobs import (
     NoWaitingJobError,
     Queue,
 )
+from libcommon.queue.notifications import WaitingJobsNotifier
 from libcommon.utils import get_datetime
 from psutil import cpu_count, getloadavg, swap_memory, virtual_memory
 
@@ -27,7 +29,11 @@ from worker.job_manager import JobManager
 from worker.job_runner_factory import BaseJobRunnerFactory
 
 
-class WorkerState(TypedDict):
+class _OptionalWorkerState(TypedDict, total=False):
+    prefetched_job_infos: list[JobInfo]
+
+
+class WorkerState(_OptionalWorkerState):
     current_job_info: Optional[JobInfo]
     last_updated: datetime
 
@@ -37,6 +43,15 @@ class Loop:
     """
     A loop gets jobs from a queue and processes them.
 
+    If `worker.prefetch_jobs` is greater than 1, the loop starts several jobs at once, and keeps the ones it cannot
+    process immediately in a local buffer. The prefetched jobs are listed in the worker state, so that the executor
+    sends heartbeats for them. A prefetched job that could not be processed within `worker.prefetch_lease_seconds` is
+    put back in the waiting state in the queue.
+
+    If a `waiting_jobs_notifier` is passed, the loop waits for a notification of a new waiting job when the queue is
+    empty, instead of sleeping `worker.sleep_seconds`. It still polls the queue every
+    `worker.wake_up_fallback_sleep_seconds`, in case a notification is missed.
+
     Once initialized, the loop can be started with the `run` method and will run until an uncaught exception
     is raised.
 
@@ -48,14 +63,20 @@ class Loop:
             Worker configuration.
         state_file_path (`str`):
             The path of the file where the state of the loop will be saved.
+        waiting_jobs_notifier (`WaitingJobsNotifier`, *optional*):
+            The notifier that wakes up the loop when a waiting job is added to the queue.
     """
 
     job_runner_factory: BaseJobRunnerFactory
     app_config: AppConfig
     state_file_path: str
+    waiting_jobs_notifier: Optional[WaitingJobsNotifier] = None
 
     def __post_init__(self) -> None:
         self.queue = Queue()
+        # prefetched jobs, and the time (monotonic) at which they have been started
+        self.prefetched_jobs: deque[tuple[JobInfo, float]] = deque()
+        self.current_job_info: Optional[JobInfo] = None
 
     def has_memory(self) -> bool:
         if self.app_config.worker.max_memory_pct <= 0:
@@ -91,29 +112,100 @@ class Loop:
         logging.debug(f"sleep during {duration:.2f} seconds")
         time.sleep(duration)
 
+    def wait_for_waiting_job(self) -> None:
+        if self.waiting_jobs_notifier is None:
+            self.sleep()
+            return
+        jitter = 0.75 + random.random() / 2  # nosec
+        # ^ between 0.75 and 1.25
+        duration = self.app_config.worker.wake_up_fallback_sleep_seconds * jitter
+        logging.debug(f"wait for a new waiting job during {duration:.2f} seconds at most")
+        if self.waiting_jobs_notifier.wait(timeout_seconds=duration):
+            logging.debug("woken up by a new waiting job")
+
     def run(self) -> None:
         logging.info("Worker loop started")
         try:
             while True:
-                if self.has_resources() and self.process_next_job():
+                if not self.has_resources():
+                    with StepProfiler("loop", "sleep"):
+                        self.sleep()
+                    continue
+                if self.process_next_job():
                     # loop immediately to try another job
                     # see https://github.com/huggingface/dataset-viewer/issues/265
                     continue
                 with StepProfiler("loop", "sleep"):
-                    self.sleep()
+                    self.wait_for_waiting_job()
         except BaseException as err:
             logging.exception(f"quit due to an uncaught error: {err}")
+            self.release_prefetched_jobs()
+            if self.waiting_jobs_notifier is not None:
+                self.waiting_jobs_notifier.close()
             raise
 
+    def get_next_job_info(self) -> JobInfo:
+        """Get the next job to process: the oldest prefetched job if any, else start new jobs in the queue.
+
+        The prefetched jobs that have exceeded their lease are put back in the waiting state in the queue.
+
+        Raises:
+            [`EmptyQueueError`], [`AlreadyStartedJobError`], [`LockTimeoutError`], [`NoWaitingJobError`]: if no job
+              could be started (see Queue.start_jobs)
+
+        Returns:
+            `JobInfo`: the job to process
+        """
+        expired_job_infos: list[JobInfo] = []
+        while (
+            self.prefetched_jobs
+            and time.monotonic() - self.prefetched_jobs[0][1] > self.app_config.worker.prefetch_lease_seconds
+        ):
+            job_info, _ = self.prefetched_jobs.popleft()
+            logging.info(f"the lease of the prefetched job {job_info['job_id']} has expired, release it")
+            expired_job_infos.append(job_info)
+        if expired_job_infos:
+            self.release_jobs(job_infos=expired_job_infos)
+        if self.prefetched_jobs:
+            job_info, _ = self.prefetched_jobs.popleft()
+            return job_info
+        job_infos = self.queue.start_jobs(
+            num_jobs=max(1, self.app_config.worker.prefetch_jobs),
+            difficulty_min=self.app_config.worker.difficulty_min,
+            difficulty_max=self.app_config.worker.difficulty_max,
+        )
+        started_at = time.monotonic()
+        self.prefetched_jobs.extend((job_info, started_at) for job_info in job_infos[1:])
+        return job_infos[0]
+
+    def release_jobs(self, job_infos: list[JobInfo]) -> None:
+        """Put jobs that have been removed from the prefetched jobs back in the waiting state in the queue.
+
+        The worker state is updated first: the executor releases the prefetched jobs listed in the state of a stopped
+        worker loop, and it must not release a job that may have been started by another worker in the meantime.
+
+        Args:
+            job_infos (`list[JobInfo]`): the jobs to release.
+        """
+        self.set_worker_state(current_job_info=self.current_job_info)
+        for job_info in job_infos:
+            try:
+                self.queue.release_job(job_id=job_info["job_id"])
+            except Exception:
+                logging.exception(f"failed to release the prefetched job {job_info['job_id']}")
+
+    def release_prefetched_jobs(self) -> None:
+        job_infos = [job_info for job_info, _ in self.prefetched_jobs]
+        self.prefetched_jobs.clear()
+        if job_infos:
+            self.release_jobs(job_infos=job_infos)
+
     def process_next_job(self) -> bool:
         logging.debug("try to process a job")
 
         with StepProfiler("loop", "start_job"):
             try:
-                job_info = self.queue.start_job(
-                    difficulty_min=self.app_config.worker.difficulty_min,
-                    difficulty_max=self.app_config.worker.difficulty_max,
-                )
+                job_info = self.get_next_job_info()
                 self.set_worker_state(current_job_info=job_info)
                 logging.debug(f"job assigned: {job_info}")
             except (EmptyQueueError, AlreadyStartedJobError, LockTimeoutError, NoWaitingJobError) as e:
@@ -132,7 +224,12 @@ class Loop:
             return True
 
     def set_worker_state(self, current_job_info: Optional[JobInfo]) -> None:
-        worker_state: WorkerState = {"current_job_info": current_job_info, "last_updated": get_datetime()}
+        self.current_job_info = current_job_info
+        worker_state: WorkerState = {
+            "current_job_info": current_job_info,
+            "last_updated": get_datetime(),
+            "prefetched_job_infos": [job_info for job_info, _ in self.prefetched_jobs],
+        }
         with FileLock(f"{self.state_file_path}.lock"):
             with open(self.state_file_path, "wb") as worker_state_f:
                 worker_state_f.write(orjson.dumps(worker_state))
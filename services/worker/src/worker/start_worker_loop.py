@@ -1,9 +1,14 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright 2022 The HuggingFace Authors.
 
+import logging
+import signal
 import sys
+from types import FrameType
+from typing import Optional
 
 from libcommon.log import init_logging
+from libcommon.queue.notifications import MongoWaitingJobsNotifier
 from libcommon.resources import CacheMongoResource, QueueMongoResource
 from libcommon.storage import (
     init_parquet_metadata_dir,
@@ -16,6 +21,15 @@ from worker.job_runner_factory import JobRunnerFactory
 from worker.loop import Loop
 from worker.resources import LibrariesResource
 
+
+def exit_on_sigterm(signum: int, frame: Optional[FrameType]) -> None:
+    # the executor stops the worker loop with SIGTERM (long job, or the pod is stopped). Exit from the main thread, so
+    # that Loop.run releases the prefetched jobs, instead of leaving them started without a worker. The exit code is 0,
+    # as expected by the executor for a stopped worker loop.
+    logging.info(f"received {signal.Signals(signum).name}, exiting")
+    sys.exit(0)
+
+
 if __name__ == "__main__":
     app_config = AppConfig.from_env()
 
@@ -68,5 +82,14 @@ if __name__ == "__main__":
             job_runner_factory=job_runner_factory,
             state_file_path=state_file_path,
             app_config=app_config,
+            waiting_jobs_notifier=(
+                MongoWaitingJobsNotifier(
+                    difficulty_min=app_config.worker.difficulty_min,
+                    difficulty_max=app_config.worker.difficulty_max,
+                )
+                if app_config.worker.wake_up_on_new_jobs
+                else None
+            ),
         )
+        signal.signal(signal.SIGTERM, exit_on_sigterm)
         loop.run()
@@ -21,12 +21,18 @@ from libcommon.parquet_utils import ParquetIndexWithMetadata, extract_split_dire
 from libcommon.resources import CacheMongoResource, QueueMongoResource
 from libcommon.simple_cache import CachedArtifactError, upsert_response
 from libcommon.storage import StrPath
+from libcommon.viewer_utils.parquet_metadata import (
+    ROW_GROUPS_INDEX_FILE,
+    ROW_GROUPS_INDEX_ROW_END,
+    load_row_groups_index,
+)
 
 from worker.config import AppConfig
 from worker.dtos import (
     ConfigParquetMetadataResponse,
     ConfigParquetResponse,
     ParquetFileMetadataItem,
+    RowGroupsIndexItem,
 )
 from worker.job_runners.config.parquet_metadata import ConfigParquetMetadataJobRunner
 from worker.utils import hffs_parquet_url
@@ -144,6 +150,14 @@ def get_job_runner(
                         parquet_metadata_subpath="ok/--/config_1/train/filename2",
                     ),
                 ],
+                row_groups_indexes=[
+                    RowGroupsIndexItem(
+                        dataset="ok",
+                        config="config_1",
+                        split="train",
+                        row_groups_index_subpath="ok/--/config_1/train/row_groups_index.npy",
+                    )
+                ],
                 partial=False,
                 features=None,
             ),
@@ -217,6 +231,14 @@ def get_job_runner(
                         parquet_metadata_subpath="with_features/--/config_1/train/filename2",
                     ),
                 ],
+                row_groups_indexes=[
+                    RowGroupsIndexItem(
+                        dataset="with_features",
+                        config="config_1",
+                        split="train",
+                        row_groups_index_subpath="with_features/--/config_1/train/row_groups_index.npy",
+                    )
+                ],
                 partial=False,
                 features=Features({"a": Value("string")}).to_dict(),
             ),
@@ -272,6 +294,14 @@ def get_job_runner(
                         parquet_metadata_subpath="more_than_10k_files/--/config_1/train-part1/filename2",
                     ),
                 ],
+                row_groups_indexes=[
+                    RowGroupsIndexItem(
+                        dataset="more_than_10k_files",
+                        config="config_1",
+                        split="train",
+                        row_groups_index_subpath="more_than_10k_files/--/config_1/train/row_groups_index.npy",
+                    )
+                ],
                 partial=False,
                 features=Features({"a": Value("string")}).to_dict(),
             ),
@@ -329,6 +359,13 @@ def test_compute(
                 )
                 == pq.ParquetFile(get_dummy_parquet_buffer()).metadata
             )
+        for row_groups_index_item in content["row_groups_indexes"]:
+            row_groups_index = load_row_groups_index(
+                Path(job_runner.parquet_metadata_directory) / row_groups_index_item["row_groups_index_subpath"]
+            )
+            # one row group of 3 rows in each of the two parquet files
+            assert row_groups_index[ROW_GROUPS_INDEX_FILE].tolist() == [0, 1]
+            assert row_groups_index[ROW_GROUPS_INDEX_ROW_END].tolist() == [3, 6]
     job_runner.post_compute()
 
 
@@ -1,10 +1,15 @@
+import contextlib
 import os
+import signal
 import sys
 import time
 from collections.abc import Callable, Iterator
+from dataclasses import replace
 from datetime import timedelta
 from http import HTTPStatus
 from pathlib import Path
+from threading import Timer
+from typing import Optional
 from unittest.mock import patch
 
 import orjson
@@ -18,7 +23,7 @@ from libcommon.simple_cache import CachedResponseDocument
 from libcommon.storage import StrPath
 from libcommon.storage_client import StorageClient
 from libcommon.utils import get_datetime
-from mirakuru import ProcessExitedWithError, TimeoutExpired
+from mirakuru import OutputExecutor, ProcessExitedWithError, TimeoutExpired
 from pytest import fixture
 
 from worker.config import AppConfig
@@ -97,6 +102,24 @@ def start_worker_loop_with_long_job() -> None:
             Queue().finish_job(current_job_info["job_id"])
 
 
+def start_worker_loop_with_long_job_in_first_slot() -> None:
+    app_config = AppConfig.from_env()
+    if not app_config.worker.state_file_path:
+        raise ValueError("Failed to get worker state because 'state_file_path' is missing.")
+    if "--print-worker-state-path" in sys.argv:
+        print(app_config.worker.state_file_path, flush=True)
+    current_job_info = get_job_info("long") if app_config.worker.state_file_path.endswith(".0") else get_job_info()
+    with QueueMongoResource(database=app_config.queue.mongo_database, host=app_config.queue.mongo_url):
+        current_job = JobDocument.objects(pk=current_job_info["job_id"]).first()
+        if current_job is not None and current_job.status == Status.STARTED and current_job.started_at is not None:
+            worker_state = WorkerState(
+                current_job_info=current_job_info, last_updated=pytz.UTC.localize(current_job.started_at)
+            )
+            write_worker_state(worker_state, app_config.worker.state_file_path)
+        # else: the long job has been killed, and the worker loop has been restarted, it has nothing to do
+        time.sleep(20)
+
+
 @fixture
 def set_worker_state(worker_state_file_path: str) -> Iterator[WorkerState]:
     job_info = get_job_info()
@@ -121,7 +144,7 @@ def set_just_started_job_in_queue(queue_mongo_resource: QueueMongoResource) -> I
         revision=job_info["params"]["revision"],
         config=job_info["params"]["config"],
         split=job_info["params"]["split"],
-        unicity_id="unicity_id",
+        unicity_id=job_info["job_id"],
         namespace="user",
         priority=job_info["priority"],
         status=Status.STARTED,
@@ -152,7 +175,7 @@ def set_long_running_job_in_queue(
         revision=job_info["params"]["revision"],
         config=job_info["params"]["config"],
         split=job_info["params"]["split"],
-        unicity_id="unicity_id",
+        unicity_id=job_info["job_id"],
         namespace="user",
         priority=job_info["priority"],
         status=Status.STARTED,
@@ -183,7 +206,7 @@ def set_zombie_job_in_queue(queue_mongo_resource: QueueMongoResource) -> Iterato
         revision=job_info["params"]["revision"],
         config=job_info["params"]["config"],
         split=job_info["params"]["split"],
-        unicity_id="unicity_id",
+        unicity_id=job_info["job_id"],
         namespace="user",
         priority=job_info["priority"],
         status=Status.STARTED,
@@ -260,6 +283,52 @@ def test_executor_heartbeat(
     assert last_heartbeat_datetime >= get_datetime() - timedelta(seconds=1)
 
 
+def test_executor_heartbeat_with_slots(
+    app_config: AppConfig,
+    job_runner_factory: JobRunnerFactory,
+    worker_state_file_path: str,
+    set_just_started_job_in_queue: JobDocument,
+    set_long_running_job_in_queue: JobDocument,
+) -> None:
+    app_config = replace(app_config, worker=replace(app_config.worker, num_slots=2))
+    executor = WorkerExecutor(app_config, job_runner_factory, state_file_path=worker_state_file_path)
+    assert executor.state_file_paths == [f"{worker_state_file_path}.0", f"{worker_state_file_path}.1"]
+    for job_info, state_file_path in zip([get_job_info(), get_job_info("long")], executor.state_file_paths):
+        write_worker_state(
+            WorkerState(current_job_info=job_info, last_updated=get_datetime()), worker_state_file_path=state_file_path
+        )
+    try:
+        executor.heartbeat()
+    finally:
+        for state_file_path in executor.state_file_paths:
+            os.remove(state_file_path)
+    for job in [set_just_started_job_in_queue, set_long_running_job_in_queue]:
+        job.reload()
+        assert job.last_heartbeat is not None
+        assert pytz.UTC.localize(job.last_heartbeat) >= get_datetime() - timedelta(seconds=1)
+
+
+def test_executor_release_prefetched_jobs(
+    executor: WorkerExecutor,
+    set_just_started_job_in_queue: JobDocument,
+    worker_state_file_path: str,
+) -> None:
+    job = set_just_started_job_in_queue
+    worker_state = WorkerState(current_job_info=None, last_updated=get_datetime())
+    worker_state["prefetched_job_infos"] = [get_job_info()]
+    write_worker_state(worker_state, worker_state_file_path)
+    try:
+        executor.release_prefetched_jobs()
+        job.reload()
+        assert job.status == Status.WAITING
+        # the released jobs are removed from the worker state, so that they are not released twice
+        state = executor.get_state()
+        assert state is not None
+        assert "prefetched_job_infos" not in state
+    finally:
+        os.remove(worker_state_file_path)
+
+
 def test_executor_kill_zombies(
     executor: WorkerExecutor,
     set_just_started_job_in_queue: JobDocument,
@@ -363,6 +432,77 @@ def test_executor_stops_on_long_job(
     assert response.details == expected_error
 
 
+def test_executor_restarts_the_slot_of_a_long_job(
+    app_config: AppConfig,
+    job_runner_factory: JobRunnerFactory,
+    worker_state_file_path: str,
+    cache_mongo_resource: CacheMongoResource,
+    tmp_dataset_repo_factory: Callable[[str], str],
+    set_long_running_job_in_queue: JobDocument,
+    set_just_started_job_in_queue: JobDocument,
+) -> None:
+    app_config = replace(app_config, worker=replace(app_config.worker, num_slots=2))
+    executor = WorkerExecutor(app_config, job_runner_factory, state_file_path=worker_state_file_path)
+    long_job = set_long_running_job_in_queue
+    normal_job = set_just_started_job_in_queue
+    tmp_dataset_repo_factory(long_job.dataset)
+    worker_loop_executors: list[OutputExecutor] = []
+    create_worker_loop_executor = executor._create_worker_loop_executor
+
+    def create_and_record_worker_loop_executor(state_file_path: Optional[str] = None) -> OutputExecutor:
+        worker_loop_executor = create_worker_loop_executor(state_file_path=state_file_path)
+        worker_loop_executors.append(worker_loop_executor)
+        return worker_loop_executor
+
+    normal_job_slot_states: list[tuple[bool, Optional[int]]] = []
+
+    def record_normal_job_slot_state() -> None:
+        process = worker_loop_executors[1].process
+        normal_job_slot_states.append((worker_loop_executors[1].running(), process.pid if process else None))
+
+    def stop_executor() -> None:
+        record_normal_job_slot_state()
+        os.kill(os.getpid(), signal.SIGTERM)  # handled by the executor
+
+    record_first_state = Timer(3, record_normal_job_slot_state)
+    stop = Timer(10, stop_executor)
+    try:
+        with (
+            patch.dict(os.environ, {"WORKER_LOOP_TYPE": "start_worker_loop_with_long_job_in_first_slot"}),
+            patch.object(executor, "max_seconds_without_heartbeat_for_zombies", -1),  # don't kill normal_job
+            patch.object(executor, "kill_long_job_interval_seconds", 0.1),
+            patch.object(executor, "_create_worker_loop_executor", side_effect=create_and_record_worker_loop_executor),
+            patch.object(executor, "restart_worker", wraps=executor.restart_worker) as restart_worker_mock,
+            patch("worker.executor.START_WORKER_LOOP_PATH", __file__),
+            patch.dict(os.environ, {"WORKER_TEST_TIME": str(_TIME)}),
+        ):
+            record_first_state.start()
+            stop.start()
+            executor.start()
+    finally:
+        record_first_state.cancel()
+        stop.cancel()
+        executor.stop()
+        for state_file_path in executor.state_file_paths:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(state_file_path)
+
+    # the long job has been killed, and its slot has been restarted
+    assert JobDocument.objects(pk=long_job.pk).count() == 0, "must be deleted because too long"
+    assert CachedResponseDocument.objects(error_code="JobManagerExceededMaximumDurationError").count() == 1
+    assert restart_worker_mock.call_count > 0
+    assert {call.kwargs["state_file_path"] for call in restart_worker_mock.call_args_list} == {
+        executor.state_file_paths[0]
+    }
+    # the other slot has kept running the normal job
+    assert len(normal_job_slot_states) == 2
+    assert all(running for running, _ in normal_job_slot_states)
+    assert normal_job_slot_states[0][1] == normal_job_slot_states[1][1]
+    normal_job.reload()
+    assert normal_job.status == Status.STARTED
+    assert normal_job.last_heartbeat is not None
+
+
 if __name__ == "__main__":
     worker_loop_type = os.environ.get("WORKER_LOOP_TYPE", "start_worker_loop")
     if worker_loop_type == "start_worker_loop_that_crashes":
@@ -371,5 +511,7 @@ if __name__ == "__main__":
         start_worker_loop_that_times_out()
     elif worker_loop_type == "start_worker_loop_with_long_job":
         start_worker_loop_with_long_job()
+    elif worker_loop_type == "start_worker_loop_with_long_job_in_first_slot":
+        start_worker_loop_with_long_job_in_first_slot()
     else:
         start_worker_loop()
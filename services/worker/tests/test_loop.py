@@ -1,4 +1,12 @@
-from libcommon.dtos import JobInfo
+import time
+from dataclasses import replace
+from threading import Timer
+
+import orjson
+
+from libcommon.dtos import JobInfo, Status
+from libcommon.queue.jobs import JobDocument
+from libcommon.queue.notifications import LocalWaitingJobsNotifier
 from libcommon.resources import CacheMongoResource, QueueMongoResource
 
 from worker.config import AppConfig
@@ -52,3 +60,105 @@ def test_process_next_job(
     assert loop.queue.is_job_in_process(job_type=JOB_TYPE, dataset=dataset, revision=revision)
     assert loop.process_next_job()
     assert not loop.queue.is_job_in_process(job_type=JOB_TYPE, dataset=dataset, revision=revision)
+
+
+def test_process_next_job_with_prefetch(
+    app_config: AppConfig,
+    libraries_resource: LibrariesResource,
+    cache_mongo_resource: CacheMongoResource,
+    queue_mongo_resource: QueueMongoResource,
+    worker_state_file_path: str,
+) -> None:
+    app_config = replace(app_config, worker=replace(app_config.worker, prefetch_jobs=2, prefetch_lease_seconds=600))
+    factory = DummyJobRunnerFactory(app_config=app_config)
+
+    loop = Loop(
+        job_runner_factory=factory,
+        app_config=app_config,
+        state_file_path=worker_state_file_path,
+    )
+    revision = "revision"
+    for dataset in ["dataset1", "dataset2", "dataset3"]:
+        loop.queue.add_job(job_type=JOB_TYPE, dataset=dataset, revision=revision, difficulty=50)
+    assert loop.process_next_job()
+    # dataset1 has been processed, and dataset2 has been prefetched
+    assert not loop.queue.is_job_in_process(job_type=JOB_TYPE, dataset="dataset1", revision=revision)
+    assert JobDocument.objects(dataset="dataset2").get().status == Status.STARTED
+    assert JobDocument.objects(dataset="dataset3").get().status == Status.WAITING
+    assert [job_info["params"]["dataset"] for job_info, _ in loop.prefetched_jobs] == ["dataset2"]
+    assert loop.process_next_job()
+    assert not loop.queue.is_job_in_process(job_type=JOB_TYPE, dataset="dataset2", revision=revision)
+    assert JobDocument.objects(dataset="dataset3").get().status == Status.WAITING
+
+
+def test_release_prefetched_jobs(
+    app_config: AppConfig,
+    libraries_resource: LibrariesResource,
+    cache_mongo_resource: CacheMongoResource,
+    queue_mongo_resource: QueueMongoResource,
+    worker_state_file_path: str,
+) -> None:
+    app_config = replace(app_config, worker=replace(app_config.worker, prefetch_jobs=2, prefetch_lease_seconds=600))
+    factory = DummyJobRunnerFactory(app_config=app_config)
+
+    loop = Loop(
+        job_runner_factory=factory,
+        app_config=app_config,
+        state_file_path=worker_state_file_path,
+    )
+    revision = "revision"
+    for dataset in ["dataset1", "dataset2"]:
+        loop.queue.add_job(job_type=JOB_TYPE, dataset=dataset, revision=revision, difficulty=50)
+    assert loop.process_next_job()
+    loop.release_prefetched_jobs()
+    assert not loop.prefetched_jobs
+    assert JobDocument.objects(dataset="dataset2").get().status == Status.WAITING
+    # the released jobs are removed from the worker state, so that the executor does not release them again
+    with open(worker_state_file_path, "rb") as worker_state_f:
+        assert orjson.loads(worker_state_f.read())["prefetched_job_infos"] == []
+
+
+def test_process_next_job_with_expired_prefetch_lease(
+    app_config: AppConfig,
+    libraries_resource: LibrariesResource,
+    cache_mongo_resource: CacheMongoResource,
+    queue_mongo_resource: QueueMongoResource,
+    worker_state_file_path: str,
+) -> None:
+    app_config = replace(app_config, worker=replace(app_config.worker, prefetch_jobs=2, prefetch_lease_seconds=0))
+    factory = DummyJobRunnerFactory(app_config=app_config)
+
+    loop = Loop(
+        job_runner_factory=factory,
+        app_config=app_config,
+        state_file_path=worker_state_file_path,
+    )
+    revision = "revision"
+    for dataset in ["dataset1", "dataset2"]:
+        loop.queue.add_job(job_type=JOB_TYPE, dataset=dataset, revision=revision, difficulty=50)
+    assert loop.process_next_job()
+    # the lease of the prefetched job has expired: it's released, then started again
+    assert loop.process_next_job()
+    assert not loop.queue.is_job_in_process(job_type=JOB_TYPE, dataset="dataset2", revision=revision)
+
+
+def test_wait_for_waiting_job(
+    app_config: AppConfig,
+    libraries_resource: LibrariesResource,
+    worker_state_file_path: str,
+) -> None:
+    app_config = replace(app_config, worker=replace(app_config.worker, wake_up_fallback_sleep_seconds=60))
+    notifier = LocalWaitingJobsNotifier()
+    loop = Loop(
+        job_runner_factory=DummyJobRunnerFactory(app_config=app_config),
+        app_config=app_config,
+        state_file_path=worker_state_file_path,
+        waiting_jobs_notifier=notifier,
+    )
+    timer = Timer(0.1, notifier.notify, kwargs={"difficulty": 50})
+    timer.start()
+    start = time.monotonic()
+    loop.wait_for_waiting_job()
+    # ^ woken up by the notification, long before the fallback sleep duration
+    assert time.monotonic() - start < 10
+    timer.join()